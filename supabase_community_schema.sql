@@ -1,6 +1,6 @@
 -- Supabase Community Schema for WealthPulse
 -- NOTE: Community tables include permissive policies for anon access.
--- The core app storage table (`wealthpulse_users`) is locked to service_role only.
+-- The core app storage tables (`wealthpulse_users` and the normalized `wealthpulse_*` tables) are locked to service_role only.
 -- Tighten policies further before production if using Supabase Auth.
 
 create extension if not exists "pgcrypto";
@@ -37,7 +37,8 @@ create table if not exists community_posts (
   grading_grade text,
   auction_end_date date,
   sold_price numeric,
-  sold_at timestamptz
+  sold_at timestamptz,
+  updated_at timestamptz default now()
 );
 
 create table if not exists community_comments (
@@ -101,14 +102,170 @@ create table if not exists community_reports (
   created_at timestamptz default now()
 );
 
+-- Deletion log so clients can sync the post feed incrementally
+create table if not exists community_post_deletions (
+  post_id uuid primary key,
+  deleted_at timestamptz default now()
+);
+
+-- Private bucket for content-addressed photos (read and written server-side with the service role)
+insert into storage.buckets (id, name, public)
+values ('wealthpulse-images', 'wealthpulse-images', false)
+on conflict (id) do nothing;
+
 -- Core app storage (server-side use)
 create table if not exists wealthpulse_users (
   username text primary key,
   data jsonb,
   updated_at timestamptz default now()
 );
+-- Key order of a normalized record; null while the record is still one JSONB blob in `data`
+alter table wealthpulse_users add column if not exists layout jsonb;
+
+-- Normalized app storage (APP_STORAGE_NORMALIZED = true): one row per asset, liability,
+-- entity and setting so a save only writes the rows that changed. Items are keyed by their
+-- "id" (item_id), with position kept for order. Primary keys lead with username, so
+-- per-user reads and deletes are index scans.
+create table if not exists wealthpulse_assets (
+  username text not null,
+  item_id text not null,
+  position integer not null,
+  data jsonb not null,
+  updated_at timestamptz default now(),
+  primary key (username, item_id)
+);
+
+create table if not exists wealthpulse_liabilities (
+  username text not null,
+  item_id text not null,
+  position integer not null,
+  data jsonb not null,
+  updated_at timestamptz default now(),
+  primary key (username, item_id)
+);
+
+create table if not exists wealthpulse_entities (
+  username text not null,
+  item_id text not null,
+  position integer not null,
+  data jsonb not null,
+  updated_at timestamptz default now(),
+  primary key (username, item_id)
+);
+
+create table if not exists wealthpulse_settings (
+  username text not null,
+  name text not null,
+  value jsonb,
+  updated_at timestamptz default now(),
+  primary key (username, name)
+);
+
+-- Tables created when items were keyed by (username, position): add item_id (the item's
+-- "id", or "@position" until the app writes one) and move the primary key onto it.
+do $$
+declare
+  t text;
+begin
+  foreach t in array array['wealthpulse_assets', 'wealthpulse_liabilities', 'wealthpulse_entities'] loop
+    execute format('alter table %I add column if not exists item_id text', t);
+    execute format('update %I set item_id = coalesce(nullif(data->>''id'', ''''), ''@'' || position) where item_id is null', t);
+    if not exists (
+      select 1 from information_schema.key_column_usage
+      where table_schema = 'public' and table_name = t and constraint_name = t || '_pkey' and column_name = 'item_id'
+    ) then
+      execute format('alter table %I drop constraint if exists %I', t, t || '_pkey');
+      execute format('alter table %I alter column item_id set not null', t);
+      execute format('alter table %I add primary key (username, item_id)', t);
+    end if;
+  end loop;
+end $$;
+
+-- One save of a normalized record, applied in a single transaction: changed and new items
+-- (p_items), items that only moved (p_moved), removed items, changed and removed settings,
+-- then the user row, whose updated_at is the version readers compare against. With
+-- p_full the caller sent every row and the user's other rows are dropped after the upserts.
+create or replace function wealthpulse_write_record(
+  p_username text,
+  p_layout jsonb,
+  p_data jsonb default null,
+  p_items jsonb default '{}'::jsonb,
+  p_moved jsonb default '{}'::jsonb,
+  p_removed_items jsonb default '{}'::jsonb,
+  p_settings jsonb default '{}'::jsonb,
+  p_removed_settings jsonb default '[]'::jsonb,
+  p_full boolean default false
+) returns timestamptz
+language plpgsql security invoker as $$
+declare
+  collection text;
+  item_table text;
+  stamp timestamptz := now();
+begin
+  for collection, item_table in
+    select * from (values
+      ('portfolio', 'wealthpulse_assets'),
+      ('liabilities', 'wealthpulse_liabilities'),
+      ('entities', 'wealthpulse_entities')
+    ) as tables(collection, item_table)
+  loop
+    execute format(
+      'insert into %I (username, item_id, position, data, updated_at)
+       select $1, e->>''item_id'', (e->>''position'')::integer, e->''data'', $2
+       from jsonb_array_elements(coalesce($3->%L, ''[]''::jsonb)) as e
+       on conflict (username, item_id) do update
+       set position = excluded.position, data = excluded.data, updated_at = excluded.updated_at',
+      item_table, collection
+    ) using p_username, stamp, p_items;
+    execute format(
+      'update %I as t set position = (m->>''position'')::integer
+       from jsonb_array_elements(coalesce($2->%L, ''[]''::jsonb)) as m
+       where t.username = $1 and t.item_id = m->>''item_id''',
+      item_table, collection
+    ) using p_username, p_moved;
+    if p_full then
+      execute format(
+        'delete from %I where username = $1 and item_id not in (
+           select e->>''item_id'' from jsonb_array_elements(coalesce($2->%L, ''[]''::jsonb)) as e
+         )',
+        item_table, collection
+      ) using p_username, p_items;
+    else
+      execute format(
+        'delete from %I where username = $1 and item_id in (
+           select jsonb_array_elements_text(coalesce($2->%L, ''[]''::jsonb))
+         )',
+        item_table, collection
+      ) using p_username, p_removed_items;
+    end if;
+  end loop;
+
+  insert into wealthpulse_settings (username, name, value, updated_at)
+  select p_username, s.key, s.value, stamp from jsonb_each(coalesce(p_settings, '{}'::jsonb)) as s
+  on conflict (username, name) do update set value = excluded.value, updated_at = excluded.updated_at;
+  if p_full then
+    delete from wealthpulse_settings where username = p_username and not (coalesce(p_settings, '{}'::jsonb) ? name);
+  else
+    delete from wealthpulse_settings
+    where username = p_username and name in (select jsonb_array_elements_text(coalesce(p_removed_settings, '[]'::jsonb)));
+  end if;
+
+  insert into wealthpulse_users (username, layout, data, updated_at)
+  values (p_username, p_layout, coalesce(p_data, '{}'::jsonb), stamp)
+  on conflict (username) do update
+  set layout = excluded.layout,
+      data = case when p_data is null then wealthpulse_users.data else excluded.data end,
+      updated_at = excluded.updated_at;
+  return stamp;
+end;
+$$;
+
+revoke execute on function wealthpulse_write_record(text, jsonb, jsonb, jsonb, jsonb, jsonb, jsonb, jsonb, boolean) from public, anon, authenticated;
+grant execute on function wealthpulse_write_record(text, jsonb, jsonb, jsonb, jsonb, jsonb, jsonb, jsonb, boolean) to service_role;
 
 create index if not exists idx_community_posts_created_at on community_posts(created_at desc);
+-- Feed pages use a (created_at, id) keyset so posts sharing a timestamp are not skipped
+create index if not exists idx_community_posts_created_at_id on community_posts(created_at desc, id desc);
 create index if not exists idx_community_posts_created_by on community_posts(created_by);
 create index if not exists idx_community_comments_post_id on community_comments(post_id);
 create index if not exists idx_community_bids_post_id on community_bids(post_id);
@@ -122,6 +279,25 @@ create index if not exists idx_community_offers_owner_id on community_offers(own
 create index if not exists idx_community_messages_sender_id on community_messages(sender_id);
 create index if not exists idx_community_messages_recipient_id on community_messages(recipient_id);
 create index if not exists idx_community_users_auth_id on community_users(auth_id);
+create index if not exists idx_community_posts_updated_at on community_posts(updated_at, id);
+create index if not exists idx_community_post_deletions_deleted_at on community_post_deletions(deleted_at);
+create index if not exists idx_community_bids_post_id_amount on community_bids(post_id, amount desc);
+-- Message boxes page on a (created_at, id) keyset; unread counts only touch unread rows
+create index if not exists idx_community_messages_recipient_created_at on community_messages(recipient, created_at desc, id desc);
+create index if not exists idx_community_messages_sender_created_at on community_messages(sender, created_at desc, id desc);
+create index if not exists idx_community_messages_recipient_id_created_at on community_messages(recipient_id, created_at desc, id desc);
+create index if not exists idx_community_messages_sender_id_created_at on community_messages(sender_id, created_at desc, id desc);
+create index if not exists idx_community_messages_recipient_unread on community_messages(recipient) where read_at is null;
+create index if not exists idx_community_messages_recipient_id_unread on community_messages(recipient_id) where read_at is null;
+
+-- Per-post bid aggregates (runs with the caller's RLS on community_bids)
+create or replace view community_post_bid_stats
+with (security_invoker = true) as
+select post_id, count(*) as bid_count, max(amount) as max_bid, max(created_at) as last_bid_at
+from community_bids
+group by post_id;
+
+grant select on community_post_bid_stats to anon, authenticated;
 
 -- Migrations for existing installations
 alter table community_users add column if not exists auth_id uuid;
@@ -135,6 +311,93 @@ alter table community_offers add column if not exists owner_id uuid;
 alter table community_messages add column if not exists sender_id uuid;
 alter table community_messages add column if not exists recipient_id uuid;
 alter table community_reports add column if not exists owner_id uuid;
+alter table community_posts add column if not exists updated_at timestamptz default now();
+
+-- Listing search: weighted tsvector kept current by Postgres on every insert/update, plus a GIN index
+alter table community_posts add column if not exists search_vector tsvector
+  generated always as (
+    setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+    setweight(to_tsvector('simple', coalesce(category, '')), 'B') ||
+    setweight(to_tsvector('simple', coalesce(body, '')), 'C') ||
+    setweight(to_tsvector('simple', coalesce(created_by, '')), 'D')
+  ) stored;
+create index if not exists idx_community_posts_search_vector on community_posts using gin (search_vector);
+
+-- Ranked prefix search over listings (runs with the caller's RLS on community_posts)
+create or replace function community_search_posts(query text, max_results integer default 200)
+returns table (id uuid, rank real)
+language sql stable security invoker as $$
+  with q as (
+    select to_tsquery('simple', string_agg(quote_literal(token) || ':*', ' & ')) as tsq
+    from regexp_split_to_table(lower(coalesce(query, '')), '[^a-z0-9]+') as token
+    where token <> ''
+  )
+  select p.id, ts_rank(p.search_vector, q.tsq) as rank
+  from community_posts p, q
+  where q.tsq is not null and p.search_vector @@ q.tsq
+  order by rank desc, p.created_at desc
+  limit greatest(1, least(coalesce(max_results, 200), 1000));
+$$;
+
+grant execute on function community_search_posts(text, integer) to anon, authenticated;
+
+-- Server-side Browse filters: list_price is the fixed price, or the starting bid for auctions
+alter table community_posts add column if not exists list_price numeric
+  generated always as (
+    case
+      when listing_type = 'For Sale' then price
+      when listing_type = 'Auction' then coalesce(nullif(auction_starting_bid, 0), price)
+    end
+  ) stored;
+create index if not exists idx_community_posts_status_created_at on community_posts(status, created_at desc);
+create index if not exists idx_community_posts_category_created_at on community_posts(category, created_at desc);
+create index if not exists idx_community_posts_type_created_at on community_posts(listing_type, created_at desc);
+create index if not exists idx_community_posts_type_status_end on community_posts(listing_type, status, auction_end_date);
+create index if not exists idx_community_posts_list_price on community_posts(list_price, created_at desc) where list_price is not null;
+create index if not exists idx_community_posts_auction_end on community_posts(auction_end_date, created_at desc) where auction_end_date is not null;
+
+-- Incremental feed sync: bump updated_at on every edit and log deletions
+create or replace function community_posts_touch_updated_at() returns trigger as $$
+begin
+  new.updated_at = now();
+  return new;
+end;
+$$ language plpgsql;
+
+drop trigger if exists community_posts_touch_updated_at on community_posts;
+create trigger community_posts_touch_updated_at
+  before update on community_posts
+  for each row execute function community_posts_touch_updated_at();
+
+create or replace function community_posts_log_deletion() returns trigger as $$
+begin
+  insert into community_post_deletions (post_id) values (old.id)
+  on conflict (post_id) do update set deleted_at = now();
+  return old;
+end;
+$$ language plpgsql security definer;
+
+drop trigger if exists community_posts_log_deletion on community_posts;
+create trigger community_posts_log_deletion
+  after delete on community_posts
+  for each row execute function community_posts_log_deletion();
+
+-- Realtime change feed for live Browse, bid and inbox updates
+do $$
+declare
+  t text;
+begin
+  if exists (select 1 from pg_publication where pubname = 'supabase_realtime') then
+    foreach t in array array['community_posts', 'community_bids', 'community_messages'] loop
+      if not exists (
+        select 1 from pg_publication_tables
+        where pubname = 'supabase_realtime' and schemaname = 'public' and tablename = t
+      ) then
+        execute format('alter publication supabase_realtime add table public.%I', t);
+      end if;
+    end loop;
+  end if;
+end $$;
 
 alter table community_users enable row level security;
 alter table community_posts enable row level security;
@@ -145,7 +408,12 @@ alter table community_messages enable row level security;
 alter table community_roles enable row level security;
 alter table community_bans enable row level security;
 alter table community_reports enable row level security;
+alter table community_post_deletions enable row level security;
 alter table wealthpulse_users enable row level security;
+alter table wealthpulse_assets enable row level security;
+alter table wealthpulse_liabilities enable row level security;
+alter table wealthpulse_entities enable row level security;
+alter table wealthpulse_settings enable row level security;
 
 create policy "community_users_select" on community_users
   for select using (auth.role() = 'authenticated');
@@ -199,6 +467,9 @@ create policy "community_messages_update" on community_messages
 create policy "community_messages_delete" on community_messages
   for delete using (sender_id = auth.uid() or recipient_id = auth.uid());
 
+create policy "community_post_deletions_select" on community_post_deletions
+  for select using (auth.role() = 'authenticated');
+
 create policy "community_roles_select" on community_roles
   for select using (auth.role() = 'authenticated');
 create policy "community_roles_manage" on community_roles
@@ -219,6 +490,10 @@ create policy "community_reports_delete" on community_reports
   for delete using (auth.role() = 'service_role');
 
 create policy "service role only users" on wealthpulse_users for all using (auth.role() = 'service_role') with check (auth.role() = 'service_role');
+create policy "service role only assets" on wealthpulse_assets for all using (auth.role() = 'service_role') with check (auth.role() = 'service_role');
+create policy "service role only liabilities" on wealthpulse_liabilities for all using (auth.role() = 'service_role') with check (auth.role() = 'service_role');
+create policy "service role only entities" on wealthpulse_entities for all using (auth.role() = 'service_role') with check (auth.role() = 'service_role');
+create policy "service role only settings" on wealthpulse_settings for all using (auth.role() = 'service_role') with check (auth.role() = 'service_role');
 
 -- OPTIONAL: Legacy fallback (service_role only for all community tables).
 -- Uncomment the block below if you want to disable end-user access entirely.
@@ -307,6 +582,8 @@ create policy "public_posts_insert" on community_posts for insert to anon, authe
 create policy "public_posts_update" on community_posts for update to anon, authenticated using (true) with check (true);
 create policy "public_posts_delete" on community_posts for delete to anon, authenticated using (true);
 
+create policy "public_post_deletions_read" on community_post_deletions for select to anon, authenticated using (true);
+
 create policy "public_comments_read" on community_comments for select to anon, authenticated using (true);
 create policy "public_comments_insert" on community_comments for insert to anon, authenticated with check (true);
 create policy "public_comments_update" on community_comments for update to anon, authenticated using (true) with check (true);
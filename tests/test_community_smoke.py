@@ -0,0 +1,45 @@
+"""Smoke test that renders the Community tab for a signed-in user.
+
+The app keeps its data files next to the script, so a copy is run from a
+temporary directory to leave the checkout untouched.
+"""
+import json
+import shutil
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("streamlit")
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+APP_PATH = Path(__file__).resolve().parents[1] / "wealth_tracker.py"
+
+
+@pytest.fixture
+def app_copy(tmp_path):
+    script = tmp_path / "wealth_tracker.py"
+    shutil.copy(APP_PATH, script)
+    (tmp_path / "wealth_data.json").write_text(json.dumps({
+        "alice": {"portfolio": [], "liabilities": [], "entities": [], "settings": {}},
+        "_meta": {"forum_posts": [{
+            "id": "post-1",
+            "title": "1 oz Gold Eagle",
+            "listing_type": "For Sale",
+            "category": "Bullion",
+            "price": 2400.0,
+            "currency": "USD",
+            "created_by": "bob",
+            "created_at": "2026-01-01T00:00:00+00:00",
+            "status": "Open",
+        }]},
+    }))
+    return script
+
+
+def test_community_tab_renders(app_copy):
+    at = AppTest.from_file(str(app_copy), default_timeout=60)
+    at.session_state["user"] = "alice"
+    at.session_state["active_tab"] = "Community"
+    at.run()
+    assert not at.exception, [item.message for item in at.exception]
+    assert any("1 oz Gold Eagle" in block.value for block in at.markdown)
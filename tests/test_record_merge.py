@@ -0,0 +1,163 @@
+"""Three-way record merge used by compare-and-swap saves.
+
+wealth_tracker.py is a Streamlit script that renders the app on import, so the
+pure helpers under test are compiled out of its source instead.
+"""
+import ast
+import hashlib
+import json
+import secrets
+from pathlib import Path
+
+import pytest
+
+APP_PATH = Path(__file__).resolve().parents[1] / "wealth_tracker.py"
+MERGE_HELPERS = {
+    "backfill_item_id",
+    "ensure_record_item_ids",
+    "record_item_ids",
+    "merge_record_lists",
+    "merge_record_values",
+    "resolve_record_write",
+    "serialize_record",
+}
+MERGE_CONSTANTS = {"MERGE_MISSING", "APP_STORAGE_ITEM_TABLES"}
+
+
+@pytest.fixture(scope="module")
+def app():
+    source = APP_PATH.read_text()
+    namespace = {"json": json, "hashlib": hashlib, "secrets": secrets}
+    for node in ast.parse(source).body:
+        if isinstance(node, ast.Assign) and any(getattr(target, "id", None) in MERGE_CONSTANTS for target in node.targets):
+            exec(ast.get_source_segment(source, node), namespace)
+        elif isinstance(node, ast.FunctionDef) and node.name in MERGE_HELPERS:
+            exec(ast.get_source_segment(source, node), namespace)
+    missing = MERGE_HELPERS - set(namespace)
+    assert not missing, f"helpers not found in wealth_tracker.py: {sorted(missing)}"
+    return namespace
+
+
+def asset(item_id, **fields):
+    return {"id": item_id, "name": item_id.upper(), "qty": 1, **fields}
+
+
+def test_one_sided_change_wins(app):
+    base = {"settings": {"currency": "USD"}, "portfolio": [asset("a")]}
+    ours = {"settings": {"currency": "EUR"}, "portfolio": [asset("a")]}
+    assert app["merge_record_values"](base, base, ours) == (ours, [])
+    assert app["merge_record_values"](base, ours, base) == (ours, [])
+
+
+def test_dict_fields_merge_key_by_key(app):
+    base = {"settings": {"currency": "USD", "theme": "dark"}}
+    theirs = {"settings": {"currency": "EUR", "theme": "dark"}}
+    ours = {"settings": {"currency": "USD", "theme": "light"}}
+    merged, conflicts = app["merge_record_values"](base, theirs, ours)
+    assert merged == {"settings": {"currency": "EUR", "theme": "light"}}
+    assert conflicts == []
+
+
+def test_list_items_merge_by_id_not_position(app):
+    base = [asset("a"), asset("b"), asset("c")]
+    # The stored side deleted "a", shifting every position; this side edited "c".
+    theirs = [asset("b"), asset("c")]
+    ours = [asset("a"), asset("b"), asset("c", qty=5)]
+    merged, conflicts = app["merge_record_values"](base, theirs, ours)
+    assert merged == [asset("b"), asset("c", qty=5)]
+    assert conflicts == []
+
+
+def test_both_sides_add_items(app):
+    base = [asset("a")]
+    theirs = [asset("a"), asset("b")]
+    ours = [asset("a"), asset("c")]
+    merged, conflicts = app["merge_record_values"](base, theirs, ours)
+    assert merged == [asset("a"), asset("b"), asset("c")]
+    assert conflicts == []
+
+
+def test_different_fields_of_one_item_merge(app):
+    base = [asset("a")]
+    theirs = [asset("a", qty=2)]
+    ours = [asset("a", notes="boxed")]
+    merged, conflicts = app["merge_record_values"](base, theirs, ours)
+    assert merged == [asset("a", qty=2, notes="boxed")]
+    assert conflicts == []
+
+
+def test_delete_against_edit_keeps_stored_side(app):
+    base = [asset("a"), asset("b")]
+    theirs = [asset("a", qty=3), asset("b")]
+    ours = [asset("b")]
+    merged, conflicts = app["merge_record_values"](base, theirs, ours, "portfolio")
+    assert merged == theirs
+    assert conflicts == ["portfolio[a]"]
+
+    merged, conflicts = app["merge_record_values"](base, ours, theirs, "portfolio")
+    assert merged == ours
+    assert conflicts == ["portfolio[a]"]
+
+
+def test_same_field_edited_on_both_sides_is_reported(app):
+    base = [asset("a")]
+    theirs = [asset("a", qty=2)]
+    ours = [asset("a", qty=7)]
+    merged, conflicts = app["merge_record_values"](base, theirs, ours, "portfolio")
+    assert merged == theirs
+    assert conflicts == ["portfolio[a].qty"]
+
+
+def test_lists_without_ids_merge_by_position(app):
+    merged, conflicts = app["merge_record_values"]([1, 2], [1, 3], [4, 2])
+    assert (merged, conflicts) == ([4, 3], [])
+    merged, conflicts = app["merge_record_values"](["x"], ["x", "y"], ["x", "z"])
+    assert (merged, conflicts) == (["x", "y", "z"], [])
+
+
+def test_backfilled_ids_are_stable_and_unique(app):
+    record = {"portfolio": [{"name": "Gold"}, {"name": "Gold"}, {"id": "keep", "name": "Silver"}], "settings": {}}
+    copy = json.loads(json.dumps(record))
+    assert app["ensure_record_item_ids"]("alice", record) is True
+    assert app["ensure_record_item_ids"]("alice", copy) is True
+    assert record == copy
+    ids = [item["id"] for item in record["portfolio"]]
+    assert ids[2] == "keep"
+    assert len(set(ids)) == 3
+    assert app["ensure_record_item_ids"]("alice", record) is False
+
+
+def test_backfill_only_touches_item_collections(app):
+    meta = {"forum_posts": [{"title": "Coin"}]}
+    assert app["ensure_record_item_ids"]("_meta", meta) is False
+    assert meta == {"forum_posts": [{"title": "Coin"}]}
+    record = {"portfolio": [{"name": "Gold"}], "history": [{"value": 1}]}
+    assert app["ensure_record_item_ids"]("alice", record) is True
+    assert "id" in record["portfolio"][0]
+    assert record["history"] == [{"value": 1}]
+
+
+def test_duplicate_ids_are_replaced(app):
+    record = {"portfolio": [{"id": "a", "name": "One"}, {"id": "a", "name": "Two"}]}
+    assert app["ensure_record_item_ids"]("alice", record) is True
+    assert record["portfolio"][0]["id"] == "a"
+    assert record["portfolio"][1]["id"] != "a"
+
+
+def test_resolve_backfills_ids_written_before_items_had_them(app):
+    serialize = app["serialize_record"]
+    base_text = serialize({"portfolio": [{"name": "Gold", "qty": 1}, {"name": "Silver", "qty": 1}]})
+    ours = json.loads(base_text)
+    app["ensure_record_item_ids"]("alice", ours)
+    ours["portfolio"][1]["qty"] = 4
+    # Another writer stored an id-less text that removed Gold.
+    stored_text = serialize({"portfolio": [{"name": "Silver", "qty": 1}]})
+    text, conflicts = app["resolve_record_write"](serialize(ours), (base_text, 1), stored_text, 2, key="alice")
+    merged = json.loads(text)
+    assert conflicts == []
+    assert [(item["name"], item["qty"]) for item in merged["portfolio"]] == [("Silver", 4)]
+
+
+def test_resolve_without_a_concurrent_write_keeps_our_text(app):
+    text = app["serialize_record"]({"portfolio": []})
+    assert app["resolve_record_write"](text, ("{}", 3), "{}", 3, key="alice") == (text, [])
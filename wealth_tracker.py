@@ -7,11 +7,13 @@ import os
 import requests
 from datetime import datetime, timedelta, timezone
 import base64
+import io
 import hashlib
 import secrets
 import html
 import tempfile
 import time
+import random
 import re
 import difflib
 import math
@@ -19,10 +21,16 @@ import calendar
 import locale
 import textwrap
 import sys
-from collections import Counter
+import copy
+import sqlite3
+import threading
+import bisect
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from zoneinfo import ZoneInfo
 import xml.etree.ElementTree as ET
-from urllib.parse import quote_plus
+from urllib.parse import quote_plus, urlparse
 import smtplib
 import ssl
 
@@ -36,6 +44,13 @@ except ImportError:
     PLOTLY_AVAILABLE = False
     st.warning("Plotly not installed. Using native Streamlit charts. Run: pip install plotly")
 
+# Optional thumbnail support (Pillow ships with Streamlit)
+try:
+    from PIL import Image, ImageOps
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
 # Optional auto-refresh component
 try:
     from streamlit_autorefresh import st_autorefresh
@@ -43,6 +58,20 @@ try:
 except Exception:
     AUTOREFRESH_AVAILABLE = False
 
+# Optional websocket client for the Supabase Realtime change feed
+try:
+    import websocket
+    REALTIME_AVAILABLE = True
+except ImportError:
+    REALTIME_AVAILABLE = False
+
+# Advisory file locks (POSIX); elsewhere only writers in the same process are serialized
+try:
+    import fcntl
+    FILE_LOCK_AVAILABLE = True
+except ImportError:
+    FILE_LOCK_AVAILABLE = False
+
 # ==============================
 # MODERN CONFIG & STYLING (DARK MODE)
 # ==============================
@@ -388,6 +417,42 @@ st.markdown("""
             box-shadow: none;
         }
 
+        .st-key-tab_router [role="radiogroup"] {
+            gap: 4px;
+            background: var(--surface-2);
+            border-radius: 10px;
+            padding: 4px;
+            border: 1px solid var(--border);
+        }
+
+        .st-key-tab_router label[data-baseweb="radio"] {
+            margin: 0;
+            border-radius: 8px;
+            padding: 6px 12px;
+            background: transparent;
+            border: 1px solid transparent;
+            transition: all 0.2s ease;
+        }
+
+        .st-key-tab_router label[data-baseweb="radio"] > div:first-child {
+            display: none;
+        }
+
+        .st-key-tab_router label[data-baseweb="radio"] p {
+            color: var(--muted);
+            font-weight: 500;
+            font-size: 0.85rem;
+        }
+
+        .st-key-tab_router label[data-baseweb="radio"]:has(input:checked) {
+            background: var(--tab-active-bg);
+            border: 1px solid rgba(209,168,67,0.45);
+        }
+
+        .st-key-tab_router label[data-baseweb="radio"]:has(input:checked) p {
+            color: var(--text) !important;
+        }
+
         .stMetric {
             background: var(--surface-2);
             border-radius: 10px;
@@ -932,6 +997,10 @@ st.markdown("""
 
 
 DATA_FILE = os.path.join(os.path.dirname(__file__), "wealth_data.json")
+APP_STORAGE_DB_FILE = os.path.join(os.path.dirname(__file__), "wealth_data.sqlite3")
+APP_STORAGE_DB_TIMEOUT = 30
+DATA_LOCK_FILE = f"{DATA_FILE}.lock"
+DATA_VERSIONS_KEY = "_versions"
 REMEMBER_FILE = os.path.join(os.path.dirname(__file__), "remember_me.json")
 PASSWORD_ITERATIONS = 200_000
 MIN_PASSWORD_LENGTH = 8
@@ -941,7 +1010,41 @@ LOGIN_MAX_ATTEMPTS = 5
 LOGIN_FAILURE_WINDOW_MINUTES = 15
 LOGIN_LOCKOUT_MINUTES = 15
 SUPABASE_TIMEOUT = 10
+SUPABASE_SYNC_BATCH_SIZE = 50
+SUPABASE_PAGE_SIZE = 1000
+CACHE_MAX_ENTRIES = 1024
+CACHE_DB_FILE = os.path.join(os.path.dirname(__file__), "wealthpulse_cache.sqlite3")
+IMAGE_BLOB_DIR = os.path.join(os.path.dirname(__file__), "wealthpulse_blobs")
+IMAGE_BLOB_BUCKET = "wealthpulse-images"
+THUMBNAIL_SIZES = (160, 480)
+THUMBNAIL_MIME = "image/webp"
+CACHE_PERSIST_MAX_AGE_SECONDS = 86400
+CACHE_STALE_SECONDS = 6 * 3600
+SINGLE_FLIGHT_WAIT_SECONDS = 30
+MARKET_REFRESH_SECONDS = {
+    "fx": 300,
+    "metals": 90,
+    "quotes": 900
+}
+MARKET_REFRESH_IDLE_SECONDS = 1800
+HTTP_DEFAULT_TIMEOUT = 10
+HTTP_PROVIDER_TIMEOUTS = {
+    "supabase": SUPABASE_TIMEOUT,
+    "supabase_auth": SUPABASE_TIMEOUT
+}
+HTTP_POOL_MAXSIZE = 16
+HTTP_RETRY_ATTEMPTS = 2
+HTTP_RETRY_BACKOFF = 0.4
+HTTP_RETRY_STATUSES = {429, 500, 502, 503, 504}
+HTTP_IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
 APP_STORAGE_TABLE = "wealthpulse_users"
+# Normalized layout: one row per list element / setting instead of one JSONB blob per user.
+APP_STORAGE_ITEM_TABLES = {
+    "portfolio": "wealthpulse_assets",
+    "liabilities": "wealthpulse_liabilities",
+    "entities": "wealthpulse_entities"
+}
+APP_STORAGE_SETTINGS_TABLE = "wealthpulse_settings"
 
 SECURITY_QUESTIONS = [
     "What is your mother's maiden name?",
@@ -1453,9 +1556,65 @@ COMMUNITY_POSTS_EXTRA_COLUMNS = {
     "images": "jsonb",
     "owner_id": "uuid",
     "grading_company": "text",
-    "grading_grade": "text"
+    "grading_grade": "text",
+    "updated_at": "timestamptz default now()",
+    # Browse price filter/sort key: the fixed price, or the starting bid for auctions.
+    "list_price": (
+        "numeric generated always as (case when listing_type = 'For Sale' then price "
+        "when listing_type = 'Auction' then coalesce(nullif(auction_starting_bid, 0), price) end) stored"
+    )
 }
 
+# Browse only needs card fields; bodies and full image lists load when a listing is opened.
+COMMUNITY_POST_CARD_COLUMNS = [
+    "id", "title", "category", "listing_type", "price", "currency", "location",
+    "created_by", "owner_id", "created_at", "status", "auction_starting_bid",
+    "auction_min_increment", "auction_end_date", "reserve_amount", "buy_now_price",
+    "grading_company", "grading_grade", "sold_price", "sold_at", "updated_at"
+]
+COMMUNITY_PAGE_SIZE = 60
+COMMUNITY_FEED_SYNC_SECONDS = 5
+COMMUNITY_FEED_DELTA_LIMIT = 500
+# Re-read a small window behind the watermark so rows committed out of order are not missed.
+COMMUNITY_FEED_OVERLAP_SECONDS = 5
+COMMUNITY_FEED_RECONCILE_SECONDS = 300
+COMMUNITY_IN_FILTER_CHUNK = 100
+# Field weights for listing search; mirrors the A/B/C/D weights of community_posts.search_vector.
+COMMUNITY_SEARCH_FIELDS = {"title": 1.0, "category": 0.4, "body": 0.2, "created_by": 0.1}
+COMMUNITY_SEARCH_REMOTE_LIMIT = 200
+# Saved-search alerts run in a background worker; its state is a storage record of its own.
+ALERT_STATE_KEY = "_alerts"
+ALERT_WORKER_SECONDS = 60
+ALERT_LEASE_FILE = f"{DATA_FILE}.alerts.lock"
+ALERT_POST_BATCH_LIMIT = 500
+ALERT_INBOX_LIMIT = 20
+# Keyed out-of-form inputs kept across tab switches (see the tab router).
+TAB_DRAFT_PREFIX = "tab_draft_"
+TAB_DRAFT_KEYS = [
+    "asset_name",
+    "market_search_term",
+    "market_type_filter",
+    "market_category_filter",
+    "market_status_filter",
+    "market_sort_option",
+    "market_price_range",
+    "market_filter_watchlist",
+    "market_filter_photos",
+    "market_filter_buy_now",
+    "market_filter_new",
+    "market_filter_ending",
+    "market_filter_near_me",
+    "market_category_search",
+    "market_saved_search_select",
+    "market_save_search_name",
+    "listing_grading_company",
+    "listing_grading_grade"
+]
+COMMUNITY_REALTIME_TABLES = ("community_posts", "community_bids", "community_messages")
+COMMUNITY_REALTIME_HEARTBEAT_SECONDS = 25
+COMMUNITY_REALTIME_CHECK_SECONDS = 2
+COMMUNITY_MESSAGES_PAGE_SIZE = 10
+
 COMMUNITY_RULES = [
     "No explicit or sexual content (images or text).",
     "No hate, threats, or harassment.",
@@ -1954,7 +2113,15 @@ def app_storage_enabled(settings=None):
     provider = (app_storage_provider(settings) or "").lower()
     return provider.startswith("supabase")
 
-RESERVED_USERNAMES = {"_meta"}
+def app_storage_normalized():
+    # Opt-in once the normalized tables exist; rows already split are read either way.
+    return secret_flag("APP_STORAGE_NORMALIZED", False)
+
+def app_storage_sqlite():
+    # Secrets only: the choice has to be known before any record (including _meta) is read.
+    return str(get_secret_value("APP_STORAGE_PROVIDER", "") or "").strip().lower() == "sqlite"
+
+RESERVED_USERNAMES = {"_meta", "_alerts", "_versions"}
 
 def validate_username(username):
     if not username:
@@ -2095,6 +2262,7 @@ def get_community_settings(db_obj, user_settings=None):
     config["supabase_service_key"] = secret_service
     if secret_flag("SUPABASE_USE_SERVICE_ROLE", False):
         config["supabase_use_service_role"] = True
+    register_image_project(config)
     return config
 
 def get_forum_posts(db_obj):
@@ -2180,15 +2348,8 @@ def get_asset_share(asset, entity_name):
 def get_liability_share(liability, entity_name):
     return get_entity_share(liability.get("ownership_split"), liability.get("owner_entity"), entity_name)
 
-def get_total_assets_value(portfolio, entity_name="All"):
-    total = 0.0
-    for asset in portfolio:
-        share = get_asset_share(asset, entity_name)
-        if share <= 0:
-            continue
-        value, _, _ = ai_valuation(asset)
-        total += value * share
-    return total
+def get_total_assets_value(valuation, entity_name="All"):
+    return float(get_valuation_view(valuation, entity_name)["view_value"].sum())
 
 def get_total_liabilities_value(liabilities, entity_name="All"):
     total = 0.0
@@ -2203,15 +2364,12 @@ def get_total_liabilities_value(liabilities, entity_name="All"):
         total += balance * share
     return total
 
-def build_portfolio_view_items(portfolio, entity_name="All"):
-    items = []
-    for idx, asset in enumerate(portfolio):
-        share = get_asset_share(asset, entity_name)
-        if entity_name == "All":
-            share = 1.0
-        if share > 0:
-            items.append({"index": idx, "asset": asset, "share": share})
-    return items
+def build_portfolio_view_items(portfolio, valuation, entity_name="All"):
+    view = get_valuation_view(valuation, entity_name)
+    return [
+        {"index": idx, "asset": portfolio[idx], "share": share, "value": value, "confidence": confidence}
+        for idx, share, value, confidence in zip(view.index.tolist(), view["share"].tolist(), view["value"].tolist(), view["confidence"].tolist())
+    ]
 
 def estimate_monthly_payment(balance, annual_rate, term_months):
     try:
@@ -2898,18 +3056,169 @@ def format_display_value(value, currency_symbol, currency_rate):
 def utc_now():
     return datetime.now(timezone.utc)
 
-def get_cache(key, ttl_seconds):
-    cache = st.session_state.get("_cache", {})
-    entry = cache.get(key)
-    if not entry:
+@st.cache_resource(show_spinner=False)
+def get_shared_cache():
+    # One LRU for every session and thread in this server process.
+    cache = {
+        "lock": threading.Lock(),
+        "entries": OrderedDict(),
+        "stats": {},
+        "db": None,
+        "writes": 0
+    }
+    if secret_flag("CACHE_PERSIST_ENABLED", True):
+        try:
+            conn = sqlite3.connect(CACHE_DB_FILE, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_entries ("
+                "key TEXT PRIMARY KEY, namespace TEXT, ts REAL, value TEXT)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_entries_ts ON cache_entries(ts)")
+            conn.commit()
+            cache["db"] = conn
+        except sqlite3.Error:
+            cache["db"] = None
+    return cache
+
+def cache_namespace(key):
+    return str(key).split("_", 1)[0] or "default"
+
+def bump_cache_stat(cache, namespace, field):
+    stats = cache["stats"].setdefault(namespace, {"hits": 0, "misses": 0, "expired": 0, "sets": 0, "evictions": 0})
+    stats[field] += 1
+
+def insert_cache_entry(cache, key, entry):
+    # Newest last; the least recently used entries are evicted past CACHE_MAX_ENTRIES.
+    cache["entries"][key] = entry
+    cache["entries"].move_to_end(key)
+    while len(cache["entries"]) > CACHE_MAX_ENTRIES:
+        evicted_key, _ = cache["entries"].popitem(last=False)
+        bump_cache_stat(cache, cache_namespace(evicted_key), "evictions")
+
+def load_persisted_cache_entry(cache, key):
+    if cache["db"] is None:
+        return None
+    try:
+        row = cache["db"].execute("SELECT ts, value FROM cache_entries WHERE key = ?", (key,)).fetchone()
+    except sqlite3.Error:
         return None
-    if time.time() - entry["ts"] > ttl_seconds:
+    if not row:
         return None
-    return entry["value"]
+    try:
+        return {"ts": float(row[0]), "value": json.loads(row[1])}
+    except Exception:
+        return None
+
+def persist_cache_entry(cache, key, namespace, entry):
+    if cache["db"] is None:
+        return
+    try:
+        payload = json.dumps(entry["value"])
+    except (TypeError, ValueError):
+        return
+    try:
+        cache["db"].execute(
+            "INSERT OR REPLACE INTO cache_entries (key, namespace, ts, value) VALUES (?, ?, ?, ?)",
+            (key, namespace, entry["ts"], payload)
+        )
+        cache["writes"] += 1
+        if cache["writes"] % 50 == 0:
+            cache["db"].execute("DELETE FROM cache_entries WHERE ts < ?", (time.time() - CACHE_PERSIST_MAX_AGE_SECONDS,))
+        cache["db"].commit()
+    except sqlite3.Error:
+        pass
+
+def get_cache(key, ttl_seconds):
+    cache = get_shared_cache()
+    namespace = cache_namespace(key)
+    with cache["lock"]:
+        entry = cache["entries"].get(key)
+        if entry is None:
+            entry = load_persisted_cache_entry(cache, key)
+            if entry is not None:
+                insert_cache_entry(cache, key, entry)
+        if not entry:
+            bump_cache_stat(cache, namespace, "misses")
+            return None
+        if time.time() - entry["ts"] > ttl_seconds:
+            bump_cache_stat(cache, namespace, "expired")
+            return None
+        cache["entries"].move_to_end(key)
+        bump_cache_stat(cache, namespace, "hits")
+        return copy.deepcopy(entry["value"])
 
 def set_cache(key, value):
-    cache = st.session_state.setdefault("_cache", {})
-    cache[key] = {"ts": time.time(), "value": value}
+    cache = get_shared_cache()
+    namespace = cache_namespace(key)
+    entry = {"ts": time.time(), "value": copy.deepcopy(value)}
+    with cache["lock"]:
+        insert_cache_entry(cache, key, entry)
+        bump_cache_stat(cache, namespace, "sets")
+        persist_cache_entry(cache, key, namespace, entry)
+
+def peek_cache(key):
+    """Return (value, age_seconds) regardless of TTL, or (None, None) when absent."""
+    cache = get_shared_cache()
+    with cache["lock"]:
+        entry = cache["entries"].get(key)
+        if entry is None:
+            entry = load_persisted_cache_entry(cache, key)
+            if entry is not None:
+                insert_cache_entry(cache, key, entry)
+        if not entry:
+            return None, None
+        return copy.deepcopy(entry["value"]), time.time() - entry["ts"]
+
+@st.cache_resource(show_spinner=False)
+def get_single_flight_state():
+    return {"lock": threading.Lock(), "calls": {}, "refreshing": set()}
+
+def single_flight(key, fn):
+    """Run fn once per key across the process; concurrent callers wait for and share its result."""
+    state = get_single_flight_state()
+    with state["lock"]:
+        call = state["calls"].get(key)
+        leader = call is None
+        if leader:
+            call = {"event": threading.Event(), "result": None, "error": None}
+            state["calls"][key] = call
+    if leader:
+        try:
+            call["result"] = fn()
+        except Exception as exc:
+            call["error"] = exc
+        finally:
+            with state["lock"]:
+                state["calls"].pop(key, None)
+            call["event"].set()
+    elif not call["event"].wait(SINGLE_FLIGHT_WAIT_SECONDS):
+        return None, "Timed out waiting for an in-flight request."
+    if call["error"] is not None:
+        return None, str(call["error"])
+    return call["result"]
+
+def refresh_cached_value(key, fetch):
+    def run():
+        data, err = fetch()
+        if data:
+            set_cache(key, data)
+        return data, err
+    return single_flight(key, run)
+
+def credential_scope(*values):
+    # Short digest of the credentials a cached provider response was fetched with;
+    # keys are persisted, so the credentials themselves never go into them.
+    return hashlib.sha256("\x00".join(str(value or "") for value in values).encode("utf-8")).hexdigest()[:12]
+
+def get_cache_stats():
+    cache = get_shared_cache()
+    with cache["lock"]:
+        sizes = Counter(cache_namespace(key) for key in cache["entries"])
+        return {
+            namespace: dict(stats, entries=sizes.get(namespace, 0))
+            for namespace, stats in cache["stats"].items()
+        }
 
 def get_now_for_settings(settings):
     tz = settings.get("timezone", "Local")
@@ -2928,6 +3237,203 @@ def format_date_for_settings(value_dt, settings):
     except Exception:
         return value_dt.strftime("%b %d, %Y")
 
+# ==============================
+# BACKGROUND MARKET REFRESH
+# ==============================
+def get_market_refresh_interval(kind):
+    overrides = get_secret_value("MARKET_REFRESH_SECONDS") or {}
+    try:
+        value = overrides.get(kind)
+    except Exception:
+        value = None
+    if value in (None, ""):
+        value = MARKET_REFRESH_SECONDS.get(kind, 300)
+    try:
+        return max(15.0, float(value))
+    except Exception:
+        return float(MARKET_REFRESH_SECONDS.get(kind, 300))
+
+@st.cache_resource(show_spinner=False)
+def get_market_refresher():
+    # Daemon thread that keeps provider data warm in the shared cache so
+    # page renders only read snapshots and never wait on third-party APIs.
+    refresher = {
+        "lock": threading.Lock(),
+        "wake": threading.Event(),
+        "jobs": {}
+    }
+    thread = threading.Thread(target=run_market_refresher, args=(refresher,), name="market-refresher", daemon=True)
+    thread.start()
+    refresher["thread"] = thread
+    return refresher
+
+def run_market_refresher(refresher):
+    while True:
+        now = time.time()
+        due = []
+        with refresher["lock"]:
+            for key, job in list(refresher["jobs"].items()):
+                if now - job["last_requested"] > MARKET_REFRESH_IDLE_SECONDS:
+                    refresher["jobs"].pop(key, None)
+                    continue
+                if now >= job["next_run"]:
+                    job["next_run"] = now + job["interval"]
+                    due.append((key, job))
+        for key, job in due:
+            started = time.time()
+            try:
+                data, err = refresh_cached_value(key, job["fetch"])
+            except Exception as exc:
+                data, err = None, str(exc)
+            with refresher["lock"]:
+                job["last_run"] = started
+                job["last_duration_ms"] = (time.time() - started) * 1000
+                job["last_error"] = None if data else (err or "No data returned.")
+        refresher["wake"].wait(1.0)
+        refresher["wake"].clear()
+
+def register_refresh_job(key, fetch, kind):
+    """Ask the background refresher to keep key warm; fetch must not use st.session_state."""
+    refresher = get_market_refresher()
+    with refresher["lock"]:
+        job = refresher["jobs"].get(key)
+        is_new = job is None
+        if is_new:
+            job = {"next_run": 0.0, "last_run": None, "last_duration_ms": None, "last_error": None}
+            refresher["jobs"][key] = job
+        job.update(fetch=fetch, kind=kind, interval=get_market_refresh_interval(kind), last_requested=time.time())
+    if is_new:
+        refresher["wake"].set()
+
+def read_warm_entry(key, fetch, kind):
+    """(latest warmed value of any age, age in seconds), or (None, None) until the first refresh lands."""
+    register_refresh_job(key, fetch, kind)
+    return peek_cache(key)
+
+def read_warm_value(key, fetch, kind):
+    return read_warm_entry(key, fetch, kind)[0]
+
+def get_market_refresh_jobs():
+    refresher = get_market_refresher()
+    with refresher["lock"]:
+        return [
+            {key: value for key, value in dict(job, key=job_key).items() if key != "fetch"}
+            for job_key, job in refresher["jobs"].items()
+        ]
+
+# ==============================
+# HTTP CLIENT
+# ==============================
+@st.cache_resource(show_spinner=False)
+def get_http_client():
+    # Process-wide: keep-alive pools are reused by every session and rerun.
+    return {
+        "lock": threading.Lock(),
+        "sessions": {},
+        "metrics": {},
+        "hooks": []
+    }
+
+def get_http_session(host):
+    client = get_http_client()
+    with client["lock"]:
+        session = client["sessions"].get(host)
+        if session is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_POOL_MAXSIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            client["sessions"][host] = session
+    return session
+
+def get_http_timeout(provider):
+    overrides = get_secret_value("HTTP_TIMEOUTS") or {}
+    try:
+        value = overrides.get(provider)
+    except Exception:
+        value = None
+    if value in (None, ""):
+        value = HTTP_PROVIDER_TIMEOUTS.get(provider, HTTP_DEFAULT_TIMEOUT)
+    try:
+        return float(value)
+    except Exception:
+        return float(HTTP_DEFAULT_TIMEOUT)
+
+def register_http_metrics_hook(hook):
+    client = get_http_client()
+    with client["lock"]:
+        if hook not in client["hooks"]:
+            client["hooks"].append(hook)
+
+def record_http_metric(provider, method, endpoint, status, elapsed_ms):
+    client = get_http_client()
+    key = f"{provider} {method} {endpoint}"
+    with client["lock"]:
+        entry = client["metrics"].setdefault(key, {
+            "provider": provider,
+            "method": method,
+            "endpoint": endpoint,
+            "count": 0,
+            "errors": 0,
+            "total_ms": 0.0,
+            "max_ms": 0.0,
+            "statuses": Counter()
+        })
+        entry["count"] += 1
+        entry["total_ms"] += elapsed_ms
+        entry["max_ms"] = max(entry["max_ms"], elapsed_ms)
+        entry["statuses"][status or "error"] += 1
+        if status is None or status >= 400:
+            entry["errors"] += 1
+        hooks = list(client["hooks"])
+    for hook in hooks:
+        try:
+            hook(provider, method, endpoint, status, elapsed_ms)
+        except Exception:
+            pass
+
+def get_http_metrics():
+    client = get_http_client()
+    with client["lock"]:
+        return [dict(entry, statuses=dict(entry["statuses"])) for entry in client["metrics"].values()]
+
+def http_request(method, url, provider="default", timeout=None, retries=None, **kwargs):
+    """Send a request through the shared per-host session with retry and metrics.
+
+    Only idempotent methods are retried unless retries is given explicitly.
+    Raises the last requests exception once retries are exhausted.
+    """
+    method = method.upper()
+    parsed = urlparse(url)
+    endpoint = f"{parsed.netloc}{parsed.path}"
+    session = get_http_session(parsed.netloc)
+    if timeout is None:
+        timeout = get_http_timeout(provider)
+    if retries is None:
+        retries = HTTP_RETRY_ATTEMPTS if method in HTTP_IDEMPOTENT_METHODS else 0
+    attempt = 0
+    while True:
+        started = time.perf_counter()
+        try:
+            response = session.request(method, url, timeout=timeout, **kwargs)
+        except requests.RequestException:
+            record_http_metric(provider, method, endpoint, None, (time.perf_counter() - started) * 1000)
+            if attempt >= retries:
+                raise
+        else:
+            record_http_metric(provider, method, endpoint, response.status_code, (time.perf_counter() - started) * 1000)
+            if response.status_code not in HTTP_RETRY_STATUSES or attempt >= retries:
+                return response
+        delay = HTTP_RETRY_BACKOFF * (2 ** attempt)
+        time.sleep(delay + random.uniform(0, delay))
+        attempt += 1
+
+def http_get(url, provider="default", **kwargs):
+    return http_request("GET", url, provider=provider, **kwargs)
+
+def http_post(url, provider="default", **kwargs):
+    return http_request("POST", url, provider=provider, **kwargs)
+
 # ==============================
 # LIVE DATA HELPERS
 # ==============================
@@ -2936,14 +3442,14 @@ def fetch_metalprice_latest(api_key, metals=None, base="USD"):
         return None, "MetalpriceAPI key missing."
     metals = metals or ["XAU", "XAG", "XPT", "XPD"]
     try:
-        resp = requests.get(
+        resp = http_get(
             "https://api.metalpriceapi.com/v1/latest",
             params={
                 "api_key": api_key,
                 "base": base,
                 "currencies": ",".join(metals)
             },
-            timeout=10
+            provider="metalpriceapi"
         )
         data = resp.json()
         if not data.get("success", False):
@@ -2970,7 +3476,7 @@ def fetch_metalprice_timeframe(api_key, start_date, end_date, metals=None, base=
         return None, "MetalpriceAPI key missing."
     metals = metals or ["XAU", "XAG", "XPT", "XPD"]
     try:
-        resp = requests.get(
+        resp = http_get(
             "https://api.metalpriceapi.com/v1/timeframe",
             params={
                 "api_key": api_key,
@@ -2979,7 +3485,7 @@ def fetch_metalprice_timeframe(api_key, start_date, end_date, metals=None, base=
                 "base": base,
                 "currencies": ",".join(metals)
             },
-            timeout=10
+            provider="metalpriceapi"
         )
         data = resp.json()
         if not data.get("success", False):
@@ -3003,10 +3509,10 @@ def fetch_metalsdev_fx(api_key, base="USD"):
     if not api_key:
         return None, "Metals.dev API key missing."
     try:
-        resp = requests.get(
+        resp = http_get(
             "https://api.metals.dev/v1/currencies",
             params={"api_key": api_key, "base": base},
-            timeout=10
+            provider="metalsdev"
         )
         data = resp.json()
         if data.get("status") != "success":
@@ -3020,10 +3526,10 @@ def fetch_metalsdev_fx(api_key, base="USD"):
 
 def fetch_frankfurter_fx(base="USD"):
     try:
-        resp = requests.get(
+        resp = http_get(
             "https://api.frankfurter.dev/v1/latest",
             params={"base": base},
-            timeout=10
+            provider="frankfurter"
         )
         data = resp.json()
         rates = data.get("rates", {})
@@ -3034,11 +3540,17 @@ def fetch_frankfurter_fx(base="USD"):
     except Exception as exc:
         return None, str(exc)
 
+def fetch_frankfurter_with_fallback(base="USD"):
+    data, err = fetch_frankfurter_fx(base)
+    if not data:
+        data, err = fetch_open_er_fx(base)
+    return data, err
+
 def fetch_open_er_fx(base="USD"):
     try:
-        resp = requests.get(
+        resp = http_get(
             f"https://open.er-api.com/v6/latest/{base}",
-            timeout=10
+            provider="open_er"
         )
         data = resp.json()
         rates = data.get("rates", {})
@@ -3053,10 +3565,10 @@ def fetch_freegoldprice_latest(api_key):
     if not api_key:
         return None, "FreeGoldPrice API key missing."
     try:
-        resp = requests.get(
+        resp = http_get(
             "https://freegoldprice.org/api/v2",
             params={"key": api_key, "action": "GSPPJ"},
-            timeout=10
+            provider="freegoldprice"
         )
         data = resp.json()
         prices = {}
@@ -3076,10 +3588,10 @@ def fetch_freegoldprice_latest(api_key):
 
 def _fetch_silverprice_payload(currency_code):
     try:
-        resp = requests.get(
+        resp = http_get(
             f"https://data-asg.goldprice.org/dbXRates/{currency_code}",
             headers={"User-Agent": "Mozilla/5.0"},
-            timeout=10
+            provider="silverprice"
         )
         data = resp.json()
         items = data.get("items") or []
@@ -3110,11 +3622,30 @@ def fetch_silverprice_latest(currency_code="USD"):
         return None, fallback_err or err
     return data, err
 
+def fetch_metals_with_fallback(provider, api_key="", currency_code="USD"):
+    if provider == "MetalpriceAPI":
+        data, err = fetch_metalprice_latest(api_key)
+    elif provider == "FreeGoldPrice":
+        data, err = fetch_freegoldprice_latest(api_key)
+    elif provider == "SilverPrice":
+        data, err = fetch_silverprice_latest(currency_code)
+    else:
+        data, err = None, None
+    active = provider
+    if not data and provider != "SilverPrice":
+        fallback_data, fallback_err = fetch_silverprice_latest(currency_code)
+        if fallback_data:
+            data, err = fallback_data, fallback_err
+            active = "SilverPrice"
+    if data:
+        data["provider"] = active
+    return data, err
+
 def fetch_newsapi(query, api_key):
     if not api_key:
         return None, "NewsAPI key missing."
     try:
-        resp = requests.get(
+        resp = http_get(
             "https://newsapi.org/v2/everything",
             params={
                 "q": query,
@@ -3123,7 +3654,7 @@ def fetch_newsapi(query, api_key):
                 "pageSize": 5,
                 "apiKey": api_key
             },
-            timeout=10
+            provider="newsapi"
         )
         data = resp.json()
         if data.get("status") != "ok":
@@ -3136,7 +3667,7 @@ def fetch_rss_items(url, limit=5):
     if not url:
         return None, "RSS URL missing."
     try:
-        resp = requests.get(url, timeout=10)
+        resp = http_get(url, provider="rss")
         xml_data = resp.text
         root = ET.fromstring(xml_data)
         items = []
@@ -3169,14 +3700,14 @@ def get_ebay_access_token(client_id, client_secret):
     if token and expiry and time.time() < expiry - 60:
         return token, None
     try:
-        resp = requests.post(
+        resp = http_post(
             "https://api.ebay.com/identity/v1/oauth2/token",
             data={
                 "grant_type": "client_credentials",
                 "scope": "https://api.ebay.com/oauth/api_scope"
             },
             auth=(client_id, client_secret),
-            timeout=10
+            provider="ebay"
         )
         data = resp.json()
         if "access_token" not in data:
@@ -3191,11 +3722,11 @@ def get_ebay_access_token(client_id, client_secret):
 
 def search_ebay_comps(query, token, limit=5):
     try:
-        resp = requests.get(
+        resp = http_get(
             "https://api.ebay.com/buy/browse/v1/item_summary/search",
             params={"q": query, "limit": limit},
             headers={"Authorization": f"Bearer {token}"},
-            timeout=10
+            provider="ebay"
         )
         data = resp.json()
         items = []
@@ -3213,11 +3744,11 @@ def search_ebay_comps(query, token, limit=5):
 
 def search_reverb_comps(query, token, limit=5):
     try:
-        resp = requests.get(
+        resp = http_get(
             "https://api.reverb.com/api/listings",
             params={"query": query, "per_page": limit},
             headers={"Authorization": f"Bearer {token}"},
-            timeout=10
+            provider="reverb"
         )
         data = resp.json()
         items = []
@@ -3410,7 +3941,8 @@ def render_comps_section(asset, asset_index, settings, currency_symbol, currency
             return
 
         query = build_comps_query(asset)
-        cache_key = f"comps_{asset_index}_{query}"
+        scope = credential_scope(ebay_client_id, ebay_client_secret, reverb_token)
+        cache_key = f"comps_{scope}_{asset.get('type')}_{query}"
         cached = get_cache(cache_key, 900)
 
         fetch_label = "Refresh comparisons" if cached else "Fetch comparisons"
@@ -3463,11 +3995,6 @@ def get_asset_suggestions(query, settings, portfolio, limit=8):
     query = (query or "").strip()
     if len(query) < 2:
         return []
-    cache_key = f"suggest_{query.lower()}"
-    cached = get_cache(cache_key, 600)
-    if cached:
-        return cached
-
     query_lower = query.lower()
     query_tokens = [t for t in query_lower.split() if t]
     suggestions = []
@@ -3506,22 +4033,32 @@ def get_asset_suggestions(query, settings, portfolio, limit=8):
         if query_lower in name.lower():
             suggestions.append({"title": name, "source": "local"})
 
-    # eBay suggestions
+    # Remote suggestions are shared across sessions; local matches above are not cached.
     ebay_client_id = get_effective_setting(settings, "ebay_client_id", "EBAY_CLIENT_ID")
     ebay_client_secret = get_effective_setting(settings, "ebay_client_secret", "EBAY_CLIENT_SECRET")
-    if len(query) >= 3 and ebay_client_id and ebay_client_secret:
-        token, err = get_ebay_access_token(ebay_client_id, ebay_client_secret)
-        if token:
-            items, _ = search_ebay_comps(query, token, limit=limit)
-            if items:
-                suggestions.extend([{"title": item.get("title"), "source": "ebay"} for item in items if item.get("title")])
-
-    # Reverb suggestions
     reverb_token = get_effective_setting(settings, "reverb_api_token", "REVERB_API_TOKEN")
-    if len(query) >= 3 and reverb_token:
-        items, _ = search_reverb_comps(query, reverb_token, limit=limit)
-        if items:
-            suggestions.extend([{"title": item.get("title"), "source": "reverb"} for item in items if item.get("title")])
+    has_ebay = bool(ebay_client_id and ebay_client_secret)
+    has_reverb = bool(reverb_token)
+    if len(query) >= 3 and (has_ebay or has_reverb):
+        scope = credential_scope(ebay_client_id, ebay_client_secret, reverb_token)
+        cache_key = f"suggest_{scope}_{limit}_{query_lower}"
+        remote = get_cache(cache_key, 600)
+        if remote is None:
+            remote = []
+            # eBay suggestions
+            if has_ebay:
+                token, err = get_ebay_access_token(ebay_client_id, ebay_client_secret)
+                if token:
+                    items, _ = search_ebay_comps(query, token, limit=limit)
+                    if items:
+                        remote.extend([{"title": item.get("title"), "source": "ebay"} for item in items if item.get("title")])
+            # Reverb suggestions
+            if has_reverb:
+                items, _ = search_reverb_comps(query, reverb_token, limit=limit)
+                if items:
+                    remote.extend([{"title": item.get("title"), "source": "reverb"} for item in items if item.get("title")])
+            set_cache(cache_key, remote)
+        suggestions.extend(remote)
 
     ranked = []
     seen = set()
@@ -3537,8 +4074,6 @@ def get_asset_suggestions(query, settings, portfolio, limit=8):
 
     ranked.sort(key=lambda x: (-x[0], x[1].lower()))
     deduped = [title for _, title in ranked[:limit]]
-
-    set_cache(cache_key, deduped)
     return deduped
 
 def render_type_fields(asset_type, details, key_prefix, currency_code, currency_symbol, currency_rate, weight_unit):
@@ -3987,19 +4522,308 @@ def search_asset_image(query, max_results=1):
 # ==============================
 # IMAGE HELPERS
 # ==============================
-def encode_uploaded_images(files):
+def image_store_provider():
+    provider = str(get_secret_value("IMAGE_STORE_PROVIDER", "") or "").strip().lower()
+    if not provider:
+        provider = "supabase" if app_storage_enabled() else "local"
+    return "supabase" if provider.startswith("supabase") else "local"
+
+def image_blob_bucket():
+    return get_secret_value("SUPABASE_IMAGE_BUCKET", IMAGE_BLOB_BUCKET) or IMAGE_BLOB_BUCKET
+
+def image_blob_path(blob_hash):
+    return os.path.join(IMAGE_BLOB_DIR, blob_hash[:2], blob_hash)
+
+@st.cache_resource(show_spinner=False)
+def get_image_projects():
+    # Supabase projects seen by this process, by URL, so listing photos stored in a
+    # Community project configured in _meta (not secrets) can be read back.
+    return {"lock": threading.Lock(), "settings": {}}
+
+def register_image_project(settings):
+    url = get_supabase_config(settings)[0]
+    if url and supabase_enabled(settings):
+        projects = get_image_projects()
+        with projects["lock"]:
+            projects["settings"][url] = dict(settings)
+
+def community_image_settings(settings):
+    """Settings to store listing photos with: the Community's own Supabase project when it
+    has one with a service key, so every host can read them; None keeps the app-wide image store."""
+    if settings and supabase_enabled(settings) and get_supabase_config(settings)[2]:
+        return settings
+    return None
+
+def image_storage_endpoint(blob_hash, settings=None, project=None):
+    if settings is None and project:
+        projects = get_image_projects()
+        with projects["lock"]:
+            settings = projects["settings"].get(project)
+    # The bucket is private and has no storage.objects policies: only the service role can use it.
+    url, _, service_key = get_supabase_config(settings or get_storage_settings_from_secrets())
+    if not url or not service_key:
+        return None, None
+    return f"{url}/storage/v1/object/{image_blob_bucket()}/{blob_hash}", service_key
+
+def put_image_blob(data, mime="image/png", settings=None):
+    """Store bytes under their sha256; identical uploads are kept once. Returns ({blob, store}, err).
+
+    With settings the blob goes to that Supabase project and the ref records its URL.
+    """
+    blob_hash = hashlib.sha256(data).hexdigest()
+    store = "supabase" if settings is not None else image_store_provider()
+    if store == "supabase":
+        endpoint, api_key = image_storage_endpoint(blob_hash, settings)
+        if not endpoint:
+            return None, "Supabase image storage needs the project URL and service role key."
+        headers = supabase_headers(api_key)
+        headers.update({"Content-Type": mime, "x-upsert": "true"})
+        try:
+            response = http_request("POST", endpoint, provider="supabase", headers=headers, data=data)
+        except Exception as exc:
+            return None, str(exc)
+        if not response.ok:
+            return None, f"{response.status_code}: {response.text[:300]}"
+        if settings is not None:
+            register_image_project(settings)
+            return {"blob": blob_hash, "store": store, "project": get_supabase_config(settings)[0]}, None
+        return {"blob": blob_hash, "store": store}, None
+    path = image_blob_path(blob_hash)
+    if not os.path.exists(path):
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, "wb") as handle:
+                handle.write(data)
+            os.replace(tmp_path, path)
+        except OSError as exc:
+            return None, str(exc)
+    return {"blob": blob_hash, "store": store}, None
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def load_image_blob(blob_hash, store="local", project=None):
+    # Blobs are content-addressed and never change, so cached bytes never go stale.
+    # Failures raise, which st.cache_data does not cache: the next render retries.
+    if store == "supabase":
+        endpoint, api_key = image_storage_endpoint(blob_hash, project=project)
+        if not endpoint:
+            raise RuntimeError("Supabase image storage needs the project URL and service role key.")
+        response = http_get(endpoint, provider="supabase", headers=supabase_headers(api_key))
+        if not response.ok:
+            raise RuntimeError(f"{response.status_code}: {response.text[:300]}")
+        return response.content
+    with open(image_blob_path(blob_hash), "rb") as handle:
+        return handle.read()
+
+def get_image_blob(blob_hash, store="local", project=None):
+    try:
+        return load_image_blob(blob_hash, store, project)
+    except Exception:
+        return None
+
+def make_thumbnail(data, size):
+    if not PIL_AVAILABLE:
+        return None
+    try:
+        with Image.open(io.BytesIO(data)) as source:
+            img = ImageOps.exif_transpose(source)
+            if img.mode not in ("RGB", "RGBA"):
+                img = img.convert("RGBA" if "A" in img.getbands() else "RGB")
+            img.thumbnail((size, size))
+            output = io.BytesIO()
+            img.save(output, format="WEBP", quality=80)
+            return output.getvalue()
+    except Exception:
+        return None
+
+def build_image_thumbnails(data, settings=None):
+    thumbs = {}
+    for size in THUMBNAIL_SIZES:
+        thumb = make_thumbnail(data, size)
+        if not thumb or len(thumb) >= len(data):
+            continue
+        ref, err = put_image_blob(thumb, THUMBNAIL_MIME, settings)
+        if not err:
+            thumbs[str(size)] = ref["blob"]
+    return thumbs
+
+def store_image_bytes(name, mime, data, settings=None):
+    ref, err = put_image_blob(data, mime, settings)
+    if err:
+        return None, err
+    image = {"name": name, "mime": mime, "size": len(data), **ref}
+    thumbs = build_image_thumbnails(data, settings)
+    if thumbs:
+        image["thumbs"] = thumbs
+    return image, None
+
+def encode_uploaded_images(files, settings=None):
     encoded = []
     for f in files:
         data = f.getvalue()
         if not data:
             continue
-        encoded.append({
-            "name": f.name,
-            "mime": f.type or "image/png",
-            "data": base64.b64encode(data).decode("utf-8")
-        })
+        image, err = store_image_bytes(f.name, f.type or "image/png", data, settings)
+        if err:
+            st.warning(f"Could not store photo {f.name}: {err}")
+            continue
+        encoded.append(image)
     return encoded
 
+def image_ref_bytes(image):
+    if not isinstance(image, dict):
+        return None
+    if image.get("blob"):
+        return get_image_blob(image["blob"], image.get("store") or "local", image.get("project"))
+    if image.get("data"):
+        try:
+            return base64.b64decode(image["data"])
+        except Exception:
+            return None
+    return None
+
+@st.cache_data(max_entries=1024, show_spinner=False)
+def get_lazy_thumbnail(source_key, size, _image):
+    # Images stored before thumbnails existed are downscaled on first view.
+    data = image_ref_bytes(_image)
+    if not data:
+        return None, None
+    thumb = make_thumbnail(data, size)
+    if thumb and len(thumb) < len(data):
+        return thumb, THUMBNAIL_MIME
+    return data, _image.get("mime") or "image/png"
+
+def image_thumbnail(image, size):
+    """(bytes, mime) of the size-px variant, falling back to the original."""
+    if not isinstance(image, dict):
+        return None, None
+    blob = (image.get("thumbs") or {}).get(str(size))
+    if blob:
+        data = get_image_blob(blob, image.get("store") or "local", image.get("project"))
+        if data:
+            return data, THUMBNAIL_MIME
+    if image.get("blob"):
+        source_key = image["blob"]
+    else:
+        source_key = hashlib.sha256(str(image.get("data") or "").encode("utf-8")).hexdigest()
+    return get_lazy_thumbnail(source_key, size, image)
+
+def image_ref_src(image, size=None):
+    if isinstance(image, str):
+        return image
+    if not isinstance(image, dict):
+        return None
+    mime = image.get("mime") or "image/png"
+    if size:
+        data, mime = image_thumbnail(image, size)
+    elif image.get("data"):
+        return f"data:{mime};base64,{image['data']}"
+    else:
+        data = image_ref_bytes(image)
+    if data:
+        return f"data:{mime};base64,{base64.b64encode(data).decode('utf-8')}"
+    return None
+
+def extract_inline_images(images, settings=None):
+    """Move inline base64 images into the blob store (settings as in put_image_blob) and add missing thumbnails.
+
+    Returns (images, changed, moved, bytes_moved, errors).
+    """
+    if not isinstance(images, list):
+        return images, False, 0, 0, []
+    updated = []
+    changed = False
+    moved = 0
+    bytes_moved = 0
+    errors = []
+    for image in images:
+        if isinstance(image, dict) and image.get("data") and not image.get("blob"):
+            try:
+                data = base64.b64decode(image["data"])
+            except Exception:
+                updated.append(image)
+                continue
+            ref, err = store_image_bytes(image.get("name") or "image", image.get("mime") or "image/png", data, settings)
+            if err:
+                errors.append(err)
+                updated.append(image)
+                continue
+            changed = True
+            moved += 1
+            bytes_moved += len(image["data"])
+            updated.append(ref)
+        elif isinstance(image, dict) and image.get("blob") and not image.get("thumbs") and PIL_AVAILABLE:
+            data = image_ref_bytes(image)
+            thumbs = build_image_thumbnails(data, settings) if data else {}
+            if thumbs:
+                image = dict(image, thumbs=thumbs)
+                changed = True
+            updated.append(image)
+        else:
+            updated.append(image)
+    return updated, changed, moved, bytes_moved, errors
+
+def migrate_inline_images(db_obj):
+    """One-shot move of inline portfolio and local listing photos into the blob store."""
+    stats = {"images": 0, "bytes": 0, "changed": 0, "errors": []}
+
+    def migrate(holder):
+        images, changed, moved, bytes_moved, errors = extract_inline_images(holder.get("images"))
+        if changed:
+            holder["images"] = images
+            stats["changed"] += 1
+        stats["images"] += moved
+        stats["bytes"] += bytes_moved
+        stats["errors"].extend(errors)
+
+    for _, record in iter_user_records(db_obj):
+        for asset in record.get("portfolio") or []:
+            if isinstance(asset, dict):
+                migrate(asset)
+    for post in get_forum_posts(db_obj):
+        if isinstance(post, dict):
+            migrate(post)
+    return stats
+
+def migrate_community_post_images(settings):
+    """One-shot move of inline Supabase listing photos into the Community project's bucket (service role).
+
+    Never into the local blob store: other hosts could not resolve those refs.
+    """
+    stats = {"posts": 0, "images": 0, "bytes": 0, "errors": []}
+    before = None
+    while True:
+        filters = [("images", "not.is", "null")]
+        if before:
+            filters.append(keyset_before_filter(before))
+        rows, err = supabase_select(
+            settings,
+            "community_posts",
+            filters=filters,
+            limit=50,
+            order="created_at.desc,id.desc",
+            use_service_key=True,
+            columns="id,created_at,images"
+        )
+        if err:
+            stats["errors"].append(err)
+            return stats
+        for row in rows or []:
+            images, changed, moved, bytes_moved, errors = extract_inline_images(row.get("images"), settings)
+            stats["errors"].extend(errors)
+            if not changed:
+                continue
+            _, err = supabase_update(settings, "community_posts", [("id", "eq", row.get("id"))], {"images": images}, use_service_key=True)
+            if err:
+                stats["errors"].append(err)
+                continue
+            stats["posts"] += 1
+            stats["images"] += moved
+            stats["bytes"] += bytes_moved
+        if not rows or len(rows) < 50:
+            return stats
+        before = keyset_cursor(rows[-1])
+
 def normalize_for_moderation(value):
     text = str(value or "").lower()
     text = re.sub(r"[^a-z0-9\s]", " ", text)
@@ -4069,13 +4893,12 @@ def persist_market_saved_searches(db_obj, username, searches):
     record["settings"] = settings
     save_data(db_obj)
 
-def send_alert_email(settings, subject, body):
-    recipient = settings.get("market_alert_email", "").strip()
+def get_smtp_config(settings):
     host = get_effective_setting(settings, "smtp_host", "SMTP_HOST")
     user = get_effective_setting(settings, "smtp_user", "SMTP_USER")
     password = get_effective_setting(settings, "smtp_password", "SMTP_PASSWORD")
-    if not recipient or not host or not user or not password:
-        return "Email settings are incomplete."
+    if not host or not user or not password:
+        return None
     try:
         port_value = get_effective_setting(settings, "smtp_port", "SMTP_PORT") or settings.get("smtp_port", 587)
         port = int(port_value)
@@ -4085,22 +4908,40 @@ def send_alert_email(settings, subject, body):
     use_tls = bool(settings.get("smtp_use_tls", True))
     if smtp_tls_value not in (None, ""):
         use_tls = str(smtp_tls_value).strip().lower() not in {"0", "false", "no"}
-    msg = f"Subject: {subject}\nTo: {recipient}\nFrom: {user}\n\n{body}"
-    try:
-        if use_tls:
-            context = ssl.create_default_context()
-            with smtplib.SMTP(host, port, timeout=10) as server:
-                server.starttls(context=context)
-                server.login(user, password)
-                server.sendmail(user, [recipient], msg)
-        else:
+    return (host, port, user, password, use_tls)
+
+def send_alert_emails(messages):
+    """Send (settings, subject, body) messages, one SMTP connection per server; returns an error (or None) per message."""
+    errors = [None] * len(messages)
+    batches = {}
+    for pos, (settings, subject, body) in enumerate(messages):
+        recipient = settings.get("market_alert_email", "").strip()
+        config = get_smtp_config(settings)
+        if not recipient or not config:
+            errors[pos] = "Email settings are incomplete."
+            continue
+        batches.setdefault(config, []).append((pos, recipient, subject, body))
+    for (host, port, user, password, use_tls), batch in batches.items():
+        try:
             context = ssl.create_default_context()
-            with smtplib.SMTP_SSL(host, port, context=context, timeout=10) as server:
+            if use_tls:
+                server = smtplib.SMTP(host, port, timeout=10)
+            else:
+                server = smtplib.SMTP_SSL(host, port, context=context, timeout=10)
+            with server:
+                if use_tls:
+                    server.starttls(context=context)
                 server.login(user, password)
-                server.sendmail(user, [recipient], msg)
-        return None
-    except Exception as exc:
-        return str(exc)
+                for pos, recipient, subject, body in batch:
+                    msg = f"Subject: {subject}\nTo: {recipient}\nFrom: {user}\n\n{body}"
+                    try:
+                        server.sendmail(user, [recipient], msg)
+                    except smtplib.SMTPException as exc:
+                        errors[pos] = str(exc)
+        except Exception as exc:
+            for pos, _, _, _ in batch:
+                errors[pos] = errors[pos] or str(exc)
+    return errors
 
 def build_alert_notification_payload(alerts):
     if not alerts:
@@ -4164,20 +5005,20 @@ def trigger_browser_notifications(alerts):
         height=0
     )
 
-def get_asset_image(asset):
+def get_asset_image(asset, size=None):
+    """First photo of an asset; pass size (e.g. 160/480) for a card thumbnail."""
     images = asset.get("images") or []
     if images:
         first = images[0]
-        if isinstance(first, dict) and "data" in first:
-            mime = first.get("mime") or "image/png"
-            data = first["data"]
-            try:
-                return {
-                    "src": f"data:{mime};base64,{data}",
-                    "bytes": base64.b64decode(data)
-                }
-            except Exception:
-                pass
+        if size:
+            data, mime = image_thumbnail(first, size)
+        else:
+            data, mime = image_ref_bytes(first), first.get("mime") if isinstance(first, dict) else None
+        if data:
+            return {
+                "src": f"data:{mime or 'image/png'};base64,{base64.b64encode(data).decode('utf-8')}",
+                "bytes": data
+            }
     url = asset.get("image_url") or search_asset_image(asset.get("name", ""))
     return {"src": url, "bytes": url}
 
@@ -4216,27 +5057,158 @@ def get_storage_settings_from_secrets():
         "supabase_use_service_role": secret_flag("SUPABASE_USE_SERVICE_ROLE", True)
     }
 
+def parse_storage_row(row):
+    record = row.get("data")
+    if isinstance(record, str):
+        try:
+            record = json.loads(record)
+        except Exception:
+            record = {}
+    if not isinstance(record, dict):
+        record = {}
+    return record
+
 def load_data_from_supabase(settings):
     if not supabase_enabled(settings):
         return None, "Supabase is not configured."
-    rows, err = supabase_select(settings, APP_STORAGE_TABLE, order="username.asc", use_service_key=True)
+    records, err = fetch_storage_records(settings)
     if err:
         return None, err
-    db_obj = {}
-    for row in rows or []:
-        username = row.get("username")
-        record = row.get("data")
-        if not username:
-            continue
-        if isinstance(record, str):
-            try:
-                record = json.loads(record)
-            except Exception:
-                record = {}
-        if not isinstance(record, dict):
-            record = {}
-        db_obj[username] = record
-    return db_obj, None
+    return {username: record for username, (record, _, _) in records.items()}, None
+
+@st.cache_resource(show_spinner=False)
+def get_storage_cache():
+    # Shared by every session in this server process.
+    return {
+        "lock": threading.RLock(),
+        "local_version": None,
+        "local_texts": {},
+        "local_record_versions": {},
+        "local_meta_config": {},
+        "remote": {},
+        "sqlite": {},
+        "synced_hashes": {}
+    }
+
+def get_local_data_version():
+    try:
+        stat = os.stat(DATA_FILE)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+def serialize_record(record):
+    return json.dumps(record, indent=2)
+
+def get_meta_config_from_text(meta_text):
+    if not meta_text:
+        return {}
+    try:
+        meta = json.loads(meta_text)
+    except Exception:
+        return {}
+    if not isinstance(meta, dict):
+        return {}
+    config = meta.get("community_config")
+    return config if isinstance(config, dict) else {}
+
+def get_local_record_texts():
+    cache = get_storage_cache()
+    with cache["lock"]:
+        version = get_local_data_version()
+        if version is None or version != cache["local_version"]:
+            local_data = load_local_data() if version else {}
+            if not isinstance(local_data, dict):
+                local_data = {}
+            # Per-record version counters ride along in the document under _versions.
+            record_versions = local_data.pop(DATA_VERSIONS_KEY, None)
+            cache["local_record_versions"] = record_versions if isinstance(record_versions, dict) else {}
+            cache["local_texts"] = {key: serialize_record(record) for key, record in local_data.items()}
+            cache["local_meta_config"] = get_meta_config_from_text(cache["local_texts"].get("_meta"))
+            cache["local_version"] = get_local_data_version()
+        return cache["local_texts"]
+
+def load_local_record_entries(usernames=None):
+    cache = get_storage_cache()
+    with cache["lock"]:
+        texts = get_local_record_texts()
+        versions = cache["local_record_versions"]
+        keys = texts if usernames is None else [key for key in usernames if key in texts]
+        return {key: (texts[key], int(versions.get(key, 0))) for key in keys}
+
+def build_storage_in_filter(usernames):
+    return "(" + ",".join(json.dumps(str(name)) for name in usernames) + ")"
+
+def storage_cache_key(settings, username):
+    # Synced hashes and cached rows belong to one Supabase project, not just one username.
+    return (get_supabase_config(settings)[0], username)
+
+def load_record_texts_from_supabase(settings, usernames=None):
+    if not supabase_enabled(settings):
+        return None, "Supabase is not configured."
+    if usernames is None:
+        db_obj, err = load_data_from_supabase(settings)
+        if db_obj is None:
+            return None, err
+        return {key: serialize_record(record) for key, record in db_obj.items()}, None
+    names = [name for name in dict.fromkeys(usernames) if name]
+    if not names:
+        return {}, None
+    rows, err = supabase_select(
+        settings,
+        APP_STORAGE_TABLE,
+        filters=[("username", "in", build_storage_in_filter(names))],
+        columns="username,updated_at",
+        use_service_key=True
+    )
+    if err:
+        return None, err
+    versions = {row.get("username"): row.get("updated_at") for row in rows or [] if row.get("username")}
+    return load_versioned_record_texts(settings, versions)
+
+def load_versioned_record_texts(settings, versions):
+    """Texts for {username: updated_at}, downloading only rows whose updated_at differs from the cached copy."""
+    cache = get_storage_cache()
+    with cache["lock"]:
+        stale = [
+            name for name, version in versions.items()
+            if (cache["remote"].get(storage_cache_key(settings, name)) or {}).get("version") != version
+        ]
+    if stale:
+        records, err = fetch_storage_records(settings, stale)
+        if err:
+            return None, err
+        with cache["lock"]:
+            for username, (record, version, rows) in records.items():
+                cache_key = storage_cache_key(settings, username)
+                cache["remote"][cache_key] = {
+                    "version": version,
+                    "text": serialize_record(record),
+                    "rows": rows
+                }
+                cache["synced_hashes"][cache_key] = storage_record_hash(record)
+    texts = {}
+    with cache["lock"]:
+        for name in versions:
+            entry = cache["remote"].get(storage_cache_key(settings, name))
+            if entry:
+                texts[name] = entry["text"]
+    return texts, None
+
+def storage_record_hash(record):
+    return hashlib.sha256(json.dumps(record, sort_keys=True).encode("utf-8")).hexdigest()
+
+def remember_remote_record(settings, username, record, version, record_hash=None, rows=None):
+    # rows is the normalized row form as written; None means the stored rows are unknown.
+    cache = get_storage_cache()
+    cache_key = storage_cache_key(settings, username)
+    with cache["lock"]:
+        if record_hash:
+            cache["synced_hashes"][cache_key] = record_hash
+        if version:
+            cache["remote"][cache_key] = {"version": version, "text": serialize_record(record), "rows": rows}
+        else:
+            cache["remote"].pop(cache_key, None)
 
 def scrub_sensitive_settings(record):
     if not isinstance(record, dict):
@@ -4278,70 +5250,769 @@ def scrub_sensitive_meta(db_obj):
         config["supabase_service_key"] = ""
     meta["community_config"] = config
 
-def sync_db_to_supabase(settings, db_obj):
+def get_sync_batch_size():
+    try:
+        value = int(get_secret_value("APP_STORAGE_SYNC_BATCH_SIZE", SUPABASE_SYNC_BATCH_SIZE))
+    except Exception:
+        value = SUPABASE_SYNC_BATCH_SIZE
+    return max(1, value)
+
+def upsert_storage_batch(settings, batch, stats=None):
+    payload = [
+        {"username": username, "data": record, "updated_at": datetime.now().isoformat()}
+        for username, record, _ in batch
+    ]
+    if stats is not None:
+        stats["requests"] += 1
+        stats["bytes"] += len(json.dumps(payload).encode("utf-8"))
+    rows, err = supabase_insert(settings, APP_STORAGE_TABLE, payload, upsert=True, use_service_key=True)
+    if err:
+        return err
+    versions = {row.get("username"): row.get("updated_at") for row in rows or [] if isinstance(row, dict)}
+    for username, record, record_hash in batch:
+        remember_remote_record(settings, username, record, versions.get(username), record_hash)
+    return None
+
+def sync_records_to_supabase(settings, db_obj, usernames=None, batch_size=None, stats=None, force=False):
+    """Bulk upsert records whose content changed since the last sync.
+
+    Returns (username, ok, err) for every record sent; a failed batch is
+    retried record by record so one bad row does not block the others.
+    In the normalized layout each record is written on its own, row by row.
+    """
     if not supabase_enabled(settings):
-        return "Supabase is not configured."
+        return None, "Supabase is not configured."
     if not isinstance(db_obj, dict):
-        return "Invalid data for sync."
+        return None, "Invalid data for sync."
     scrub_sensitive_meta(db_obj)
+    synced_hashes = get_storage_cache()["synced_hashes"]
+    pending = []
     for username, record in db_obj.items():
         if not isinstance(record, dict):
             continue
+        if usernames is not None and username not in usernames:
+            continue
         scrub_sensitive_settings(record)
-        payload = {
-            "username": username,
-            "data": record,
-            "updated_at": datetime.now().isoformat()
-        }
-        _, err = supabase_insert(settings, APP_STORAGE_TABLE, payload, upsert=True, use_service_key=True)
-        if err:
-            return err
-    return None
+        record_hash = storage_record_hash(record)
+        if not force and synced_hashes.get(storage_cache_key(settings, username)) == record_hash:
+            if stats is not None:
+                stats["skipped"] = int(stats.get("skipped", 0)) + 1
+            continue
+        pending.append((username, record, record_hash))
+    results = []
+    if app_storage_normalized():
+        remote = get_storage_cache()["remote"]
+        for username, record, record_hash in pending:
+            base = None if force else (remote.get(storage_cache_key(settings, username)) or {}).get("rows")
+            rows, version, err = write_normalized_record(settings, username, record, base=base, stats=stats)
+            if not err:
+                remember_remote_record(settings, username, record, version, record_hash, rows=rows)
+            results.append((username, not err, err))
+        return results, None
+    size = batch_size or get_sync_batch_size()
+    for start in range(0, len(pending), size):
+        batch = pending[start:start + size]
+        err = upsert_storage_batch(settings, batch, stats=stats)
+        if err and len(batch) > 1:
+            for item in batch:
+                item_err = upsert_storage_batch(settings, [item], stats=stats)
+                results.append((item[0], not item_err, item_err))
+            continue
+        for username, _, _ in batch:
+            results.append((username, not err, err))
+    return results, None
 
-def load_data():
-    if app_storage_enabled():
+def sync_db_to_supabase(settings, db_obj, usernames=None, stats=None):
+    results, err = sync_records_to_supabase(settings, db_obj, usernames=usernames, stats=stats)
+    if err:
+        return err
+    failures = [(username, item_err) for username, ok, item_err in results if not ok]
+    if not failures:
+        return None
+    details = "; ".join(f"{username}: {item_err}" for username, item_err in failures[:3])
+    if len(failures) > 3:
+        details += f"; +{len(failures) - 3} more"
+    return f"{len(failures)} of {len(results)} record(s) failed ({details})"
+
+def load_record_entries(usernames=None):
+    """{key: (serialized record, version)} for the requested keys (all of them when usernames is None).
+
+    The version is what save_data compares against when it writes the record back;
+    Supabase rows carry no version here and are written last-writer-wins.
+    """
+    if app_storage_sqlite():
+        entries, err = load_sqlite_record_entries(usernames)
+        if entries is not None:
+            return entries
+        st.warning(f"SQLite app storage unavailable ({err}). Falling back to local storage.")
+    elif app_storage_enabled():
         storage_settings = get_storage_settings_from_secrets()
-        data, err = load_data_from_supabase(storage_settings)
-        if data is not None:
-            return data
+        texts, err = load_record_texts_from_supabase(storage_settings, usernames)
+        if texts is not None:
+            return {key: (text, None) for key, text in texts.items()}
         st.warning(f"Supabase app storage unavailable ({err}). Falling back to local storage.")
-    local_data = load_local_data()
-    meta_config = {}
-    if isinstance(local_data, dict):
-        meta = local_data.get("_meta")
-        if isinstance(meta, dict):
-            meta_config = meta.get("community_config") or {}
+    get_local_record_texts()
+    meta_config = get_storage_cache()["local_meta_config"]
     if app_storage_enabled(meta_config):
-        data, err = load_data_from_supabase(meta_config)
-        if data is not None:
-            return data
+        texts, err = load_record_texts_from_supabase(meta_config, usernames)
+        if texts is not None:
+            return {key: (text, None) for key, text in texts.items()}
         st.warning(f"Supabase app storage unavailable ({err}). Using local storage.")
-    return local_data
+    return load_local_record_entries(usernames)
 
-def save_data(data):
-    if app_storage_enabled(get_community_settings(data)):
-        storage_settings = get_community_settings(data)
-        sync_error = sync_db_to_supabase(storage_settings, data)
-        if sync_error:
-            st.warning(f"Supabase sync failed: {sync_error}. Writing to local file as backup.")
+def load_record_texts(usernames=None):
+    """Serialized records for the requested keys (all of them when usernames is None)."""
+    return {key: text for key, (text, _) in load_record_entries(usernames).items()}
+
+# Serialized form and storage version of each record as it was loaded during
+# this run; save_data diffs against the text and writes against the version.
+record_snapshots = {}
+record_versions = {}
+
+def load_data():
+    return {key: json.loads(text) for key, text in load_record_texts().items()}
+
+def adopt_record_entries(db_obj, entries, overwrite=True):
+    for key, (text, version) in entries.items():
+        if not overwrite and key in db_obj:
+            continue
+        db_obj[key] = json.loads(text)
+        # Backfilled ids differ from the snapshot, so the next save stores them.
+        ensure_record_item_ids(key, db_obj[key])
+        record_snapshots[key] = text
+        record_versions[key] = version
+    return db_obj
+
+def load_session_data(username=None):
+    keys = ["_meta"]
+    if username:
+        keys.append(username)
+    return adopt_record_entries({}, load_record_entries(keys))
+
+def ensure_user_loaded(db_obj, username):
+    if not username:
+        return None
+    if username not in db_obj:
+        adopt_record_entries(db_obj, load_record_entries([username]))
+    return db_obj.get(username)
+
+def load_all_user_records(db_obj):
+    return adopt_record_entries(db_obj, load_record_entries(), overwrite=False)
+
+def get_changed_records(data):
+    changed = {}
+    for key, record in data.items():
+        text = serialize_record(record)
+        if record_snapshots.get(key) != text:
+            changed[key] = text
+    return changed
+
+def get_changed_meta_sections(meta, snapshot_text):
+    if not isinstance(meta, dict):
+        return []
+    try:
+        previous = json.loads(snapshot_text) if snapshot_text else {}
+    except Exception:
+        previous = {}
+    if not isinstance(previous, dict):
+        previous = {}
+    sections = []
+    for key in set(meta) | set(previous):
+        if key not in meta or key not in previous or json.dumps(meta[key]) != json.dumps(previous[key]):
+            sections.append(key)
+    return sorted(sections)
+
+def record_save_stats(stats):
+    st.session_state.last_save_stats = stats
+    history = st.session_state.setdefault("storage_save_history", [])
+    history.append(stats)
+    del history[:-20]
+
+MERGE_MISSING = object()
+
+def backfill_item_id(key, name, item, occurrence):
+    # Derived from the item's content (and which copy of identical items it is), not its
+    # position, so every process backfilling the same item assigns the same id.
+    payload = json.dumps([key, name, occurrence, {field: value for field, value in item.items() if field != "id"}], sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:12]
+
+def ensure_record_item_ids(key, record):
+    """Give every dict in a record's item collections (APP_STORAGE_ITEM_TABLES) a unique "id";
+    True when any was added.
+
+    Items get secrets.token_hex ids where they are created; older items, and copies
+    that share an id, are backfilled here. Storage rows and merges key items by it.
+    Other lists, and records without these collections such as _meta, are left alone.
+    """
+    if not isinstance(record, dict):
+        return False
+    changed = False
+    for name in APP_STORAGE_ITEM_TABLES:
+        values = record.get(name)
+        if not isinstance(values, list):
+            continue
+        seen = set()
+        occurrences = {}
+        for item in values:
+            if not isinstance(item, dict):
+                continue
+            item_id = item.get("id")
+            if not isinstance(item_id, (str, int)) or isinstance(item_id, bool) or item_id == "" or item_id in seen:
+                content = json.dumps({field: value for field, value in item.items() if field != "id"}, sort_keys=True)
+                occurrences[content] = occurrences.get(content, 0) + 1
+                item["id"] = backfill_item_id(key, name, item, occurrences[content])
+                changed = True
+            seen.add(item["id"])
+    return changed
+
+def record_item_ids(values):
+    ids = [item.get("id") if isinstance(item, dict) else None for item in values]
+    if not all(isinstance(item_id, (str, int)) and not isinstance(item_id, bool) and item_id != "" for item_id in ids) or len(set(ids)) != len(ids):
+        return None
+    return ids
+
+def merge_record_lists(base, theirs, ours, path):
+    """Merge lists of dicts by "id"; None when the items carry no usable ids.
+
+    Items are merged one by one in the stored (theirs) order, followed by the
+    items only this writer added.
+    """
+    keyed = [record_item_ids(values) for values in (base, theirs, ours)]
+    if None in keyed:
+        return None
+    base_items = dict(zip(keyed[0], base))
+    theirs_items = dict(zip(keyed[1], theirs))
+    ours_items = dict(zip(keyed[2], ours))
+    merged = []
+    conflicts = []
+    for item_id in keyed[1] + [item_id for item_id in keyed[2] if item_id not in theirs_items]:
+        value, item_conflicts = merge_record_values(
+            base_items.get(item_id, MERGE_MISSING),
+            theirs_items.get(item_id, MERGE_MISSING),
+            ours_items.get(item_id, MERGE_MISSING),
+            f"{path}[{item_id}]"
+        )
+        if value is not MERGE_MISSING:
+            merged.append(value)
+        conflicts.extend(item_conflicts)
+    return merged, conflicts
+
+def merge_record_values(base, theirs, ours, path=""):
+    """Three-way merge of a value two writers changed from the same base.
+
+    Returns (merged, conflicting paths). A side that left the value alone yields to
+    the other; dicts merge key by key and lists of items with ids item by item (see
+    merge_record_lists). Lists without ids merge element by element when all three
+    have the same length, and keep both appends when both sides only appended.
+    Anything else changed on both sides keeps the stored (theirs) value and is reported.
+    """
+    if ours == base or ours == theirs:
+        return theirs, []
+    if theirs == base:
+        return ours, []
+    if isinstance(base, dict) and isinstance(theirs, dict) and isinstance(ours, dict):
+        merged = dict(theirs)
+        conflicts = []
+        for key in list(ours) + [key for key in base if key not in ours]:
+            value, key_conflicts = merge_record_values(
+                base.get(key, MERGE_MISSING),
+                theirs.get(key, MERGE_MISSING),
+                ours.get(key, MERGE_MISSING),
+                f"{path}.{key}" if path else str(key)
+            )
+            if value is MERGE_MISSING:
+                merged.pop(key, None)
+            else:
+                merged[key] = value
+            conflicts.extend(key_conflicts)
+        return merged, conflicts
+    if isinstance(base, list) and isinstance(theirs, list) and isinstance(ours, list):
+        by_id = merge_record_lists(base, theirs, ours, path)
+        if by_id is not None:
+            return by_id
+        if len(base) == len(theirs) == len(ours):
+            merged = []
+            conflicts = []
+            for index, values in enumerate(zip(base, theirs, ours)):
+                value, item_conflicts = merge_record_values(*values, f"{path}[{index}]")
+                merged.append(value)
+                conflicts.extend(item_conflicts)
+            return merged, conflicts
+        if theirs[:len(base)] == base and ours[:len(base)] == base:
+            return theirs + ours[len(base):], []
+    return theirs, [path or "(record)"]
+
+def resolve_record_write(text, base, stored_text, stored_version, key=None):
+    """Compare-and-swap for one record: (text to store, conflicting paths).
+
+    base is (text, version) as this session loaded it. If the stored version is
+    still that version the session's text wins outright; otherwise another writer
+    got there first and the two edits are merged over the stored record. Texts
+    written before items had ids are backfilled the same way on every side first.
+    """
+    if base is None or stored_text is None:
+        return text, []
+    base_text, base_version = base
+    if stored_version == base_version:
+        return text, []
+    values = [json.loads(value) if value else MERGE_MISSING for value in (base_text, stored_text, text)]
+    for value in values:
+        ensure_record_item_ids(key, value)
+    merged, conflicts = merge_record_values(*values)
+    return serialize_record(merged), conflicts
+
+def adopt_write_result(data, changed, result, stats):
+    """Record the versions just written; records merged with another writer's edits are refreshed in place."""
+    for key, text in result["texts"].items():
+        if text != changed.get(key):
+            record = json.loads(text)
+            if isinstance(data.get(key), dict) and isinstance(record, dict):
+                data[key].clear()
+                data[key].update(record)
+            else:
+                data[key] = record
+        record_snapshots[key] = text
+        record_versions[key] = result["versions"].get(key)
+    if result["conflicts"]:
+        stats["conflicts"] = result["conflicts"]
+        paths = [f"{key}: {path}" for key, key_paths in result["conflicts"].items() for path in key_paths]
+        more = f" (+{len(paths) - 5} more)" if len(paths) > 5 else ""
+        st.warning(
+            "Some changes were saved elsewhere at the same time; the saved values were kept for "
+            + ", ".join(paths[:5]) + more + "."
+        )
+
+def build_local_document(texts, versions=None):
+    if not texts:
+        return "{}"
+    parts = []
+    for key, text in texts.items():
+        parts.append(f"  {json.dumps(key)}: " + text.replace("\n", "\n  "))
+    if versions:
+        parts.append(f"  {json.dumps(DATA_VERSIONS_KEY)}: " + json.dumps(versions, indent=2).replace("\n", "\n  "))
+    return "{\n" + ",\n".join(parts) + "\n}"
+
+@contextmanager
+def data_file_lock():
+    # Serializes read-merge-write cycles across server processes. Readers never
+    # take it: the document is still swapped in with an atomic os.replace.
+    with open(DATA_LOCK_FILE, "a") as handle:
+        if FILE_LOCK_AVAILABLE:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if FILE_LOCK_AVAILABLE:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+
+def write_local_data(changed_texts, bases=None):
+    """Write changed records into DATA_FILE; returns {"bytes", "texts", "versions", "conflicts"}.
+
+    bases maps key -> (text, version) as loaded; records whose stored version moved
+    since then are merged rather than overwritten (see resolve_record_write).
+    """
+    cache = get_storage_cache()
+    with cache["lock"], data_file_lock():
+        # Re-read under the lock so a write from another process is merged over, not lost.
+        # Records this session never loaded (or left untouched) are preserved as stored.
+        texts = dict(get_local_record_texts())
+        versions = dict(cache["local_record_versions"])
+        written = {}
+        conflicts = {}
+        for key, text in changed_texts.items():
+            stored_version = int(versions.get(key, 0))
+            text, key_conflicts = resolve_record_write(text, (bases or {}).get(key), texts.get(key), stored_version, key=key)
+            texts[key] = text
+            versions[key] = stored_version + 1
+            written[key] = text
+            if key_conflicts:
+                conflicts[key] = key_conflicts
+        content = build_local_document(texts, versions)
+        dir_name = os.path.dirname(DATA_FILE)
+        fd, tmp_path = tempfile.mkstemp(prefix=".wealth_data_", suffix=".tmp", dir=dir_name)
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, DATA_FILE)
+        finally:
+            if os.path.exists(tmp_path):
+                try:
+                    os.remove(tmp_path)
+                except Exception:
+                    pass
+        cache["local_texts"] = texts
+        cache["local_record_versions"] = versions
+        cache["local_meta_config"] = get_meta_config_from_text(texts.get("_meta"))
+        cache["local_version"] = get_local_data_version()
+    return {
+        "bytes": len(content.encode("utf-8")),
+        "texts": written,
+        "versions": {key: versions[key] for key in written},
+        "conflicts": conflicts
+    }
+
+# ==============================
+# SQLITE APP STORAGE
+# ==============================
+# Records are split so that editing one asset or one setting rewrites one row:
+# every list in a record (portfolio, liabilities, entities, feedback, forum_posts,
+# messages, community_roles, ...) is stored one element per row in storage_items,
+# keyed by the element's "id" (see ensure_record_item_ids) so removing an element
+# does not shift the others onto different rows; every other top-level value
+# (settings, login_security, counters) is one row per field in storage_fields.
+# storage_records keeps the key order and a version.
+APP_STORAGE_ITEMS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS storage_items (
+    key TEXT NOT NULL,
+    collection TEXT NOT NULL,
+    item_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (key, collection, item_id)
+) WITHOUT ROWID
+"""
+APP_STORAGE_DB_SCHEMA = """
+CREATE TABLE IF NOT EXISTS storage_records (
+    key TEXT PRIMARY KEY,
+    layout TEXT NOT NULL,
+    version INTEGER NOT NULL DEFAULT 1,
+    updated_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS storage_fields (
+    key TEXT NOT NULL,
+    field TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (key, field)
+) WITHOUT ROWID;
+""" + APP_STORAGE_ITEMS_SCHEMA + ";\n"
+
+@st.cache_resource(show_spinner=False)
+def get_app_storage_db():
+    # One connection per server process. WAL lets readers run alongside a writer, and
+    # writes use BEGIN IMMEDIATE so other processes queue on the busy timeout.
+    conn = sqlite3.connect(APP_STORAGE_DB_FILE, timeout=APP_STORAGE_DB_TIMEOUT, check_same_thread=False, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(APP_STORAGE_DB_SCHEMA)
+    if not sqlite_items_keyed_by_id(conn):
+        migrate_sqlite_item_ids(conn)
+    return {"lock": threading.Lock(), "conn": conn, "seeded": False}
+
+def sqlite_items_keyed_by_id(conn):
+    return any(row[1] == "item_id" for row in conn.execute("PRAGMA table_info(storage_items)"))
+
+def migrate_sqlite_item_ids(conn):
+    """Re-key storage_items written before items had ids from (collection, position) to (collection, item_id)."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # Another process may have migrated while this one waited for the write lock.
+        if sqlite_items_keyed_by_id(conn):
+            conn.execute("COMMIT")
+            return
+        grouped = {}
+        for key, collection, value in conn.execute(
+            "SELECT key, collection, value FROM storage_items ORDER BY key, collection, position"
+        ):
+            grouped.setdefault(key, {}).setdefault(collection, []).append(json.loads(value))
+        conn.execute("DROP TABLE storage_items")
+        conn.execute(APP_STORAGE_ITEMS_SCHEMA)
+        for key, collections in grouped.items():
+            ensure_record_item_ids(key, collections)
+            for collection, values in collections.items():
+                conn.executemany(
+                    "INSERT INTO storage_items (key, collection, item_id, position, value) VALUES (?, ?, ?, ?, ?)",
+                    [(key, collection, item_id, position, value) for position, (item_id, value) in enumerate(storage_item_rows(values))]
+                )
+        # Items gained ids, so caches keyed by version must re-read these records.
+        conn.executemany("UPDATE storage_records SET version = version + 1 WHERE key = ?", [(key,) for key in grouped])
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+def storage_item_rows(values, sort_keys=False):
+    """[(item_id, serialized value)] for a list; elements without an "id" (scalars), or repeating one, are keyed by position."""
+    rows = []
+    seen = set()
+    for position, item in enumerate(values):
+        item_id = str(item["id"]) if isinstance(item, dict) and item.get("id") not in (None, "") else None
+        if item_id is None or item_id in seen:
+            item_id = f"@{position}"
+        seen.add(item_id)
+        rows.append((item_id, json.dumps(item, sort_keys=sort_keys)))
+    return rows
+
+def split_storage_record(record):
+    """(layout, fields, items) with every value already serialized; items are [(item_id, value)] per list."""
+    if not isinstance(record, dict):
+        return None, {"": json.dumps(record)}, {}
+    layout, fields, items = [], {}, {}
+    for name, value in record.items():
+        if isinstance(value, list):
+            layout.append([name, True])
+            items[name] = storage_item_rows(value)
         else:
-            if not secret_flag("APP_STORAGE_LOCAL_CACHE", False):
-                return
-    scrub_sensitive_meta(data)
-    dir_name = os.path.dirname(DATA_FILE)
-    fd, tmp_path = tempfile.mkstemp(prefix=".wealth_data_", suffix=".tmp", dir=dir_name)
+            layout.append([name, False])
+            fields[name] = json.dumps(value)
+    return layout, fields, items
+
+def join_storage_record(layout, fields, items):
+    if layout is None:
+        return json.loads(fields.get("", "null"))
+    record = {}
+    for name, is_list in layout:
+        if is_list:
+            record[name] = [json.loads(text) for text in items.get(name, [])]
+        else:
+            record[name] = json.loads(fields.get(name, "null"))
+    return record
+
+def read_sqlite_rows(conn, keys):
+    """Raw rows for keys: {key: {"layout", "version", "fields", "items", "item_rows"}}.
+
+    items holds each list's serialized values in order; item_rows maps item_id -> (position, value).
+    """
+    if not keys:
+        return {}
+    placeholders = ",".join("?" for _ in keys)
+    rows = {}
+    for key, layout, version in conn.execute(
+        f"SELECT key, layout, version FROM storage_records WHERE key IN ({placeholders})", keys
+    ):
+        rows[key] = {"layout": json.loads(layout), "version": version, "fields": {}, "items": {}, "item_rows": {}}
+    for key, field, value in conn.execute(
+        f"SELECT key, field, value FROM storage_fields WHERE key IN ({placeholders})", keys
+    ):
+        if key in rows:
+            rows[key]["fields"][field] = value
+    for key, collection, item_id, position, value in conn.execute(
+        f"SELECT key, collection, item_id, position, value FROM storage_items WHERE key IN ({placeholders}) ORDER BY key, collection, position", keys
+    ):
+        if key in rows:
+            rows[key]["items"].setdefault(collection, []).append(value)
+            rows[key]["item_rows"].setdefault(collection, {})[item_id] = (position, value)
+    return rows
+
+def ensure_sqlite_seeded():
+    # First use of an empty database picks up the existing JSON document.
+    store = get_app_storage_db()
+    if store["seeded"]:
+        return
+    store["seeded"] = True
+    if os.path.exists(DATA_FILE):
+        import_json_to_sqlite(DATA_FILE, only_if_empty=True)
+
+def load_sqlite_record_entries(usernames=None):
+    """{key: (serialized record, version)} from SQLite; only records whose version moved are re-read."""
+    ensure_sqlite_seeded()
+    store = get_app_storage_db()
+    cache = get_storage_cache()
     try:
-        with os.fdopen(fd, "w") as f:
-            json.dump(data, f, indent=2)
-            f.flush()
-            os.fsync(f.fileno())
-        os.replace(tmp_path, DATA_FILE)
-    finally:
-        if os.path.exists(tmp_path):
+        with store["lock"]:
+            conn = store["conn"]
+            # One read transaction so the three tables are seen at the same point in time.
+            conn.execute("BEGIN")
             try:
-                os.remove(tmp_path)
+                if usernames is None:
+                    version_rows = conn.execute("SELECT key, version FROM storage_records").fetchall()
+                else:
+                    names = [name for name in dict.fromkeys(usernames) if name]
+                    placeholders = ",".join("?" for _ in names)
+                    version_rows = conn.execute(
+                        f"SELECT key, version FROM storage_records WHERE key IN ({placeholders})", names
+                    ).fetchall() if names else []
+                versions = dict(version_rows)
+                with cache["lock"]:
+                    stale = [key for key, version in versions.items() if (cache["sqlite"].get(key) or {}).get("version") != version]
+                rows = read_sqlite_rows(conn, stale)
+            finally:
+                conn.execute("COMMIT")
+    except sqlite3.Error as exc:
+        return None, str(exc)
+    with cache["lock"]:
+        for key, row in rows.items():
+            record = join_storage_record(row["layout"], row["fields"], row["items"])
+            cache["sqlite"][key] = {"version": row["version"], "text": serialize_record(record)}
+        return {
+            key: (cache["sqlite"][key]["text"], cache["sqlite"][key]["version"])
+            for key in versions if key in cache["sqlite"]
+        }, None
+
+def write_sqlite_records(changed_texts, bases=None, only_if_empty=False, skip_existing=False):
+    """Write changed records, touching only the field and list-element rows that differ.
+
+    Returns ({"records", "rows", "bytes", "texts", "versions", "conflicts", "skipped"}, err).
+    bases works as in write_local_data. With only_if_empty nothing is written once
+    the database holds any record (used to seed from JSON exactly once); with
+    skip_existing records already in the database are left alone and listed in skipped.
+    """
+    store = get_app_storage_db()
+    cache = get_storage_cache()
+    stats = {"records": 0, "rows": 0, "bytes": 0, "texts": {}, "versions": {}, "conflicts": {}, "skipped": []}
+    now = datetime.now().isoformat()
+    try:
+        with store["lock"]:
+            conn = store["conn"]
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if only_if_empty and conn.execute("SELECT 1 FROM storage_records LIMIT 1").fetchone():
+                    conn.execute("ROLLBACK")
+                    return stats, None
+                keys = list(changed_texts)
+                current = read_sqlite_rows(conn, keys)
+                if skip_existing:
+                    stats["skipped"] = [key for key in keys if key in current]
+                    keys = [key for key in keys if key not in current]
+                for key in keys:
+                    text = changed_texts[key]
+                    old = current.get(key) or {"version": None, "fields": {}, "items": {}, "item_rows": {}}
+                    if key in current:
+                        stored_text = serialize_record(join_storage_record(old["layout"], old["fields"], old["items"]))
+                        text, key_conflicts = resolve_record_write(text, (bases or {}).get(key), stored_text, old["version"], key=key)
+                        if key_conflicts:
+                            stats["conflicts"][key] = key_conflicts
+                    record = json.loads(text)
+                    if ensure_record_item_ids(key, record):
+                        # Imported or pre-id text: rows are keyed by item id, so store the ids too.
+                        text = serialize_record(record)
+                    stats["texts"][key] = text
+                    layout, fields, items = split_storage_record(record)
+                    for field, value in fields.items():
+                        if old["fields"].get(field) != value:
+                            conn.execute(
+                                "INSERT INTO storage_fields (key, field, value) VALUES (?, ?, ?) "
+                                "ON CONFLICT(key, field) DO UPDATE SET value = excluded.value",
+                                (key, field, value)
+                            )
+                            stats["rows"] += 1
+                            stats["bytes"] += len(value.encode("utf-8"))
+                    for field in old["fields"]:
+                        if field not in fields:
+                            conn.execute("DELETE FROM storage_fields WHERE key = ? AND field = ?", (key, field))
+                            stats["rows"] += 1
+                    for collection in set(items) | set(old["item_rows"]):
+                        rows = items.get(collection, [])
+                        old_rows = old["item_rows"].get(collection, {})
+                        for position, (item_id, value) in enumerate(rows):
+                            stored = old_rows.get(item_id)
+                            if stored is None or stored[1] != value:
+                                conn.execute(
+                                    "INSERT INTO storage_items (key, collection, item_id, position, value) VALUES (?, ?, ?, ?, ?) "
+                                    "ON CONFLICT(key, collection, item_id) DO UPDATE SET position = excluded.position, value = excluded.value",
+                                    (key, collection, item_id, position, value)
+                                )
+                                stats["rows"] += 1
+                                stats["bytes"] += len(value.encode("utf-8"))
+                            elif stored[0] != position:
+                                # Moved by an insert or delete earlier in the list: only the order changes.
+                                conn.execute(
+                                    "UPDATE storage_items SET position = ? WHERE key = ? AND collection = ? AND item_id = ?",
+                                    (position, key, collection, item_id)
+                                )
+                                stats["rows"] += 1
+                        live_ids = {item_id for item_id, _ in rows}
+                        gone = [item_id for item_id in old_rows if item_id not in live_ids]
+                        conn.executemany(
+                            "DELETE FROM storage_items WHERE key = ? AND collection = ? AND item_id = ?",
+                            [(key, collection, item_id) for item_id in gone]
+                        )
+                        stats["rows"] += len(gone)
+                    conn.execute(
+                        "INSERT INTO storage_records (key, layout, version, updated_at) VALUES (?, ?, 1, ?) "
+                        "ON CONFLICT(key) DO UPDATE SET layout = excluded.layout, version = version + 1, updated_at = excluded.updated_at",
+                        (key, json.dumps(layout), now)
+                    )
+                    stats["records"] += 1
+                placeholders = ",".join("?" for _ in keys)
+                stats["versions"] = dict(conn.execute(
+                    f"SELECT key, version FROM storage_records WHERE key IN ({placeholders})", keys
+                ).fetchall()) if keys else {}
+                conn.execute("COMMIT")
             except Exception:
-                pass
+                conn.execute("ROLLBACK")
+                raise
+    except sqlite3.Error as exc:
+        return None, str(exc)
+    with cache["lock"]:
+        for key, text in stats["texts"].items():
+            cache["sqlite"][key] = {"version": stats["versions"].get(key), "text": text}
+    return stats, None
+
+def import_json_to_sqlite(path=DATA_FILE, only_if_empty=False, skip_existing=True):
+    """Copy the records of a wealth_data.json document into SQLite storage.
+
+    Records already in SQLite are kept unless skip_existing is False, in which case
+    the JSON copy replaces them.
+    """
+    try:
+        with open(path, "r") as f:
+            data = json.load(f)
+    except Exception as exc:
+        return None, f"Unable to read {path}: {exc}"
+    if not isinstance(data, dict):
+        return None, f"{path} does not contain a JSON object."
+    texts = {key: serialize_record(record) for key, record in data.items() if key != DATA_VERSIONS_KEY}
+    return write_sqlite_records(texts, only_if_empty=only_if_empty, skip_existing=skip_existing)
+
+# CLI entry point for moving an existing JSON store into SQLite:
+#   python wealth_tracker.py --import-json [path] [--overwrite]   (then set APP_STORAGE_PROVIDER = "SQLite")
+# Records already in SQLite are skipped unless --overwrite is given.
+if "--import-json" in sys.argv:
+    cli_args = sys.argv[sys.argv.index("--import-json") + 1:]
+    cli_path = cli_args[0] if cli_args and not cli_args[0].startswith("--") else DATA_FILE
+    cli_stats, cli_err = import_json_to_sqlite(cli_path, skip_existing="--overwrite" not in sys.argv)
+    print(json.dumps({"stats": cli_stats, "error": cli_err}))
+    sys.exit(1 if cli_err else 0)
+
+def save_data(data):
+    storage_settings = get_community_settings(data)
+    use_supabase = app_storage_enabled(storage_settings)
+    use_sqlite = app_storage_sqlite()
+    scrub_sensitive_meta(data)
+    if use_supabase:
+        for _, record in iter_user_records(data):
+            scrub_sensitive_settings(record)
+    for key, record in data.items():
+        ensure_record_item_ids(key, record)
+    changed = get_changed_records(data)
+    if not changed:
+        st.session_state.storage_saves_skipped = int(st.session_state.get("storage_saves_skipped", 0)) + 1
+        return None
+    stats = {
+        "at": datetime.now().isoformat(timespec="seconds"),
+        "backend": "Supabase" if use_supabase else "SQLite" if use_sqlite else "Local",
+        "records": sorted(key for key in changed if not key.startswith("_")),
+        "meta_sections": get_changed_meta_sections(data.get("_meta"), record_snapshots.get("_meta")) if "_meta" in changed else [],
+        "bytes": 0,
+        "requests": 0
+    }
+    if use_supabase:
+        sync_error = sync_db_to_supabase(storage_settings, data, usernames=list(changed), stats=stats)
+        if sync_error:
+            st.warning(f"Supabase sync failed: {sync_error}. Writing to local file as backup.")
+        elif not secret_flag("APP_STORAGE_LOCAL_CACHE", False):
+            record_snapshots.update(changed)
+            record_save_stats(stats)
+            return stats
+    bases = {key: (record_snapshots.get(key), record_versions.get(key)) for key in changed}
+    if use_sqlite:
+        write_result, write_err = write_sqlite_records(changed, bases=bases)
+        if write_err:
+            st.warning(f"SQLite write failed: {write_err}. Writing to local file as backup.")
+        else:
+            stats["bytes"] += write_result["bytes"]
+            stats["rows"] = write_result["rows"]
+            stats["requests"] += 1
+            adopt_write_result(data, changed, write_result, stats)
+            record_save_stats(stats)
+            return stats
+    write_result = write_local_data(changed, bases=bases)
+    stats["bytes"] += write_result["bytes"]
+    adopt_write_result(data, changed, write_result, stats)
+    record_save_stats(stats)
+    return stats
 
 def get_supabase_config(settings):
     url, _ = resolve_setting(settings, "supabase_url", "SUPABASE_URL")
@@ -4386,46 +6057,90 @@ def supabase_request(settings, method, table, params=None, payload=None, use_ser
     if prefer_value is None and method in ("POST", "PATCH", "PUT"):
         prefer_value = "return=representation"
     try:
-        response = requests.request(
+        response = http_request(
             method,
             endpoint,
+            provider="supabase",
             headers=supabase_headers(api_key, prefer=prefer_value, auth_token=auth_token),
             params=params,
-            json=payload,
-            timeout=SUPABASE_TIMEOUT
+            json=payload
         )
         if not response.ok:
             return None, f"{response.status_code}: {response.text[:300]}"
+        if method == "HEAD":
+            return response.headers, None
         if response.text:
             return response.json(), None
         return [], None
     except Exception as exc:
         return None, str(exc)
 
-def supabase_select(settings, table, filters=None, limit=None, order=None, use_service_key=False, auth_token=None):
-    params = {"select": "*"}
+def supabase_filter_params(filters):
+    # A list of pairs so one column can carry several filters (price=gte.1&price=lte.5);
+    # op None passes value through, for logic filters such as ("or", None, "(a.eq.1,b.eq.2)").
+    return [(col, value if op is None else f"{op}.{value}") for col, op, value in filters or []]
+
+def supabase_select(settings, table, filters=None, limit=None, order=None, use_service_key=False, auth_token=None, columns="*"):
+    params = [("select", columns)]
     if limit:
-        params["limit"] = str(limit)
+        params.append(("limit", str(limit)))
     if order:
-        params["order"] = order
-    if filters:
-        for col, op, value in filters:
-            params[col] = f"{op}.{value}"
+        params.append(("order", order))
+    params.extend(supabase_filter_params(filters))
     return supabase_request(settings, "GET", table, params=params, use_service_key=use_service_key, auth_token=auth_token)
 
-def supabase_insert(settings, table, payload, upsert=False, use_service_key=False, auth_token=None):
+def supabase_select_all(settings, table, filters=None, order=None, use_service_key=False, columns="*", page_size=SUPABASE_PAGE_SIZE):
+    """Every matching row, read page by page so the server's max-rows cap does not truncate it (order must be stable).
+
+    Only an empty page ends the read: when the project's max-rows is below page_size every
+    page comes back short, so a short page does not mean the rows ran out.
+    """
+    rows = []
+    while True:
+        page, err = supabase_select(
+            settings,
+            table,
+            filters=list(filters or []) + [("offset", None, str(len(rows)))],
+            limit=page_size,
+            order=order,
+            use_service_key=use_service_key,
+            columns=columns
+        )
+        if err:
+            return None, err
+        if not page:
+            return rows, None
+        rows.extend(page)
+
+def supabase_count(settings, table, filters=None, use_service_key=False, auth_token=None):
+    """Matching row count from the Content-Range header of a HEAD request; no rows are transferred."""
+    headers, err = supabase_request(
+        settings,
+        "HEAD",
+        table,
+        params=supabase_filter_params(filters),
+        prefer="count=exact",
+        use_service_key=use_service_key,
+        auth_token=auth_token
+    )
+    if err:
+        return None, err
+    try:
+        return int(str(headers.get("Content-Range", "")).rsplit("/", 1)[1]), None
+    except Exception:
+        return None, "Supabase did not return a row count."
+
+def supabase_insert(settings, table, payload, upsert=False, use_service_key=False, auth_token=None, on_conflict="username"):
     params = None
     prefer = None
     if upsert:
-        params = {"on_conflict": "username"}
+        params = {"on_conflict": on_conflict}
         prefer = "return=representation, resolution=merge-duplicates"
     data, err = supabase_request(settings, "POST", table, params=params, payload=payload, prefer=prefer, use_service_key=use_service_key, auth_token=auth_token)
     return data, err
 
 def supabase_update(settings, table, filters, payload, use_service_key=False, auth_token=None):
-    params = {}
-    for col, op, value in filters:
-        params[col] = f"{op}.{value}"
+    params = supabase_filter_params(filters)
     return supabase_request(settings, "PATCH", table, params=params, payload=payload, use_service_key=use_service_key, auth_token=auth_token)
 
 def supabase_delete(settings, table, filters, use_service_key=False, auth_token=None):
@@ -4444,6 +6159,203 @@ def supabase_check_table(settings, table="community_posts", use_service_key=None
         return False, err
     return True, None
 
+# ==============================
+# NORMALIZED SUPABASE STORAGE
+# ==============================
+# The same split as the SQLite layout, in Postgres: portfolio, liabilities and
+# entities go one element per row into their own tables keyed by (username,
+# item_id) with a position column for order, settings one key per row into
+# wealthpulse_settings, and wealthpulse_users keeps every other field plus the
+# key order in `layout`. A save sends only the rows that differ from what this
+# process last read or wrote, in one call to the wealthpulse_write_record
+# function, which applies them and bumps updated_at in a single transaction.
+# Rows whose layout is null are still single JSONB blobs; they are read as
+# before and split on their next write (or by migrate_storage_to_normalized).
+
+def split_normalized_record(record):
+    """Row form of a record: {"layout", "data", "items", "settings"}, values serialized for diffing.
+
+    items holds [(item_id, value)] per list, in order.
+    """
+    layout, rest, items, settings = [], {}, {}, {}
+    for name, value in record.items():
+        layout.append(name)
+        if name in APP_STORAGE_ITEM_TABLES and isinstance(value, list):
+            items[name] = storage_item_rows(value, sort_keys=True)
+        elif name == "settings" and isinstance(value, dict):
+            settings = {key: json.dumps(item, sort_keys=True) for key, item in value.items()}
+        else:
+            rest[name] = value
+    return {"layout": layout, "data": json.dumps(rest, sort_keys=True), "items": items, "settings": settings}
+
+def join_normalized_record(layout, rest, items, settings):
+    # A field still present in `data` wins, so a blob written over a split row reads back intact.
+    record = {}
+    for name in layout or []:
+        if name in rest:
+            record[name] = rest[name]
+        elif name in APP_STORAGE_ITEM_TABLES:
+            record[name] = [json.loads(text) for _, text in items.get(name, [])]
+        elif name == "settings":
+            record[name] = {key: json.loads(text) for key, text in settings.items()}
+    for name, value in rest.items():
+        record.setdefault(name, value)
+    return record
+
+def load_normalized_parts(settings, usernames, filter_by_name=True):
+    """{username: {"items", "settings"}} read from the normalized tables, values serialized."""
+    parts = {name: {"items": {}, "settings": {}} for name in usernames}
+    if not parts:
+        return parts, None
+    filters = [("username", "in", build_storage_in_filter(list(parts)))] if filter_by_name else None
+    for collection, table in APP_STORAGE_ITEM_TABLES.items():
+        rows, err = supabase_select_all(
+            settings, table, filters=filters, order="username.asc,position.asc,item_id.asc",
+            columns="username,item_id,position,data", use_service_key=True
+        )
+        if err:
+            return None, err
+        for row in rows:
+            part = parts.get(row.get("username"))
+            if part is not None:
+                part["items"].setdefault(collection, []).append((row.get("item_id"), json.dumps(row.get("data"), sort_keys=True)))
+    rows, err = supabase_select_all(
+        settings, APP_STORAGE_SETTINGS_TABLE, filters=filters, order="username.asc,name.asc",
+        columns="username,name,value", use_service_key=True
+    )
+    if err:
+        return None, err
+    for row in rows:
+        part = parts.get(row.get("username"))
+        if part is not None and row.get("name") is not None:
+            part["settings"][row["name"]] = json.dumps(row.get("value"), sort_keys=True)
+    return parts, None
+
+def fetch_storage_records(settings, usernames=None):
+    """{username: (record, updated_at, row form)}; the row form is None for blob rows.
+
+    The user rows are read before their parts: a writer bumps updated_at last, so a
+    read that overlaps a save is cached under the old version and re-read next time.
+    """
+    filters = [("username", "in", build_storage_in_filter(usernames))] if usernames is not None else None
+    rows, err = supabase_select_all(settings, APP_STORAGE_TABLE, filters=filters, order="username.asc", use_service_key=True)
+    if err:
+        return None, err
+    split_names = [row.get("username") for row in rows if row.get("username") and row.get("layout") is not None]
+    parts, err = load_normalized_parts(settings, split_names, filter_by_name=usernames is not None)
+    if err:
+        return None, err
+    records = {}
+    for row in rows:
+        username = row.get("username")
+        if not username:
+            continue
+        record = parse_storage_row(row)
+        form = None
+        if username in parts:
+            part = parts[username]
+            form = {
+                "layout": row["layout"],
+                "data": json.dumps(record, sort_keys=True),
+                "items": part["items"],
+                "settings": part["settings"]
+            }
+            record = join_normalized_record(row["layout"], record, part["items"], part["settings"])
+        records[username] = (record, row.get("updated_at"), form)
+    return records, None
+
+def write_normalized_record(settings, username, record, base=None, stats=None):
+    """Write one record in the normalized layout; returns (row form written, updated_at, err).
+
+    base is the row form last read or written; only rows that differ from it are sent.
+    Without one the user's rows are unknown, so every row is sent and the function
+    drops the user's other rows after writing them, in the same transaction.
+    """
+    if not isinstance(record, dict):
+        return None, None, "Only object records can be normalized."
+    ensure_record_item_ids(username, record)
+    rows = split_normalized_record(record)
+    full = base is None
+    base = base or {}
+    items, moved, removed_items = {}, {}, {}
+    for collection in APP_STORAGE_ITEM_TABLES:
+        old = {item_id: (position, text) for position, (item_id, text) in enumerate(base.get("items", {}).get(collection, []))}
+        new = rows["items"].get(collection, [])
+        for position, (item_id, text) in enumerate(new):
+            stored = old.get(item_id)
+            if full or stored is None or stored[1] != text:
+                items.setdefault(collection, []).append({"item_id": item_id, "position": position, "data": json.loads(text)})
+            elif stored[0] != position:
+                moved.setdefault(collection, []).append({"item_id": item_id, "position": position})
+        live_ids = {item_id for item_id, _ in new}
+        gone = [item_id for item_id in old if item_id not in live_ids]
+        if gone:
+            removed_items[collection] = gone
+    old_settings = base.get("settings") or {}
+    payload = {
+        "p_username": username,
+        "p_layout": rows["layout"],
+        "p_data": json.loads(rows["data"]) if full or base.get("data") != rows["data"] else None,
+        "p_items": items,
+        "p_moved": moved,
+        "p_removed_items": removed_items,
+        "p_settings": {
+            name: json.loads(text) for name, text in rows["settings"].items()
+            if full or old_settings.get(name) != text
+        },
+        "p_removed_settings": [name for name in old_settings if name not in rows["settings"]],
+        "p_full": full
+    }
+    if stats is not None:
+        stats["requests"] = int(stats.get("requests", 0)) + 1
+        stats["bytes"] = int(stats.get("bytes", 0)) + len(json.dumps(payload).encode("utf-8"))
+        stats["rows"] = int(stats.get("rows", 0)) + 1 + len(payload["p_settings"]) + len(payload["p_removed_settings"]) + sum(
+            len(group) for part in (items, moved, removed_items) for group in part.values()
+        )
+    version, err = supabase_request(settings, "POST", "rpc/wealthpulse_write_record", payload=payload, use_service_key=True)
+    if err:
+        return None, None, err
+    return rows, version if isinstance(version, str) else None, None
+
+def migrate_storage_to_normalized(settings):
+    """Split every record still stored as a JSONB blob into the normalized tables.
+
+    Returns ({"records", "requests", "bytes", "rows"}, err). Each record is rewritten
+    in full and its layout set last, so the migration can simply be run again.
+    """
+    if not supabase_enabled(settings):
+        return None, "Supabase is not configured."
+    rows, err = supabase_select_all(
+        settings, APP_STORAGE_TABLE, filters=[("layout", "is", "null")], order="username.asc",
+        columns="username,data", use_service_key=True
+    )
+    if err:
+        return None, err
+    stats = {"records": 0, "requests": 0, "bytes": 0, "rows": 0}
+    failures = []
+    for row in rows:
+        username = row.get("username")
+        if not username:
+            continue
+        record = parse_storage_row(row)
+        written, version, item_err = write_normalized_record(settings, username, record, stats=stats)
+        if item_err:
+            failures.append(f"{username}: {item_err}")
+            continue
+        remember_remote_record(settings, username, record, version, storage_record_hash(record), rows=written)
+        stats["records"] += 1
+    if failures:
+        more = f"; +{len(failures) - 3} more" if len(failures) > 3 else ""
+        return stats, f"{len(failures)} record(s) failed ({'; '.join(failures[:3])}{more})"
+    return stats, None
+
+# CLI entry point for splitting existing Supabase blobs into the normalized tables:
+#   python wealth_tracker.py --normalize-supabase   (then set APP_STORAGE_NORMALIZED = true)
+if "--normalize-supabase" in sys.argv:
+    cli_stats, cli_err = migrate_storage_to_normalized(get_storage_settings_from_secrets())
+    print(json.dumps({"stats": cli_stats, "error": cli_err}))
+    sys.exit(1 if cli_err else 0)
+
 def supabase_auth_required(settings):
     return secret_flag("SUPABASE_AUTH_REQUIRED", False) or bool(settings.get("supabase_auth_required", False))
 
@@ -4465,7 +6377,7 @@ def supabase_auth_sign_in(settings, email, password):
     headers = {"apikey": anon_key, "Content-Type": "application/json"}
     payload = {"email": email, "password": password}
     try:
-        response = requests.post(endpoint, headers=headers, json=payload, timeout=SUPABASE_TIMEOUT)
+        response = http_post(endpoint, provider="supabase_auth", headers=headers, json=payload)
         if not response.ok:
             return None, f"{response.status_code}: {response.text[:200]}"
         return response.json(), None
@@ -4480,7 +6392,7 @@ def supabase_auth_sign_up(settings, email, password):
     headers = {"apikey": anon_key, "Content-Type": "application/json"}
     payload = {"email": email, "password": password}
     try:
-        response = requests.post(endpoint, headers=headers, json=payload, timeout=SUPABASE_TIMEOUT)
+        response = http_post(endpoint, provider="supabase_auth", headers=headers, json=payload)
         if not response.ok:
             return None, f"{response.status_code}: {response.text[:200]}"
         return response.json(), None
@@ -4495,7 +6407,7 @@ def supabase_auth_refresh(settings, refresh_token):
     headers = {"apikey": anon_key, "Content-Type": "application/json"}
     payload = {"refresh_token": refresh_token}
     try:
-        response = requests.post(endpoint, headers=headers, json=payload, timeout=SUPABASE_TIMEOUT)
+        response = http_post(endpoint, provider="supabase_auth", headers=headers, json=payload)
         if not response.ok:
             return None, f"{response.status_code}: {response.text[:200]}"
         return response.json(), None
@@ -4638,82 +6550,760 @@ def load_community_schema_sql():
 def community_local_posts(db_obj):
     return get_forum_posts(db_obj)
 
-def community_get_posts(settings, db_obj, limit=200):
+def community_post_card_columns(column_support=None):
+    column_support = column_support or {}
+    columns = [col for col in COMMUNITY_POST_CARD_COLUMNS if column_support.get(col, True)]
+    if column_support.get("images", True):
+        columns.append("cover_image:images->0")
+    return ",".join(columns)
+
+def keyset_cursor(row):
+    # (created_at, id) of the last row of a page; created_at alone skips rows that share it.
+    if not row or not row.get("created_at"):
+        return None
+    return (str(row.get("created_at")), str(row.get("id") or ""))
+
+def keyset_before_filter(cursor):
+    """PostgREST filter for rows after cursor in created_at.desc,id.desc order."""
+    stamp, row_id = (json.dumps(value) for value in cursor)
+    return ("or", None, f"(created_at.lt.{stamp},and(created_at.eq.{stamp},id.lt.{row_id}))")
+
+def community_get_posts(settings, db_obj, limit=COMMUNITY_PAGE_SIZE, before=None, column_support=None):
+    """One page of listing cards, newest first. Pass keyset_cursor(last card) as before for the next page."""
     if supabase_enabled(settings):
         auth_err = community_require_auth(settings)
         if auth_err:
             return [], auth_err
+        filters = [keyset_before_filter(before)] if before else None
         return supabase_select(
             settings,
             "community_posts",
+            filters=filters,
             limit=limit,
-            order="created_at.desc",
-            auth_token=community_auth_token(settings)
+            order="created_at.desc,id.desc",
+            auth_token=community_auth_token(settings),
+            columns=community_post_card_columns(column_support)
         )
-    return community_local_posts(db_obj), None
+    sort_key = lambda post: (str(post.get("created_at") or ""), str(post.get("id") or ""))
+    posts = sorted(community_local_posts(db_obj), key=sort_key, reverse=True)
+    if before:
+        posts = [post for post in posts if sort_key(post) < tuple(before)]
+    return posts[:limit], None
+
+def community_get_feed(settings, db_obj, pages=1, page_size=COMMUNITY_PAGE_SIZE, column_support=None):
+    posts = []
+    before = None
+    for _ in range(max(1, pages)):
+        page, err = community_get_posts(settings, db_obj, limit=page_size, before=before, column_support=column_support)
+        if err:
+            return posts, err
+        page = page or []
+        posts.extend(page)
+        before = keyset_cursor(page[-1]) if page else None
+        if len(page) < page_size or not before:
+            break
+    return posts, None
 
-def community_get_comments(settings, db_obj, post_id):
-    if supabase_enabled(settings):
-        auth_err = community_require_auth(settings)
-        if auth_err:
-            return [], auth_err
-        return supabase_select(
+@st.cache_resource(show_spinner=False)
+def get_community_feed_store():
+    # Per-process listing cards, kept current with updated_at/deletion deltas.
+    return {"lock": threading.Lock(), "feeds": {}}
+
+def shift_timestamp(value, seconds):
+    try:
+        return (datetime.fromisoformat(str(value).replace("Z", "+00:00")) + timedelta(seconds=seconds)).isoformat()
+    except Exception:
+        return value
+
+def community_feed_key(settings, column_support):
+    url, _, _ = get_supabase_config(settings)
+    return f"{url}|{community_post_card_columns(column_support)}|{bool(community_auth_token(settings))}"
+
+def community_feed_merge(feed, rows):
+    for row in rows or []:
+        post_id = row.get("id")
+        if not post_id:
+            continue
+        feed["posts"][post_id] = row
+        stamp = row.get("updated_at") or row.get("created_at")
+        if stamp and (not feed["watermark"] or stamp > feed["watermark"]):
+            feed["watermark"] = stamp
+
+def community_feed_load_older(settings, db_obj, feed, column_support, min_posts):
+    while not feed["exhausted"] and len(feed["posts"]) < min_posts:
+        page, err = community_get_posts(settings, db_obj, before=feed["oldest"], column_support=column_support)
+        if err:
+            return err
+        page = page or []
+        community_feed_merge(feed, page)
+        if page:
+            feed["oldest"] = keyset_cursor(page[-1])
+        if len(page) < COMMUNITY_PAGE_SIZE or not feed["oldest"]:
+            feed["exhausted"] = True
+    return None
+
+def community_feed_pull_changes(settings, feed, column_support):
+    auth_token = community_auth_token(settings)
+    since = shift_timestamp(feed["watermark"] or feed["synced_from"], -COMMUNITY_FEED_OVERLAP_SECONDS)
+    filters = [("updated_at", "gte", since)]
+    cursor = None
+    while True:
+        rows, err = supabase_select(
             settings,
-            "community_comments",
-            filters=[("post_id", "eq", post_id)],
-            order="created_at.asc",
-            auth_token=community_auth_token(settings)
+            "community_posts",
+            filters=filters,
+            limit=COMMUNITY_FEED_DELTA_LIMIT,
+            order="updated_at.asc,id.asc",
+            auth_token=auth_token,
+            columns=community_post_card_columns(column_support)
         )
-    posts = community_local_posts(db_obj)
-    for post in posts:
-        if post.get("id") == post_id:
-            return post.get("comments", []), None
-    return [], None
+        if err:
+            return err
+        rows = rows or []
+        # Only keep new rows inside the loaded window; older pages pick them up when loaded.
+        community_feed_merge(feed, [
+            row for row in rows
+            if row.get("id") in feed["posts"] or feed["exhausted"] or str(row.get("created_at") or "") >= (feed["oldest"] or ("",))[0]
+        ])
+        if len(rows) < COMMUNITY_FEED_DELTA_LIMIT:
+            break
+        # Continue after the last (updated_at, id): a bulk update can stamp more rows
+        # than one page with the same updated_at. Stop if the cursor cannot advance.
+        next_cursor = (str(rows[-1].get("updated_at") or ""), str(rows[-1].get("id") or ""))
+        if not next_cursor[0] or not next_cursor[1] or next_cursor == cursor:
+            break
+        cursor = next_cursor
+        stamp, row_id = (json.dumps(value) for value in cursor)
+        filters = [("or", None, f"(updated_at.gt.{stamp},and(updated_at.eq.{stamp},id.gt.{row_id}))")]
+    return community_feed_pull_deletions(settings, feed)
+
+def community_feed_pull_deletions(settings, feed):
+    auth_token = community_auth_token(settings)
+    if feed["tombstones"]:
+        since = shift_timestamp(feed["deleted_watermark"] or feed["synced_from"], -COMMUNITY_FEED_OVERLAP_SECONDS)
+        rows, err = supabase_select(
+            settings,
+            "community_post_deletions",
+            filters=[("deleted_at", "gte", since)],
+            order="deleted_at.asc",
+            auth_token=auth_token,
+            columns="post_id,deleted_at"
+        )
+        if not err:
+            community_search_index_forget([row.get("post_id") for row in rows or [] if row.get("post_id")])
+            for row in rows or []:
+                feed["posts"].pop(row.get("post_id"), None)
+                stamp = row.get("deleted_at")
+                if stamp and (not feed["deleted_watermark"] or stamp > feed["deleted_watermark"]):
+                    feed["deleted_watermark"] = stamp
+            return None
+        if not is_supabase_missing_table_error(err):
+            return err
+        # Schema without the deletion log: reconcile ids periodically instead.
+        feed["tombstones"] = False
+    if time.time() - feed["reconciled_at"] < COMMUNITY_FEED_RECONCILE_SECONDS:
+        return None
+    filters = [("created_at", "gte", feed["oldest"][0])] if feed["oldest"] and not feed["exhausted"] else None
+    rows, err = supabase_select(settings, "community_posts", filters=filters, auth_token=auth_token, columns="id")
+    if err:
+        return err
+    live_ids = {row.get("id") for row in rows or []}
+    gone = [post_id for post_id in feed["posts"] if post_id not in live_ids]
+    community_search_index_forget(gone)
+    for post_id in gone:
+        feed["posts"].pop(post_id, None)
+    feed["reconciled_at"] = time.time()
+    return None
+
+def community_feed_mark_stale():
+    # Local writes should show up on the next rerun instead of after the sync interval.
+    store = get_community_feed_store()
+    with store["lock"]:
+        for feed in store["feeds"].values():
+            feed["synced_at"] = 0.0
+
+def community_sync_feed(settings, db_obj, pages=1, column_support=None):
+    """Listing cards for the first pages, synced incrementally after the first load."""
+    column_support = column_support or {}
+    if not supabase_enabled(settings) or not column_support.get("updated_at", True):
+        return community_get_feed(settings, db_obj, pages=pages, column_support=column_support)
+    auth_err = community_require_auth(settings)
+    if auth_err:
+        return [], auth_err
+    key = community_feed_key(settings, column_support)
+    store = get_community_feed_store()
+    min_posts = max(1, pages) * COMMUNITY_PAGE_SIZE
+
+    def is_fresh(feed):
+        return (
+            feed is not None
+            and time.time() - feed["synced_at"] < COMMUNITY_FEED_SYNC_SECONDS
+            and (feed["exhausted"] or len(feed["posts"]) >= min_posts)
+        )
+
+    def sync():
+        with store["lock"]:
+            feed = store["feeds"].get(key)
+        if is_fresh(feed):
+            return feed, None
+        if feed is None:
+            feed = {
+                "posts": {},
+                "watermark": None,
+                "deleted_watermark": None,
+                "oldest": None,
+                "exhausted": False,
+                "tombstones": True,
+                "synced_at": 0.0,
+                "synced_from": datetime.now(timezone.utc).isoformat(),
+                "reconciled_at": time.time()
+            }
+            err = community_feed_load_older(settings, db_obj, feed, column_support, min_posts)
+            if err:
+                return None, err
+            feed["synced_at"] = time.time()
+        else:
+            feed = copy.deepcopy(feed)
+            if time.time() - feed["synced_at"] >= COMMUNITY_FEED_SYNC_SECONDS:
+                err = community_feed_pull_changes(settings, feed, column_support)
+                if err:
+                    return None, err
+                feed["synced_at"] = time.time()
+            err = community_feed_load_older(settings, db_obj, feed, column_support, min_posts)
+            if err:
+                return None, err
+        with store["lock"]:
+            store["feeds"][key] = feed
+        return feed, None
+
+    with store["lock"]:
+        feed = store["feeds"].get(key)
+    if is_fresh(feed):
+        err = None
+    else:
+        feed, err = single_flight(f"community_feed|{key}", sync)
+    if err:
+        return [], err
+    posts = sorted(feed["posts"].values(), key=lambda post: str(post.get("created_at") or ""), reverse=True)
+    return copy.deepcopy(posts), None
 
-def community_get_bids(settings, db_obj, post_id):
+def community_get_post(settings, db_obj, post_id):
     if supabase_enabled(settings):
         auth_err = community_require_auth(settings)
         if auth_err:
-            return [], auth_err
-        return supabase_select(
+            return None, auth_err
+        rows, err = supabase_select(
             settings,
-            "community_bids",
-            filters=[("post_id", "eq", post_id)],
-            order="created_at.asc",
+            "community_posts",
+            filters=[("id", "eq", post_id)],
+            limit=1,
             auth_token=community_auth_token(settings)
         )
-    posts = community_local_posts(db_obj)
-    for post in posts:
+        if err:
+            return None, err
+        return (rows[0] if rows else None), None
+    for post in community_local_posts(db_obj):
         if post.get("id") == post_id:
-            return post.get("bids", []), None
-    return [], None
+            return post, None
+    return None, None
+
+def search_tokens(text):
+    return re.findall(r"[0-9a-z]+", str(text or "").lower())
 
-def community_get_offers(settings, db_obj, post_id):
+def create_search_index():
+    # Inverted index over listing text: token -> {post_id: weight}.
+    # bodies caches {post_id: (updated_at, body)} for Supabase cards, which carry no body.
+    return {"lock": threading.Lock(), "docs": {}, "postings": {}, "vocabulary": [], "vocabulary_dirty": False, "bodies": {}}
+
+@st.cache_resource(show_spinner=False)
+def get_community_search_index():
+    return create_search_index()
+
+def community_search_index_remove(index, post_id):
+    doc = index["docs"].pop(post_id, None)
+    if not doc:
+        return
+    for token in doc["weights"]:
+        postings = index["postings"].get(token)
+        if postings is None:
+            continue
+        postings.pop(post_id, None)
+        if not postings:
+            index["postings"].pop(token, None)
+            index["vocabulary_dirty"] = True
+
+def community_search_index_sync(index, posts):
+    """Add posts and re-tokenize only those whose searchable fields changed.
+
+    Add-only: the shared index serves sessions with different pages loaded, so a
+    post missing from one session's list is not gone. Deletions come through
+    community_search_index_forget.
+    """
+    for post in posts:
+        post_id = post.get("id")
+        if not post_id:
+            continue
+        signature = tuple(str(post.get(field) or "") for field in COMMUNITY_SEARCH_FIELDS)
+        doc = index["docs"].get(post_id)
+        if doc and doc["signature"] == signature:
+            continue
+        community_search_index_remove(index, post_id)
+        weights = {}
+        for (field, field_weight), text in zip(COMMUNITY_SEARCH_FIELDS.items(), signature):
+            for token in search_tokens(text):
+                weights[token] = weights.get(token, 0.0) + field_weight
+        for token, weight in weights.items():
+            postings = index["postings"].setdefault(token, {})
+            if not postings:
+                index["vocabulary_dirty"] = True
+            postings[post_id] = weight
+        index["docs"][post_id] = {"signature": signature, "weights": weights}
+    if index["vocabulary_dirty"]:
+        index["vocabulary"] = sorted(index["postings"])
+        index["vocabulary_dirty"] = False
+
+def community_search_index_query(index, query):
+    """Ranked {post_id: score}; every query token must prefix-match a token of the post."""
+    tokens = list(dict.fromkeys(search_tokens(query)))
+    if not tokens or not index["docs"]:
+        return {}
+    doc_count = len(index["docs"])
+    scores = None
+    for token in tokens:
+        token_scores = {}
+        vocabulary = index["vocabulary"]
+        pos = bisect.bisect_left(vocabulary, token)
+        while pos < len(vocabulary) and vocabulary[pos].startswith(token):
+            postings = index["postings"][vocabulary[pos]]
+            idf = math.log(1.0 + doc_count / len(postings))
+            for post_id, weight in postings.items():
+                token_scores[post_id] = token_scores.get(post_id, 0.0) + weight * idf
+            pos += 1
+        if scores is None:
+            scores = token_scores
+        else:
+            scores = {post_id: score + token_scores[post_id] for post_id, score in scores.items() if post_id in token_scores}
+        if not scores:
+            return {}
+    return scores
+
+def community_search_index_forget(post_ids):
+    index = get_community_search_index()
+    with index["lock"]:
+        for post_id in post_ids:
+            community_search_index_remove(index, post_id)
+            index["bodies"].pop(post_id, None)
+        if index["vocabulary_dirty"]:
+            index["vocabulary"] = sorted(index["postings"])
+            index["vocabulary_dirty"] = False
+
+def community_search_with_bodies(settings, index, posts):
+    """Cards with their body filled in; bodies are fetched once per post version, in chunks."""
+    with index["lock"]:
+        missing = [
+            post.get("id") for post in posts
+            if post.get("id") and "body" not in post
+            and (index["bodies"].get(post.get("id")) or (None,))[0] != post.get("updated_at")
+        ]
+    auth_token = community_auth_token(settings)
+    for start in range(0, len(missing), COMMUNITY_IN_FILTER_CHUNK):
+        chunk = missing[start:start + COMMUNITY_IN_FILTER_CHUNK]
+        rows, err = supabase_select(
+            settings,
+            "community_posts",
+            filters=[("id", "in", f"({','.join(str(post_id) for post_id in chunk)})")],
+            auth_token=auth_token,
+            columns="id,body,updated_at"
+        )
+        if err:
+            break
+        with index["lock"]:
+            for row in rows or []:
+                index["bodies"][row.get("id")] = (row.get("updated_at"), row.get("body") or "")
+    with index["lock"]:
+        bodies = {post_id: body for post_id, (_, body) in index["bodies"].items()}
+    return [post if "body" in post or post.get("id") not in bodies else dict(post, body=bodies[post["id"]]) for post in posts]
+
+def community_search_local(settings, posts, query):
+    index = get_community_search_index()
     if supabase_enabled(settings):
-        auth_err = community_require_auth(settings)
-        if auth_err:
-            return [], auth_err
-        return supabase_select(
+        posts = community_search_with_bodies(settings, index, posts)
+    with index["lock"]:
+        community_search_index_sync(index, posts)
+        return community_search_index_query(index, query)
+
+def community_search_remote(settings, query):
+    """Ranked post ids from the search_vector GIN index (community_search_posts RPC)."""
+    rows, err = supabase_request(
+        settings,
+        "POST",
+        "rpc/community_search_posts",
+        payload={"query": str(query or ""), "max_results": COMMUNITY_SEARCH_REMOTE_LIMIT},
+        auth_token=community_auth_token(settings)
+    )
+    if err:
+        return None, err
+    return {row.get("id"): float(row.get("rank") or 0.0) for row in rows or [] if row.get("id")}, None
+
+def community_search_scores(settings, posts, query):
+    """{post_id: score} for query, ranked on the server in Supabase mode.
+
+    Without the community_search_posts RPC this falls back to the local index over posts.
+    """
+    if not search_tokens(query):
+        return {}, None
+    if supabase_enabled(settings):
+        scores, err = community_search_remote(settings, query)
+        if scores is not None:
+            return scores, None
+        return community_search_local(settings, posts, query), err
+    return community_search_local(settings, posts, query), None
+
+COMMUNITY_BROWSE_ORDER = {
+    "Newest": "created_at.desc",
+    "Ending Soon": "auction_end_date.asc.nullslast,created_at.desc",
+    "Price (Low to High)": "list_price.asc.nullslast,created_at.desc",
+    "Price (High to Low)": "list_price.desc.nullslast,created_at.desc"
+}
+
+def community_browse_filters(criteria):
+    """PostgREST filters for Browse criteria, or None when nothing can match.
+
+    Mirrors the Python filters of the local backend: "Ended" is an Active auction past its
+    end date, and price is the list_price column (price, or the starting bid for auctions).
+    A null status reads as Active, as in get_post_status.
+    """
+    filters = []
+    if criteria.get("listing_type"):
+        filters.append(("listing_type", "eq", criteria["listing_type"]))
+    if criteria.get("category"):
+        filters.append(("category", "eq", criteria["category"]))
+    status = criteria.get("status")
+    today = criteria.get("today") or datetime.now().date().isoformat()
+    if status == "Active":
+        filters.append(("and", None, f"(or(status.eq.Active,status.is.null),or(listing_type.neq.Auction,listing_type.is.null,auction_end_date.is.null,auction_end_date.gte.{today}))"))
+    elif status == "Ended":
+        filters.append(("or", None, f"(status.eq.Ended,and(or(status.eq.Active,status.is.null),listing_type.eq.Auction,auction_end_date.lt.{today}))"))
+    elif status:
+        filters.append(("status", "eq", status))
+    if criteria.get("priced"):
+        filters.append(("list_price", "not.is", "null"))
+    if criteria.get("price_min") is not None:
+        filters.append(("list_price", "gte", criteria["price_min"]))
+    if criteria.get("price_max") is not None:
+        filters.append(("list_price", "lte", criteria["price_max"]))
+    if criteria.get("ids") is not None:
+        ids = [str(post_id) for post_id in criteria["ids"] if post_id]
+        if not ids:
+            return None
+        filters.append(("id", "in", f"({','.join(ids)})"))
+    if criteria.get("photos"):
+        filters.append(("images->0", "not.is", "null"))
+    if criteria.get("buy_now"):
+        filters.append(("buy_now_price", "gt", 0))
+    if criteria.get("created_after"):
+        filters.append(("created_at", "gt", criteria["created_after"]))
+    if criteria.get("ending_by"):
+        filters.append(("auction_end_date", "not.is", "null"))
+        filters.append(("auction_end_date", "lte", criteria["ending_by"]))
+    if criteria.get("location"):
+        filters.append(("location", "ilike", f"*{criteria['location']}*"))
+    return filters
+
+def community_query_posts(settings, criteria, sort="Newest", limit=COMMUNITY_PAGE_SIZE, column_support=None):
+    """Listing cards matching criteria, filtered and ordered by PostgREST."""
+    auth_err = community_require_auth(settings)
+    if auth_err:
+        return [], auth_err
+    filters = community_browse_filters(criteria)
+    if filters is None:
+        return [], None
+    return supabase_select(
+        settings,
+        "community_posts",
+        filters=filters,
+        limit=limit,
+        order=COMMUNITY_BROWSE_ORDER.get(sort, COMMUNITY_BROWSE_ORDER["Newest"]),
+        auth_token=community_auth_token(settings),
+        columns=community_post_card_columns(column_support)
+    )
+
+COMMUNITY_CHILD_TABLES = {
+    "comments": "community_comments",
+    "bids": "community_bids",
+    "offers": "community_offers"
+}
+
+def community_select_by_posts(settings, table, post_ids, auth_token=None, columns="*", order="created_at.asc"):
+    rows = []
+    for start in range(0, len(post_ids), COMMUNITY_IN_FILTER_CHUNK):
+        chunk = post_ids[start:start + COMMUNITY_IN_FILTER_CHUNK]
+        data, err = supabase_select(
             settings,
-            "community_offers",
-            filters=[("post_id", "eq", post_id)],
-            order="created_at.asc",
-            auth_token=community_auth_token(settings)
+            table,
+            filters=[("post_id", "in", f"({','.join(str(post_id) for post_id in chunk)})")],
+            order=order,
+            auth_token=auth_token,
+            columns=columns
         )
-    posts = community_local_posts(db_obj)
-    for post in posts:
-        if post.get("id") == post_id:
-            return post.get("offers", []), None
-    return [], None
+        if err:
+            return None, err
+        rows.extend(data or [])
+    return rows, None
 
-def community_create_post(settings, db_obj, post):
+def community_group_by_post(rows, post_ids):
+    grouped = {post_id: [] for post_id in post_ids}
+    for row in rows or []:
+        grouped.setdefault(row.get("post_id"), []).append(row)
+    return grouped
+
+def community_get_post_activity(settings, db_obj, post_ids, kinds=("comments", "bids", "offers")):
+    """Comments/bids/offers for many posts: one post_id=in.(...) query per table, grouped by post."""
+    post_ids = [post_id for post_id in dict.fromkeys(post_ids) if post_id]
+    activity = {kind: {post_id: [] for post_id in post_ids} for kind in kinds}
+    if not post_ids:
+        return activity, None
     if supabase_enabled(settings):
         auth_err = community_require_auth(settings)
         if auth_err:
-            return None, auth_err
-        return supabase_insert(settings, "community_posts", post, auth_token=community_auth_token(settings))
+            return activity, auth_err
+        auth_token = community_auth_token(settings)
+        with ThreadPoolExecutor(max_workers=len(kinds)) as executor:
+            futures = {
+                kind: executor.submit(community_select_by_posts, settings, COMMUNITY_CHILD_TABLES[kind], post_ids, auth_token)
+                for kind in kinds
+            }
+            errors = []
+            for kind, future in futures.items():
+                rows, err = future.result()
+                if err:
+                    errors.append(f"{kind}: {err}")
+                    continue
+                activity[kind] = community_group_by_post(rows, post_ids)
+        return activity, "; ".join(errors) or None
+    wanted = set(post_ids)
+    for post in community_local_posts(db_obj):
+        if post.get("id") in wanted:
+            for kind in kinds:
+                activity[kind][post["id"]] = post.get(kind, [])
+    return activity, None
+
+def community_get_bids_batch(settings, db_obj, post_ids):
+    activity, err = community_get_post_activity(settings, db_obj, post_ids, ("bids",))
+    return activity["bids"], err
+
+def community_bid_stats_from_rows(bids_by_post):
+    return {
+        post_id: {
+            "bid_count": len(bids),
+            "max_bid": max((float(bid.get("amount") or 0.0) for bid in bids), default=None)
+        }
+        for post_id, bids in bids_by_post.items()
+    }
+
+def community_get_bid_stats(settings, db_obj, post_ids):
+    """Bid count and max bid per post from the community_post_bid_stats view (client-side if the view is missing)."""
+    post_ids = [post_id for post_id in dict.fromkeys(post_ids) if post_id]
+    if not post_ids:
+        return {}, None
+    if supabase_enabled(settings):
+        auth_err = community_require_auth(settings)
+        if auth_err:
+            return {}, auth_err
+        rows, err = community_select_by_posts(
+            settings,
+            "community_post_bid_stats",
+            post_ids,
+            auth_token=community_auth_token(settings),
+            columns="post_id,bid_count,max_bid",
+            order=None
+        )
+        if not err:
+            stats = {post_id: {"bid_count": 0, "max_bid": None} for post_id in post_ids}
+            for row in rows or []:
+                stats[row.get("post_id")] = {
+                    "bid_count": int(row.get("bid_count") or 0),
+                    "max_bid": float(row["max_bid"]) if row.get("max_bid") is not None else None
+                }
+            return stats, None
+        if not is_supabase_missing_table_error(err):
+            return {}, err
+    bids_by_post, err = community_get_bids_batch(settings, db_obj, post_ids)
+    return community_bid_stats_from_rows(bids_by_post), err
+
+def community_get_recent_bids(settings, db_obj, post_id, limit=5):
+    """The newest limit bids on one post, without reading the rest."""
+    if supabase_enabled(settings):
+        auth_err = community_require_auth(settings)
+        if auth_err:
+            return [], auth_err
+        rows, err = supabase_select(
+            settings,
+            "community_bids",
+            filters=[("post_id", "eq", post_id)],
+            limit=limit,
+            order="created_at.desc",
+            auth_token=community_auth_token(settings)
+        )
+        return rows or [], err
+    for post in community_local_posts(db_obj):
+        if post.get("id") == post_id:
+            bids = sorted(post.get("bids") or [], key=lambda b: parse_forum_date(b.get("created_at", "")), reverse=True)
+            return bids[:limit], None
+    return [], None
+
+@st.cache_resource(show_spinner=False)
+def get_community_change_store():
+    # Per-process version counters by topic ("posts", "post:<id>", "messages:<user>"),
+    # bumped by the realtime subscriber or, for the local backend, by the write itself.
+    return {"lock": threading.Lock(), "versions": {}, "subscribers": {}}
+
+def community_change_topics(table, record):
+    record = record or {}
+    if table == "community_posts":
+        topics = ["posts", f"post:{record.get('id')}"]
+    elif table == "community_bids":
+        topics = [f"post:{record.get('post_id')}"]
+    elif table == "community_messages":
+        topics = [f"messages:{record.get('recipient')}", f"messages:{record.get('sender')}"]
+    else:
+        topics = []
+    return [topic for topic in topics if not topic.endswith(":None")]
+
+def publish_community_change(table, record):
+    """Record a change to table; sessions watching an affected topic rerun on their next check."""
+    store = get_community_change_store()
+    with store["lock"]:
+        for topic in community_change_topics(table, record):
+            store["versions"][topic] = store["versions"].get(topic, 0) + 1
+    if table == "community_posts":
+        community_feed_mark_stale()
+
+def get_community_versions(topics):
+    store = get_community_change_store()
+    with store["lock"]:
+        return {topic: store["versions"].get(topic, 0) for topic in topics}
+
+def community_realtime_endpoint(settings):
+    url, anon_key, service_key = get_supabase_config(settings)
+    # Server-side subscriber: the service key sees every row; anon only what RLS allows.
+    api_key = service_key or anon_key
+    if not url or not api_key:
+        return None, None
+    ws_url = "wss://" + url.split("://", 1)[1] if url.startswith("https://") else "ws://" + url.split("://", 1)[-1]
+    return f"{ws_url}/realtime/v1/websocket?apikey={api_key}&vsn=1.0.0", api_key
+
+def ensure_community_realtime(settings):
+    """Start the change-feed subscriber for this Supabase project once per process; returns its status."""
+    if not REALTIME_AVAILABLE or not secret_flag("COMMUNITY_REALTIME_ENABLED", True):
+        return None
+    endpoint, api_key = community_realtime_endpoint(settings)
+    if not endpoint:
+        return None
+    url, _, _ = get_supabase_config(settings)
+    store = get_community_change_store()
+    with store["lock"]:
+        subscriber = store["subscribers"].get(url)
+        if subscriber is None:
+            subscriber = {"url": url, "connected": False, "events": 0, "last_event": None, "last_error": None}
+            store["subscribers"][url] = subscriber
+            thread = threading.Thread(
+                target=run_community_realtime,
+                args=(subscriber, endpoint, api_key),
+                name="community-realtime",
+                daemon=True
+            )
+            thread.start()
+        return dict(subscriber)
+
+def run_community_realtime(subscriber, endpoint, api_key):
+    store = get_community_change_store()
+    backoff = 1.0
+    while True:
+        try:
+            ws = websocket.create_connection(endpoint, timeout=5)
+            try:
+                ws.send(json.dumps({
+                    "topic": "realtime:community",
+                    "event": "phx_join",
+                    "ref": "1",
+                    "payload": {
+                        "config": {
+                            "postgres_changes": [
+                                {"event": "*", "schema": "public", "table": table}
+                                for table in COMMUNITY_REALTIME_TABLES
+                            ]
+                        },
+                        "access_token": api_key
+                    }
+                }))
+                ref = 1
+                last_beat = time.time()
+                while True:
+                    if time.time() - last_beat >= COMMUNITY_REALTIME_HEARTBEAT_SECONDS:
+                        ref += 1
+                        ws.send(json.dumps({"topic": "phoenix", "event": "heartbeat", "payload": {}, "ref": str(ref)}))
+                        last_beat = time.time()
+                    try:
+                        raw = ws.recv()
+                    except websocket.WebSocketTimeoutException:
+                        continue
+                    if not raw:
+                        raise ConnectionError("Realtime connection closed.")
+                    message = json.loads(raw)
+                    event = message.get("event")
+                    payload = message.get("payload") or {}
+                    if event == "phx_reply" and message.get("topic") == "realtime:community":
+                        if payload.get("status") != "ok":
+                            raise ConnectionError(f"Realtime join failed: {payload.get('response')}")
+                        with store["lock"]:
+                            subscriber["connected"] = True
+                            subscriber["last_error"] = None
+                        backoff = 1.0
+                    elif event == "postgres_changes":
+                        data = payload.get("data") or {}
+                        publish_community_change(data.get("table"), data.get("record") or data.get("old_record"))
+                        with store["lock"]:
+                            subscriber["events"] += 1
+                            subscriber["last_event"] = time.time()
+                    elif event in ("phx_error", "phx_close"):
+                        raise ConnectionError(f"Realtime channel {event}.")
+            finally:
+                ws.close()
+        except Exception as exc:
+            with store["lock"]:
+                subscriber["connected"] = False
+                subscriber["last_error"] = str(exc)
+        time.sleep(backoff + random.uniform(0, backoff))
+        backoff = min(60.0, backoff * 2)
+
+def get_community_realtime_status():
+    store = get_community_change_store()
+    with store["lock"]:
+        return [dict(subscriber) for subscriber in store["subscribers"].values()]
+
+def watch_community_changes(topics):
+    """Rerun the app once any of topics changes; checks the in-process store without rerunning the script."""
+    baseline = get_community_versions(topics)
+
+    @st.fragment(run_every=COMMUNITY_REALTIME_CHECK_SECONDS)
+    def community_change_watcher():
+        if get_community_versions(topics) != baseline:
+            st.rerun(scope="app")
+
+    community_change_watcher()
+
+def community_create_post(settings, db_obj, post):
+    if supabase_enabled(settings):
+        auth_err = community_require_auth(settings)
+        if auth_err:
+            return None, auth_err
+        result = supabase_insert(settings, "community_posts", post, auth_token=community_auth_token(settings))
+        community_feed_mark_stale()
+        return result
     posts = community_local_posts(db_obj)
     posts.append(post)
+    publish_community_change("community_posts", post)
     return [post], None
 
 def community_update_post(settings, db_obj, post_id, payload):
@@ -4721,11 +7311,14 @@ def community_update_post(settings, db_obj, post_id, payload):
         auth_err = community_require_auth(settings)
         if auth_err:
             return None, auth_err
-        return supabase_update(settings, "community_posts", [("id", "eq", post_id)], payload, auth_token=community_auth_token(settings))
+        result = supabase_update(settings, "community_posts", [("id", "eq", post_id)], payload, auth_token=community_auth_token(settings))
+        community_feed_mark_stale()
+        return result
     posts = community_local_posts(db_obj)
     for post in posts:
         if post.get("id") == post_id:
             post.update(payload)
+            publish_community_change("community_posts", post)
             return [post], None
     return None, "Post not found."
 
@@ -4734,11 +7327,17 @@ def community_delete_post(settings, db_obj, post_id):
         auth_err = community_require_auth(settings)
         if auth_err:
             return None, auth_err
-        return supabase_delete(settings, "community_posts", [("id", "eq", post_id)], auth_token=community_auth_token(settings))
+        result = supabase_delete(settings, "community_posts", [("id", "eq", post_id)], auth_token=community_auth_token(settings))
+        community_feed_mark_stale()
+        if not result[1]:
+            community_search_index_forget([post_id])
+        return result
     posts = community_local_posts(db_obj)
     for post in list(posts):
         if post.get("id") == post_id:
             posts.remove(post)
+            community_search_index_forget([post_id])
+            publish_community_change("community_posts", post)
             return [], None
     return None, "Post not found."
 
@@ -4765,6 +7364,7 @@ def community_add_bid(settings, db_obj, bid):
     for post in posts:
         if post.get("id") == bid.get("post_id"):
             post.setdefault("bids", []).append(bid)
+            publish_community_change("community_bids", bid)
             return [bid], None
     return None, "Post not found."
 
@@ -4781,22 +7381,68 @@ def community_add_offer(settings, db_obj, offer):
             return [offer], None
     return None, "Post not found."
 
-def community_get_messages(settings, db_obj, username, box="inbox"):
+@st.cache_resource(show_spinner=False)
+def get_local_message_index():
+    # Positions of each user's messages in _meta["messages"] (append-only, so oldest first),
+    # extended incrementally as messages are appended.
+    return {"lock": threading.Lock(), "count": 0, "tail_id": None, "boxes": {"inbox": {}, "sent": {}}}
+
+def local_message_positions(messages, username, box):
+    index = get_local_message_index()
+    with index["lock"]:
+        count = index["count"]
+        if count > len(messages) or (count and messages[count - 1].get("id") != index["tail_id"]):
+            # The list was rewritten elsewhere (e.g. reloaded from another copy); rebuild.
+            count = 0
+            index["boxes"] = {"inbox": {}, "sent": {}}
+        for pos in range(count, len(messages)):
+            message = messages[pos]
+            index["boxes"]["inbox"].setdefault(message.get("recipient"), []).append(pos)
+            index["boxes"]["sent"].setdefault(message.get("sender"), []).append(pos)
+        index["count"] = len(messages)
+        index["tail_id"] = messages[-1].get("id") if messages else None
+        return list(index["boxes"][box].get(username, []))
+
+def community_message_filters(settings, username, box):
+    auth_id = get_supabase_auth_user_id(settings)
+    if supabase_auth_required(settings) and auth_id:
+        return [("recipient_id", "eq", auth_id)] if box == "inbox" else [("sender_id", "eq", auth_id)]
+    return [("recipient", "eq", username)] if box == "inbox" else [("sender", "eq", username)]
+
+def community_get_messages(settings, db_obj, username, box="inbox", limit=COMMUNITY_MESSAGES_PAGE_SIZE, before=None):
+    """One page of a user's inbox or sent box, newest first. Pass keyset_cursor(last message) as before for the next page."""
     if supabase_enabled(settings):
         auth_err = community_require_auth(settings)
         if auth_err:
             return [], auth_err
-        auth_id = get_supabase_auth_user_id(settings)
-        if supabase_auth_required(settings) and auth_id:
-            filters = [("recipient_id", "eq", auth_id)] if box == "inbox" else [("sender_id", "eq", auth_id)]
-        else:
-            filters = [("recipient", "eq", username)] if box == "inbox" else [("sender", "eq", username)]
-        return supabase_select(settings, "community_messages", filters=filters, order="created_at.desc", auth_token=community_auth_token(settings))
-    meta = get_meta(db_obj)
-    messages = meta.get("messages", [])
-    if box == "inbox":
-        return [m for m in messages if m.get("recipient") == username], None
-    return [m for m in messages if m.get("sender") == username], None
+        filters = community_message_filters(settings, username, box)
+        if before:
+            filters.append(keyset_before_filter(before))
+        return supabase_select(settings, "community_messages", filters=filters, limit=limit, order="created_at.desc,id.desc", auth_token=community_auth_token(settings))
+    messages = get_meta(db_obj).setdefault("messages", [])
+    positions = local_message_positions(messages, username, box)
+    if before:
+        stamp, message_id = before
+        cut = bisect.bisect_left(positions, stamp, key=lambda pos: str(messages[pos].get("created_at") or ""))
+        # Messages sharing the cursor's timestamp stay in append order; cut at the cursor message itself.
+        while cut < len(positions) and str(messages[positions[cut]].get("created_at") or "") == stamp:
+            if str(messages[positions[cut]].get("id") or "") == message_id:
+                break
+            cut += 1
+        positions = positions[:cut]
+    if limit:
+        positions = positions[-limit:]
+    return [messages[pos] for pos in reversed(positions)], None
+
+def community_count_unread(settings, db_obj, username):
+    if supabase_enabled(settings):
+        auth_err = community_require_auth(settings)
+        if auth_err:
+            return 0, auth_err
+        filters = community_message_filters(settings, username, "inbox") + [("read_at", "is", "null")]
+        return supabase_count(settings, "community_messages", filters=filters, auth_token=community_auth_token(settings))
+    messages = get_meta(db_obj).setdefault("messages", [])
+    return sum(1 for pos in local_message_positions(messages, username, "inbox") if not messages[pos].get("read_at")), None
 
 def community_send_message(settings, db_obj, message):
     if supabase_enabled(settings):
@@ -4808,26 +7454,33 @@ def community_send_message(settings, db_obj, message):
     if not message.get("id"):
         message["id"] = secrets.token_hex(6)
     meta.setdefault("messages", []).append(message)
+    publish_community_change("community_messages", message)
     return [message], None
 
-def community_mark_message_read(settings, db_obj, message_id):
+def community_mark_messages_read(settings, db_obj, username, message_ids=None):
+    """Mark the given inbox messages (all unread ones when message_ids is None) read in one PATCH."""
+    read_at = datetime.now().isoformat()
     if supabase_enabled(settings):
         auth_err = community_require_auth(settings)
         if auth_err:
             return None, auth_err
-        return supabase_update(
-            settings,
-            "community_messages",
-            [("id", "eq", message_id)],
-            {"read_at": datetime.now().isoformat()},
-            auth_token=community_auth_token(settings)
-        )
-    meta = get_meta(db_obj)
-    for msg in meta.get("messages", []):
-        if msg.get("id") == message_id:
-            msg["read_at"] = datetime.now().isoformat()
-            return [msg], None
-    return None, "Message not found."
+        filters = community_message_filters(settings, username, "inbox") + [("read_at", "is", "null")]
+        if message_ids is not None:
+            if not message_ids:
+                return [], None
+            filters.append(("id", "in", f"({','.join(str(message_id) for message_id in message_ids)})"))
+        return supabase_update(settings, "community_messages", filters, {"read_at": read_at}, auth_token=community_auth_token(settings))
+    messages = get_meta(db_obj).setdefault("messages", [])
+    wanted = None if message_ids is None else set(message_ids)
+    updated = []
+    for pos in local_message_positions(messages, username, "inbox"):
+        message = messages[pos]
+        if not message.get("read_at") and (wanted is None or message.get("id") in wanted):
+            message["read_at"] = read_at
+            updated.append(message)
+    if message_ids is not None and len(message_ids) == 1 and not updated:
+        return None, "Message not found."
+    return updated, None
 
 def community_get_roles(settings, db_obj):
     if supabase_enabled(settings):
@@ -5111,6 +7764,7 @@ def get_remembered_user(db_obj):
     if not username or not token:
         clear_remember_file()
         return None
+    ensure_user_loaded(db_obj, username)
     if expiry_raw:
         try:
             expiry_dt = datetime.fromisoformat(str(expiry_raw))
@@ -5143,7 +7797,369 @@ def get_remembered_user(db_obj):
         save_data(db_obj)
     return username
 
-db = load_data()
+db = load_session_data(st.session_state.get("user"))
+
+# ==============================
+# SAVED SEARCH ALERT WORKER
+# ==============================
+def normalize_forum_datetime(dt_value):
+    if not isinstance(dt_value, datetime):
+        return dt_value
+    if dt_value.tzinfo is not None:
+        try:
+            dt_value = dt_value.astimezone().replace(tzinfo=None)
+        except Exception:
+            dt_value = dt_value.replace(tzinfo=None)
+    return dt_value
+
+def parse_forum_date(value):
+    if not value:
+        return datetime.min
+    try:
+        parsed = datetime.fromisoformat(value)
+    except Exception:
+        return datetime.min
+    return normalize_forum_datetime(parsed)
+
+def get_auction_fields(post):
+    if post.get("auction"):
+        auction = post.get("auction", {})
+        return (
+            auction.get("starting_bid", 0.0),
+            auction.get("min_increment", 0.0),
+            auction.get("end_date")
+        )
+    return (
+        post.get("auction_starting_bid", 0.0),
+        post.get("auction_min_increment", 0.0),
+        post.get("auction_end_date")
+    )
+
+def get_listing_price_value(post):
+    listing_type = post.get("listing_type", "Discussion")
+    if listing_type == "For Sale":
+        return post.get("price")
+    if listing_type == "Auction":
+        starting_bid, _, _ = get_auction_fields(post)
+        return starting_bid or post.get("price")
+    return None
+
+def get_auction_end_dt(post):
+    _, _, end_date = get_auction_fields(post)
+    if not end_date:
+        return None
+    raw = str(end_date)
+    try:
+        end_dt = datetime.fromisoformat(raw)
+    except Exception:
+        try:
+            end_dt = datetime.strptime(raw, "%Y-%m-%d")
+        except Exception:
+            return None
+    if "T" not in raw:
+        end_dt = end_dt.replace(hour=23, minute=59, second=59)
+    return normalize_forum_datetime(end_dt)
+
+def get_post_status(post):
+    status = post.get("status") or "Active"
+    listing_type = post.get("listing_type")
+    if listing_type == "Auction":
+        _, _, end_date = get_auction_fields(post)
+        if end_date:
+            try:
+                if datetime.fromisoformat(end_date).date() < datetime.now().date() and status == "Active":
+                    return "Ended"
+            except Exception:
+                pass
+    return status
+
+def get_post_image_refs(post):
+    images = post.get("images")
+    if images is None:
+        images = [post["cover_image"]] if post.get("cover_image") else []
+    return images[:5]
+
+def saved_search_matches(post, search, settings, watchlist, now_dt):
+    """Whether post passes a saved search's filters; the search term is matched separately via the index."""
+    category_filter = search.get("category_filter", "All")
+    quick_category = search.get("quick_category", "All")
+    if quick_category and quick_category != "All":
+        category_filter = quick_category
+    type_filter = search.get("type_filter", "All")
+    status_filter = search.get("status_filter", "All")
+    price_range = search.get("price_range")
+    if type_filter != "All" and post.get("listing_type") != type_filter:
+        return False
+    if category_filter != "All" and post.get("category") != category_filter:
+        return False
+    if status_filter != "All" and get_post_status(post) != status_filter:
+        return False
+    if price_range:
+        price_value = get_listing_price_value(post)
+        if price_value is None or price_value < price_range[0] or price_value > price_range[1]:
+            return False
+    if search.get("filter_watchlist") and post.get("id") not in watchlist:
+        return False
+    if search.get("filter_photos") and not get_post_image_refs(post):
+        return False
+    if search.get("filter_buy_now") and not post.get("buy_now_price"):
+        return False
+    if search.get("filter_new"):
+        created_dt = parse_forum_date(post.get("created_at"))
+        if created_dt == datetime.min or (now_dt - created_dt).days > 7:
+            return False
+    if search.get("filter_ending"):
+        end_dt = get_auction_end_dt(post)
+        if not end_dt or end_dt > now_dt + timedelta(days=2):
+            return False
+    if search.get("filter_near_me"):
+        user_country = get_country_name(get_country_code(settings)).lower()
+        if user_country and user_country not in str(post.get("location", "")).lower():
+            return False
+    return True
+
+def get_alert_worker_interval():
+    try:
+        return max(15.0, float(get_secret_value("ALERT_WORKER_SECONDS", ALERT_WORKER_SECONDS)))
+    except Exception:
+        return float(ALERT_WORKER_SECONDS)
+
+def load_alert_state(texts):
+    try:
+        state = json.loads(texts.get(ALERT_STATE_KEY) or "{}")
+    except Exception:
+        state = {}
+    if not isinstance(state, dict):
+        state = {}
+    if not isinstance(state.get("users"), dict):
+        state["users"] = {}
+    return state
+
+def get_user_alert_state(username):
+    """The worker's per-user alert state: watermark, per-search check times and the alert inbox."""
+    state = load_alert_state(load_record_texts([ALERT_STATE_KEY]))
+    return state["users"].get(username) or {}
+
+def load_alert_records():
+    """{key: (serialized record, version)}; the _alerts version is the base persist_alert_state writes against."""
+    # With Supabase app storage, list every username and updated_at, then re-download only the rows
+    # whose updated_at moved since the previous cycle (the storage cache outlives the batch).
+    if app_storage_enabled():
+        settings = get_storage_settings_from_secrets()
+        rows, err = supabase_select_all(
+            settings,
+            APP_STORAGE_TABLE,
+            order="username.asc",
+            use_service_key=True,
+            columns="username,updated_at"
+        )
+        if not err:
+            versions = {row.get("username"): row.get("updated_at") for row in rows if row.get("username")}
+            texts, err = load_versioned_record_texts(settings, versions)
+            if texts is not None:
+                return {key: (text, None) for key, text in texts.items()}
+    return load_record_entries()
+
+def load_alert_posts(data, since):
+    """Listings created after since, oldest first, with bodies for term matching."""
+    settings = get_community_settings(data)
+    if not supabase_enabled(settings):
+        since_dt = parse_forum_date(since)
+        posts = [post for post in get_forum_posts(data) if parse_forum_date(post.get("created_at")) > since_dt]
+        return sorted(posts, key=lambda post: parse_forum_date(post.get("created_at"))), None
+    posts = []
+    while True:
+        rows, err = supabase_select(
+            settings,
+            "community_posts",
+            filters=[("created_at", "gt", since)],
+            limit=ALERT_POST_BATCH_LIMIT,
+            order="created_at.asc",
+            use_service_key=True
+        )
+        if err:
+            return posts, err
+        rows = rows or []
+        posts.extend(rows)
+        if len(rows) < ALERT_POST_BATCH_LIMIT:
+            return posts, None
+        since = rows[-1].get("created_at")
+
+def persist_alert_state(data, state, base=None):
+    """Write _alerts against base, (text, version) as loaded, so a concurrent writer is merged, not overwritten."""
+    storage_settings = get_community_settings(data)
+    bases = {ALERT_STATE_KEY: base}
+    if app_storage_sqlite():
+        _, err = write_sqlite_records({ALERT_STATE_KEY: serialize_record(state)}, bases=bases)
+        return err
+    if app_storage_enabled(storage_settings):
+        return sync_db_to_supabase(storage_settings, {ALERT_STATE_KEY: state})
+    write_local_data({ALERT_STATE_KEY: serialize_record(state)}, bases=bases)
+    return None
+
+def acquire_alert_lease(holder):
+    """Take the host-wide alert lease (a non-blocking flock) once; only its holder evaluates alerts.
+
+    Every server process starts a worker, so without the lease each would email the same
+    alerts. The lock is kept for the life of the process; a standby takes over when it exits.
+    """
+    if holder.get("lease") is not None or not FILE_LOCK_AVAILABLE:
+        return True
+    handle = open(ALERT_LEASE_FILE, "a")
+    try:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        handle.close()
+        return False
+    holder["lease"] = handle
+    return True
+
+def alert_worker_enabled():
+    # Supabase app storage implies the app may run on several hosts, which a file lease cannot
+    # cover; there the worker is opt-in and alerts are expected from one --run-alerts cron.
+    return secret_flag("ALERT_WORKER_ENABLED", not app_storage_enabled())
+
+def run_saved_search_alert_batch(checked=None):
+    """Evaluate every user's saved searches against listings created since their watermark.
+
+    State lives in its own storage record (_alerts) so user sessions never overwrite it;
+    emails are sent in one batch per SMTP server. checked maps username -> last evaluation
+    time, kept in memory by the worker so users are only evaluated every market_alerts_interval.
+    """
+    checked = {} if checked is None else checked
+    entries = load_alert_records()
+    texts = {key: text for key, (text, _) in entries.items()}
+    data = {key: json.loads(text) for key, text in texts.items() if key != ALERT_STATE_KEY}
+    state = load_alert_state(texts)
+    state_text = json.dumps(state, sort_keys=True)
+    remote = supabase_enabled(get_community_settings(data))
+    now = time.time()
+    now_iso = datetime.now().isoformat()
+    # Watermarks use the clock of the backend's created_at values.
+    start_mark = datetime.now(timezone.utc).isoformat() if remote else now_iso
+    stats = {"users": 0, "searches": 0, "posts": 0, "alerts": 0, "emails": 0, "email_errors": 0}
+
+    due = []
+    for username, record in iter_user_records(data):
+        settings = get_user_settings(data, username)
+        searches = [search for search in settings.get("market_saved_searches") or [] if search.get("alerts_enabled", True)]
+        if not settings.get("market_alerts_enabled", True) or not searches:
+            continue
+        user_state = state["users"].setdefault(username, {})
+        if not user_state.get("watermark"):
+            # Start from now: alerts cover listings created after alerts were switched on.
+            user_state["watermark"] = start_mark
+            checked[username] = now
+            continue
+        if now - checked.get(username, 0.0) < int(settings.get("market_alerts_interval", 180)):
+            continue
+        due.append((username, settings, searches, user_state))
+
+    messages = []
+    err = None
+    if due:
+        since = min((user_state["watermark"] for _, _, _, user_state in due), key=parse_forum_date)
+        posts, err = load_alert_posts(data, since)
+        stats["posts"] = len(posts)
+        if not err:
+            index = create_search_index()
+            community_search_index_sync(index, posts)
+            term_scores = {}
+            now_dt = normalize_forum_datetime(datetime.now())
+            for username, settings, searches, user_state in due:
+                watermark_dt = parse_forum_date(user_state["watermark"])
+                new_posts = [post for post in posts if parse_forum_date(post.get("created_at")) > watermark_dt]
+                watchlist = set(settings.get("market_watchlist") or [])
+                search_state = user_state.setdefault("searches", {})
+                stats["users"] += 1
+                for search in searches:
+                    stats["searches"] += 1
+                    name = search.get("name")
+                    term = (search.get("search_term") or "").strip()
+                    if term and term not in term_scores:
+                        term_scores[term] = community_search_index_query(index, term)
+                    matches = [
+                        post for post in new_posts
+                        if (not term or post.get("id") in term_scores[term])
+                        and saved_search_matches(post, search, settings, watchlist, now_dt)
+                    ]
+                    if not matches:
+                        continue
+                    matches.reverse()
+                    search_state.setdefault(name, {})["last_alerted"] = now_iso
+                    stats["alerts"] += 1
+                    user_state.setdefault("inbox", []).append({
+                        "name": name,
+                        "count": len(matches),
+                        "post_ids": [post.get("id") for post in matches[:20]],
+                        "at": now_iso
+                    })
+                    user_state["inbox"] = user_state["inbox"][-ALERT_INBOX_LIMIT:]
+                    if settings.get("market_alerts_email_enabled") and search.get("email_alerts"):
+                        subject = f"WealthPulse Alert: {name} ({len(matches)} new)"
+                        listing_lines = [f"- {post.get('title')} ({post.get('listing_type')})" for post in matches[:5]]
+                        body = "New listings matched your saved search:\n" + "\n".join(listing_lines)
+                        messages.append((settings, subject, body))
+                if posts:
+                    user_state["watermark"] = max(
+                        [user_state["watermark"]] + [post.get("created_at") for post in new_posts if post.get("created_at")],
+                        key=parse_forum_date
+                    )
+                checked[username] = now
+
+    if messages:
+        errors = send_alert_emails(messages)
+        stats["emails"] = sum(1 for item in errors if not item)
+        stats["email_errors"] = sum(1 for item in errors if item)
+    persist_err = None
+    if json.dumps(state, sort_keys=True) != state_text:
+        persist_err = persist_alert_state(data, state, base=entries.get(ALERT_STATE_KEY))
+    return stats, err or persist_err
+
+@st.cache_resource(show_spinner=False)
+def get_alert_worker():
+    # Daemon thread that evaluates all users' saved searches so page loads never do.
+    worker = {"lock": threading.Lock(), "checked": {}, "last_run": None, "last_duration_ms": None, "last_error": None, "last_stats": None, "standby": False}
+    if alert_worker_enabled():
+        thread = threading.Thread(target=run_alert_worker, args=(worker,), name="alert-worker", daemon=True)
+        thread.start()
+        worker["thread"] = thread
+    return worker
+
+def run_alert_worker(worker):
+    while True:
+        if not acquire_alert_lease(worker):
+            with worker["lock"]:
+                worker["standby"] = True
+            time.sleep(get_alert_worker_interval())
+            continue
+        started = time.time()
+        try:
+            stats, err = run_saved_search_alert_batch(worker["checked"])
+        except Exception as exc:
+            stats, err = None, str(exc)
+        with worker["lock"]:
+            worker["last_run"] = started
+            worker["last_duration_ms"] = (time.time() - started) * 1000
+            worker["last_stats"] = stats
+            worker["last_error"] = err
+            worker["standby"] = False
+        time.sleep(get_alert_worker_interval())
+
+def get_alert_worker_status():
+    worker = get_alert_worker()
+    with worker["lock"]:
+        return {key: value for key, value in worker.items() if key not in ("lock", "thread", "checked", "lease")}
+
+# CLI entry point for running alerts from cron instead of the app process:
+#   python wealth_tracker.py --run-alerts   (set ALERT_WORKER_ENABLED = false in secrets)
+if "--run-alerts" in sys.argv:
+    if not acquire_alert_lease({}):
+        print(json.dumps({"stats": None, "error": None, "skipped": "alert lease held by another process"}))
+        sys.exit(0)
+    cli_stats, cli_err = run_saved_search_alert_batch()
+    print(json.dumps({"stats": cli_stats, "error": cli_err}))
+    sys.exit(1 if cli_err else 0)
 
 # ==============================
 # DELETE AND MODIFY FUNCTIONS
@@ -5436,7 +8452,7 @@ if not st.session_state.user:
                 login = st.form_submit_button("Launch Dashboard", width="stretch")
 
             if login:
-                record = db.get(username)
+                record = ensure_user_loaded(db, username)
                 record_dict = record if isinstance(record, dict) else None
                 if not username:
                     st.warning("Please enter a username")
@@ -5499,7 +8515,7 @@ if not st.session_state.user:
             with st.expander("Forgot Password"):
                 with st.form("forgot_form"):
                     forgot_user = st.text_input("Username", key="forgot_user")
-                    record = db.get(forgot_user) if forgot_user else None
+                    record = ensure_user_loaded(db, forgot_user)
                     record_dict = record if isinstance(record, dict) else None
                     recovery = record_dict.get("recovery", []) if record_dict else []
                     answers = []
@@ -5596,7 +8612,7 @@ if not st.session_state.user:
                     elif len({q1, q2, q3}) < 3:
                         st.error("Please choose three different recovery questions.")
                     else:
-                        record = db.get(new_username)
+                        record = ensure_user_loaded(db, new_username)
                         record_dict = record if isinstance(record, dict) else None
                         if record_dict and record_dict.get("auth"):
                             st.error("Username already exists. Please log in.")
@@ -5732,102 +8748,111 @@ with logout_cols[4]:
         for key in ["user", "selected_asset_index", "modify_index", "show_modify_form", "reveal_values", "open_asset_key", "open_asset_view"]:
             if key in st.session_state:
                 del st.session_state[key]
+        for key in [key for key in st.session_state if str(key).startswith(TAB_DRAFT_PREFIX)]:
+            del st.session_state[key]
         st.session_state.user = None
         st.session_state.is_admin = False
         st.rerun()
 
 weight_unit = user_settings.get("metal_weight_unit", "toz")
-auto_refresh_enabled = user_settings.get("auto_refresh_enabled", True)
-refresh_interval = int(user_settings.get("auto_refresh_interval", 70))
-
-if auto_refresh_enabled and AUTOREFRESH_AVAILABLE:
-    st_autorefresh(interval=max(30, refresh_interval) * 1000, key="global_autorefresh")
-
-# Live FX update (Frankfurter or Metals.dev)
-fx_last_updated = None
-fx_provider = user_settings.get("fx_provider", "Frankfurter")
-if user_settings.get("auto_fx_enabled"):
-    cache_key = f"fx_{st.session_state.currency_code}_{fx_provider}"
-    fx_cached = get_cache(cache_key, max(60, refresh_interval))
-    if fx_cached:
-        fx_data = fx_cached
+
+# Live FX update (Frankfurter or Metals.dev), kept warm by the background refresher
+def apply_live_fx(settings):
+    """Set the session FX rate from the warmed provider data; returns the provider timestamp.
+
+    st.session_state.fx_status says whether the rate in use is "live", "stale"
+    (warmed value older than a few refresh cycles), "pending" (first refresh has
+    not landed) or "unavailable" (no rate for this currency); None when unused.
+    """
+    st.session_state.fx_status = None
+    if not settings.get("auto_fx_enabled"):
+        return None
+    fx_provider = settings.get("fx_provider", "Frankfurter")
+    # Rates are always fetched against USD, so one entry per provider serves every currency.
+    cache_key = f"fx_{fx_provider}"
+    if fx_provider == "Metals.dev":
+        metals_dev_api_key = get_effective_setting(settings, "metals_dev_api_key", "METALS_DEV_API_KEY")
+        cache_key = f"fx_{fx_provider}_{credential_scope(metals_dev_api_key)}"
+        fx_fetch = lambda: fetch_metalsdev_fx(metals_dev_api_key)
     else:
-        if fx_provider == "Metals.dev":
-            fx_data, fx_error = fetch_metalsdev_fx(get_effective_setting(user_settings, "metals_dev_api_key", "METALS_DEV_API_KEY"))
-        else:
-            fx_data, fx_error = fetch_frankfurter_fx()
-            if not fx_data:
-                fx_data, fx_error = fetch_open_er_fx()
-        if fx_data:
-            set_cache(cache_key, fx_data)
-        else:
-            fx_data = None
-    if fx_data:
-        code = st.session_state.currency_code
-        if code == "USD":
-            st.session_state.currency_rate = 1.0
-        else:
-            if fx_provider == "Metals.dev":
-                currencies = fx_data.get("currencies", {})
-                raw = currencies.get(code)
-                if raw:
-                    try:
-                        st.session_state.currency_rate = 1 / float(raw)
-                        fx_last_updated = fx_data.get("timestamp")
-                    except Exception:
-                        pass
-            else:
-                rates = fx_data.get("rates", {})
-                raw = rates.get(code)
-                if raw:
-                    try:
-                        st.session_state.currency_rate = float(raw)
-                        fx_last_updated = fx_data.get("date")
-                    except Exception:
-                        pass
+        fx_fetch = fetch_frankfurter_with_fallback
+    fx_data, fx_age = read_warm_entry(cache_key, fx_fetch, "fx")
+    code = st.session_state.currency_code
+    if code == "USD":
+        st.session_state.currency_rate = 1.0
+        return None
+    if not fx_data:
+        st.session_state.fx_status = "pending"
+        return None
+    fresh_status = "stale" if fx_age > FX_STALE_REFRESH_CYCLES * get_market_refresh_interval("fx") else "live"
+    if fx_provider == "Metals.dev":
+        raw = fx_data.get("currencies", {}).get(code)
+        if raw:
+            try:
+                st.session_state.currency_rate = 1 / float(raw)
+                st.session_state.fx_status = fresh_status
+                return fx_data.get("timestamp")
+            except Exception:
+                pass
+    else:
+        raw = fx_data.get("rates", {}).get(code)
+        if raw:
+            try:
+                st.session_state.currency_rate = float(raw)
+                st.session_state.fx_status = fresh_status
+                return fx_data.get("date")
+            except Exception:
+                pass
+    st.session_state.fx_status = "unavailable"
+    return None
 
-# Live metals (FreeGoldPrice or MetalpriceAPI)
-live_metals_data = None
-metals_last_updated = None
-metals_provider = user_settings.get("metals_provider", "FreeGoldPrice")
-metals_provider_active = metals_provider
-metals_cache_key = f"metals_latest_{metals_provider}"
-metals_cached = get_cache(metals_cache_key, max(60, refresh_interval))
-if metals_cached:
-    live_metals_data = metals_cached
-else:
+FX_STALE_REFRESH_CYCLES = 3
+FX_STATUS_NOTES = {
+    "pending": "Live FX rate is still loading; amounts use the last saved rate.",
+    "stale": "Live FX rate is out of date; the provider has not answered recently.",
+    "unavailable": "Live FX rate unavailable for this currency; amounts use the last saved rate."
+}
+
+# Live metals (FreeGoldPrice or MetalpriceAPI, SilverPrice fallback), kept warm by the background refresher
+def load_live_metals(settings):
+    """Warmed spot prices for the session currency, mirrored into session_state for valuations."""
+    metals_provider = settings.get("metals_provider", "FreeGoldPrice")
+    metals_currency_code = st.session_state.currency_code
+    metals_api_key = ""
     if metals_provider == "MetalpriceAPI":
-        live_metals_data, metals_error = fetch_metalprice_latest(get_effective_setting(user_settings, "metalprice_api_key", "METALPRICE_API_KEY"))
+        metals_api_key = get_effective_setting(settings, "metalprice_api_key", "METALPRICE_API_KEY")
     elif metals_provider == "FreeGoldPrice":
-        live_metals_data, metals_error = fetch_freegoldprice_latest(get_effective_setting(user_settings, "freegoldprice_api_key", "FREEGOLDPRICE_API_KEY"))
-    elif metals_provider == "SilverPrice":
-        live_metals_data, metals_error = fetch_silverprice_latest(st.session_state.currency_code)
+        metals_api_key = get_effective_setting(settings, "freegoldprice_api_key", "FREEGOLDPRICE_API_KEY")
+    metals_cache_key = f"metals_latest_{metals_provider}_{credential_scope(metals_api_key)}_{metals_currency_code}"
+    live_metals_data = read_warm_value(
+        metals_cache_key,
+        lambda: fetch_metals_with_fallback(metals_provider, metals_api_key, metals_currency_code),
+        "metals"
+    )
+    metals_provider_active = (live_metals_data or {}).get("provider") or metals_provider
+    st.session_state.live_metal_prices = (live_metals_data or {}).get("prices", {})
+    st.session_state.metals_provider_active = metals_provider_active
+    return live_metals_data, metals_provider_active, (live_metals_data or {}).get("timestamp")
+
+def format_provider_time(value, settings):
+    if isinstance(value, (int, float)):
+        provider_time = datetime.fromtimestamp(value)
     else:
-        live_metals_data = None
-
-    if not live_metals_data and metals_provider != "SilverPrice":
-        fallback_key = "metals_latest_SilverPrice"
-        fallback_cached = get_cache(fallback_key, max(60, refresh_interval))
-        if fallback_cached:
-            live_metals_data = fallback_cached
-            metals_provider_active = "SilverPrice"
-        else:
-            fallback_data, fallback_err = fetch_silverprice_latest(st.session_state.currency_code)
-            if fallback_data:
-                live_metals_data = fallback_data
-                metals_error = fallback_err
-                metals_provider_active = "SilverPrice"
-                set_cache(fallback_key, fallback_data)
-
-    if live_metals_data:
-        set_cache(metals_cache_key, live_metals_data)
-
-if live_metals_data:
-    st.session_state.live_metal_prices = live_metals_data.get("prices", {})
-    metals_last_updated = live_metals_data.get("timestamp")
-else:
-    st.session_state.live_metal_prices = {}
-st.session_state.metals_provider_active = metals_provider_active
+        try:
+            provider_time = datetime.fromisoformat(str(value))
+        except Exception:
+            provider_time = get_now_for_settings(settings)
+    return format_date_for_settings(provider_time, settings)
+
+def get_live_panel_interval(settings, kind):
+    """run_every for a live panel: the user's refresh interval, but never faster than its data is warmed."""
+    if not settings.get("auto_refresh_enabled", True):
+        return None
+    user_interval = max(30, int(settings.get("auto_refresh_interval", 70)))
+    return max(user_interval, int(get_market_refresh_interval(kind)))
+
+apply_live_fx(user_settings)
+live_metals_data, metals_provider_active, _ = load_live_metals(user_settings)
 
 # ==============================
 # ENHANCED HELPERS
@@ -5849,41 +8874,347 @@ def get_price(ticker):
     except:
         return 0.0
 
-@st.cache_data(ttl=3600)
-def get_history(ticker):
+MARKET_DATA_FIELDS = ["Open", "High", "Low", "Close", "Volume"]
+HISTORY_ACTION_FIELDS = ["Dividends", "Stock Splits"]
+MARKET_DATA_MAX_WORKERS = 8
+HISTORY_DB_FILE = os.path.join(os.path.dirname(__file__), "market_history.sqlite3")
+HISTORY_REFRESH_SECONDS = 900
+HISTORY_PERIOD_DAYS = {
+    "5d": 5,
+    "1mo": 31,
+    "3mo": 92,
+    "6mo": 183,
+    "1y": 366,
+    "2y": 731,
+    "5y": 1827
+}
+
+def get_portfolio_tickers(assets):
+    return tuple(sorted({(asset.get("ticker") or "").strip() for asset in assets if (asset.get("ticker") or "").strip()}))
+
+def normalize_history_frame(hist, keep_actions=False):
+    if hist is None or hist.empty:
+        return pd.DataFrame()
+    frame = hist.copy()
+    index = pd.to_datetime(frame.index)
+    if getattr(index, "tz", None) is not None:
+        index = index.tz_localize(None)
+    frame.index = index.normalize()
+    frame = frame[~frame.index.duplicated(keep="last")]
+    fields = MARKET_DATA_FIELDS + (HISTORY_ACTION_FIELDS if keep_actions else [])
+    return frame[[col for col in fields if col in frame.columns]]
+
+def fetch_ticker_history(ticker, **kwargs):
     try:
-        return yf.Ticker(ticker).history(period="1y")
-    except:
+        return yf.Ticker(ticker).history(**kwargs)
+    except Exception:
         return pd.DataFrame()
 
-def get_detailed_history(ticker, period="1y"):
+def download_histories(tickers, **kwargs):
+    """Daily bars per ticker from one multi-ticker download plus a bounded pool for misses."""
+    frames = {}
+    if not tickers:
+        return frames
+    keep_actions = bool(kwargs.get("actions"))
     try:
-        return yf.Ticker(ticker).history(period=period)
-    except:
+        raw = yf.download(list(tickers), group_by="ticker", auto_adjust=True, threads=True, progress=False, **kwargs)
+    except Exception:
+        raw = pd.DataFrame()
+    if raw is not None and not raw.empty:
+        if isinstance(raw.columns, pd.MultiIndex):
+            available = set(raw.columns.get_level_values(0))
+            for ticker in tickers:
+                if ticker in available:
+                    frame = normalize_history_frame(raw[ticker].dropna(how="all"), keep_actions)
+                    if not frame.empty:
+                        frames[ticker] = frame
+        elif len(tickers) == 1:
+            frame = normalize_history_frame(raw.dropna(how="all"), keep_actions)
+            if not frame.empty:
+                frames[tickers[0]] = frame
+    missing = [ticker for ticker in tickers if ticker not in frames]
+    if missing:
+        with ThreadPoolExecutor(max_workers=min(MARKET_DATA_MAX_WORKERS, len(missing))) as pool:
+            histories = pool.map(lambda ticker: fetch_ticker_history(ticker, **kwargs), missing)
+            for ticker, hist in zip(missing, histories):
+                frame = normalize_history_frame(hist, keep_actions)
+                if not frame.empty:
+                    frames[ticker] = frame
+    return frames
+
+@st.cache_resource(show_spinner=False)
+def get_history_store():
+    # Daily bars survive restarts; only the tail since the last stored bar is refetched.
+    conn = sqlite3.connect(HISTORY_DB_FILE, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS price_history ("
+        "ticker TEXT NOT NULL, date TEXT NOT NULL, open REAL, high REAL, low REAL, close REAL, volume REAL, "
+        "PRIMARY KEY (ticker, date))"
+    )
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS history_sync ("
+        "ticker TEXT PRIMARY KEY, covered_from TEXT, fetched_at REAL)"
+    )
+    conn.commit()
+    return {"lock": threading.Lock(), "conn": conn}
+
+def history_store_plan(tickers, start_date, refresh_seconds=HISTORY_REFRESH_SECONDS):
+    store = get_history_store()
+    placeholders = ",".join("?" for _ in tickers)
+    with store["lock"]:
+        sync_rows = store["conn"].execute(
+            f"SELECT ticker, covered_from, fetched_at FROM history_sync WHERE ticker IN ({placeholders})",
+            list(tickers)
+        ).fetchall()
+        last_rows = store["conn"].execute(
+            f"SELECT ticker, MAX(date) FROM price_history WHERE ticker IN ({placeholders}) GROUP BY ticker",
+            list(tickers)
+        ).fetchall()
+    sync_state = {row[0]: (row[1], row[2]) for row in sync_rows}
+    last_dates = {row[0]: row[1] for row in last_rows}
+    now = time.time()
+    full, tails = [], {}
+    for ticker in tickers:
+        covered_from, fetched_at = sync_state.get(ticker, (None, None))
+        if not covered_from or covered_from > start_date:
+            full.append(ticker)
+        elif now - float(fetched_at or 0) >= refresh_seconds:
+            # Re-read the last stored bar too; it may have been an intraday partial.
+            tails[ticker] = last_dates.get(ticker) or start_date
+    return full, tails
+
+def history_store_write(frames, attempted, covered_from=None):
+    store = get_history_store()
+    rows = []
+    for ticker, frame in frames.items():
+        for date_value, bar in frame.iterrows():
+            rows.append((
+                ticker,
+                date_value.strftime("%Y-%m-%d"),
+                *[None if pd.isna(bar.get(field)) else float(bar.get(field)) for field in MARKET_DATA_FIELDS]
+            ))
+    now = time.time()
+    with store["lock"]:
+        conn = store["conn"]
+        conn.executemany("INSERT OR REPLACE INTO price_history VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        for ticker in attempted:
+            conn.execute(
+                "INSERT INTO history_sync (ticker, covered_from, fetched_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(ticker) DO UPDATE SET fetched_at = excluded.fetched_at, "
+                "covered_from = MIN(COALESCE(history_sync.covered_from, excluded.covered_from), COALESCE(excluded.covered_from, history_sync.covered_from))",
+                (ticker, covered_from, now)
+            )
+        conn.commit()
+
+def history_store_reset(tickers):
+    store = get_history_store()
+    placeholders = ",".join("?" for _ in tickers)
+    with store["lock"]:
+        conn = store["conn"]
+        conn.execute(f"DELETE FROM price_history WHERE ticker IN ({placeholders})", list(tickers))
+        conn.execute(f"DELETE FROM history_sync WHERE ticker IN ({placeholders})", list(tickers))
+        conn.commit()
+
+def history_actions_since(frame, since):
+    # A split or dividend after the last stored bar re-bases every earlier adjusted bar.
+    fields = [field for field in HISTORY_ACTION_FIELDS if field in frame.columns]
+    if not fields:
+        return False
+    recent = frame.loc[frame.index > pd.Timestamp(since), fields]
+    return bool((recent.fillna(0) != 0).any().any())
+
+def history_store_read(tickers, start_date):
+    store = get_history_store()
+    placeholders = ",".join("?" for _ in tickers)
+    with store["lock"]:
+        rows = store["conn"].execute(
+            f"SELECT ticker, date, open, high, low, close, volume FROM price_history "
+            f"WHERE ticker IN ({placeholders}) AND date >= ? ORDER BY ticker, date",
+            [*tickers, start_date]
+        ).fetchall()
+    if not rows:
+        return {}
+    table = pd.DataFrame(rows, columns=["Ticker", "Date", *MARKET_DATA_FIELDS])
+    table["Date"] = pd.to_datetime(table["Date"])
+    return {
+        ticker: group.drop(columns="Ticker").set_index("Date")
+        for ticker, group in table.groupby("Ticker", sort=False)
+    }
+
+def load_histories(tickers, period="1y", refresh_seconds=HISTORY_REFRESH_SECONDS):
+    """Daily bars per ticker, served from the local history store when possible."""
+    tickers = [ticker for ticker in dict.fromkeys(tickers) if ticker]
+    if not tickers:
+        return {}
+    days = HISTORY_PERIOD_DAYS.get(period)
+    if not days:
+        return download_histories(tickers, period=period)
+    start_date = (datetime.now().date() - timedelta(days=days)).isoformat()
+    try:
+        full, tails = history_store_plan(tickers, start_date, refresh_seconds)
+        if full:
+            history_store_write(download_histories(full, period=period), full, covered_from=start_date)
+        if tails:
+            # Bars are stored adjusted, so a tail that brings a split or dividend
+            # invalidates the ticker's stored history and it is fetched again in full.
+            tail_frames = download_histories(list(tails), start=min(tails.values()), actions=True)
+            rebased = [ticker for ticker, frame in tail_frames.items() if history_actions_since(frame, tails[ticker])]
+            history_store_write(
+                {ticker: frame for ticker, frame in tail_frames.items() if ticker not in rebased},
+                [ticker for ticker in tails if ticker not in rebased]
+            )
+            if rebased:
+                history_store_reset(rebased)
+                history_store_write(download_histories(rebased, period=period), rebased, covered_from=start_date)
+        return history_store_read(tickers, start_date)
+    except sqlite3.Error:
+        return download_histories(tickers, period=period)
+
+def refresh_watched_quotes(tickers):
+    # Pull the latest daily tails into the history store; renders then read them locally.
+    histories = load_histories(tickers, refresh_seconds=0)
+    if not histories:
+        return None, "No quotes returned."
+    return {"tickers": sorted(histories), "refreshed_at": time.time()}, None
+
+@st.cache_data(ttl=HISTORY_REFRESH_SECONDS, show_spinner=False)
+def get_market_snapshot(tickers, period="1y"):
+    """Daily bars for every ticker in one date-aligned frame with (ticker, field) columns.
+
+    Render-path read: only bars already in the history store, never a provider
+    call. The quotes job registered for the portfolio fetches new tickers and tails.
+    """
+    tickers = [ticker for ticker in dict.fromkeys(tickers) if ticker]
+    if not tickers:
+        return pd.DataFrame()
+    start_date = (datetime.now().date() - timedelta(days=HISTORY_PERIOD_DAYS.get(period, 366))).isoformat()
+    try:
+        frames = history_store_read(tickers, start_date)
+    except sqlite3.Error:
+        frames = {}
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, axis=1).sort_index()
+
+def get_snapshot_history(snapshot, ticker):
+    ticker = (ticker or "").strip()
+    if snapshot is None or snapshot.empty or ticker not in snapshot.columns.get_level_values(0):
+        return pd.DataFrame()
+    hist = snapshot[ticker]
+    if "Close" not in hist.columns:
         return pd.DataFrame()
+    return hist.dropna(subset=["Close"])
+
+def get_snapshot_price(snapshot, ticker):
+    hist = get_snapshot_history(snapshot, ticker)
+    if hist.empty:
+        return 0.0
+    return float(hist["Close"].iloc[-1])
+
+CONDITION_MULTIPLIERS = {
+    "Poor": 0.6, "Fair": 0.8, "Good": 1.0,
+    "Very Good": 1.15, "Excellent": 1.3, "Mint": 1.5
+}
+RARITY_TYPES = ["Collectible", "Card", "Guitar", "Watch", "Art"]
+RARITY_MULTIPLIER = 1.2
+
+def valuation_explanation(condition):
+    explanation = (
+        "Based on condition (" + condition + "), "
+        "market pricing, and rarity assumptions."
+    )
+    if AI_VALUATION_ADJUSTMENT < 1:
+        explanation += f" Adjusted down by {int((1 - AI_VALUATION_ADJUSTMENT) * 100)}% to reflect local pricing."
+    return explanation
 
 def ai_valuation(asset):
     base = get_effective_market_price(asset)
-    condition_mult = {
-        "Poor": 0.6, "Fair": 0.8, "Good": 1.0,
-        "Very Good": 1.15, "Excellent": 1.3, "Mint": 1.5
-    }.get(asset["condition"], 1.0)
+    condition_mult = CONDITION_MULTIPLIERS.get(asset["condition"], 1.0)
 
-    rarity_mult = 1.2 if asset["type"] in ["Collectible", "Card", "Guitar", "Watch", "Art"] else 1.0
+    rarity_mult = RARITY_MULTIPLIER if asset["type"] in RARITY_TYPES else 1.0
     estimate = base * asset["qty"] * condition_mult * rarity_mult
     estimate *= AI_VALUATION_ADJUSTMENT
     confidence = min(95, int(60 + condition_mult * 20))
     confidence = max(5, confidence - 20)
     confidence = max(5, int(confidence * AI_CONFIDENCE_ADJUSTMENT))
 
-    explanation = (
-        "Based on condition (" + asset["condition"] + "), "
-        "market pricing, and rarity assumptions."
-    )
-    if AI_VALUATION_ADJUSTMENT < 1:
-        explanation += f" Adjusted down by {int((1 - AI_VALUATION_ADJUSTMENT) * 100)}% to reflect local pricing."
+    return round(estimate, 2), confidence, valuation_explanation(asset["condition"])
 
-    return round(estimate, 2), confidence, explanation
+def apply_snapshot_prices(portfolio, snapshot):
+    for asset in portfolio:
+        if asset.get("ticker"):
+            snapshot_price = get_snapshot_price(snapshot, asset["ticker"])
+            if snapshot_price:
+                asset["market_price"] = snapshot_price
+
+def build_portfolio_valuation(portfolio):
+    """Value the whole portfolio in one columnar pass (rows keep the portfolio index).
+
+    Same rules as ai_valuation, applied to whole columns: live metal spot
+    overrides, condition/rarity multipliers and the pricing adjustments.
+    """
+    details = [asset.get("details") or {} for asset in portfolio]
+    wealth = [asset.get("wealth") or {} for asset in portfolio]
+    table = pd.DataFrame({
+        "name": [asset.get("name", "") for asset in portfolio],
+        "type": [asset.get("type") for asset in portfolio],
+        "condition": [asset.get("condition") for asset in portfolio],
+        "ticker": [asset.get("ticker") for asset in portfolio],
+        "market_price": [asset.get("market_price", 0) for asset in portfolio],
+        "qty": [asset.get("qty", 1) for asset in portfolio],
+        "weight": [item.get("weight_troy_oz") for item in details],
+        "owner_entity": [item.get("owner_entity") for item in wealth]
+    }, index=pd.RangeIndex(len(portfolio)))
+    for column, default in (("market_price", 0.0), ("qty", 1.0), ("weight", 0.0)):
+        table[column] = pd.to_numeric(table[column], errors="coerce").fillna(default)
+
+    base = table["market_price"]
+    if st.session_state.get("use_live_metal_price", False):
+        live_prices = st.session_state.get("live_metal_prices", {}) or {}
+        spot = pd.to_numeric(table["type"].map(METAL_CODES).map(live_prices), errors="coerce").fillna(0.0)
+        spot_price = spot.where(table["weight"] == 0, spot * table["weight"])
+        base = spot_price.where(spot > 0, base)
+    table["base_price"] = base
+
+    condition_mult = table["condition"].map(CONDITION_MULTIPLIERS).fillna(1.0)
+    rarity_mult = table["type"].isin(RARITY_TYPES).map({True: RARITY_MULTIPLIER, False: 1.0})
+    table["value"] = (base * table["qty"] * condition_mult * rarity_mult * AI_VALUATION_ADJUSTMENT).round(2)
+    confidence = (60 + condition_mult * 20).astype(int).clip(upper=95)
+    confidence = (confidence - 20).clip(lower=5)
+    table["confidence"] = (confidence * AI_CONFIDENCE_ADJUSTMENT).astype(int).clip(lower=5)
+
+    splits = [item.get("ownership_split") for item in wealth]
+    splits = [split if isinstance(split, dict) else {} for split in splits]
+    table["has_split"] = [bool(split) for split in splits]
+    split_pct = pd.DataFrame(splits, index=table.index).apply(pd.to_numeric, errors="coerce")
+    return {"table": table, "split_pct": split_pct, "views": {}}
+
+def get_valuation_view(valuation, entity_name="All"):
+    """Rows held by entity_name with share and share-weighted value columns."""
+    views = valuation["views"]
+    if entity_name in views:
+        return views[entity_name]
+    table = valuation["table"]
+    if not entity_name or entity_name == "All":
+        share = pd.Series(1.0, index=table.index)
+    else:
+        split_pct = valuation["split_pct"]
+        if entity_name in split_pct.columns:
+            split_share = split_pct[entity_name].fillna(0.0) / 100.0
+        else:
+            split_share = pd.Series(0.0, index=table.index)
+        owner_share = (table["owner_entity"] == entity_name).astype(float)
+        share = split_share.where(table["has_split"], owner_share)
+    view = table.assign(share=share)
+    view = view[view["share"] > 0]
+    view = view.assign(view_value=view["value"] * view["share"])
+    views[entity_name] = view
+    return view
+
+def get_asset_valuation(valuation, index):
+    row = valuation["table"].loc[index]
+    return float(row["value"]), int(row["confidence"]), valuation_explanation(row["condition"])
 
 def marketplace_links(name):
     q = requests.utils.quote(name)
@@ -5984,110 +9315,271 @@ for asset in portfolio:
         asset["image_url"] = search_asset_image(asset["name"])
 save_data(db)
 
-# ==============================
-# MAIN DASHBOARD HEADER
-# ==============================
-safe_user = escape_html(user)
-currency_code = st.session_state.currency_code
-currency_symbol = st.session_state.currency_symbol
-currency_rate = st.session_state.currency_rate
-now_local = get_now_for_settings(user_settings)
-last_updated_text = format_date_for_settings(now_local, user_settings)
-st.markdown("""
-    <div style="display: flex; justify-content: space-between; align-items: center; margin-bottom: 1rem;">
-        <div>
-            <h1 style="margin: 0;">WealthPulse</h1>
-            <p style="color: var(--muted); margin: 0;">Welcome back, """ + safe_user + """</p>
-        </div>
-        <div style="text-align: right;">
-            <p style="color: var(--muted); margin: 0; font-size: 0.9rem;">Last Updated</p>
-            <p style="color: var(--text); margin: 0; font-weight: 600;">""" + last_updated_text + """</p>
-        </div>
-    </div>
-""", unsafe_allow_html=True)
-render_plan_badge(user_settings)
-render_scroll_to_top()
-render_https_warning_banner()
-render_https_enforcement()
-render_gold_animation()
-render_gold_click_listener()
+# One batched market-data download shared by the Portfolio, Analytics and Buy/Sell tabs
+portfolio_tickers = get_portfolio_tickers(portfolio)
+if portfolio_tickers:
+    register_refresh_job(
+        f"quotes_{','.join(portfolio_tickers)}",
+        lambda: refresh_watched_quotes(portfolio_tickers),
+        "quotes"
+    )
+market_snapshot = get_market_snapshot(portfolio_tickers)
+# Tickers with no stored bars yet keep their saved price until the quotes job lands
+pending_quote_tickers = [ticker for ticker in portfolio_tickers if get_snapshot_history(market_snapshot, ticker).empty]
+apply_snapshot_prices(portfolio, market_snapshot)
+# Every tab reads valuations from this one table instead of calling ai_valuation per asset
+portfolio_valuation = build_portfolio_valuation(portfolio)
 
 # ==============================
-# ENHANCED TABS
+# LIVE PRICE PANELS
 # ==============================
-tab_labels = [
-    "Portfolio",
-    "Bullion",
-    "Community",
-    "Analytics",
-    "Buy/Sell",
-    "Stats",
-    "Add Asset",
-    "Edit Items",
-    "Entities & Liabilities",
+# Each panel is a fragment with its own run_every, so a price tick
+# re-executes that panel only; forms, images and charts stay put.
+METALS_SOURCE_LABELS = {
+    "SilverPrice": "SilverPrice.org",
+    "FreeGoldPrice": "FreeGoldPrice",
+    "MetalpriceAPI": "MetalpriceAPI"
+}
+
+def render_market_snippets(settings):
+    @st.fragment(run_every=get_live_panel_interval(settings, "metals"))
+    def market_snippets():
+        fx_updated = apply_live_fx(settings)
+        metals_data, provider_active, metals_updated = load_live_metals(settings)
+        code = st.session_state.currency_code
+        symbol = st.session_state.currency_symbol
+        rate = st.session_state.currency_rate
+        st.subheader("Market Snippets")
+        snippet_cols = st.columns(2)
+        with snippet_cols[0]:
+            st.markdown("**FX Rate**")
+            if code != "USD":
+                st.write(f"1 USD = {code} {rate:,.4f}")
+                fx_note = FX_STATUS_NOTES.get(st.session_state.get("fx_status"))
+                if fx_note:
+                    st.caption(fx_note)
+                if fx_updated:
+                    st.caption(f"FX updated {format_provider_time(fx_updated, settings)}")
+            else:
+                st.write("USD base currency")
+        with snippet_cols[1]:
+            if metals_data and metals_data.get("prices"):
+                st.markdown(f"**Live Metals (spot, {code}/oz)**")
+                gold = metals_data["prices"].get("XAU")
+                silver = metals_data["prices"].get("XAG")
+                if gold:
+                    st.write(f"Gold: {format_currency(gold, symbol, rate)}")
+                if silver:
+                    st.write(f"Silver: {format_currency(silver, symbol, rate)}")
+                st.caption(f"Source: {METALS_SOURCE_LABELS.get(provider_active, 'Live')}")
+                if metals_updated:
+                    st.caption(f"Metals updated {format_provider_time(metals_updated, settings)}")
+            else:
+                st.markdown("**Live Metals**")
+                st.write("Choose a metals source in Settings to enable live pricing.")
+
+    market_snippets()
+
+def render_live_metals_panel(settings):
+    @st.fragment(run_every=get_live_panel_interval(settings, "metals"))
+    def live_metals_panel():
+        metals_data, provider_active, _ = load_live_metals(settings)
+        if not (metals_data and metals_data.get("prices")):
+            return
+        st.subheader("Live Metals Pricing")
+        st.caption(f"Source: {METALS_SOURCE_LABELS.get(provider_active, 'Live')}")
+        metal_cols = st.columns(4)
+        for idx, code in enumerate(["XAU", "XAG", "XPT", "XPD"]):
+            price = metals_data["prices"].get(code)
+            if price is None:
+                continue
+            display = format_currency(price, st.session_state.currency_symbol, st.session_state.currency_rate)
+            with metal_cols[idx % 4]:
+                st.metric(METAL_NAMES.get(code, code), display)
+
+    live_metals_panel()
+
+def render_top_movers(settings, assets, tickers):
+    @st.fragment(run_every=get_live_panel_interval(settings, "quotes"))
+    def top_movers():
+        snapshot = get_market_snapshot(tickers)
+        st.subheader("Top Movers (Tickers)")
+        movers = []
+        for asset in assets:
+            if asset.get("ticker"):
+                hist = get_snapshot_history(snapshot, asset["ticker"])
+                if not hist.empty:
+                    recent = hist["Close"].tail(30)
+                    avg_price = recent.mean() if not recent.empty else 0
+                    current_price = get_snapshot_price(snapshot, asset["ticker"])
+                    if avg_price > 0:
+                        pct = (current_price - avg_price) / avg_price * 100
+                        movers.append({
+                            "name": asset["name"],
+                            "ticker": asset["ticker"],
+                            "pct": pct,
+                            "price": current_price
+                        })
+        if movers:
+            movers.sort(key=lambda x: abs(x["pct"]), reverse=True)
+            if settings.get("notifications_enabled"):
+                threshold = float(settings.get("notification_threshold_pct", 5.0))
+                alerts = [m for m in movers if abs(m["pct"]) >= threshold]
+                if alerts:
+                    st.warning(f"{len(alerts)} alert(s): movement ≥ {threshold:.1f}%")
+            for mover in movers[:5]:
+                direction = "▲" if mover["pct"] >= 0 else "▼"
+                st.write(f"{direction} {mover['name']} ({mover['ticker']}): {mover['pct']:.1f}%")
+        else:
+            st.write("No ticker assets found.")
+
+    top_movers()
+
+def render_net_worth_card(settings, assets, tickers, liabilities, entity_view):
+    @st.fragment(run_every=get_live_panel_interval(settings, "metals"))
+    def net_worth_card():
+        # Revalue from the warmed FX, spot and quote data without rerunning the page
+        apply_live_fx(settings)
+        load_live_metals(settings)
+        apply_snapshot_prices(assets, get_market_snapshot(tickers))
+        total_all = get_total_assets_value(build_portfolio_valuation(assets), entity_view)
+        liabilities_total = get_total_liabilities_value(liabilities, entity_view)
+        net_worth = total_all - liabilities_total
+        symbol = st.session_state.currency_symbol
+        rate = st.session_state.currency_rate
+        st.markdown(f"""
+            <div style="background: linear-gradient(135deg, #d1a843 0%, #f2c66d 100%); 
+                        border-radius: 20px; padding: 2rem; margin-top: 2rem; 
+                        box-shadow: 0 10px 30px rgba(0,0,0,0.3); text-align: center;">
+                <p style="color: var(--text); margin: 0; font-size: 1.1rem; text-transform: uppercase; letter-spacing: 2px;">
+                    Net Worth
+                </p>
+                <div style="color: var(--text); font-size: 2.6rem; font-weight: 800; margin: 0.4rem 0;">
+                    {format_currency_html(net_worth, symbol, rate)}
+                </div>
+                <p style="color: var(--muted); margin: 0; font-size: 0.9rem;">
+                    Assets {format_currency_html(total_all, symbol, rate)} • Liabilities {format_currency_html(liabilities_total, symbol, rate)}
+                </p>
+            </div>
+        """, unsafe_allow_html=True)
+
+    net_worth_card()
+
+def render_bullion_spot_metrics(settings):
+    @st.fragment(run_every=get_live_panel_interval(settings, "metals"))
+    def bullion_spot_metrics():
+        metals_data, _, metals_updated = load_live_metals(settings)
+        prices = (metals_data or {}).get("prices") or {}
+        symbol = st.session_state.currency_symbol
+        rate = st.session_state.currency_rate
+        live_cols = st.columns(2)
+        gold_spot = prices.get("XAU")
+        silver_spot = prices.get("XAG")
+        if gold_spot is not None:
+            live_cols[0].metric("Gold Spot", format_currency(gold_spot, symbol, rate))
+        if silver_spot is not None:
+            live_cols[1].metric("Silver Spot", format_currency(silver_spot, symbol, rate))
+        if metals_updated:
+            st.caption(f"Updated {format_provider_time(metals_updated, settings)}")
+
+    bullion_spot_metrics()
+
+# ==============================
+# MAIN DASHBOARD HEADER
+# ==============================
+safe_user = escape_html(user)
+currency_code = st.session_state.currency_code
+currency_symbol = st.session_state.currency_symbol
+currency_rate = st.session_state.currency_rate
+now_local = get_now_for_settings(user_settings)
+last_updated_text = format_date_for_settings(now_local, user_settings)
+st.markdown("""
+    <div style="display: flex; justify-content: space-between; align-items: center; margin-bottom: 1rem;">
+        <div>
+            <h1 style="margin: 0;">WealthPulse</h1>
+            <p style="color: var(--muted); margin: 0;">Welcome back, """ + safe_user + """</p>
+        </div>
+        <div style="text-align: right;">
+            <p style="color: var(--muted); margin: 0; font-size: 0.9rem;">Last Updated</p>
+            <p style="color: var(--text); margin: 0; font-weight: 600;">""" + last_updated_text + """</p>
+        </div>
+    </div>
+""", unsafe_allow_html=True)
+render_plan_badge(user_settings)
+if pending_quote_tickers:
+    st.caption(
+        f"Loading prices for {', '.join(pending_quote_tickers[:5])}"
+        + (f" and {len(pending_quote_tickers) - 5} more" if len(pending_quote_tickers) > 5 else "")
+        + " in the background; saved prices are shown until they arrive."
+    )
+if FX_STATUS_NOTES.get(st.session_state.get("fx_status")):
+    st.caption(FX_STATUS_NOTES[st.session_state.fx_status])
+render_scroll_to_top()
+render_https_warning_banner()
+render_https_enforcement()
+render_gold_animation()
+render_gold_click_listener()
+
+# ==============================
+# ENHANCED TABS
+# ==============================
+tab_labels = [
+    "Portfolio",
+    "Bullion",
+    "Community",
+    "Analytics",
+    "Buy/Sell",
+    "Stats",
+    "Add Asset",
+    "Edit Items",
+    "Entities & Liabilities",
     "Settings",
     "Help"
 ]
 if st.session_state.get("is_admin"):
     tab_labels.append("Admin")
 
-tabs = st.tabs(tab_labels)
-tab1, bullion_tab, forum_tab, tab2, tab3, tab4, tab5, tab6, tab7, tab8, tab_help = tabs[:11]
-admin_tab = tabs[11] if len(tabs) > 11 else None
-
-tab_jump_index = None
-if st.session_state.get("jump_to_portfolio"):
-    tab_jump_index = 0
-    st.session_state.jump_to_portfolio = False
-if st.session_state.get("jump_to_bullion"):
-    tab_jump_index = 1
-    st.session_state.jump_to_bullion = False
-if st.session_state.get("jump_to_community"):
-    tab_jump_index = 2
-    st.session_state.jump_to_community = False
-if st.session_state.get("jump_to_modify"):
-    tab_jump_index = 7
-    st.session_state.jump_to_modify = False
-if st.session_state.get("jump_to_add_asset"):
-    tab_jump_index = 6
-    st.session_state.jump_to_add_asset = False
-if st.session_state.get("jump_to_entities"):
-    tab_jump_index = 8
-    st.session_state.jump_to_entities = False
-if st.session_state.get("jump_to_settings"):
-    tab_jump_index = 9
-    st.session_state.jump_to_settings = False
-if st.session_state.get("jump_to_help"):
-    tab_jump_index = 10
-    st.session_state.jump_to_help = False
-if st.session_state.get("jump_to_admin") and admin_tab is not None:
-    tab_jump_index = 11
-    st.session_state.jump_to_admin = False
-if tab_jump_index is not None:
-    components.html(f"""
-        <script>
-            (function() {{
-                const target = {tab_jump_index};
-                let tries = 0;
-                const timer = setInterval(() => {{
-                    const tabs = window.parent.document.querySelectorAll('button[data-baseweb="tab"], div[role="tab"]');
-                    if (tabs.length > target) {{
-                        tabs[target].click();
-                        clearInterval(timer);
-                    }}
-                    tries += 1;
-                    if (tries > 30) {{
-                        clearInterval(timer);
-                    }}
-                }}, 150);
-            }})();
-        </script>
-    """, height=0)
+# Only the active tab's body runs; the jump_to_* flags select it for the next render
+TAB_JUMP_FLAGS = [
+    ("jump_to_portfolio", "Portfolio"),
+    ("jump_to_bullion", "Bullion"),
+    ("jump_to_community", "Community"),
+    ("jump_to_modify", "Edit Items"),
+    ("jump_to_add_asset", "Add Asset"),
+    ("jump_to_entities", "Entities & Liabilities"),
+    ("jump_to_settings", "Settings"),
+    ("jump_to_help", "Help"),
+    ("jump_to_admin", "Admin")
+]
+for flag, label in TAB_JUMP_FLAGS:
+    if st.session_state.get(flag):
+        st.session_state[flag] = False
+        if label in tab_labels:
+            st.session_state.active_tab = label
+if st.session_state.get("active_tab") not in tab_labels:
+    st.session_state.active_tab = tab_labels[0]
+# Streamlit drops the state of widgets that were not rendered in a run, so with one tab
+# rendered at a time a draft would be lost on every tab switch. Keyed inputs that live
+# outside forms are mirrored into plain session keys and put back when their widget
+# returns. Unsubmitted form fields never reach the server and still reset on a switch.
+for key in TAB_DRAFT_KEYS:
+    if key in st.session_state:
+        st.session_state[TAB_DRAFT_PREFIX + key] = st.session_state[key]
+    elif TAB_DRAFT_PREFIX + key in st.session_state:
+        st.session_state[key] = st.session_state[TAB_DRAFT_PREFIX + key]
+with st.container(key="tab_router"):
+    active_tab = st.radio(
+        "Section",
+        tab_labels,
+        key="active_tab",
+        horizontal=True,
+        label_visibility="collapsed"
+    )
 
 # ==============================
 # TAB 1: PORTFOLIO (MODERNIZED WITH IMAGES)
 # ==============================
-with tab1:
+if active_tab == "Portfolio":
     panels = set(user_settings.get("dashboard_panels", []))
     if st.session_state.get("privacy_mode"):
         st.session_state.reveal_values = st.checkbox(
@@ -6204,99 +9696,13 @@ with tab1:
                     save_data(db)
                     st.success("You're all set. Welcome to WealthPulse!")
     if "Market Snippets" in panels:
-        st.subheader("Market Snippets")
-        snippet_cols = st.columns(2)
-        with snippet_cols[0]:
-            if st.session_state.currency_code != "USD":
-                st.markdown("**FX Rate**")
-                st.write(f"1 USD = {st.session_state.currency_code} {st.session_state.currency_rate:,.4f}")
-                if fx_last_updated:
-                    if isinstance(fx_last_updated, (int, float)):
-                        fx_time = datetime.fromtimestamp(fx_last_updated)
-                    else:
-                        try:
-                            fx_time = datetime.fromisoformat(str(fx_last_updated))
-                        except Exception:
-                            fx_time = get_now_for_settings(user_settings)
-                    st.caption(f"FX updated {format_date_for_settings(fx_time, user_settings)}")
-            else:
-                st.markdown("**FX Rate**")
-                st.write("USD base currency")
-        with snippet_cols[1]:
-            if live_metals_data and live_metals_data.get("prices"):
-                source_label = {
-                    "SilverPrice": "SilverPrice.org",
-                    "FreeGoldPrice": "FreeGoldPrice",
-                    "MetalpriceAPI": "MetalpriceAPI"
-                }.get(metals_provider_active, "Live")
-                st.markdown(f"**Live Metals (spot, {currency_code}/oz)**")
-                gold = live_metals_data["prices"].get("XAU")
-                silver = live_metals_data["prices"].get("XAG")
-                if gold:
-                    st.write(f"Gold: {format_currency(gold, currency_symbol, currency_rate)}")
-                if silver:
-                    st.write(f"Silver: {format_currency(silver, currency_symbol, currency_rate)}")
-                st.caption(f"Source: {source_label}")
-                if metals_last_updated:
-                    if isinstance(metals_last_updated, (int, float)):
-                        metals_time = datetime.fromtimestamp(metals_last_updated)
-                    else:
-                        try:
-                            metals_time = datetime.fromisoformat(str(metals_last_updated))
-                        except Exception:
-                            metals_time = get_now_for_settings(user_settings)
-                    st.caption(f"Metals updated {format_date_for_settings(metals_time, user_settings)}")
-            else:
-                st.markdown("**Live Metals**")
-                st.write("Choose a metals source in Settings to enable live pricing.")
+        render_market_snippets(user_settings)
 
-    if "Live Metals" in panels and live_metals_data and live_metals_data.get("prices"):
-        st.subheader("Live Metals Pricing")
-        source_label = {
-            "SilverPrice": "SilverPrice.org",
-            "FreeGoldPrice": "FreeGoldPrice",
-            "MetalpriceAPI": "MetalpriceAPI"
-        }.get(metals_provider_active, "Live")
-        st.caption(f"Source: {source_label}")
-        metal_cols = st.columns(4)
-        for idx, code in enumerate(["XAU", "XAG", "XPT", "XPD"]):
-            price = live_metals_data["prices"].get(code)
-            if price is None:
-                continue
-            display = format_currency(price, currency_symbol, currency_rate)
-            with metal_cols[idx % 4]:
-                st.metric(METAL_NAMES.get(code, code), display)
+    if "Live Metals" in panels:
+        render_live_metals_panel(user_settings)
 
     if "Top Movers" in panels:
-        st.subheader("Top Movers (Tickers)")
-        movers = []
-        for asset in portfolio:
-            if asset.get("ticker"):
-                hist = get_history(asset["ticker"])
-                if not hist.empty:
-                    recent = hist["Close"].tail(30)
-                    avg_price = recent.mean() if not recent.empty else 0
-                    current_price = get_price(asset["ticker"])
-                    if avg_price > 0:
-                        pct = (current_price - avg_price) / avg_price * 100
-                        movers.append({
-                            "name": asset["name"],
-                            "ticker": asset["ticker"],
-                            "pct": pct,
-                            "price": current_price
-                        })
-        if movers:
-            movers.sort(key=lambda x: abs(x["pct"]), reverse=True)
-            if user_settings.get("notifications_enabled"):
-                threshold = float(user_settings.get("notification_threshold_pct", 5.0))
-                alerts = [m for m in movers if abs(m["pct"]) >= threshold]
-                if alerts:
-                    st.warning(f"{len(alerts)} alert(s): movement ≥ {threshold:.1f}%")
-            for mover in movers[:5]:
-                direction = "▲" if mover["pct"] >= 0 else "▼"
-                st.write(f"{direction} {mover['name']} ({mover['ticker']}): {mover['pct']:.1f}%")
-        else:
-            st.write("No ticker assets found.")
+        render_top_movers(user_settings, portfolio, portfolio_tickers)
 
     if "Stock News" in panels:
         st.subheader("Stock News")
@@ -6361,7 +9767,7 @@ with tab1:
                 view_mode = st.radio("View", ["Grid", "List"], horizontal=True, index=default_index)
         
         # Build view items (with bullion rollups for display)
-        view_items = build_portfolio_view_items(portfolio, selected_view)
+        view_items = build_portfolio_view_items(portfolio, portfolio_valuation, selected_view)
         bullion_rollups = {}
         display_portfolio = []
         for item in view_items:
@@ -6387,8 +9793,7 @@ with tab1:
                     agg["qty"] += float(asset.get("qty", 1)) * share
                 except Exception:
                     agg["qty"] += share
-                value, _, _ = ai_valuation(asset)
-                agg["value"] += value * share
+                agg["value"] += item["value"] * share
                 continue
             display_portfolio.append({
                 **item,
@@ -6434,7 +9839,7 @@ with tab1:
                     int(item.get("override_confidence", 50)),
                     item.get("override_explanation", "Combined bullion items.")
                 )
-            return ai_valuation(item["asset"])
+            return item["value"], item["confidence"], valuation_explanation(item["asset"]["condition"])
 
         if sort_by == "Value (High-Low)":
             display_portfolio.sort(key=lambda x: get_item_valuation(x)[0] * x["share"], reverse=True)
@@ -6445,14 +9850,6 @@ with tab1:
         elif sort_by == "Date Added":
             display_portfolio.sort(key=lambda x: parse_added_date(x["asset"].get("added", "")), reverse=True)
 
-        for asset in portfolio:
-            if asset.get("ticker"):
-                asset["market_price"] = get_price(asset["ticker"])
-
-        total_all = sum(ai_valuation(item["asset"])[0] * item["share"] for item in view_items)
-        liabilities_total = get_total_liabilities_value(liabilities, selected_view)
-        net_worth = total_all - liabilities_total
-        
         if view_mode == "Grid":
             cols = st.columns(3)
             for idx, item in enumerate(display_portfolio):
@@ -6464,7 +9861,7 @@ with tab1:
                 view_value = value * share
                 with cols[idx % 3]:
                     with st.container():
-                        image = get_asset_image(asset)
+                        image = get_asset_image(asset, size=480)
                         safe_name = escape_html(asset.get("name", ""))
                         safe_type = escape_html(asset.get("type", ""))
                         safe_condition = escape_html(asset.get("condition", ""))
@@ -6525,7 +9922,7 @@ with tab1:
                 item_key = item.get("key") or f"asset:{asset_index}"
                 value, _, _ = get_item_valuation(item)
                 view_value = value * share
-                image = get_asset_image(asset)
+                image = get_asset_image(asset, size=160)
                 safe_name = escape_html(asset.get("name", ""))
                 safe_type = escape_html(asset.get("type", ""))
                 safe_condition = escape_html(asset.get("condition", ""))
@@ -6561,30 +9958,16 @@ with tab1:
                     apply_card_click_overlay(marker_id)
 
         # Total wealth card
-        st.markdown(f"""
-            <div style="background: linear-gradient(135deg, #d1a843 0%, #f2c66d 100%); 
-                        border-radius: 20px; padding: 2rem; margin-top: 2rem; 
-                        box-shadow: 0 10px 30px rgba(0,0,0,0.3); text-align: center;">
-                <p style="color: var(--text); margin: 0; font-size: 1.1rem; text-transform: uppercase; letter-spacing: 2px;">
-                    Net Worth
-                </p>
-                <div style="color: var(--text); font-size: 2.6rem; font-weight: 800; margin: 0.4rem 0;">
-                    {format_currency_html(net_worth, currency_symbol, currency_rate)}
-                </div>
-                <p style="color: var(--muted); margin: 0; font-size: 0.9rem;">
-                    Assets {format_currency_html(total_all, currency_symbol, currency_rate)} • Liabilities {format_currency_html(liabilities_total, currency_symbol, currency_rate)}
-                </p>
-            </div>
-        """, unsafe_allow_html=True)
+        render_net_worth_card(user_settings, portfolio, portfolio_tickers, liabilities, selected_view)
 
     # Edit/Delete actions are handled in the Edit Items tab
 
 # ==============================
 # TAB 2: ANALYTICS & CHARTS
 # ==============================
-with tab2:
+if active_tab == "Analytics":
     entity_view = st.session_state.get("portfolio_entity_view", "All")
-    view_items = build_portfolio_view_items(portfolio, entity_view)
+    view_items = build_portfolio_view_items(portfolio, portfolio_valuation, entity_view)
     if entity_view != "All":
         st.caption(f"Viewing: {entity_view}")
     if not view_items:
@@ -6599,10 +9982,7 @@ with tab2:
         for item in view_items:
             asset = item["asset"]
             share = item["share"]
-            if asset.get("ticker"):
-                asset["market_price"] = get_price(asset["ticker"])
-            value, _, _ = ai_valuation(asset)
-            value_display = format_currency_value(value * share, currency_rate)
+            value_display = format_currency_value(item["value"] * share, currency_rate)
             asset_values.append(value_display)
             asset_types[asset["type"]] = asset_types.get(asset["type"], 0) + value_display
             asset_names.append(asset["name"])
@@ -6726,7 +10106,7 @@ with tab2:
             share = item["share"]
             cost_basis = asset.get("details", {}).get("cost_basis")
             if cost_basis:
-                current_value, _, _ = ai_valuation(asset)
+                current_value = item["value"]
                 cost_rows.append({
                     "Asset": asset["name"],
                     "Cost Basis": format_currency_value(float(cost_basis) * share, currency_rate),
@@ -6769,7 +10149,7 @@ with tab2:
                 asset = item["asset"]
                 share = item["share"]
                 if asset.get("ticker"):
-                    hist = get_detailed_history(asset["ticker"], "1y")
+                    hist = get_snapshot_history(market_snapshot, asset["ticker"]).copy()
                     if not hist.empty:
                         hist["Portfolio_Value"] = hist["Close"] * asset["qty"] * currency_rate * share
                         if combined_history.empty:
@@ -6817,21 +10197,21 @@ with tab2:
 # ==============================
 # TAB 3: BUY/SELL GUIDE
 # ==============================
-with tab3:
+if active_tab == "Buy/Sell":
     if not has_plan_at_least(user_settings, "Pro"):
         render_plan_gate(user_settings, "Pro", "Buy/Sell Guidance", "Upgrade to unlock buy/sell intelligence and recommendations.", key="gate_buysell")
     else:
         st.subheader("Intelligent Buy/Sell Recommendations")
         entity_view = st.session_state.get("portfolio_entity_view", "All")
-        view_items = build_portfolio_view_items(portfolio, entity_view)
+        view_items = build_portfolio_view_items(portfolio, portfolio_valuation, entity_view)
         if entity_view != "All":
             st.caption(f"Viewing: {entity_view}")
 
         for idx, item in enumerate(view_items):
             asset = item["asset"]
             if asset.get("ticker"):
-                current_price = get_price(asset["ticker"])
-                hist = get_detailed_history(asset["ticker"], "1y")
+                current_price = get_snapshot_price(market_snapshot, asset["ticker"])
+                hist = get_snapshot_history(market_snapshot, asset["ticker"])
         
                 if not hist.empty:
                     high_52w = hist["High"].max()
@@ -6908,8 +10288,8 @@ with tab3:
                                 st.line_chart(hist_display["Close"])
             else:
                 # Physical assets guidance
-                value, confidence, _ = ai_valuation(asset)
-                image = get_asset_image(asset)
+                value, confidence = item["value"], item["confidence"]
+                image = get_asset_image(asset, size=160)
                 safe_name = escape_html(asset.get("name", ""))
                 value_html = format_currency_html(value, currency_symbol, currency_rate)
                 with st.container():
@@ -6932,16 +10312,16 @@ with tab3:
 # ==============================
 # TAB 4: PORTFOLIO STATS
 # ==============================
-with tab4:
+if active_tab == "Stats":
     if not has_plan_at_least(user_settings, "Pro"):
         render_plan_gate(user_settings, "Pro", "Portfolio Stats", "Upgrade to unlock detailed stats and planning snapshots.", key="gate_stats")
     else:
         col1, col2, col3, col4 = st.columns(4)
         entity_view = st.session_state.get("portfolio_entity_view", "All")
-        view_items = build_portfolio_view_items(portfolio, entity_view)
+        view_items = build_portfolio_view_items(portfolio, portfolio_valuation, entity_view)
         if entity_view != "All":
             st.caption(f"Viewing: {entity_view}")
-        total_value = sum(ai_valuation(item["asset"])[0] * item["share"] for item in view_items)
+        total_value = get_total_assets_value(portfolio_valuation, entity_view)
         total_assets = len(view_items)
         physical_assets = len([item for item in view_items if not item["asset"].get("ticker")])
         financial_assets = total_assets - physical_assets
@@ -6961,8 +10341,7 @@ with tab4:
         for item in view_items:
             asset = item["asset"]
             t = asset["type"]
-            val, _, _ = ai_valuation(asset)
-            val *= item["share"]
+            val = item["value"] * item["share"]
             if t not in type_stats:
                 type_stats[t] = {"count": 0, "value": 0}
             type_stats[t]["count"] += 1
@@ -7077,10 +10456,10 @@ with tab4:
         st.subheader("Entity & Custody Breakdown")
         if entity_view == "All":
             entity_stats = {}
-            for asset in portfolio:
+            asset_values = portfolio_valuation["table"]["value"]
+            for asset, val in zip(portfolio, asset_values):
                 wealth = asset.get("wealth", {})
                 split = wealth.get("ownership_split") if isinstance(wealth.get("ownership_split"), dict) else {}
-                val, _, _ = ai_valuation(asset)
                 if split:
                     for ent_name, pct in split.items():
                         try:
@@ -7150,20 +10529,15 @@ with tab4:
 # ==============================
 # TAB 5: ADD ASSET (ENHANCED WITH AUTO-IMAGE)
 # ==============================
-with tab5:
+if active_tab == "Add Asset":
     st.subheader("Add New Asset")
 
     name = st.text_input("Asset Name", key="asset_name", placeholder="e.g., Vintage Rolex")
     query = (name or "").strip()
     suggestions = []
     if len(query) >= 2:
-        cache_key = f"suggest_{query.lower()}"
-        cached = get_cache(cache_key, 600)
-        if cached is not None:
-            suggestions = cached
-        else:
-            with st.spinner("Searching..."):
-                suggestions = get_asset_suggestions(query, user_settings, portfolio)
+        with st.spinner("Searching..."):
+            suggestions = get_asset_suggestions(query, user_settings, portfolio)
     if suggestions:
         selection = st.selectbox("Search Results", ["Select a result..."] + suggestions, key="asset_name_suggestion")
         st.caption("Results ranked by relevance.")
@@ -7234,13 +10608,14 @@ with tab5:
             if not name_value:
                 st.error("Please enter an asset name")
             else:
-                # Store uploaded images as base64 so they can be persisted in JSON
+                # Uploaded images go to the blob store; the record keeps hash references
                 img_list = encode_uploaded_images(images) if images else []
                 
                 # Always keep a fallback image URL
                 img_url = search_asset_image(name_value)
                 
                 portfolio.append({
+                    "id": secrets.token_hex(6),
                     "name": name_value,
                     "type": asset_type,
                     "qty": qty,
@@ -7271,7 +10646,7 @@ with tab5:
 # ==============================
 # TAB 6: EDIT ASSETS
 # ==============================
-with tab6:
+if active_tab == "Edit Items":
     st.subheader("Edit Existing Assets")
     render_delete_confirmation(portfolio, currency_symbol, currency_rate)
     
@@ -7286,7 +10661,8 @@ with tab6:
             st.warning("Warning: This action cannot be undone!")
             
             # List all assets for selection
-            asset_options = {f"{i+1}. {asset['name']} - {asset['type']} ({format_currency(ai_valuation(asset)[0], currency_symbol, currency_rate)})": i 
+            asset_values = portfolio_valuation["table"]["value"]
+            asset_options = {f"{i+1}. {asset['name']} - {asset['type']} ({format_currency(asset_values[i], currency_symbol, currency_rate)})": i 
                             for i, asset in enumerate(portfolio)}
             
             selected_assets = st.multiselect(
@@ -7337,7 +10713,7 @@ with tab6:
                 st.markdown(f"**Type:** {asset['type']}")
                 st.markdown(f"**Quantity:** {asset['qty']}")
                 
-                image = get_asset_image(asset)
+                image = get_asset_image(asset, size=480)
                 st.image(image["bytes"], caption="Current Image", width=200)
             
             with col2:
@@ -7345,7 +10721,7 @@ with tab6:
                 if asset.get("ticker"):
                     st.markdown(f"**Ticker:** {asset['ticker']}")
                 st.markdown(f"**Market Price:** {format_currency(get_effective_market_price(asset), currency_symbol, currency_rate)}")
-                st.markdown(f"**AI Valuation:** {format_currency(ai_valuation(asset)[0], currency_symbol, currency_rate)}")
+                st.markdown(f"**AI Valuation:** {format_currency(get_asset_valuation(portfolio_valuation, asset_index)[0], currency_symbol, currency_rate)}")
                 if asset.get("details"):
                     render_details_list(asset.get("details"), currency_symbol, currency_rate, weight_unit)
                 if asset.get("wealth"):
@@ -7465,7 +10841,7 @@ with tab6:
 # ==============================
 # TAB 7: ENTITIES & LIABILITIES
 # ==============================
-with tab7:
+if active_tab == "Entities & Liabilities":
     st.subheader("Entities & Liabilities")
 
     entities = user_record.get("entities", [])
@@ -7483,7 +10859,7 @@ with tab7:
     if extra_entities:
         entity_stat_names.extend(sorted(extra_entities))
 
-    total_assets_all = get_total_assets_value(portfolio, "All")
+    total_assets_all = get_total_assets_value(portfolio_valuation, "All")
     total_liabilities_all = get_total_liabilities_value(liabilities, "All")
     net_worth_all = total_assets_all - total_liabilities_all
     debt_ratio = (total_liabilities_all / total_assets_all * 100) if total_assets_all else 0.0
@@ -7523,7 +10899,7 @@ with tab7:
     st.markdown("### Entity Statements")
     entity_statement_rows = []
     for entity_name in entity_stat_names:
-        assets_value = get_total_assets_value(portfolio, entity_name)
+        assets_value = get_total_assets_value(portfolio_valuation, entity_name)
         liab_value = get_total_liabilities_value(liabilities, entity_name)
         net_value = assets_value - liab_value
         insured_value = 0.0
@@ -7546,7 +10922,7 @@ with tab7:
 
     for entity_name in entity_stat_names:
         with st.expander(f"{entity_name} Statement"):
-            assets_value = get_total_assets_value(portfolio, entity_name)
+            assets_value = get_total_assets_value(portfolio_valuation, entity_name)
             liab_value = get_total_liabilities_value(liabilities, entity_name)
             net_value = assets_value - liab_value
             st.write(f"**Assets:** {format_currency(assets_value, currency_symbol, currency_rate)}")
@@ -7554,11 +10930,9 @@ with tab7:
             st.write(f"**Net Worth:** {format_currency(net_value, currency_symbol, currency_rate)}")
 
             asset_rows = []
-            for asset in portfolio:
-                share = get_asset_share(asset, entity_name)
-                if share <= 0:
-                    continue
-                value, _, _ = ai_valuation(asset)
+            entity_valuation = get_valuation_view(portfolio_valuation, entity_name)
+            for idx, share, value in zip(entity_valuation.index, entity_valuation["share"], entity_valuation["value"]):
+                asset = portfolio[idx]
                 wealth = asset.get("wealth", {})
                 asset_rows.append({
                     "Asset": asset.get("name", ""),
@@ -8162,9 +11536,8 @@ with tab7:
     st.markdown("---")
     st.markdown("### Estate & Beneficiary Export")
     estate_assets = []
-    for asset in portfolio:
+    for asset, value in zip(portfolio, portfolio_valuation["table"]["value"]):
         wealth = asset.get("wealth", {})
-        value, _, _ = ai_valuation(asset)
         ownership_split = wealth.get("ownership_split") if isinstance(wealth.get("ownership_split"), dict) else {}
         split_text = ", ".join([f"{k}:{v}%" for k, v in ownership_split.items()]) if ownership_split else ""
         estate_assets.append({
@@ -8258,7 +11631,7 @@ with tab7:
 # ==============================
 # TAB 8: SETTINGS
 # ==============================
-with tab8:
+if active_tab == "Settings":
     st.subheader("Settings")
     st.markdown("Configure your display currency, live data, and preferences.")
 
@@ -8412,6 +11785,9 @@ with tab8:
     storage_provider_secret = bool(get_secret_value("APP_STORAGE_PROVIDER")) or secret_flag("SUPABASE_APP_STORAGE", False)
     storage_provider_options = ["Local", "Supabase"]
     storage_provider_index = 1 if storage_provider_current.lower().startswith("supabase") else 0
+    if app_storage_sqlite():
+        storage_provider_options.append("SQLite")
+        storage_provider_index = 2
     storage_provider = st.selectbox(
         "Core app storage",
         storage_provider_options,
@@ -8469,8 +11845,43 @@ with tab8:
         st.info("App is open access, but policy mode says Auth required. Open policies or change the app setting.")
     if community_policy_mode_setting == "open":
         st.caption("To enable open access, uncomment the 'Open community access' block in supabase_community_schema.sql and run it in Supabase SQL editor.")
+    if storage_provider == "SQLite":
+        st.caption(
+            f"Uses `{os.path.basename(APP_STORAGE_DB_FILE)}` (WAL mode) for user data; "
+            "each asset, liability, entity and setting is its own row."
+        )
+        if st.session_state.get("is_admin"):
+            import_overwrite = st.checkbox(
+                "Overwrite records that already exist in SQLite",
+                value=False,
+                key="import_sqlite_overwrite"
+            )
+            import_confirm = st.checkbox(
+                f"I understand this copies every account in `{os.path.basename(DATA_FILE)}` into SQLite"
+                + (", replacing the stored copies." if import_overwrite else "."),
+                key="import_sqlite_confirm"
+            )
+            if st.button("Import wealth_data.json into SQLite", key="import_sqlite_storage"):
+                if not import_confirm:
+                    st.warning("Please confirm the import first.")
+                else:
+                    import_stats, import_err = import_json_to_sqlite(DATA_FILE, skip_existing=not import_overwrite)
+                    if import_err:
+                        st.error(f"Import failed: {import_err}")
+                    else:
+                        skipped = len(import_stats["skipped"])
+                        st.success(
+                            f"Imported {import_stats['records']} record(s); {import_stats['rows']} row(s) changed"
+                            + (f"; {skipped} already in SQLite were kept." if skipped else ".")
+                        )
     if storage_provider == "Supabase":
-        st.caption(f"Uses Supabase table `{APP_STORAGE_TABLE}` for user data.")
+        if app_storage_normalized():
+            st.caption(
+                f"Uses Supabase table `{APP_STORAGE_TABLE}` for user data; assets, liabilities, entities and settings "
+                f"are rows in `{'`, `'.join(APP_STORAGE_ITEM_TABLES.values())}` and `{APP_STORAGE_SETTINGS_TABLE}`."
+            )
+        else:
+            st.caption(f"Uses Supabase table `{APP_STORAGE_TABLE}` for user data.")
         if not supabase_enabled(community_settings):
             st.warning("Supabase keys not configured. App storage cannot switch to Supabase yet.")
         if supabase_use_service_role and not get_effective_setting(community_settings, "supabase_service_key", "SUPABASE_SERVICE_KEY"):
@@ -8485,11 +11896,33 @@ with tab8:
                     st.error(f"App storage check failed: {err}")
         with test_cols[1]:
             if st.button("Sync Local Data to Supabase", key="sync_app_storage"):
-                sync_err = sync_db_to_supabase(community_settings, db)
+                sync_stats = {"requests": 0, "bytes": 0, "skipped": 0}
+                sync_results, sync_err = sync_records_to_supabase(
+                    community_settings,
+                    {key: json.loads(text) for key, (text, _) in load_local_record_entries().items()},
+                    stats=sync_stats
+                )
                 if sync_err:
                     st.error(f"Sync failed: {sync_err}")
                 else:
-                    st.success("Local data synced to Supabase.")
+                    synced_count = sum(1 for _, ok, _ in sync_results if ok)
+                    st.success(
+                        f"Local data synced to Supabase: {synced_count} record(s) in {sync_stats['requests']} request(s), "
+                        f"{sync_stats['skipped']} unchanged."
+                    )
+                    failed_results = [item for item in sync_results if not item[1]]
+                    if failed_results:
+                        render_checklist_results(failed_results)
+        if app_storage_normalized() and st.button("Split Supabase records into rows", key="normalize_app_storage"):
+            migrate_stats, migrate_err = migrate_storage_to_normalized(community_settings)
+            if migrate_stats is None:
+                st.error(f"Migration failed: {migrate_err}")
+            else:
+                migrate_message = f"Split {migrate_stats['records']} record(s) into {migrate_stats['rows']} row(s)."
+                if migrate_err:
+                    st.warning(f"{migrate_message} {migrate_err}")
+                else:
+                    st.success(migrate_message)
         with st.expander("Deployment Security Checklist"):
             st.markdown(
                 "- Store all keys in `.streamlit/secrets.toml` (API keys + Supabase keys).\n"
@@ -8497,7 +11930,8 @@ with tab8:
                 "- Run the updated `supabase_community_schema.sql` to enable RLS policies.\n"
                 "- Optional: uncomment the strict `service_role` policies block in the SQL to lock down community tables.\n"
                 "- Set `SUPABASE_AUTH_REQUIRED = true` to enforce per-user Community access.\n"
-                "- Set `APP_STORAGE_PROVIDER = \"Supabase\"` to move user data off local JSON."
+                "- Set `APP_STORAGE_PROVIDER = \"Supabase\"` to move user data off local JSON.\n"
+                "- Set `APP_STORAGE_NORMALIZED = true` (after running the SQL) to save assets and settings row by row."
             )
 
     auto_refresh_enabled_input = st.checkbox("Enable auto-refresh", value=settings.get("auto_refresh_enabled", True))
@@ -8507,8 +11941,7 @@ with tab8:
         value=int(settings.get("auto_refresh_interval", 70)),
         step=10
     )
-    if auto_refresh_enabled_input and not AUTOREFRESH_AVAILABLE:
-        st.warning("Auto-refresh requires the streamlit-autorefresh package.")
+    st.caption("Live price panels refresh on their own; the rest of the page is not re-run.")
 
     freegoldprice_effective = get_effective_setting(settings, "freegoldprice_api_key", "FREEGOLDPRICE_API_KEY")
     metalprice_effective = get_effective_setting(settings, "metalprice_api_key", "METALPRICE_API_KEY")
@@ -9004,6 +12437,7 @@ with tab8:
             "market_alerts_interval": int(market_alerts_interval),
             "market_alerts_email_enabled": bool(market_alerts_email_enabled),
             "market_alerts_push_enabled": bool(market_alerts_push_enabled),
+            "market_alerts_seen_at": settings.get("market_alerts_seen_at", ""),
             "market_alert_email": market_alert_email.strip(),
             "smtp_host": smtp_host_to_save,
             "smtp_port": int(smtp_port_to_save),
@@ -9042,369 +12476,387 @@ with tab8:
 # ==============================
 # TAB 9: HELP
 # ==============================
-if tab_help is not None:
-    with tab_help:
-        st.subheader("Help & Quick Guide")
-        st.caption("Questions or feedback? Email wealthpulse@outlook.co.nz.")
+@st.fragment
+def render_help_tab():
+    st.subheader("Help & Quick Guide")
+    st.caption("Questions or feedback? Email wealthpulse@outlook.co.nz.")
 
-        st.markdown("### Start Here")
-        st.markdown(
-            """
-            <div class="help-grid">
-                <div class="help-card">
-                    <div class="help-card-title">1. Settings</div>
-                    <div class="help-card-body">Set currency, theme, font size, and data sources before you add assets.</div>
-                </div>
-                <div class="help-card">
-                    <div class="help-card-title">2. Add Assets</div>
-                    <div class="help-card-body">Add items, choose a type, and fill the details that matter to you.</div>
-                </div>
-                <div class="help-card">
-                    <div class="help-card-title">3. Entities</div>
-                    <div class="help-card-body">Separate Personal, Trust, and Business assets for a true net worth view.</div>
-                </div>
-                <div class="help-card">
-                    <div class="help-card-title">4. Review</div>
-                    <div class="help-card-body">Use Portfolio, Analytics, and Stats to monitor your progress.</div>
-                </div>
+    st.markdown("### Start Here")
+    st.markdown(
+        """
+        <div class="help-grid">
+            <div class="help-card">
+                <div class="help-card-title">1. Settings</div>
+                <div class="help-card-body">Set currency, theme, font size, and data sources before you add assets.</div>
             </div>
-            """,
-            unsafe_allow_html=True
-        )
+            <div class="help-card">
+                <div class="help-card-title">2. Add Assets</div>
+                <div class="help-card-body">Add items, choose a type, and fill the details that matter to you.</div>
+            </div>
+            <div class="help-card">
+                <div class="help-card-title">3. Entities</div>
+                <div class="help-card-body">Separate Personal, Trust, and Business assets for a true net worth view.</div>
+            </div>
+            <div class="help-card">
+                <div class="help-card-title">4. Review</div>
+                <div class="help-card-body">Use Portfolio, Analytics, and Stats to monitor your progress.</div>
+            </div>
+        </div>
+        """,
+        unsafe_allow_html=True
+    )
 
-        st.markdown("### Quick Checklist")
+    st.markdown("### Quick Checklist")
+    st.markdown(
+        "1. Confirm currency and theme in `Settings`.\n"
+        "2. Add your first asset in `Add Asset`.\n"
+        "3. Create an entity in `Entities & Liabilities`.\n"
+        "4. Check `Portfolio` and `Analytics` for your totals.\n"
+        "5. Optional: Post a listing in `Community`."
+    )
+
+    st.markdown("### Navigation Tips")
+    st.markdown(
+        "- The top buttons jump directly to `Settings`, `Feedback / Bugs`, `Help`, and `Log Out`.\n"
+        "- Tabs organize the app by workflow. Use `Settings` to customize what panels appear."
+    )
+
+    st.markdown("### Tab Guide")
+    with st.expander("Portfolio"):
         st.markdown(
-            "1. Confirm currency and theme in `Settings`.\n"
-            "2. Add your first asset in `Add Asset`.\n"
-            "3. Create an entity in `Entities & Liabilities`.\n"
-            "4. Check `Portfolio` and `Analytics` for your totals.\n"
-            "5. Optional: Post a listing in `Community`."
+            "- View total net worth, panels, and quick summaries.\n"
+            "- Filter by entity using `Portfolio View`.\n"
+            "- Select an item to see detailed information.\n"
+            "- Use privacy mode to hide values when sharing."
         )
-
-        st.markdown("### Navigation Tips")
+    with st.expander("Bullion"):
         st.markdown(
-            "- The top buttons jump directly to `Settings`, `Feedback / Bugs`, `Help`, and `Log Out`.\n"
-            "- Tabs organize the app by workflow. Use `Settings` to customize what panels appear."
+            "- See live metals pricing and bullion summaries.\n"
+            "- Bullion holdings are grouped by metal type.\n"
+            "- News section pulls gold/silver/copper headlines when enabled."
         )
-
-        st.markdown("### Tab Guide")
-        with st.expander("Portfolio"):
-            st.markdown(
-                "- View total net worth, panels, and quick summaries.\n"
-                "- Filter by entity using `Portfolio View`.\n"
-                "- Select an item to see detailed information.\n"
-                "- Use privacy mode to hide values when sharing."
-            )
-        with st.expander("Bullion"):
-            st.markdown(
-                "- See live metals pricing and bullion summaries.\n"
-                "- Bullion holdings are grouped by metal type.\n"
-                "- News section pulls gold/silver/copper headlines when enabled."
-            )
-        with st.expander("Community"):
-            st.markdown(
-                "- Browse listings with filters, sort, and watchlist.\n"
-                "- Create listings with photos (max 5) and required country.\n"
-                "- Auctions support bids, reserve, and buy-now (if enabled).\n"
-                "- Private messages connect buyers and sellers.\n"
-                "- Community rules block explicit or abusive content."
-            )
-        with st.expander("Analytics"):
-            st.markdown(
-                "- Review portfolio breakdowns, trends, and charts.\n"
-                "- Uses your selected currency and FX settings."
-            )
-        with st.expander("Buy/Sell"):
-            st.markdown(
-                "- Auto recommendations for assets with tickers.\n"
-                "- Uses price history to highlight buy/hold/sell ranges."
-            )
-        with st.expander("Stats"):
-            st.markdown(
-                "- Summary statistics for assets, types, and valuations.\n"
-                "- Helpful for quick health checks."
-            )
-        with st.expander("Add Asset"):
-            st.markdown(
-                "- Search and select asset names with suggestions.\n"
-                "- Fill in type details and wealth management fields.\n"
-                "- Upload photos and add notes.\n"
-                "- Add to portfolio and return to the main view."
-            )
-        with st.expander("Edit Items"):
-            st.markdown(
-                "- Select an asset to edit name, type, pricing, or details.\n"
-                "- Update images or notes.\n"
-                "- Delete assets with confirmation or use bulk delete."
-            )
-        with st.expander("Entities & Liabilities"):
-            st.markdown(
-                "- Create entities (Personal, Trust, Company, etc.).\n"
-                "- Assign ownership and split percentages.\n"
-                "- Track liabilities and view entity statements."
-            )
-        with st.expander("Settings"):
-            st.markdown(
-                "- Choose currency, theme, font size, and auto-refresh.\n"
-                "- Configure metals, FX, and news sources.\n"
-                "- Manage Community access mode and Supabase settings.\n"
-                "- Export or import your data."
-            )
-        if st.session_state.get("is_admin"):
-            with st.expander("Admin"):
-                st.markdown(
-                    "- View local usage stats and revenue tracking.\n"
-                    "- Respond to user feedback and reset passwords.\n"
-                    "- Moderate community content when enabled."
-                )
-
-        st.markdown("### Common Issues")
+    with st.expander("Community"):
         st.markdown(
-            "1. Prices not updating: check `Settings` → API keys and live data source.\n"
-            "2. Community blocked: confirm Supabase keys and Community access mode.\n"
-            "3. Light theme readability: adjust font size or switch theme in `Settings`."
+            "- Browse listings with filters, sort, and watchlist.\n"
+            "- Create listings with photos (max 5) and required country.\n"
+            "- Auctions support bids, reserve, and buy-now (if enabled).\n"
+            "- Private messages connect buyers and sellers.\n"
+            "- Community rules block explicit or abusive content."
         )
-
-        st.markdown("### API Key Links")
+    with st.expander("Analytics"):
         st.markdown(
-            "[SilverPrice.org](https://silverprice.org) • "
-            "[FreeGoldPrice](https://freegoldprice.com) • "
-            "[MetalpriceAPI](https://metalpriceapi.com) • "
-            "[Metals.dev](https://metals.dev) • "
-            "[Frankfurter](https://www.frankfurter.app) • "
-            "[NewsAPI](https://newsapi.org) • "
-            "[eBay Developers](https://developer.ebay.com) • "
-            "[Reverb API](https://www.reverb.com/developers)"
+            "- Review portfolio breakdowns, trends, and charts.\n"
+            "- Uses your selected currency and FX settings."
         )
-
-        st.markdown("### Support")
+    with st.expander("Buy/Sell"):
         st.markdown(
-            "- Feedback or bug reports: wealthpulse@outlook.co.nz\n"
-            "- Use the Feedback form in Settings for direct submission."
+            "- Auto recommendations for assets with tickers.\n"
+            "- Uses price history to highlight buy/hold/sell ranges."
         )
-
-        guide_lines = [
-            "1. Settings: set currency, theme, and data sources.",
-            "2. Add Asset: enter details and save.",
-            "3. Entities: separate Personal, Trust, and Business ownership.",
-            "4. Portfolio/Analytics: monitor totals and trends.",
-            "5. Community: browse or post listings with photos.",
-            "Support: wealthpulse@outlook.co.nz"
-        ]
-        guide_text = "WealthPulse Quick Guide\n------------------------\n" + "\n".join(guide_lines) + "\n"
-        pdf_data = build_simple_pdf(guide_lines)
-        st.download_button(
-            "Download Quick Guide (TXT)",
-            data=guide_text,
-            file_name="wealthpulse_quick_guide.txt",
-            mime="text/plain",
-            width="content"
+    with st.expander("Stats"):
+        st.markdown(
+            "- Summary statistics for assets, types, and valuations.\n"
+            "- Helpful for quick health checks."
         )
-        st.download_button(
-            "Download Quick Guide (PDF)",
-            data=pdf_data,
-            file_name="wealthpulse_quick_guide.pdf",
-            mime="application/pdf",
-            width="content"
+    with st.expander("Add Asset"):
+        st.markdown(
+            "- Search and select asset names with suggestions.\n"
+            "- Fill in type details and wealth management fields.\n"
+            "- Upload photos and add notes.\n"
+            "- Add to portfolio and return to the main view."
+        )
+    with st.expander("Edit Items"):
+        st.markdown(
+            "- Select an asset to edit name, type, pricing, or details.\n"
+            "- Update images or notes.\n"
+            "- Delete assets with confirmation or use bulk delete."
+        )
+    with st.expander("Entities & Liabilities"):
+        st.markdown(
+            "- Create entities (Personal, Trust, Company, etc.).\n"
+            "- Assign ownership and split percentages.\n"
+            "- Track liabilities and view entity statements."
+        )
+    with st.expander("Settings"):
+        st.markdown(
+            "- Choose currency, theme, font size, and auto-refresh.\n"
+            "- Configure metals, FX, and news sources.\n"
+            "- Manage Community access mode and Supabase settings.\n"
+            "- Export or import your data."
         )
+    if st.session_state.get("is_admin"):
+        with st.expander("Admin"):
+            st.markdown(
+                "- View local usage stats and revenue tracking.\n"
+                "- Respond to user feedback and reset passwords.\n"
+                "- Moderate community content when enabled."
+            )
+
+    st.markdown("### Common Issues")
+    st.markdown(
+        "1. Prices not updating: check `Settings` → API keys and live data source.\n"
+        "2. Community blocked: confirm Supabase keys and Community access mode.\n"
+        "3. Light theme readability: adjust font size or switch theme in `Settings`."
+    )
+
+    st.markdown("### API Key Links")
+    st.markdown(
+        "[SilverPrice.org](https://silverprice.org) • "
+        "[FreeGoldPrice](https://freegoldprice.com) • "
+        "[MetalpriceAPI](https://metalpriceapi.com) • "
+        "[Metals.dev](https://metals.dev) • "
+        "[Frankfurter](https://www.frankfurter.app) • "
+        "[NewsAPI](https://newsapi.org) • "
+        "[eBay Developers](https://developer.ebay.com) • "
+        "[Reverb API](https://www.reverb.com/developers)"
+    )
+
+    st.markdown("### Support")
+    st.markdown(
+        "- Feedback or bug reports: wealthpulse@outlook.co.nz\n"
+        "- Use the Feedback form in Settings for direct submission."
+    )
+
+    guide_lines = [
+        "1. Settings: set currency, theme, and data sources.",
+        "2. Add Asset: enter details and save.",
+        "3. Entities: separate Personal, Trust, and Business ownership.",
+        "4. Portfolio/Analytics: monitor totals and trends.",
+        "5. Community: browse or post listings with photos.",
+        "Support: wealthpulse@outlook.co.nz"
+    ]
+    guide_text = "WealthPulse Quick Guide\n------------------------\n" + "\n".join(guide_lines) + "\n"
+    pdf_data = build_simple_pdf(guide_lines)
+    st.download_button(
+        "Download Quick Guide (TXT)",
+        data=guide_text,
+        file_name="wealthpulse_quick_guide.txt",
+        mime="text/plain",
+        width="content"
+    )
+    st.download_button(
+        "Download Quick Guide (PDF)",
+        data=pdf_data,
+        file_name="wealthpulse_quick_guide.pdf",
+        mime="application/pdf",
+        width="content"
+    )
+
+if active_tab == "Help":
+    render_help_tab()
 
 # ==============================
 # TAB 9: BULLION
 # ==============================
-if bullion_tab is not None:
-    with bullion_tab:
-        st.subheader("Bullion")
-        st.markdown(
-            "Physical gold and silver can help balance a portfolio by offering diversification, "
-            "inflation protection, and a tangible store of value. Many long‑term investors hold "
-            "bullion as a stabilizer alongside growth assets."
-        )
+@st.fragment
+def render_bullion_tab():
+    st.subheader("Bullion")
+    st.markdown(
+        "Physical gold and silver can help balance a portfolio by offering diversification, "
+        "inflation protection, and a tangible store of value. Many long‑term investors hold "
+        "bullion as a stabilizer alongside growth assets."
+    )
+
+    st.markdown("### Live Metals Pricing (SilverPrice.org)")
+    widget_currency = (currency_code or "USD").upper()
+    widget_supported = widget_currency in BULLION_WIDGET_CURRENCIES
+    if not widget_supported:
+        widget_currency = "USD"
+    if live_metals_data and live_metals_data.get("prices") and metals_provider_active == "SilverPrice":
+        render_bullion_spot_metrics(user_settings)
+        st.caption("SilverPrice.org provides live spot prices for gold and silver only.")
 
-        st.markdown("### Live Metals Pricing (SilverPrice.org)")
-        widget_currency = (currency_code or "USD").upper()
-        widget_supported = widget_currency in BULLION_WIDGET_CURRENCIES
         if not widget_supported:
-            widget_currency = "USD"
-        if live_metals_data and live_metals_data.get("prices") and metals_provider_active == "SilverPrice":
-            live_cols = st.columns(2)
-            gold_spot = live_metals_data["prices"].get("XAU")
-            silver_spot = live_metals_data["prices"].get("XAG")
-            if gold_spot is not None:
-                live_cols[0].metric("Gold Spot", format_currency(gold_spot, currency_symbol, currency_rate))
-            if silver_spot is not None:
-                live_cols[1].metric("Silver Spot", format_currency(silver_spot, currency_symbol, currency_rate))
-            if metals_last_updated:
-                if isinstance(metals_last_updated, (int, float)):
-                    metals_time = datetime.fromtimestamp(metals_last_updated)
-                else:
-                    try:
-                        metals_time = datetime.fromisoformat(str(metals_last_updated))
-                    except Exception:
-                        metals_time = get_now_for_settings(user_settings)
-                st.caption(f"Updated {format_date_for_settings(metals_time, user_settings)}")
-            st.caption("SilverPrice.org provides live spot prices for gold and silver only.")
+            st.caption(f"SilverPrice widgets do not support {currency_code}; showing USD instead.")
+        components.html(
+            f"""
+            <div style="display:flex; flex-wrap:wrap; gap:1rem;">
+                <div id="silver-price" data-silver_price="{widget_currency}-o-1d"></div>
+                <div id="gold-price" data-gold_price="{widget_currency}-o-1d"></div>
+            </div>
+            <script src="https://charts.goldprice.org/silver-price.js"></script>
+            <script src="https://charts.goldprice.org/gold-price.js"></script>
+            """,
+            height=340
+        )
+    else:
+        st.info("Enable SilverPrice.org in Settings to show live gold and silver spot pricing here.")
 
-            if not widget_supported:
-                st.caption(f"SilverPrice widgets do not support {currency_code}; showing USD instead.")
-            components.html(
-                f"""
-                <div style="display:flex; flex-wrap:wrap; gap:1rem;">
-                    <div id="silver-price" data-silver_price="{widget_currency}-o-1d"></div>
-                    <div id="gold-price" data-gold_price="{widget_currency}-o-1d"></div>
-                </div>
-                <script src="https://charts.goldprice.org/silver-price.js"></script>
-                <script src="https://charts.goldprice.org/gold-price.js"></script>
-                """,
-                height=340
-            )
+    entity_view = st.session_state.get("portfolio_entity_view", "All")
+    if entity_view != "All":
+        st.caption(f"Viewing: {entity_view}")
+
+    bullion_items = []
+    bullion_by_metal = {}
+    total_bullion_value = 0.0
+    total_bullion_weight = 0.0
+    for item in build_portfolio_view_items(portfolio, portfolio_valuation, entity_view):
+        asset = item["asset"]
+        share = item["share"]
+        if asset.get("type") not in BULLION_TYPES:
+            continue
+        bullion_items.append(item)
+        metal = asset.get("type")
+        bucket = bullion_by_metal.setdefault(metal, {"value": 0.0, "weight": 0.0, "count": 0})
+        val = item["value"]
+        bucket["value"] += val * share
+        bucket["count"] += 1
+        total_bullion_value += val * share
+        weight = asset.get("details", {}).get("weight_troy_oz")
+        if weight:
+            try:
+                bucket["weight"] += float(weight) * share
+                total_bullion_weight += float(weight) * share
+            except Exception:
+                pass
+
+    if bullion_items:
+        st.markdown("### Bullion Snapshot")
+        snap_cols = st.columns(3)
+        snap_cols[0].metric("Total Bullion Value", format_currency(total_bullion_value, currency_symbol, currency_rate))
+        if total_bullion_weight > 0:
+            snap_cols[1].metric("Total Weight", format_detail_value("weight_troy_oz", total_bullion_weight, currency_symbol, currency_rate, weight_unit))
         else:
-            st.info("Enable SilverPrice.org in Settings to show live gold and silver spot pricing here.")
+            snap_cols[1].metric("Total Weight", "Add weight to bullion items")
+        snap_cols[2].metric("Items", len(bullion_items))
 
-        entity_view = st.session_state.get("portfolio_entity_view", "All")
-        if entity_view != "All":
-            st.caption(f"Viewing: {entity_view}")
+        st.markdown("### By Metal")
+        metal_cols = st.columns(3)
+        for idx, (metal, data) in enumerate(sorted(bullion_by_metal.items())):
+            label = f"{metal} Value"
+            value_display = format_currency(data["value"], currency_symbol, currency_rate)
+            metal_cols[idx % 3].metric(label, value_display)
 
-        bullion_items = []
-        bullion_by_metal = {}
-        total_bullion_value = 0.0
-        total_bullion_weight = 0.0
-        for item in build_portfolio_view_items(portfolio, entity_view):
+        st.markdown("### Bullion Holdings")
+        rows = []
+        for item in bullion_items:
             asset = item["asset"]
             share = item["share"]
-            if asset.get("type") not in BULLION_TYPES:
-                continue
-            bullion_items.append(item)
-            metal = asset.get("type")
-            bucket = bullion_by_metal.setdefault(metal, {"value": 0.0, "weight": 0.0, "count": 0})
-            val, _, _ = ai_valuation(asset)
-            bucket["value"] += val * share
-            bucket["count"] += 1
-            total_bullion_value += val * share
-            weight = asset.get("details", {}).get("weight_troy_oz")
-            if weight:
-                try:
-                    bucket["weight"] += float(weight) * share
-                    total_bullion_weight += float(weight) * share
-                except Exception:
-                    pass
-
-        if bullion_items:
-            st.markdown("### Bullion Snapshot")
-            snap_cols = st.columns(3)
-            snap_cols[0].metric("Total Bullion Value", format_currency(total_bullion_value, currency_symbol, currency_rate))
-            if total_bullion_weight > 0:
-                snap_cols[1].metric("Total Weight", format_detail_value("weight_troy_oz", total_bullion_weight, currency_symbol, currency_rate, weight_unit))
-            else:
-                snap_cols[1].metric("Total Weight", "Add weight to bullion items")
-            snap_cols[2].metric("Items", len(bullion_items))
-
-            st.markdown("### By Metal")
-            metal_cols = st.columns(3)
-            for idx, (metal, data) in enumerate(sorted(bullion_by_metal.items())):
-                label = f"{metal} Value"
-                value_display = format_currency(data["value"], currency_symbol, currency_rate)
-                metal_cols[idx % 3].metric(label, value_display)
-
-            st.markdown("### Bullion Holdings")
-            rows = []
-            for item in bullion_items:
-                asset = item["asset"]
-                share = item["share"]
-                val, _, _ = ai_valuation(asset)
-                rows.append({
-                    "Name": asset.get("name", "Asset"),
-                    "Metal": asset.get("type", ""),
-                    "Condition": asset.get("condition", ""),
-                    "Qty": asset.get("qty", 1),
-                    "Weight": format_detail_value("weight_troy_oz", asset.get("details", {}).get("weight_troy_oz"), currency_symbol, currency_rate, weight_unit),
-                    "Value": format_currency(val * share, currency_symbol, currency_rate)
-                })
-            st.dataframe(pd.DataFrame(rows), width="stretch", hide_index=True)
+            val = item["value"]
+            rows.append({
+                "Name": asset.get("name", "Asset"),
+                "Metal": asset.get("type", ""),
+                "Condition": asset.get("condition", ""),
+                "Qty": asset.get("qty", 1),
+                "Weight": format_detail_value("weight_troy_oz", asset.get("details", {}).get("weight_troy_oz"), currency_symbol, currency_rate, weight_unit),
+                "Value": format_currency(val * share, currency_symbol, currency_rate)
+            })
+        st.dataframe(pd.DataFrame(rows), width="stretch", hide_index=True)
+    else:
+        st.info("No bullion assets yet. Add Gold, Silver, Copper, Platinum, or Palladium items to see them here.")
+
+    st.markdown("### Bullion News")
+    query = "gold OR silver OR copper bullion"
+    articles = None
+    news_err = None
+    if user_settings.get("news_provider") == "NewsAPI" and get_effective_setting(user_settings, "news_api_key", "NEWS_API_KEY"):
+        news_cache_key = f"bullion_news_{query}"
+        news_cached = get_cache(news_cache_key, 1800)
+        if news_cached:
+            articles = news_cached
         else:
-            st.info("No bullion assets yet. Add Gold, Silver, Copper, Platinum, or Palladium items to see them here.")
-
-        st.markdown("### Bullion News")
-        query = "gold OR silver OR copper bullion"
-        articles = None
-        news_err = None
-        if user_settings.get("news_provider") == "NewsAPI" and get_effective_setting(user_settings, "news_api_key", "NEWS_API_KEY"):
-            news_cache_key = f"bullion_news_{query}"
-            news_cached = get_cache(news_cache_key, 1800)
-            if news_cached:
-                articles = news_cached
-            else:
-                articles, news_err = fetch_newsapi(query, get_effective_setting(user_settings, "news_api_key", "NEWS_API_KEY"))
-                if articles:
-                    set_cache(news_cache_key, articles)
-
-        if not articles and user_settings.get("rss_backup_enabled") and user_settings.get("rss_feed_url"):
-            rss_url = user_settings.get("rss_feed_url")
-            if "{query}" in rss_url:
-                rss_url = rss_url.replace("{query}", quote_plus(query))
-            rss_cache_key = f"rss_{rss_url}"
-            rss_cached = get_cache(rss_cache_key, 1800)
-            if rss_cached:
-                articles = rss_cached
+            articles, news_err = fetch_newsapi(query, get_effective_setting(user_settings, "news_api_key", "NEWS_API_KEY"))
+            if articles:
+                set_cache(news_cache_key, articles)
+
+    if not articles and user_settings.get("rss_backup_enabled") and user_settings.get("rss_feed_url"):
+        rss_url = user_settings.get("rss_feed_url")
+        if "{query}" in rss_url:
+            rss_url = rss_url.replace("{query}", quote_plus(query))
+        rss_cache_key = f"rss_{rss_url}"
+        rss_cached = get_cache(rss_cache_key, 1800)
+        if rss_cached:
+            articles = rss_cached
+        else:
+            articles, news_err = fetch_rss_items(rss_url, limit=6)
+            if articles:
+                set_cache(rss_cache_key, articles)
+
+    if articles:
+        for article in articles[:6]:
+            title = article.get("title", "Article")
+            url = article.get("url") or article.get("link", "")
+            source = article.get("source", "News")
+            published = article.get("publishedAt") or article.get("published") or ""
+            if url:
+                st.markdown(f"- [{title}]({url}) — {source} ({published})")
             else:
-                articles, news_err = fetch_rss_items(rss_url, limit=6)
-                if articles:
-                    set_cache(rss_cache_key, articles)
+                st.write(f"- {title} — {source} ({published})")
+    else:
+        st.info(f"Bullion news unavailable: {news_err or 'Enable NewsAPI or RSS in Settings'}")
 
-        if articles:
-            for article in articles[:6]:
-                title = article.get("title", "Article")
-                url = article.get("url") or article.get("link", "")
-                source = article.get("source", "News")
-                published = article.get("publishedAt") or article.get("published") or ""
-                if url:
-                    st.markdown(f"- [{title}]({url}) — {source} ({published})")
-                else:
-                    st.write(f"- {title} — {source} ({published})")
-        else:
-            st.info(f"Bullion news unavailable: {news_err or 'Enable NewsAPI or RSS in Settings'}")
+if active_tab == "Bullion":
+    render_bullion_tab()
 
 # ==============================
 # TAB 10: COMMUNITY MARKET
 # ==============================
-if forum_tab is not None:
-    with forum_tab:
-        is_elite = has_plan_at_least(user_settings, "Elite")
-        render_founding_badge(user_settings)
-        supabase_connected = supabase_enabled(community_settings)
-        auth_required = supabase_auth_required(community_settings)
-        auth_user = get_supabase_auth_user(community_settings) if auth_required else None
-        auth_email = get_supabase_auth_email(community_settings) if auth_required else ""
-        auth_user_id = get_supabase_auth_user_id(community_settings) if auth_required else None
-        if auth_required:
-            st.markdown("### Community Account")
-            url_check, anon_check, _ = get_supabase_config(community_settings)
-            if not anon_check:
-                st.warning("Supabase anon key is required for Community Auth.")
-            if not supabase_connected:
-                st.warning("Supabase is not configured. Community sign-in is unavailable.")
-            elif auth_user:
-                st.success(f"Signed in to Community as {auth_email}")
-                if st.button("Sign out of Community", key="community_signout"):
-                    clear_supabase_auth_state()
-                    st.rerun()
-            else:
-                with st.form("community_signin"):
-                    email = st.text_input("Email")
-                    password = st.text_input("Password", type="password")
-                    submit_signin = st.form_submit_button("Sign In")
-                with st.expander("Create Community Account"):
-                    with st.form("community_signup"):
-                        new_email = st.text_input("Email", key="community_signup_email")
-                        new_password = st.text_input("Password", type="password", key="community_signup_password")
-                        confirm_password = st.text_input("Confirm Password", type="password", key="community_signup_confirm")
-                        submit_signup = st.form_submit_button("Create Account")
-                if submit_signin:
-                    if not email or not password:
-                        st.error("Enter email and password.")
+if active_tab == "Community":
+    is_elite = has_plan_at_least(user_settings, "Elite")
+    render_founding_badge(user_settings)
+    supabase_connected = supabase_enabled(community_settings)
+    auth_required = supabase_auth_required(community_settings)
+    auth_user = get_supabase_auth_user(community_settings) if auth_required else None
+    auth_email = get_supabase_auth_email(community_settings) if auth_required else ""
+    auth_user_id = get_supabase_auth_user_id(community_settings) if auth_required else None
+    if auth_required:
+        st.markdown("### Community Account")
+        url_check, anon_check, _ = get_supabase_config(community_settings)
+        if not anon_check:
+            st.warning("Supabase anon key is required for Community Auth.")
+        if not supabase_connected:
+            st.warning("Supabase is not configured. Community sign-in is unavailable.")
+        elif auth_user:
+            st.success(f"Signed in to Community as {auth_email}")
+            if st.button("Sign out of Community", key="community_signout"):
+                clear_supabase_auth_state()
+                st.rerun()
+        else:
+            with st.form("community_signin"):
+                email = st.text_input("Email")
+                password = st.text_input("Password", type="password")
+                submit_signin = st.form_submit_button("Sign In")
+            with st.expander("Create Community Account"):
+                with st.form("community_signup"):
+                    new_email = st.text_input("Email", key="community_signup_email")
+                    new_password = st.text_input("Password", type="password", key="community_signup_password")
+                    confirm_password = st.text_input("Confirm Password", type="password", key="community_signup_confirm")
+                    submit_signup = st.form_submit_button("Create Account")
+            if submit_signin:
+                if not email or not password:
+                    st.error("Enter email and password.")
+                else:
+                    auth_data, err = supabase_auth_sign_in(community_settings, email, password)
+                    if err:
+                        st.error(f"Sign in failed: {err}")
+                    else:
+                        access_token = auth_data.get("access_token")
+                        refresh_token = auth_data.get("refresh_token")
+                        expires_in = auth_data.get("expires_in") or 3600
+                        user_obj = auth_data.get("user") or {}
+                        set_supabase_auth_state({
+                            "access_token": access_token,
+                            "refresh_token": refresh_token,
+                            "expires_at": time.time() + int(expires_in),
+                            "user": user_obj
+                        })
+                        community_sync_user(community_settings, db, user)
+                        st.success("Community sign-in successful.")
+                        st.rerun()
+            if submit_signup:
+                pw_error = validate_password_strength(new_password)
+                if pw_error:
+                    st.error(pw_error)
+                elif new_password != confirm_password:
+                    st.error("Passwords do not match.")
+                else:
+                    signup_data, err = supabase_auth_sign_up(community_settings, new_email, new_password)
+                    if err:
+                        st.error(f"Sign up failed: {err}")
                     else:
-                        auth_data, err = supabase_auth_sign_in(community_settings, email, password)
+                        auth_data, err = supabase_auth_sign_in(community_settings, new_email, new_password)
                         if err:
-                            st.error(f"Sign in failed: {err}")
+                            st.warning("Account created. Please sign in.")
                         else:
                             access_token = auth_data.get("access_token")
                             refresh_token = auth_data.get("refresh_token")
@@ -9417,584 +12869,505 @@ if forum_tab is not None:
                                 "user": user_obj
                             })
                             community_sync_user(community_settings, db, user)
-                            st.success("Community sign-in successful.")
+                            st.success("Community account created and signed in.")
                             st.rerun()
-                if submit_signup:
-                    pw_error = validate_password_strength(new_password)
-                    if pw_error:
-                        st.error(pw_error)
-                    elif new_password != confirm_password:
-                        st.error("Passwords do not match.")
-                    else:
-                        signup_data, err = supabase_auth_sign_up(community_settings, new_email, new_password)
-                        if err:
-                            st.error(f"Sign up failed: {err}")
-                        else:
-                            auth_data, err = supabase_auth_sign_in(community_settings, new_email, new_password)
-                            if err:
-                                st.warning("Account created. Please sign in.")
-                            else:
-                                access_token = auth_data.get("access_token")
-                                refresh_token = auth_data.get("refresh_token")
-                                expires_in = auth_data.get("expires_in") or 3600
-                                user_obj = auth_data.get("user") or {}
-                                set_supabase_auth_state({
-                                    "access_token": access_token,
-                                    "refresh_token": refresh_token,
-                                    "expires_at": time.time() + int(expires_in),
-                                    "user": user_obj
-                                })
-                                community_sync_user(community_settings, db, user)
-                                st.success("Community account created and signed in.")
-                                st.rerun()
-                st.info("Sign in to access the Community Market.")
-
-        community_ready = True
-        schema_ok = None
-        schema_err = None
-        if supabase_connected:
-            schema_ok, schema_err = supabase_check_table(
-                community_settings,
-                "community_posts",
-                use_service_key=community_use_service_role(community_settings),
-                auth_token=community_auth_token(community_settings)
-            )
-            if not schema_ok:
-                community_ready = False
-        if auth_required and not auth_user:
+            st.info("Sign in to access the Community Market.")
+
+    community_ready = True
+    schema_ok = None
+    schema_err = None
+    if supabase_connected:
+        schema_ok, schema_err = supabase_check_table(
+            community_settings,
+            "community_posts",
+            use_service_key=community_use_service_role(community_settings),
+            auth_token=community_auth_token(community_settings)
+        )
+        if not schema_ok:
             community_ready = False
+    if auth_required and not auth_user:
+        community_ready = False
 
-        forum_posts = []
-        posts_err = None
-        if community_ready:
-            forum_posts, posts_err = community_get_posts(community_settings, db)
-            if posts_err:
-                st.error(f"Community backend error: {posts_err}")
-                forum_posts = []
-            if auth_required and auth_user_id:
-                legacy_posts = [post for post in forum_posts if post.get("created_by") == user and not post.get("owner_id")]
-                if legacy_posts:
-                    st.warning("Some of your older listings predate Supabase Auth. Ask an admin to backfill owner_id or recreate those listings to enable edits.")
-
-        if community_ready:
-            role = community_get_role(community_settings, db, user)
-            is_mod = role in ("admin", "moderator")
-            is_banned = community_is_banned(community_settings, db, user)
-        else:
-            role = None
-            is_mod = False
-            is_banned = False
-
-        column_support = st.session_state.get("community_column_support")
-        if supabase_enabled(community_settings) and community_ready and column_support is None:
-            column_results = supabase_check_columns(
-                community_settings,
-                "community_posts",
-                list(COMMUNITY_POSTS_EXTRA_COLUMNS.keys()),
-                use_service_key=community_use_service_role(community_settings),
-                auth_token=community_auth_token(community_settings)
-            )
-            column_support = {col: ok for col, ok, _ in column_results}
-            st.session_state.community_column_support = column_support
-        if column_support is None:
-            column_support = {}
-        supports_reserve = column_support.get("reserve_amount", True) or not supabase_enabled(community_settings)
-        supports_buy_now = column_support.get("buy_now_price", True) or not supabase_enabled(community_settings)
-        supports_images = column_support.get("images", True) or not supabase_enabled(community_settings)
-        supports_owner_id = column_support.get("owner_id", True) or not supabase_enabled(community_settings)
-        supports_grading_company = column_support.get("grading_company", True) or not supabase_enabled(community_settings)
-        supports_grading_grade = column_support.get("grading_grade", True) or not supabase_enabled(community_settings)
-        supports_grading = supports_grading_company and supports_grading_grade
-        if supabase_auth_required(community_settings) and not supports_owner_id:
-            st.warning("Supabase schema is missing the owner_id column. Run the migration helper before using Community Auth.")
-
-        if "edit_listing_id" not in st.session_state:
-            st.session_state.edit_listing_id = None
-        if "edit_listing_origin" not in st.session_state:
-            st.session_state.edit_listing_origin = "browse"
-        if "market_selected_post_id" not in st.session_state:
-            st.session_state.market_selected_post_id = None
-        if "market_view_post_id" not in st.session_state:
-            st.session_state.market_view_post_id = None
-        if "market_watchlist" not in st.session_state:
-            stored_watchlist = user_settings.get("market_watchlist") or []
-            st.session_state.market_watchlist = set(stored_watchlist)
-        if "market_saved_searches" not in st.session_state:
-            st.session_state.market_saved_searches = user_settings.get("market_saved_searches") or []
-
-        if is_banned:
-            st.warning("Your account is suspended from posting, bidding, or messaging in the community.")
-        else:
-            st.info("Community Rules apply to listings, comments, and messages. Violations are blocked.")
+    column_support = st.session_state.get("community_column_support")
+    if supabase_enabled(community_settings) and community_ready and column_support is None:
+        column_results = supabase_check_columns(
+            community_settings,
+            "community_posts",
+            list(COMMUNITY_POSTS_EXTRA_COLUMNS.keys()),
+            use_service_key=community_use_service_role(community_settings),
+            auth_token=community_auth_token(community_settings)
+        )
+        column_support = {col: ok for col, ok, _ in column_results}
+        st.session_state.community_column_support = column_support
+    if column_support is None:
+        column_support = {}
+    forum_posts = []
+    posts_err = None
+    if "community_feed_pages" not in st.session_state:
+        st.session_state.community_feed_pages = 1
+    if community_ready:
+        forum_posts, posts_err = community_sync_feed(
+            community_settings,
+            db,
+            pages=st.session_state.community_feed_pages,
+            column_support=column_support
+        )
+        if posts_err:
+            st.error(f"Community backend error: {posts_err}")
+            forum_posts = []
+        if auth_required and auth_user_id:
+            legacy_posts = [post for post in forum_posts if post.get("created_by") == user and not post.get("owner_id")]
+            if legacy_posts:
+                st.warning("Some of your older listings predate Supabase Auth. Ask an admin to backfill owner_id or recreate those listings to enable edits.")
+
+    if community_ready:
+        role = community_get_role(community_settings, db, user)
+        is_mod = role in ("admin", "moderator")
+        is_banned = community_is_banned(community_settings, db, user)
+    else:
+        role = None
+        is_mod = False
+        is_banned = False
+
+    supports_reserve = column_support.get("reserve_amount", True) or not supabase_enabled(community_settings)
+    supports_buy_now = column_support.get("buy_now_price", True) or not supabase_enabled(community_settings)
+    supports_images = column_support.get("images", True) or not supabase_enabled(community_settings)
+    supports_owner_id = column_support.get("owner_id", True) or not supabase_enabled(community_settings)
+    supports_grading_company = column_support.get("grading_company", True) or not supabase_enabled(community_settings)
+    supports_grading_grade = column_support.get("grading_grade", True) or not supabase_enabled(community_settings)
+    supports_grading = supports_grading_company and supports_grading_grade
+    if supabase_auth_required(community_settings) and not supports_owner_id:
+        st.warning("Supabase schema is missing the owner_id column. Run the migration helper before using Community Auth.")
+
+    if "edit_listing_id" not in st.session_state:
+        st.session_state.edit_listing_id = None
+    if "edit_listing_origin" not in st.session_state:
+        st.session_state.edit_listing_origin = "browse"
+    if "market_selected_post_id" not in st.session_state:
+        st.session_state.market_selected_post_id = None
+    if "market_view_post_id" not in st.session_state:
+        st.session_state.market_view_post_id = None
+    if "market_watchlist" not in st.session_state:
+        stored_watchlist = user_settings.get("market_watchlist") or []
+        st.session_state.market_watchlist = set(stored_watchlist)
+    if "market_saved_searches" not in st.session_state:
+        st.session_state.market_saved_searches = user_settings.get("market_saved_searches") or []
+
+    if is_banned:
+        st.warning("Your account is suspended from posting, bidding, or messaging in the community.")
+    else:
+        st.info("Community Rules apply to listings, comments, and messages. Violations are blocked.")
 
-        forum_tabs = ["Browse", "Watchlist", "Create Listing", "My Listings", "Messages"]
-        if is_mod:
-            forum_tabs.append("Moderation")
-        forum_tabs = st.tabs(forum_tabs)
+    forum_tabs = ["Browse", "Watchlist", "Create Listing", "My Listings", "Messages"]
+    if is_mod:
+        forum_tabs.append("Moderation")
+    forum_tabs = st.tabs(forum_tabs)
 
-        def normalize_forum_datetime(dt_value):
-            if not isinstance(dt_value, datetime):
-                return dt_value
-            if dt_value.tzinfo is not None:
-                try:
-                    dt_value = dt_value.astimezone().replace(tzinfo=None)
-                except Exception:
-                    dt_value = dt_value.replace(tzinfo=None)
-            return dt_value
+    def forum_now():
+        now_dt = get_now_for_settings(user_settings)
+        return normalize_forum_datetime(now_dt)
 
-        def parse_forum_date(value):
-            if not value:
-                return datetime.min
-            try:
-                parsed = datetime.fromisoformat(value)
-            except Exception:
-                return datetime.min
-            return normalize_forum_datetime(parsed)
-
-        def forum_now():
-            now_dt = get_now_for_settings(user_settings)
-            return normalize_forum_datetime(now_dt)
-
-        def is_recent_listing(post, days=7):
-            created_at = post.get("created_at")
-            created_dt = parse_forum_date(created_at)
-            if created_dt == datetime.min:
-                return False
-            return (forum_now() - created_dt).days <= days
-
-        def get_auction_fields(post):
-            if post.get("auction"):
-                auction = post.get("auction", {})
-                return (
-                    auction.get("starting_bid", 0.0),
-                    auction.get("min_increment", 0.0),
-                    auction.get("end_date")
-                )
-            return (
-                post.get("auction_starting_bid", 0.0),
-                post.get("auction_min_increment", 0.0),
-                post.get("auction_end_date")
-            )
+    def is_recent_listing(post, days=7):
+        created_at = post.get("created_at")
+        created_dt = parse_forum_date(created_at)
+        if created_dt == datetime.min:
+            return False
+        return (forum_now() - created_dt).days <= days
+
+    def get_reserve_amount(post):
+        if post.get("auction"):
+            return post.get("auction", {}).get("reserve_amount")
+        return post.get("reserve_amount")
+
+    def get_buy_now_price(post):
+        if post.get("auction"):
+            return post.get("auction", {}).get("buy_now_price")
+        return post.get("buy_now_price")
+
+    def get_post_images(post, size=None):
+        # Cards and previews pass a thumbnail size; only the detail view loads full images.
+        display = []
+        for img in get_post_image_refs(post):
+            src = image_ref_src(img, size)
+            if src:
+                display.append(src)
+        return display
+
+    full_post_cache = {}
+
+    def get_full_post(post):
+        # Cards carry no body/images; fetch the full row once per rerun when a listing is opened.
+        if not post or "body" in post:
+            return post
+        post_id = post.get("id")
+        if post_id not in full_post_cache:
+            full_post, err = community_get_post(community_settings, db, post_id)
+            if err:
+                st.error(f"Unable to load listing: {err}")
+            full_post_cache[post_id] = full_post or post
+        return full_post_cache[post_id]
+
+    def get_listing_card_image(post):
+        images = get_post_images(post, size=480)
+        if images:
+            return images[0]
+        title = post.get("title") or post.get("category") or "listing"
+        return search_asset_image(str(title))
 
-        def get_reserve_amount(post):
-            if post.get("auction"):
-                return post.get("auction", {}).get("reserve_amount")
-            return post.get("reserve_amount")
-
-        def get_buy_now_price(post):
-            if post.get("auction"):
-                return post.get("auction", {}).get("buy_now_price")
-            return post.get("buy_now_price")
-
-        def get_post_images(post):
-            images = post.get("images") or []
-            display = []
-            for img in images:
-                if isinstance(img, dict) and img.get("data"):
-                    mime = img.get("mime") or "image/png"
-                    display.append(f"data:{mime};base64,{img.get('data')}")
-                elif isinstance(img, str):
-                    display.append(img)
-            return display[:5]
-
-        def get_listing_card_image(post):
-            images = get_post_images(post)
-            if images:
-                return images[0]
-            title = post.get("title") or post.get("category") or "listing"
-            return search_asset_image(str(title))
-
-        def get_listing_price_value(post):
-            listing_type = post.get("listing_type", "Discussion")
-            if listing_type == "For Sale":
-                return post.get("price")
-            if listing_type == "Auction":
-                starting_bid, _, _ = get_auction_fields(post)
-                return starting_bid or post.get("price")
+    def clamp_price_range(saved_range, min_price, max_price):
+        if not saved_range or len(saved_range) != 2:
+            return (min_price, max_price)
+        try:
+            low = float(saved_range[0])
+            high = float(saved_range[1])
+        except Exception:
+            return (min_price, max_price)
+        low = max(min_price, min(max_price, low))
+        high = max(min_price, min(max_price, high))
+        if low > high:
+            return (min_price, max_price)
+        return (low, high)
+
+    def format_time_left(end_date_value, settings):
+        if not end_date_value:
             return None
-
-        def get_auction_end_dt(post):
-            _, _, end_date = get_auction_fields(post)
-            if not end_date:
-                return None
-            raw = str(end_date)
-            try:
-                end_dt = datetime.fromisoformat(raw)
-            except Exception:
-                try:
-                    end_dt = datetime.strptime(raw, "%Y-%m-%d")
-                except Exception:
-                    return None
-            if "T" not in raw:
-                end_dt = end_dt.replace(hour=23, minute=59, second=59)
-            return normalize_forum_datetime(end_dt)
-
-        def clamp_price_range(saved_range, min_price, max_price):
-            if not saved_range or len(saved_range) != 2:
-                return (min_price, max_price)
+        raw = str(end_date_value)
+        end_dt = None
+        try:
+            end_dt = datetime.fromisoformat(raw)
+        except Exception:
             try:
-                low = float(saved_range[0])
-                high = float(saved_range[1])
+                end_dt = datetime.strptime(raw, "%Y-%m-%d")
             except Exception:
-                return (min_price, max_price)
-            low = max(min_price, min(max_price, low))
-            high = max(min_price, min(max_price, high))
-            if low > high:
-                return (min_price, max_price)
-            return (low, high)
-
-        def format_time_left(end_date_value, settings):
-            if not end_date_value:
-                return None
-            raw = str(end_date_value)
-            end_dt = None
+                end_dt = None
+        if not end_dt:
+            return None
+        if "T" not in raw:
+            end_dt = end_dt.replace(hour=23, minute=59, second=59)
+        end_dt = normalize_forum_datetime(end_dt)
+        now_dt = normalize_forum_datetime(get_now_for_settings(settings))
+        if end_dt <= now_dt:
+            return "Ended"
+        delta = end_dt - now_dt
+        days = delta.days
+        hours = int(delta.seconds // 3600)
+        minutes = int((delta.seconds % 3600) // 60)
+        if days > 0:
+            return f"Ends in {days}d {hours}h"
+        if hours > 0:
+            return f"Ends in {hours}h {minutes}m"
+        return f"Ends in {minutes}m"
+
+    def open_streamlit_dialog(title):
+        dialog_fn = getattr(st, "dialog", None)
+        if callable(dialog_fn):
             try:
-                end_dt = datetime.fromisoformat(raw)
+                dialog_ctx = dialog_fn(title)
+                if hasattr(dialog_ctx, "__enter__"):
+                    return dialog_ctx, True
             except Exception:
-                try:
-                    end_dt = datetime.strptime(raw, "%Y-%m-%d")
-                except Exception:
-                    end_dt = None
-            if not end_dt:
-                return None
-            if "T" not in raw:
-                end_dt = end_dt.replace(hour=23, minute=59, second=59)
-            end_dt = normalize_forum_datetime(end_dt)
-            now_dt = normalize_forum_datetime(get_now_for_settings(settings))
-            if end_dt <= now_dt:
-                return "Ended"
-            delta = end_dt - now_dt
-            days = delta.days
-            hours = int(delta.seconds // 3600)
-            minutes = int((delta.seconds % 3600) // 60)
-            if days > 0:
-                return f"Ends in {days}d {hours}h"
-            if hours > 0:
-                return f"Ends in {hours}h {minutes}m"
-            return f"Ends in {minutes}m"
-
-        def get_post_status(post):
-            status = post.get("status", "Active")
-            listing_type = post.get("listing_type")
-            if listing_type == "Auction":
-                _, _, end_date = get_auction_fields(post)
-                if end_date:
-                    try:
-                        if datetime.fromisoformat(end_date).date() < datetime.now().date() and status == "Active":
-                            return "Ended"
-                    except Exception:
-                        pass
-            return status
+                pass
+        return st.container(), False
 
-        def open_streamlit_dialog(title):
-            dialog_fn = getattr(st, "dialog", None)
-            if callable(dialog_fn):
-                try:
-                    dialog_ctx = dialog_fn(title)
-                    if hasattr(dialog_ctx, "__enter__"):
-                        return dialog_ctx, True
-                except Exception:
-                    pass
-            return st.container(), False
+    def render_listing_edit_form(post, key_prefix):
+        post_id = post.get("id")
+        listing_type_value = post.get("listing_type") or "For Sale"
+        listing_type_options = ["For Sale", "Auction", "Discussion"]
+        try:
+            listing_type_index = listing_type_options.index(listing_type_value)
+        except ValueError:
+            listing_type_index = 0
+        category_filter = st.text_input(
+            "Filter categories (optional)",
+            placeholder="Type to filter categories (e.g., bullion, cards, coins)",
+            key=f"{key_prefix}_category_filter_{post_id}"
+        )
+        category_list = list(COMMUNITY_CATEGORY_OPTIONS)
+        category_list += [asset.get("type", "Other") for asset in portfolio]
+        category_value = post.get("category", "Other")
+        if category_value not in category_list:
+            category_list.append(category_value)
+        category_list = filter_category_options(category_list, category_filter)
+        if category_value not in category_list:
+            category_list.insert(0, category_value)
+        try:
+            category_index = category_list.index(category_value)
+        except ValueError:
+            category_index = 0
 
-        def render_listing_edit_form(post, key_prefix):
-            post_id = post.get("id")
-            listing_type_value = post.get("listing_type") or "For Sale"
-            listing_type_options = ["For Sale", "Auction", "Discussion"]
+        starting_bid_default, min_increment_default, end_date_default = get_auction_fields(post)
+        reserve_default = get_reserve_amount(post) if supports_reserve else None
+        buy_now_default = get_buy_now_price(post) if supports_buy_now else None
+        end_date_value = None
+        if end_date_default:
             try:
-                listing_type_index = listing_type_options.index(listing_type_value)
-            except ValueError:
-                listing_type_index = 0
-            category_filter = st.text_input(
-                "Filter categories (optional)",
-                placeholder="Type to filter categories (e.g., bullion, cards, coins)",
-                key=f"{key_prefix}_category_filter_{post_id}"
-            )
-            category_list = list(COMMUNITY_CATEGORY_OPTIONS)
-            category_list += [asset.get("type", "Other") for asset in portfolio]
-            category_value = post.get("category", "Other")
-            if category_value not in category_list:
-                category_list.append(category_value)
-            category_list = filter_category_options(category_list, category_filter)
-            if category_value not in category_list:
-                category_list.insert(0, category_value)
-            try:
-                category_index = category_list.index(category_value)
-            except ValueError:
-                category_index = 0
-
-            starting_bid_default, min_increment_default, end_date_default = get_auction_fields(post)
-            reserve_default = get_reserve_amount(post) if supports_reserve else None
-            buy_now_default = get_buy_now_price(post) if supports_buy_now else None
-            end_date_value = None
-            if end_date_default:
+                end_date_value = datetime.fromisoformat(str(end_date_default)).date()
+            except Exception:
                 try:
-                    end_date_value = datetime.fromisoformat(str(end_date_default)).date()
+                    end_date_value = datetime.strptime(str(end_date_default), "%Y-%m-%d").date()
                 except Exception:
-                    try:
-                        end_date_value = datetime.strptime(str(end_date_default), "%Y-%m-%d").date()
-                    except Exception:
-                        end_date_value = None
-            if end_date_value is None:
-                end_date_value = datetime.now().date() + timedelta(days=7)
-
-            with st.form(f"{key_prefix}_edit_listing_form_{post_id}"):
-                edit_listing_type = st.selectbox(
-                    "Listing Type",
-                    listing_type_options,
-                    index=listing_type_index,
-                    key=f"{key_prefix}_edit_listing_type_{post_id}"
-                )
-                edit_category = st.selectbox(
-                    "Category",
-                    category_list,
-                    index=category_index,
-                    key=f"{key_prefix}_edit_listing_category_{post_id}"
-                )
-                edit_title = st.text_input(
-                    "Title",
-                    value=post.get("title", ""),
-                    key=f"{key_prefix}_edit_listing_title_{post_id}"
-                )
-                edit_description = st.text_area(
-                    "Description",
-                    value=post.get("body", ""),
-                    height=120,
-                    key=f"{key_prefix}_edit_listing_body_{post_id}"
-                )
-                grading_type = grading_type_for_category(edit_category)
-                edit_grading_company = None
-                edit_grading_grade = None
-                if grading_type:
-                    st.markdown("#### Grading (optional)")
-                    if supports_grading:
-                        if grading_type == "coin":
-                            company_options = COIN_GRADING_COMPANIES
-                            grade_options = COIN_GRADE_OPTIONS
-                        else:
-                            company_options = CARD_GRADING_COMPANIES
-                            grade_options = CARD_GRADE_OPTIONS
-                        existing_company = post.get("grading_company") or "Ungraded / None"
-                        existing_grade = post.get("grading_grade") or "Ungraded"
-                        if existing_company not in (["Ungraded / None"] + company_options):
-                            company_options = [existing_company] + company_options
-                        if existing_grade not in grade_options:
-                            grade_options = [existing_grade] + grade_options
-                        edit_grading_company = st.selectbox(
-                            "Grading Company",
-                            ["Ungraded / None"] + company_options,
-                            index=(["Ungraded / None"] + company_options).index(existing_company),
-                            key=f"{key_prefix}_edit_listing_grade_company_{post_id}"
-                        )
-                        edit_grading_grade = st.selectbox(
-                            "Grade",
-                            grade_options,
-                            index=grade_options.index(existing_grade),
-                            key=f"{key_prefix}_edit_listing_grade_{post_id}"
-                        )
-                        if edit_grading_company == "Ungraded / None":
-                            edit_grading_company = None
-                        if edit_grading_grade == "Ungraded":
-                            edit_grading_grade = None
+                    end_date_value = None
+        if end_date_value is None:
+            end_date_value = datetime.now().date() + timedelta(days=7)
+
+        with st.form(f"{key_prefix}_edit_listing_form_{post_id}"):
+            edit_listing_type = st.selectbox(
+                "Listing Type",
+                listing_type_options,
+                index=listing_type_index,
+                key=f"{key_prefix}_edit_listing_type_{post_id}"
+            )
+            edit_category = st.selectbox(
+                "Category",
+                category_list,
+                index=category_index,
+                key=f"{key_prefix}_edit_listing_category_{post_id}"
+            )
+            edit_title = st.text_input(
+                "Title",
+                value=post.get("title", ""),
+                key=f"{key_prefix}_edit_listing_title_{post_id}"
+            )
+            edit_description = st.text_area(
+                "Description",
+                value=post.get("body", ""),
+                height=120,
+                key=f"{key_prefix}_edit_listing_body_{post_id}"
+            )
+            grading_type = grading_type_for_category(edit_category)
+            edit_grading_company = None
+            edit_grading_grade = None
+            if grading_type:
+                st.markdown("#### Grading (optional)")
+                if supports_grading:
+                    if grading_type == "coin":
+                        company_options = COIN_GRADING_COMPANIES
+                        grade_options = COIN_GRADE_OPTIONS
                     else:
-                        st.caption("Grading fields require a schema update. Run the migration helper below.")
-                existing_images = post.get("images") or []
-                display_images = get_post_images(post)
-                if display_images:
-                    preview_cols = st.columns(min(len(display_images), 5))
-                    for idx, img in enumerate(display_images):
-                        with preview_cols[idx]:
-                            st.image(img, width=140)
-                replace_images = []
-                remove_images = False
-                if supports_images:
-                    replace_images = st.file_uploader(
-                        f"Replace Photos (max {MAX_LISTING_IMAGES})",
-                        type=["jpg", "jpeg", "png"],
-                        accept_multiple_files=True,
-                        key=f"{key_prefix}_edit_listing_images_{post_id}"
+                        company_options = CARD_GRADING_COMPANIES
+                        grade_options = CARD_GRADE_OPTIONS
+                    existing_company = post.get("grading_company") or "Ungraded / None"
+                    existing_grade = post.get("grading_grade") or "Ungraded"
+                    if existing_company not in (["Ungraded / None"] + company_options):
+                        company_options = [existing_company] + company_options
+                    if existing_grade not in grade_options:
+                        grade_options = [existing_grade] + grade_options
+                    edit_grading_company = st.selectbox(
+                        "Grading Company",
+                        ["Ungraded / None"] + company_options,
+                        index=(["Ungraded / None"] + company_options).index(existing_company),
+                        key=f"{key_prefix}_edit_listing_grade_company_{post_id}"
                     )
-                    if replace_images:
-                        image_error = validate_listing_images(replace_images)
-                        if image_error:
-                            st.warning(image_error)
-                            replace_images = replace_images[:MAX_LISTING_IMAGES]
-                    remove_images = st.checkbox(
-                        "Remove existing photos",
-                        value=False,
-                        key=f"{key_prefix}_edit_listing_remove_images_{post_id}"
+                    edit_grading_grade = st.selectbox(
+                        "Grade",
+                        grade_options,
+                        index=grade_options.index(existing_grade),
+                        key=f"{key_prefix}_edit_listing_grade_{post_id}"
                     )
+                    if edit_grading_company == "Ungraded / None":
+                        edit_grading_company = None
+                    if edit_grading_grade == "Ungraded":
+                        edit_grading_grade = None
                 else:
-                    st.caption("Photo uploads require a schema update. Run the migration helper below.")
-                edit_location = st.text_input(
-                    "Country (required)",
-                    value=post.get("location", ""),
-                    help="Enter the country where the item is located. Add city/region after the country if needed.",
-                    key=f"{key_prefix}_edit_listing_location_{post_id}"
+                    st.caption("Grading fields require a schema update. Run the migration helper below.")
+            existing_images = post.get("images") or []
+            display_images = get_post_images(post, size=160)
+            if display_images:
+                preview_cols = st.columns(min(len(display_images), 5))
+                for idx, img in enumerate(display_images):
+                    with preview_cols[idx]:
+                        st.image(img, width=140)
+            replace_images = []
+            remove_images = False
+            if supports_images:
+                replace_images = st.file_uploader(
+                    f"Replace Photos (max {MAX_LISTING_IMAGES})",
+                    type=["jpg", "jpeg", "png"],
+                    accept_multiple_files=True,
+                    key=f"{key_prefix}_edit_listing_images_{post_id}"
                 )
-                edit_price = None
-                edit_starting_bid = None
-                edit_min_increment = None
-                edit_reserve = None
-                edit_buy_now = None
-                edit_end_date = None
-                listing_currency = post.get("currency", currency_code)
-                if edit_listing_type == "For Sale":
-                    edit_price = st.number_input(
-                        f"Price ({listing_currency})",
-                        min_value=0.0,
-                        value=float(post.get("price") or 0.0),
-                        step=1.0,
-                        key=f"{key_prefix}_edit_listing_price_{post_id}"
-                    )
-                elif edit_listing_type == "Auction":
-                    edit_starting_bid = st.number_input(
-                        f"Starting Bid ({listing_currency})",
+                if replace_images:
+                    image_error = validate_listing_images(replace_images)
+                    if image_error:
+                        st.warning(image_error)
+                        replace_images = replace_images[:MAX_LISTING_IMAGES]
+                remove_images = st.checkbox(
+                    "Remove existing photos",
+                    value=False,
+                    key=f"{key_prefix}_edit_listing_remove_images_{post_id}"
+                )
+            else:
+                st.caption("Photo uploads require a schema update. Run the migration helper below.")
+            edit_location = st.text_input(
+                "Country (required)",
+                value=post.get("location", ""),
+                help="Enter the country where the item is located. Add city/region after the country if needed.",
+                key=f"{key_prefix}_edit_listing_location_{post_id}"
+            )
+            edit_price = None
+            edit_starting_bid = None
+            edit_min_increment = None
+            edit_reserve = None
+            edit_buy_now = None
+            edit_end_date = None
+            listing_currency = post.get("currency", currency_code)
+            if edit_listing_type == "For Sale":
+                edit_price = st.number_input(
+                    f"Price ({listing_currency})",
+                    min_value=0.0,
+                    value=float(post.get("price") or 0.0),
+                    step=1.0,
+                    key=f"{key_prefix}_edit_listing_price_{post_id}"
+                )
+            elif edit_listing_type == "Auction":
+                edit_starting_bid = st.number_input(
+                    f"Starting Bid ({listing_currency})",
+                    min_value=0.0,
+                    value=float(starting_bid_default or 0.0),
+                    step=1.0,
+                    key=f"{key_prefix}_edit_listing_starting_{post_id}"
+                )
+                edit_min_increment = st.number_input(
+                    f"Minimum Increment ({listing_currency})",
+                    min_value=0.0,
+                    value=float(min_increment_default or 0.0),
+                    step=1.0,
+                    key=f"{key_prefix}_edit_listing_increment_{post_id}"
+                )
+                if supports_reserve:
+                    edit_reserve = st.number_input(
+                        f"Reserve Amount ({listing_currency})",
                         min_value=0.0,
-                        value=float(starting_bid_default or 0.0),
+                        value=float(reserve_default or 0.0),
                         step=1.0,
-                        key=f"{key_prefix}_edit_listing_starting_{post_id}"
+                        key=f"{key_prefix}_edit_listing_reserve_{post_id}"
                     )
-                    edit_min_increment = st.number_input(
-                        f"Minimum Increment ({listing_currency})",
+                else:
+                    st.caption("Reserve amounts require a schema update. Run the migration helper.")
+                if supports_buy_now:
+                    edit_buy_now = st.number_input(
+                        f"Buy Now Price ({listing_currency})",
                         min_value=0.0,
-                        value=float(min_increment_default or 0.0),
+                        value=float(buy_now_default or 0.0),
                         step=1.0,
-                        key=f"{key_prefix}_edit_listing_increment_{post_id}"
+                        key=f"{key_prefix}_edit_listing_buy_now_{post_id}"
                     )
-                    if supports_reserve:
-                        edit_reserve = st.number_input(
-                            f"Reserve Amount ({listing_currency})",
-                            min_value=0.0,
-                            value=float(reserve_default or 0.0),
-                            step=1.0,
-                            key=f"{key_prefix}_edit_listing_reserve_{post_id}"
-                        )
-                    else:
-                        st.caption("Reserve amounts require a schema update. Run the migration helper.")
-                    if supports_buy_now:
-                        edit_buy_now = st.number_input(
-                            f"Buy Now Price ({listing_currency})",
-                            min_value=0.0,
-                            value=float(buy_now_default or 0.0),
-                            step=1.0,
-                            key=f"{key_prefix}_edit_listing_buy_now_{post_id}"
-                        )
+                else:
+                    st.caption("Buy Now requires a schema update. Run the migration helper.")
+                edit_end_date = st.date_input(
+                    "Auction End Date",
+                    value=end_date_value,
+                    key=f"{key_prefix}_edit_listing_end_date_{post_id}"
+                )
+            submit_edit = st.form_submit_button("Save Changes")
+
+        if submit_edit:
+            if not edit_title.strip():
+                st.error("Title is required.")
+            elif not edit_location.strip():
+                st.error("Country is required.")
+            elif not edit_description.strip():
+                st.error("Description is required.")
+            elif validate_community_text(f"{edit_title} {edit_description} {edit_location}"):
+                st.error("Your listing contains content that violates the Community Rules.")
+            elif replace_images and validate_listing_images(replace_images):
+                st.error(validate_listing_images(replace_images))
+            elif edit_listing_type == "Auction" and supports_reserve and edit_reserve and edit_starting_bid is not None and edit_reserve < edit_starting_bid:
+                st.error("Reserve amount should be equal to or higher than the starting bid.")
+            elif edit_listing_type == "Auction" and supports_buy_now and edit_buy_now and edit_reserve and edit_buy_now < edit_reserve:
+                st.error("Buy Now price should be equal to or higher than the reserve.")
+            else:
+                update_images = None
+                if supports_images and remove_images:
+                    update_images = []
+                elif supports_images and replace_images:
+                    update_images = encode_uploaded_images(replace_images, community_image_settings(community_settings))
+                update_payload = {
+                    "title": edit_title.strip(),
+                    "body": edit_description.strip(),
+                    "category": edit_category,
+                    "listing_type": edit_listing_type,
+                    "location": edit_location.strip(),
+                    "currency": listing_currency,
+                    "price": float(edit_price) if edit_listing_type == "For Sale" else None,
+                    "auction_starting_bid": float(edit_starting_bid) if edit_listing_type == "Auction" else None,
+                    "auction_min_increment": float(edit_min_increment) if edit_listing_type == "Auction" else None,
+                    "reserve_amount": float(edit_reserve) if edit_listing_type == "Auction" and supports_reserve and edit_reserve and edit_reserve > 0 else None,
+                    "buy_now_price": float(edit_buy_now) if edit_listing_type == "Auction" and supports_buy_now and edit_buy_now and edit_buy_now > 0 else None,
+                    "auction_end_date": edit_end_date.isoformat() if edit_listing_type == "Auction" and edit_end_date else None
+                }
+                if supports_grading:
+                    if grading_type:
+                        update_payload["grading_company"] = edit_grading_company
+                        update_payload["grading_grade"] = edit_grading_grade
                     else:
-                        st.caption("Buy Now requires a schema update. Run the migration helper.")
-                    edit_end_date = st.date_input(
-                        "Auction End Date",
-                        value=end_date_value,
-                        key=f"{key_prefix}_edit_listing_end_date_{post_id}"
-                    )
-                submit_edit = st.form_submit_button("Save Changes")
-
-            if submit_edit:
-                if not edit_title.strip():
-                    st.error("Title is required.")
-                elif not edit_location.strip():
-                    st.error("Country is required.")
-                elif not edit_description.strip():
-                    st.error("Description is required.")
-                elif validate_community_text(f"{edit_title} {edit_description} {edit_location}"):
-                    st.error("Your listing contains content that violates the Community Rules.")
-                elif replace_images and validate_listing_images(replace_images):
-                    st.error(validate_listing_images(replace_images))
-                elif edit_listing_type == "Auction" and supports_reserve and edit_reserve and edit_starting_bid is not None and edit_reserve < edit_starting_bid:
-                    st.error("Reserve amount should be equal to or higher than the starting bid.")
-                elif edit_listing_type == "Auction" and supports_buy_now and edit_buy_now and edit_reserve and edit_buy_now < edit_reserve:
-                    st.error("Buy Now price should be equal to or higher than the reserve.")
+                        update_payload["grading_company"] = None
+                        update_payload["grading_grade"] = None
+                if update_images is not None:
+                    update_payload["images"] = update_images
+                if not supports_reserve:
+                    update_payload.pop("reserve_amount", None)
+                if not supports_buy_now:
+                    update_payload.pop("buy_now_price", None)
+                _, err = community_update_post(community_settings, db, post.get("id"), update_payload)
+                if err:
+                    st.error(err)
                 else:
-                    update_images = None
-                    if supports_images and remove_images:
-                        update_images = []
-                    elif supports_images and replace_images:
-                        update_images = encode_uploaded_images(replace_images)
-                    update_payload = {
-                        "title": edit_title.strip(),
-                        "body": edit_description.strip(),
-                        "category": edit_category,
-                        "listing_type": edit_listing_type,
-                        "location": edit_location.strip(),
-                        "currency": listing_currency,
-                        "price": float(edit_price) if edit_listing_type == "For Sale" else None,
-                        "auction_starting_bid": float(edit_starting_bid) if edit_listing_type == "Auction" else None,
-                        "auction_min_increment": float(edit_min_increment) if edit_listing_type == "Auction" else None,
-                        "reserve_amount": float(edit_reserve) if edit_listing_type == "Auction" and supports_reserve and edit_reserve and edit_reserve > 0 else None,
-                        "buy_now_price": float(edit_buy_now) if edit_listing_type == "Auction" and supports_buy_now and edit_buy_now and edit_buy_now > 0 else None,
-                        "auction_end_date": edit_end_date.isoformat() if edit_listing_type == "Auction" and edit_end_date else None
-                    }
-                    if supports_grading:
-                        if grading_type:
-                            update_payload["grading_company"] = edit_grading_company
-                            update_payload["grading_grade"] = edit_grading_grade
-                        else:
-                            update_payload["grading_company"] = None
-                            update_payload["grading_grade"] = None
-                    if update_images is not None:
-                        update_payload["images"] = update_images
-                    if not supports_reserve:
-                        update_payload.pop("reserve_amount", None)
-                    if not supports_buy_now:
-                        update_payload.pop("buy_now_price", None)
-                    _, err = community_update_post(community_settings, db, post.get("id"), update_payload)
-                    if err:
-                        st.error(err)
-                    else:
-                        st.success("Listing updated.")
-                        st.session_state.edit_listing_id = None
-                        request_scroll_to_top()
-                        st.rerun()
+                    st.success("Listing updated.")
+                    st.session_state.edit_listing_id = None
+                    request_scroll_to_top()
+                    st.rerun()
 
-        def render_marketplace_card(post, status, key_prefix="card"):
-            post_id = post.get("id", "")
-            listing_type = post.get("listing_type", "Discussion")
-            currency = post.get("currency", currency_code)
-            title = escape_html(post.get("title", "Listing"))
-            category = escape_html(post.get("category", "Other"))
-            country = escape_html(post.get("location", ""))
-            seller = escape_html(post.get("created_by", "Seller"))
-            image_src = escape_html(get_listing_card_image(post))
-            is_new = is_recent_listing(post, days=7)
-            photo_count = len(get_post_images(post))
-
-            price_label = ""
-            price_value = post.get("price")
-            if listing_type == "For Sale" and price_value:
-                price_label = f"{currency} {float(price_value):,.2f}"
-            elif listing_type == "Auction":
-                starting_bid, _, _ = get_auction_fields(post)
-                if starting_bid:
-                    price_label = f"Starting {currency} {float(starting_bid):,.2f}"
-
-            time_left_label = ""
-            if listing_type == "Auction":
-                _, _, end_date = get_auction_fields(post)
-                time_left_label = format_time_left(end_date, user_settings) or ""
-
-            badges = [
-                f'<span class="market-pill gold">{escape_html(listing_type)}</span>',
-                f'<span class="market-pill">{escape_html(status)}</span>'
-            ]
-            if time_left_label:
-                badges.append(f'<span class="market-pill warning">{escape_html(time_left_label)}</span>')
-            if is_new:
-                badges.append('<span class="market-pill success">NEW</span>')
-            if photo_count:
-                badges.append(f'<span class="market-pill">Photos {photo_count}</span>')
-            if post.get("buy_now_price"):
-                badges.append('<span class="market-pill gold">Buy Now</span>')
-            badges_html = "".join(badges)
-
-            price_tag_html = f'<div class="market-price-tag">{price_label}</div>' if price_label else ''
-            card_html = (
-                '<div class="market-card">'
-                f'<div class="market-image"><img src="{image_src}" alt="Listing image" />{price_tag_html}</div>'
-                f'<div class="market-body"><div class="market-badges">{badges_html}</div>'
-                f'<div class="market-title">{title}</div>'
-                f'<div class="market-meta">{country} · {category} · @{seller}</div>'
-                '</div></div>'
-            )
+    def render_marketplace_card(post, status, key_prefix="card"):
+        post_id = post.get("id", "")
+        listing_type = post.get("listing_type", "Discussion")
+        currency = post.get("currency", currency_code)
+        title = escape_html(post.get("title", "Listing"))
+        category = escape_html(post.get("category", "Other"))
+        country = escape_html(post.get("location", ""))
+        seller = escape_html(post.get("created_by", "Seller"))
+        image_src = escape_html(get_listing_card_image(post))
+        is_new = is_recent_listing(post, days=7)
+        photo_count = len(get_post_image_refs(post))
+        photo_label = f"Photos {photo_count}" if "images" in post else "Photos"
+
+        price_label = ""
+        price_value = post.get("price")
+        if listing_type == "For Sale" and price_value:
+            price_label = f"{currency} {float(price_value):,.2f}"
+        elif listing_type == "Auction":
+            starting_bid, _, _ = get_auction_fields(post)
+            if starting_bid:
+                price_label = f"Starting {currency} {float(starting_bid):,.2f}"
+
+        time_left_label = ""
+        if listing_type == "Auction":
+            _, _, end_date = get_auction_fields(post)
+            time_left_label = format_time_left(end_date, user_settings) or ""
+
+        badges = [
+            f'<span class="market-pill gold">{escape_html(listing_type)}</span>',
+            f'<span class="market-pill">{escape_html(status)}</span>'
+        ]
+        if time_left_label:
+            badges.append(f'<span class="market-pill warning">{escape_html(time_left_label)}</span>')
+        if is_new:
+            badges.append('<span class="market-pill success">NEW</span>')
+        if photo_count:
+            badges.append(f'<span class="market-pill">{photo_label}</span>')
+        if post.get("buy_now_price"):
+            badges.append('<span class="market-pill gold">Buy Now</span>')
+        badges_html = "".join(badges)
+
+        price_tag_html = f'<div class="market-price-tag">{price_label}</div>' if price_label else ''
+        card_html = (
+            '<div class="market-card">'
+            f'<div class="market-image"><img src="{image_src}" alt="Listing image" />{price_tag_html}</div>'
+            f'<div class="market-body"><div class="market-badges">{badges_html}</div>'
+            f'<div class="market-title">{title}</div>'
+            f'<div class="market-meta">{country} · {category} · @{seller}</div>'
+            '</div></div>'
+        )
         render_html_block(card_html)
         actions = st.columns([1, 1])
         with actions[0]:
@@ -10028,159 +13401,137 @@ if forum_tab is not None:
                     persist_market_watchlist(db, user, watchlist)
                     st.rerun()
 
-        def render_listing_detail_panel(post, status):
-            post_id = post.get("id", "")
-            price = post.get("price")
-            currency = post.get("currency", currency_code)
-            listing_type = post.get("listing_type", "Discussion")
-            title = post.get("title", "Listing")
-
-            header_cols = st.columns([3, 1])
-            with header_cols[0]:
-                st.markdown(f"### {title}")
-                st.caption(f"Posted by {post.get('created_by', 'Unknown')} • {post.get('created_at', '')}")
-            with header_cols[1]:
-                watchlist = st.session_state.market_watchlist
-                is_watching = post_id in watchlist
-                label = "Watching" if is_watching else "Watch"
-                if st.button(label, key=f"watch_listing_detail_{post_id}"):
-                    if is_watching:
-                        watchlist.discard(post_id)
-                    else:
-                        watchlist.add(post_id)
-                    st.session_state.market_watchlist = watchlist
-                    persist_market_watchlist(db, user, watchlist)
-                    st.rerun()
-
-            detail_cols = st.columns([1.3, 1])
-            with detail_cols[0]:
-                post_images = get_post_images(post)
-                if post_images:
-                    image_cols = st.columns(min(len(post_images), 3))
-                    for idx, img in enumerate(post_images[:3]):
-                        with image_cols[idx]:
-                            st.image(img, width=220)
-                st.write(post.get("body", ""))
-                if post.get("category"):
-                    st.write(f"Category: {post.get('category')}")
-                if post.get("grading_company") or post.get("grading_grade"):
-                    company = post.get("grading_company") or ""
-                    grade = post.get("grading_grade") or ""
-                    label = f"{company} {grade}".strip()
-                    st.write(f"Grade: {label}")
-                if post.get("location"):
-                    st.write(f"Country: {post.get('location')}")
-                if status == "Sold" and post.get("sold_price") is not None:
-                    st.markdown(f"**Sold for:** {currency} {float(post.get('sold_price')):,.2f}")
-
-            with detail_cols[1]:
-                summary_card = st.container()
-                with summary_card:
-                    st.markdown("#### Listing Summary")
-                    if listing_type == "For Sale":
-                        st.metric("Asking Price", f"{currency} {float(price or 0.0):,.2f}")
-                    elif listing_type == "Auction":
-                        starting_bid, min_increment, end_date = get_auction_fields(post)
-                        st.metric("Starting Bid", f"{currency} {float(starting_bid or 0.0):,.2f}")
-                        if end_date:
-                            st.caption(f"Auction ends: {end_date}")
-                    if post.get("buy_now_price"):
-                        st.metric("Buy Now", f"{currency} {float(post.get('buy_now_price')):,.2f}")
-                    if post.get("reserve_amount"):
-                        st.metric("Reserve", f"{currency} {float(post.get('reserve_amount')):,.2f}")
-                    if user == post.get("created_by"):
-                        if st.button("Edit Listing", key=f"edit_listing_detail_{post_id}"):
-                            st.session_state.edit_listing_id = post_id
-                            st.session_state.edit_listing_origin = "browse"
-                            request_scroll_to_top()
-                            st.rerun()
+    def render_listing_detail_panel(post, status):
+        post_id = post.get("id", "")
+        price = post.get("price")
+        currency = post.get("currency", currency_code)
+        listing_type = post.get("listing_type", "Discussion")
+        title = post.get("title", "Listing")
+
+        header_cols = st.columns([3, 1])
+        with header_cols[0]:
+            st.markdown(f"### {title}")
+            st.caption(f"Posted by {post.get('created_by', 'Unknown')} • {post.get('created_at', '')}")
+        with header_cols[1]:
+            watchlist = st.session_state.market_watchlist
+            is_watching = post_id in watchlist
+            label = "Watching" if is_watching else "Watch"
+            if st.button(label, key=f"watch_listing_detail_{post_id}"):
+                if is_watching:
+                    watchlist.discard(post_id)
+                else:
+                    watchlist.add(post_id)
+                st.session_state.market_watchlist = watchlist
+                persist_market_watchlist(db, user, watchlist)
+                st.rerun()
 
-            if listing_type == "Auction":
-                starting_bid, min_increment, end_date = get_auction_fields(post)
-                reserve_amount = get_reserve_amount(post) if supports_reserve else None
-                buy_now_price = get_buy_now_price(post) if supports_buy_now else None
-                bids, bid_err = community_get_bids(community_settings, db, post_id)
-                if bid_err:
-                    st.error(bid_err)
-                    bids = []
-                current_bid = max([b.get("amount", 0.0) for b in bids], default=starting_bid or 0.0)
-                st.markdown(f"**Current Bid:** {currency} {current_bid:,.2f}")
-                st.caption(f"Minimum Increment: {currency} {float(min_increment or 0.0):,.2f}")
-                if reserve_amount:
-                    st.caption(f"Reserve: {currency} {float(reserve_amount):,.2f}")
-                    if current_bid >= float(reserve_amount):
-                        st.success("Reserve met")
-                    else:
-                        st.warning("Reserve not met yet")
-                if buy_now_price:
-                    st.caption(f"Buy Now: {currency} {float(buy_now_price):,.2f}")
-                if end_date:
-                    st.write(f"Auction ends: {end_date}")
-
-                if bids:
-                    recent = sorted(bids, key=lambda b: parse_forum_date(b.get("created_at", "")), reverse=True)[:5]
-                    st.markdown("**Recent Bids**")
-                    for bid in recent:
-                        st.write(f"{bid.get('user','User')}: {currency} {float(bid.get('amount', 0.0)):,.2f}")
-
-                if status == "Active":
-                    if is_banned:
-                        st.info("You cannot bid while suspended.")
-                    else:
-                        with st.form(f"bid_form_{post_id}"):
-                            bid_amount = st.number_input(
-                                f"Place Bid ({currency})",
-                                min_value=0.0,
-                                value=float(current_bid + max(min_increment or 0.0, 1.0)),
-                                step=1.0
-                            )
-                            submit_bid = st.form_submit_button("Submit Bid")
-                        if submit_bid:
-                            if bid_amount < current_bid + (min_increment or 0.0):
-                                st.error(f"Bid must be at least {currency} {current_bid + (min_increment or 0.0):,.2f}.")
-                            else:
-                                bid_payload = {
-                                    "post_id": post_id,
-                                    "amount": float(bid_amount),
-                                    "user": user,
-                                    "created_at": datetime.now().isoformat()
-                                }
-                                if supabase_auth_required(community_settings) and supports_owner_id and auth_user_id:
-                                    bid_payload["owner_id"] = auth_user_id
-                                _, err = community_add_bid(community_settings, db, bid_payload)
-                                if err:
-                                    st.error(err)
-                                else:
-                                    seller = post.get("created_by")
-                                    if seller and seller != user:
-                                        recipient_id = community_lookup_user_auth_id(community_settings, seller) if supabase_auth_required(community_settings) else None
-                                        if supabase_auth_required(community_settings) and not recipient_id:
-                                            st.warning("Bid placed, but seller has not linked a Community account yet.")
-                                        else:
-                                            msg_payload = {
-                                                "sender": user,
-                                                "recipient": seller,
-                                                "subject": f"New bid on {post.get('title', 'your listing')}",
-                                                "body": f"{user} placed a bid of {currency} {float(bid_amount):,.2f}.",
-                                                "created_at": datetime.now().isoformat(),
-                                                "read_at": None
-                                            }
-                                            if supabase_auth_required(community_settings) and auth_user_id:
-                                                msg_payload["sender_id"] = auth_user_id
-                                                msg_payload["recipient_id"] = recipient_id
-                                            _, msg_err = community_send_message(community_settings, db, msg_payload)
-                                            if msg_err:
-                                                st.warning(f"Bid placed, but could not notify seller: {msg_err}")
-                                    st.success("Bid submitted.")
-                                    st.rerun()
+        detail_cols = st.columns([1.3, 1])
+        with detail_cols[0]:
+            post_images = get_post_images(post)
+            if post_images:
+                image_cols = st.columns(min(len(post_images), 3))
+                for idx, img in enumerate(post_images[:3]):
+                    with image_cols[idx]:
+                        st.image(img, width=220)
+            st.write(post.get("body", ""))
+            if post.get("category"):
+                st.write(f"Category: {post.get('category')}")
+            if post.get("grading_company") or post.get("grading_grade"):
+                company = post.get("grading_company") or ""
+                grade = post.get("grading_grade") or ""
+                label = f"{company} {grade}".strip()
+                st.write(f"Grade: {label}")
+            if post.get("location"):
+                st.write(f"Country: {post.get('location')}")
+            if status == "Sold" and post.get("sold_price") is not None:
+                st.markdown(f"**Sold for:** {currency} {float(post.get('sold_price')):,.2f}")
+
+        with detail_cols[1]:
+            summary_card = st.container()
+            with summary_card:
+                st.markdown("#### Listing Summary")
+                if listing_type == "For Sale":
+                    st.metric("Asking Price", f"{currency} {float(price or 0.0):,.2f}")
+                elif listing_type == "Auction":
+                    starting_bid, min_increment, end_date = get_auction_fields(post)
+                    st.metric("Starting Bid", f"{currency} {float(starting_bid or 0.0):,.2f}")
+                    if end_date:
+                        st.caption(f"Auction ends: {end_date}")
+                if post.get("buy_now_price"):
+                    st.metric("Buy Now", f"{currency} {float(post.get('buy_now_price')):,.2f}")
+                if post.get("reserve_amount"):
+                    st.metric("Reserve", f"{currency} {float(post.get('reserve_amount')):,.2f}")
+                if user == post.get("created_by"):
+                    if st.button("Edit Listing", key=f"edit_listing_detail_{post_id}"):
+                        st.session_state.edit_listing_id = post_id
+                        st.session_state.edit_listing_origin = "browse"
+                        request_scroll_to_top()
+                        st.rerun()
 
-                    if buy_now_price and user != post.get("created_by"):
-                        if st.button("Buy Now", key=f"buy_now_{post_id}"):
-                            _, err = community_update_post(community_settings, db, post_id, {
-                                "status": "Sold",
-                                "sold_price": float(buy_now_price),
-                                "sold_at": datetime.now().isoformat()
-                            })
+        activity_kinds = ["comments"]
+        if listing_type == "For Sale":
+            activity_kinds.append("offers")
+        activity, activity_err = community_get_post_activity(community_settings, db, [post_id], activity_kinds)
+        if activity_err:
+            st.error(activity_err)
+
+        if listing_type == "Auction":
+            starting_bid, min_increment, end_date = get_auction_fields(post)
+            reserve_amount = get_reserve_amount(post) if supports_reserve else None
+            buy_now_price = get_buy_now_price(post) if supports_buy_now else None
+            bid_stats, bid_err = community_get_bid_stats(community_settings, db, [post_id])
+            if bid_err:
+                st.error(bid_err)
+            post_bid_stats = bid_stats.get(post_id) or {}
+            max_bid = post_bid_stats.get("max_bid")
+            current_bid = float(max_bid) if max_bid is not None else float(starting_bid or 0.0)
+            st.markdown(f"**Current Bid:** {currency} {current_bid:,.2f}")
+            st.caption(f"Bids: {int(post_bid_stats.get('bid_count') or 0)}")
+            st.caption(f"Minimum Increment: {currency} {float(min_increment or 0.0):,.2f}")
+            if reserve_amount:
+                st.caption(f"Reserve: {currency} {float(reserve_amount):,.2f}")
+                if current_bid >= float(reserve_amount):
+                    st.success("Reserve met")
+                else:
+                    st.warning("Reserve not met yet")
+            if buy_now_price:
+                st.caption(f"Buy Now: {currency} {float(buy_now_price):,.2f}")
+            if end_date:
+                st.write(f"Auction ends: {end_date}")
+
+            recent, recent_err = community_get_recent_bids(community_settings, db, post_id) if post_bid_stats.get("bid_count") else ([], None)
+            if recent_err:
+                st.error(recent_err)
+            if recent:
+                st.markdown("**Recent Bids**")
+                for bid in recent:
+                    st.write(f"{bid.get('user','User')}: {currency} {float(bid.get('amount', 0.0)):,.2f}")
+
+            if status == "Active":
+                if is_banned:
+                    st.info("You cannot bid while suspended.")
+                else:
+                    with st.form(f"bid_form_{post_id}"):
+                        bid_amount = st.number_input(
+                            f"Place Bid ({currency})",
+                            min_value=0.0,
+                            value=float(current_bid + max(min_increment or 0.0, 1.0)),
+                            step=1.0
+                        )
+                        submit_bid = st.form_submit_button("Submit Bid")
+                    if submit_bid:
+                        if bid_amount < current_bid + (min_increment or 0.0):
+                            st.error(f"Bid must be at least {currency} {current_bid + (min_increment or 0.0):,.2f}.")
+                        else:
+                            bid_payload = {
+                                "post_id": post_id,
+                                "amount": float(bid_amount),
+                                "user": user,
+                                "created_at": datetime.now().isoformat()
+                            }
+                            if supabase_auth_required(community_settings) and supports_owner_id and auth_user_id:
+                                bid_payload["owner_id"] = auth_user_id
+                            _, err = community_add_bid(community_settings, db, bid_payload)
                             if err:
                                 st.error(err)
                             else:
@@ -10188,228 +13539,233 @@ if forum_tab is not None:
                                 if seller and seller != user:
                                     recipient_id = community_lookup_user_auth_id(community_settings, seller) if supabase_auth_required(community_settings) else None
                                     if supabase_auth_required(community_settings) and not recipient_id:
-                                        st.warning("Purchase completed, but seller has not linked a Community account yet.")
+                                        st.warning("Bid placed, but seller has not linked a Community account yet.")
                                     else:
                                         msg_payload = {
                                             "sender": user,
                                             "recipient": seller,
-                                            "subject": f"Buy Now purchase on {post.get('title', 'your listing')}",
-                                            "body": f"{user} purchased via Buy Now for {currency} {float(buy_now_price):,.2f}.",
+                                            "subject": f"New bid on {post.get('title', 'your listing')}",
+                                            "body": f"{user} placed a bid of {currency} {float(bid_amount):,.2f}.",
                                             "created_at": datetime.now().isoformat(),
                                             "read_at": None
                                         }
                                         if supabase_auth_required(community_settings) and auth_user_id:
                                             msg_payload["sender_id"] = auth_user_id
                                             msg_payload["recipient_id"] = recipient_id
-                                        community_send_message(community_settings, db, msg_payload)
-                                st.success("Purchase completed.")
+                                        _, msg_err = community_send_message(community_settings, db, msg_payload)
+                                        if msg_err:
+                                            st.warning(f"Bid placed, but could not notify seller: {msg_err}")
+                                st.success("Bid submitted.")
                                 st.rerun()
 
-            if listing_type == "For Sale":
-                st.markdown(f"**Asking Price:** {currency} {float(price or 0.0):,.2f}")
-                offers, offer_err = community_get_offers(community_settings, db, post_id)
-                if offer_err:
-                    st.error(offer_err)
-                if status == "Active":
-                    if is_banned:
-                        st.info("You cannot send offers while suspended.")
-                    else:
-                        with st.form(f"offer_form_{post_id}"):
-                            offer_amount = st.number_input(
-                                f"Send Offer ({currency})",
-                                min_value=0.0,
-                                value=float(price or 0.0),
-                                step=1.0
-                            )
-                            submit_offer = st.form_submit_button("Send Offer")
-                        if submit_offer:
-                            offer_payload = {
-                                "post_id": post_id,
-                                "amount": float(offer_amount),
-                                "user": user,
-                                "created_at": datetime.now().isoformat()
-                            }
-                            if supabase_auth_required(community_settings) and supports_owner_id and auth_user_id:
-                                offer_payload["owner_id"] = auth_user_id
-                            _, err = community_add_offer(community_settings, db, offer_payload)
-                            if err:
-                                st.error(err)
-                            else:
-                                st.success("Offer sent.")
-                                st.rerun()
+                if buy_now_price and user != post.get("created_by"):
+                    if st.button("Buy Now", key=f"buy_now_{post_id}"):
+                        _, err = community_update_post(community_settings, db, post_id, {
+                            "status": "Sold",
+                            "sold_price": float(buy_now_price),
+                            "sold_at": datetime.now().isoformat()
+                        })
+                        if err:
+                            st.error(err)
+                        else:
+                            seller = post.get("created_by")
+                            if seller and seller != user:
+                                recipient_id = community_lookup_user_auth_id(community_settings, seller) if supabase_auth_required(community_settings) else None
+                                if supabase_auth_required(community_settings) and not recipient_id:
+                                    st.warning("Purchase completed, but seller has not linked a Community account yet.")
+                                else:
+                                    msg_payload = {
+                                        "sender": user,
+                                        "recipient": seller,
+                                        "subject": f"Buy Now purchase on {post.get('title', 'your listing')}",
+                                        "body": f"{user} purchased via Buy Now for {currency} {float(buy_now_price):,.2f}.",
+                                        "created_at": datetime.now().isoformat(),
+                                        "read_at": None
+                                    }
+                                    if supabase_auth_required(community_settings) and auth_user_id:
+                                        msg_payload["sender_id"] = auth_user_id
+                                        msg_payload["recipient_id"] = recipient_id
+                                    community_send_message(community_settings, db, msg_payload)
+                            st.success("Purchase completed.")
+                            st.rerun()
 
-            comments, comment_err = community_get_comments(community_settings, db, post_id)
-            if comment_err:
-                st.error(comment_err)
-                comments = []
-            st.markdown("**Comments**")
-            for comment in comments[-5:]:
-                st.write(f"{comment.get('user', 'User')}: {comment.get('text', '')}")
-            if is_banned:
-                st.info("You cannot comment while suspended.")
-            else:
-                with st.form(f"comment_form_{post_id}"):
-                    comment_text = st.text_input("Add a comment", key=f"comment_input_{post_id}")
-                    submit_comment = st.form_submit_button("Post Comment")
-                if submit_comment and comment_text.strip():
-                    if validate_community_text(comment_text):
-                        st.error("Your comment violates the Community Rules.")
-                    else:
-                        comment_payload = {
+        if listing_type == "For Sale":
+            st.markdown(f"**Asking Price:** {currency} {float(price or 0.0):,.2f}")
+            offers = activity["offers"].get(post_id, [])
+            if status == "Active":
+                if is_banned:
+                    st.info("You cannot send offers while suspended.")
+                else:
+                    with st.form(f"offer_form_{post_id}"):
+                        offer_amount = st.number_input(
+                            f"Send Offer ({currency})",
+                            min_value=0.0,
+                            value=float(price or 0.0),
+                            step=1.0
+                        )
+                        submit_offer = st.form_submit_button("Send Offer")
+                    if submit_offer:
+                        offer_payload = {
                             "post_id": post_id,
+                            "amount": float(offer_amount),
                             "user": user,
-                            "text": comment_text.strip(),
                             "created_at": datetime.now().isoformat()
                         }
                         if supabase_auth_required(community_settings) and supports_owner_id and auth_user_id:
-                            comment_payload["owner_id"] = auth_user_id
-                        _, err = community_add_comment(community_settings, db, comment_payload)
+                            offer_payload["owner_id"] = auth_user_id
+                        _, err = community_add_offer(community_settings, db, offer_payload)
                         if err:
                             st.error(err)
                         else:
-                            st.success("Comment posted.")
+                            st.success("Offer sent.")
                             st.rerun()
 
-            if user != post.get("created_by"):
-                if is_banned:
-                    st.info("You cannot message sellers while suspended.")
+        comments = activity["comments"].get(post_id, [])
+        st.markdown("**Comments**")
+        for comment in comments[-5:]:
+            st.write(f"{comment.get('user', 'User')}: {comment.get('text', '')}")
+        if is_banned:
+            st.info("You cannot comment while suspended.")
+        else:
+            with st.form(f"comment_form_{post_id}"):
+                comment_text = st.text_input("Add a comment", key=f"comment_input_{post_id}")
+                submit_comment = st.form_submit_button("Post Comment")
+            if submit_comment and comment_text.strip():
+                if validate_community_text(comment_text):
+                    st.error("Your comment violates the Community Rules.")
                 else:
-                    with st.form(f"message_seller_{post_id}"):
-                        message_body = st.text_area("Message seller", height=80, key=f"msg_body_{post_id}")
-                        send_msg = st.form_submit_button("Send Message")
-                    if send_msg and message_body.strip():
-                        if validate_community_text(message_body):
-                            st.error("Your message violates the Community Rules.")
-                        else:
-                            recipient_name = post.get("created_by")
-                            recipient_id = community_lookup_user_auth_id(community_settings, recipient_name) if supabase_auth_required(community_settings) else None
-                            if supabase_auth_required(community_settings) and not recipient_id:
-                                st.error("Seller has not linked a Community account yet.")
-                            else:
-                                msg_payload = {
-                                    "sender": user,
-                                    "recipient": recipient_name,
-                                    "subject": f"Re: {post.get('title', '')}",
-                                    "body": message_body.strip(),
-                                    "created_at": datetime.now().isoformat(),
-                                    "read_at": None
-                                }
-                                if supabase_auth_required(community_settings) and auth_user_id:
-                                    msg_payload["sender_id"] = auth_user_id
-                                    msg_payload["recipient_id"] = recipient_id
-                                _, err = community_send_message(community_settings, db, msg_payload)
-                                if err:
-                                    st.error(err)
-                                else:
-                                    st.success("Message sent.")
-                                    st.rerun()
-
-            report_cols = st.columns(2)
-            with report_cols[0]:
-                if st.button("Report Listing", key=f"report_{post_id}"):
-                    report_payload = {
-                        "id": secrets.token_hex(6),
+                    comment_payload = {
                         "post_id": post_id,
-                        "reported_by": user,
-                        "reported_user": post.get("created_by"),
-                        "reason": "User reported",
+                        "user": user,
+                        "text": comment_text.strip(),
                         "created_at": datetime.now().isoformat()
                     }
                     if supabase_auth_required(community_settings) and supports_owner_id and auth_user_id:
-                        report_payload["owner_id"] = auth_user_id
-                    if supabase_enabled(community_settings):
-                        report_payload.pop("id", None)
-                    _, err = community_report_post(community_settings, db, report_payload)
+                        comment_payload["owner_id"] = auth_user_id
+                    _, err = community_add_comment(community_settings, db, comment_payload)
                     if err:
                         st.error(err)
                     else:
-                        st.success("Report submitted.")
+                        st.success("Comment posted.")
                         st.rerun()
-            if is_mod:
-                with report_cols[1]:
-                    if st.button("Remove Listing", key=f"remove_{post_id}"):
-                        _, err = community_update_post(community_settings, db, post_id, {"status": "Removed"})
-                        if err:
-                            st.error(err)
-                        else:
-                            st.success("Listing removed.")
-                            st.rerun()
 
-        def render_listing_edit_modal():
-            post_id = st.session_state.get("edit_listing_id")
-            if not post_id:
-                return
-            if not is_elite:
-                render_plan_gate(
-                    user_settings,
-                    "Elite",
-                    "Edit Listings",
-                    "Upgrade to Elite to edit Community Market listings.",
-                    key="gate_community_edit"
-                )
-                st.session_state.edit_listing_id = None
-                return
-            target_post = next((post for post in forum_posts if post.get("id") == post_id), None)
-            if not target_post:
-                st.session_state.edit_listing_id = None
-                return
-            if supports_owner_id and auth_user_id and target_post.get("owner_id") and target_post.get("owner_id") != auth_user_id:
-                st.error("Only the listing owner can edit this post.")
-                st.session_state.edit_listing_id = None
-                return
-            if user != target_post.get("created_by"):
-                st.error("Only the listing owner can edit this post.")
-                st.session_state.edit_listing_id = None
-                return
-            dialog_ctx, dialog_supported = open_streamlit_dialog("Edit Listing")
-            if dialog_supported:
-                with dialog_ctx:
-                    render_listing_edit_form(target_post, f"modal_{st.session_state.get('edit_listing_origin', 'browse')}")
-                    st.markdown("---")
-                    confirm_delete = st.checkbox("I understand this will permanently delete the listing.", key=f"confirm_delete_{post_id}")
-                    if st.button("Delete Listing", key=f"delete_listing_modal_{post_id}"):
-                        if not confirm_delete:
-                            st.warning("Please confirm the deletion.")
+        if user != post.get("created_by"):
+            if is_banned:
+                st.info("You cannot message sellers while suspended.")
+            else:
+                with st.form(f"message_seller_{post_id}"):
+                    message_body = st.text_area("Message seller", height=80, key=f"msg_body_{post_id}")
+                    send_msg = st.form_submit_button("Send Message")
+                if send_msg and message_body.strip():
+                    if validate_community_text(message_body):
+                        st.error("Your message violates the Community Rules.")
+                    else:
+                        recipient_name = post.get("created_by")
+                        recipient_id = community_lookup_user_auth_id(community_settings, recipient_name) if supabase_auth_required(community_settings) else None
+                        if supabase_auth_required(community_settings) and not recipient_id:
+                            st.error("Seller has not linked a Community account yet.")
                         else:
-                            _, err = community_delete_post(community_settings, db, post_id)
+                            msg_payload = {
+                                "sender": user,
+                                "recipient": recipient_name,
+                                "subject": f"Re: {post.get('title', '')}",
+                                "body": message_body.strip(),
+                                "created_at": datetime.now().isoformat(),
+                                "read_at": None
+                            }
+                            if supabase_auth_required(community_settings) and auth_user_id:
+                                msg_payload["sender_id"] = auth_user_id
+                                msg_payload["recipient_id"] = recipient_id
+                            _, err = community_send_message(community_settings, db, msg_payload)
                             if err:
                                 st.error(err)
                             else:
-                                st.success("Listing deleted.")
-                                st.session_state.edit_listing_id = None
+                                save_data(db)
+                                st.success("Message sent.")
                                 st.rerun()
-                    if st.button("Close", key=f"close_edit_listing_{post_id}"):
-                        st.session_state.edit_listing_id = None
+
+        report_cols = st.columns(2)
+        with report_cols[0]:
+            if st.button("Report Listing", key=f"report_{post_id}"):
+                report_payload = {
+                    "id": secrets.token_hex(6),
+                    "post_id": post_id,
+                    "reported_by": user,
+                    "reported_user": post.get("created_by"),
+                    "reason": "User reported",
+                    "created_at": datetime.now().isoformat()
+                }
+                if supabase_auth_required(community_settings) and supports_owner_id and auth_user_id:
+                    report_payload["owner_id"] = auth_user_id
+                if supabase_enabled(community_settings):
+                    report_payload.pop("id", None)
+                _, err = community_report_post(community_settings, db, report_payload)
+                if err:
+                    st.error(err)
+                else:
+                    st.success("Report submitted.")
+                    st.rerun()
+        if is_mod:
+            with report_cols[1]:
+                if st.button("Remove Listing", key=f"remove_{post_id}"):
+                    _, err = community_update_post(community_settings, db, post_id, {"status": "Removed"})
+                    if err:
+                        st.error(err)
+                    else:
+                        st.success("Listing removed.")
                         st.rerun()
-            else:
-                dialog_fn = getattr(st, "dialog", None)
-                if callable(dialog_fn):
-                    @dialog_fn("Edit Listing")
-                    def _edit_dialog():
-                        render_listing_edit_form(
-                            target_post,
-                            f"modal_{st.session_state.get('edit_listing_origin', 'browse')}"
-                        )
-                        st.markdown("---")
-                        confirm_delete = st.checkbox("I understand this will permanently delete the listing.", key=f"confirm_delete_{post_id}")
-                        if st.button("Delete Listing", key=f"delete_listing_modal_{post_id}"):
-                            if not confirm_delete:
-                                st.warning("Please confirm the deletion.")
-                            else:
-                                _, err = community_delete_post(community_settings, db, post_id)
-                                if err:
-                                    st.error(err)
-                                else:
-                                    st.success("Listing deleted.")
-                                    st.session_state.edit_listing_id = None
-                                    st.rerun()
-                        if st.button("Close", key=f"close_edit_listing_{post_id}"):
+
+    def render_listing_edit_modal():
+        post_id = st.session_state.get("edit_listing_id")
+        if not post_id:
+            return
+        if not is_elite:
+            render_plan_gate(
+                user_settings,
+                "Elite",
+                "Edit Listings",
+                "Upgrade to Elite to edit Community Market listings.",
+                key="gate_community_edit"
+            )
+            st.session_state.edit_listing_id = None
+            return
+        target_post = get_full_post(next((post for post in forum_posts if post.get("id") == post_id), None))
+        if not target_post:
+            st.session_state.edit_listing_id = None
+            return
+        if supports_owner_id and auth_user_id and target_post.get("owner_id") and target_post.get("owner_id") != auth_user_id:
+            st.error("Only the listing owner can edit this post.")
+            st.session_state.edit_listing_id = None
+            return
+        if user != target_post.get("created_by"):
+            st.error("Only the listing owner can edit this post.")
+            st.session_state.edit_listing_id = None
+            return
+        dialog_ctx, dialog_supported = open_streamlit_dialog("Edit Listing")
+        if dialog_supported:
+            with dialog_ctx:
+                render_listing_edit_form(target_post, f"modal_{st.session_state.get('edit_listing_origin', 'browse')}")
+                st.markdown("---")
+                confirm_delete = st.checkbox("I understand this will permanently delete the listing.", key=f"confirm_delete_{post_id}")
+                if st.button("Delete Listing", key=f"delete_listing_modal_{post_id}"):
+                    if not confirm_delete:
+                        st.warning("Please confirm the deletion.")
+                    else:
+                        _, err = community_delete_post(community_settings, db, post_id)
+                        if err:
+                            st.error(err)
+                        else:
+                            st.success("Listing deleted.")
                             st.session_state.edit_listing_id = None
                             st.rerun()
-                    _edit_dialog()
-                else:
-                    st.markdown("### Edit Listing")
-                    st.caption("Your Streamlit version does not support modal dialogs. Showing the editor inline.")
+                if st.button("Close", key=f"close_edit_listing_{post_id}"):
+                    st.session_state.edit_listing_id = None
+                    st.rerun()
+        else:
+            dialog_fn = getattr(st, "dialog", None)
+            if callable(dialog_fn):
+                @dialog_fn("Edit Listing")
+                def _edit_dialog():
                     render_listing_edit_form(
                         target_post,
                         f"modal_{st.session_state.get('edit_listing_origin', 'browse')}"
@@ -10430,1224 +13786,1429 @@ if forum_tab is not None:
                     if st.button("Close", key=f"close_edit_listing_{post_id}"):
                         st.session_state.edit_listing_id = None
                         st.rerun()
-                    st.stop()
-
-        def render_listing_view_modal():
-            post_id = st.session_state.get("market_view_post_id")
-            if not post_id:
-                return
-            target_post = next((post for post in forum_posts if post.get("id") == post_id), None)
-            if not target_post:
-                st.session_state.market_view_post_id = None
-                return
-            status = get_post_status(target_post)
-            dialog_ctx, dialog_supported = open_streamlit_dialog("Listing Details")
-            if dialog_supported:
-                with dialog_ctx:
-                    render_listing_detail_panel(target_post, status)
-                    if st.button("Close", key=f"close_view_listing_{post_id}"):
-                        st.session_state.market_view_post_id = None
-                        st.rerun()
+                _edit_dialog()
             else:
-                dialog_fn = getattr(st, "dialog", None)
-                if callable(dialog_fn):
-                    @dialog_fn("Listing Details")
-                    def _view_dialog():
-                        render_listing_detail_panel(target_post, status)
-                        if st.button("Close", key=f"close_view_listing_{post_id}"):
-                            st.session_state.market_view_post_id = None
+                st.markdown("### Edit Listing")
+                st.caption("Your Streamlit version does not support modal dialogs. Showing the editor inline.")
+                render_listing_edit_form(
+                    target_post,
+                    f"modal_{st.session_state.get('edit_listing_origin', 'browse')}"
+                )
+                st.markdown("---")
+                confirm_delete = st.checkbox("I understand this will permanently delete the listing.", key=f"confirm_delete_{post_id}")
+                if st.button("Delete Listing", key=f"delete_listing_modal_{post_id}"):
+                    if not confirm_delete:
+                        st.warning("Please confirm the deletion.")
+                    else:
+                        _, err = community_delete_post(community_settings, db, post_id)
+                        if err:
+                            st.error(err)
+                        else:
+                            st.success("Listing deleted.")
+                            st.session_state.edit_listing_id = None
                             st.rerun()
-                    _view_dialog()
-                else:
-                    st.markdown("### Listing Details")
+                if st.button("Close", key=f"close_edit_listing_{post_id}"):
+                    st.session_state.edit_listing_id = None
+                    st.rerun()
+                st.stop()
+
+    def render_listing_view_modal():
+        post_id = st.session_state.get("market_view_post_id")
+        if not post_id:
+            return
+        target_post = get_full_post(next((post for post in forum_posts if post.get("id") == post_id), None))
+        if not target_post:
+            st.session_state.market_view_post_id = None
+            return
+        status = get_post_status(target_post)
+        dialog_ctx, dialog_supported = open_streamlit_dialog("Listing Details")
+        if dialog_supported:
+            with dialog_ctx:
+                render_listing_detail_panel(target_post, status)
+                if st.button("Close", key=f"close_view_listing_{post_id}"):
+                    st.session_state.market_view_post_id = None
+                    st.rerun()
+        else:
+            dialog_fn = getattr(st, "dialog", None)
+            if callable(dialog_fn):
+                @dialog_fn("Listing Details")
+                def _view_dialog():
                     render_listing_detail_panel(target_post, status)
                     if st.button("Close", key=f"close_view_listing_{post_id}"):
                         st.session_state.market_view_post_id = None
                         st.rerun()
-                    st.stop()
+                _view_dialog()
+            else:
+                st.markdown("### Listing Details")
+                render_listing_detail_panel(target_post, status)
+                if st.button("Close", key=f"close_view_listing_{post_id}"):
+                    st.session_state.market_view_post_id = None
+                    st.rerun()
+                st.stop()
 
-        render_listing_edit_modal()
-        render_listing_view_modal()
+    render_listing_edit_modal()
+    render_listing_view_modal()
 
 
-        with forum_tabs[0]:
-            if not community_ready:
-                st.info("Community is not ready yet. Configure Supabase in the setup section at the bottom of this page.")
-            else:
-                if AUTOREFRESH_AVAILABLE:
-                    live_updates = st.checkbox("Live updates (auto-refresh bids)", value=True, key="community_live_updates")
-                    if live_updates:
-                        st_autorefresh(interval=20000, key="community_live_refresh")
-                st.markdown("### Browse Listings")
-                category_seed = set(COMMUNITY_CATEGORY_OPTIONS)
-                category_seed |= {post.get("category", "Other") for post in forum_posts}
-                category_seed |= {asset.get("type", "Other") for asset in portfolio}
-                category_options = list(COMMUNITY_CATEGORY_OPTIONS)
-                for extra in sorted(category_seed - set(category_options)):
-                    category_options.append(extra)
-                category_counts = Counter([post.get("category", "Other") for post in forum_posts])
-                top_categories = [cat for cat, _ in category_counts.most_common(6)]
-                quick_categories = ["All"] + [cat for cat in top_categories if cat in category_options]
-                quick_current = st.session_state.get("market_quick_category", "All")
-                quick_index = quick_categories.index(quick_current) if quick_current in quick_categories else 0
-                st.radio(
-                    "Quick Categories",
-                    quick_categories,
-                    horizontal=True,
-                    index=quick_index,
-                    key="market_quick_category"
+    with forum_tabs[0]:
+        if not community_ready:
+            st.info("Community is not ready yet. Configure Supabase in the setup section at the bottom of this page.")
+        else:
+            live_updates = st.checkbox("Live updates (new listings, bids and messages)", value=True, key="community_live_updates")
+            if live_updates:
+                # Local writes publish their own changes; Supabase changes arrive over Realtime.
+                realtime_status = ensure_community_realtime(community_settings) if supabase_enabled(community_settings) else None
+                realtime_ok = not supabase_enabled(community_settings) or (
+                    realtime_status is not None and (realtime_status["connected"] or not realtime_status["last_error"])
                 )
-                filter_container = st.container()
-                with filter_container:
-                    st.markdown('<div id="sticky-filter-marker"></div>', unsafe_allow_html=True)
-                    filter_cols = st.columns([1.6, 1, 1, 1])
-                    with filter_cols[0]:
-                        search_term = st.text_input(
-                            "Search listings",
-                            placeholder="Search by title, description, or seller...",
-                            key="market_search_term"
-                        )
-                    with filter_cols[1]:
-                        type_filter = st.selectbox(
-                            "Type",
-                            ["All", "For Sale", "Auction", "Discussion"],
-                            key="market_type_filter"
-                        )
-                    with filter_cols[2]:
-                        category_filter = st.selectbox(
-                            "Category",
-                            ["All"] + category_options,
-                            key="market_category_filter"
-                        )
-                    with filter_cols[3]:
-                        status_filter = st.selectbox(
-                            "Status",
-                            ["All", "Active", "Ended", "Closed", "Sold", "Removed"],
-                            key="market_status_filter"
-                        )
+                if realtime_ok and hasattr(st, "fragment"):
+                    live_topics = ["posts", f"messages:{user}"]
+                    if st.session_state.get("market_selected_post_id"):
+                        live_topics.append(f"post:{st.session_state.market_selected_post_id}")
+                    watch_community_changes(live_topics)
+                elif AUTOREFRESH_AVAILABLE:
+                    st_autorefresh(interval=20000, key="community_live_refresh")
+            st.markdown("### Browse Listings")
+            category_seed = set(COMMUNITY_CATEGORY_OPTIONS)
+            category_seed |= {post.get("category", "Other") for post in forum_posts}
+            category_seed |= {asset.get("type", "Other") for asset in portfolio}
+            category_options = list(COMMUNITY_CATEGORY_OPTIONS)
+            for extra in sorted(category_seed - set(category_options)):
+                category_options.append(extra)
+            category_counts = Counter([post.get("category", "Other") for post in forum_posts])
+            top_categories = [cat for cat, _ in category_counts.most_common(6)]
+            quick_categories = ["All"] + [cat for cat in top_categories if cat in category_options]
+            quick_current = st.session_state.get("market_quick_category", "All")
+            quick_index = quick_categories.index(quick_current) if quick_current in quick_categories else 0
+            st.radio(
+                "Quick Categories",
+                quick_categories,
+                horizontal=True,
+                index=quick_index,
+                key="market_quick_category"
+            )
+            filter_container = st.container()
+            with filter_container:
+                st.markdown('<div id="sticky-filter-marker"></div>', unsafe_allow_html=True)
+                filter_cols = st.columns([1.6, 1, 1, 1])
+                with filter_cols[0]:
+                    search_term = st.text_input(
+                        "Search listings",
+                        placeholder="Search by title, category, description, or seller...",
+                        key="market_search_term"
+                    )
+                with filter_cols[1]:
+                    type_filter = st.selectbox(
+                        "Type",
+                        ["All", "For Sale", "Auction", "Discussion"],
+                        key="market_type_filter"
+                    )
+                with filter_cols[2]:
+                    category_filter = st.selectbox(
+                        "Category",
+                        ["All"] + category_options,
+                        key="market_category_filter"
+                    )
+                with filter_cols[3]:
+                    status_filter = st.selectbox(
+                        "Status",
+                        ["All", "Active", "Ended", "Closed", "Sold", "Removed"],
+                        key="market_status_filter"
+                    )
 
-                    if "market_price_range_pending" in st.session_state:
-                        st.session_state.market_price_range = st.session_state.pop("market_price_range_pending")
-                    price_values = [value for value in (get_listing_price_value(post) for post in forum_posts) if value is not None]
-                    price_range = None
-                    sort_cols = st.columns([2, 1])
-                    with sort_cols[0]:
-                        if price_values:
-                            min_price = float(min(price_values))
-                            max_price = float(max(price_values))
+                if "market_price_range_pending" in st.session_state:
+                    st.session_state.market_price_range = st.session_state.pop("market_price_range_pending")
+                price_values = [value for value in (get_listing_price_value(post) for post in forum_posts) if value is not None]
+                price_range = None
+                sort_cols = st.columns([2, 1])
+                with sort_cols[0]:
+                    if price_values:
+                        min_price = float(min(price_values))
+                        max_price = float(max(price_values))
+                        if "market_price_range" in st.session_state:
+                            st.session_state.market_price_range = clamp_price_range(
+                                st.session_state.market_price_range, min_price, max_price
+                            )
+                        if min_price == max_price:
+                            st.caption(f"Price range fixed at {currency_code} {min_price:,.2f}")
+                            price_range = (min_price, max_price)
+                        else:
                             if "market_price_range" in st.session_state:
-                                st.session_state.market_price_range = clamp_price_range(
-                                    st.session_state.market_price_range, min_price, max_price
+                                price_range = st.slider(
+                                    f"Price Range ({currency_code})",
+                                    min_value=min_price,
+                                    max_value=max_price,
+                                    key="market_price_range"
                                 )
-                            if min_price == max_price:
-                                st.caption(f"Price range fixed at {currency_code} {min_price:,.2f}")
-                                price_range = (min_price, max_price)
                             else:
-                                if "market_price_range" in st.session_state:
-                                    price_range = st.slider(
-                                        f"Price Range ({currency_code})",
-                                        min_value=min_price,
-                                        max_value=max_price,
-                                        key="market_price_range"
-                                    )
-                                else:
-                                    price_range = st.slider(
-                                        f"Price Range ({currency_code})",
-                                        min_value=min_price,
-                                        max_value=max_price,
-                                        value=(min_price, max_price),
-                                        key="market_price_range"
+                                price_range = st.slider(
+                                    f"Price Range ({currency_code})",
+                                    min_value=min_price,
+                                    max_value=max_price,
+                                    value=(min_price, max_price),
+                                    key="market_price_range"
+                                )
+                with sort_cols[1]:
+                    sort_option = st.selectbox(
+                        "Sort by",
+                        ["Newest", "Best Match", "Ending Soon", "Price (Low to High)", "Price (High to Low)"],
+                        key="market_sort_option"
+                    )
+
+            components.html(
+                """
+                <script>
+                  (function() {
+                    const marker = window.parent.document.getElementById("sticky-filter-marker");
+                    if (!marker) return;
+                    const block = marker.closest('div[data-testid="stVerticalBlock"]');
+                    if (block) {
+                      block.classList.add("sticky-filter-block");
+                    }
+                  })();
+                </script>
+                """,
+                height=0
+            )
+
+            quick_filter_cols = st.columns(6)
+            with quick_filter_cols[0]:
+                filter_watchlist = st.checkbox("Watchlist", key="market_filter_watchlist")
+            with quick_filter_cols[1]:
+                filter_photos = st.checkbox("Photos only", key="market_filter_photos")
+            with quick_filter_cols[2]:
+                filter_buy_now = st.checkbox("Buy Now", key="market_filter_buy_now")
+            with quick_filter_cols[3]:
+                filter_new = st.checkbox("New (7d)", key="market_filter_new")
+            with quick_filter_cols[4]:
+                filter_ending = st.checkbox("Ending Soon", key="market_filter_ending")
+            with quick_filter_cols[5]:
+                filter_near_me = st.checkbox("Near Me", key="market_filter_near_me")
+
+            alert_inbox_cache = {}
+
+            def get_alert_inbox_state():
+                if "state" not in alert_inbox_cache:
+                    alert_inbox_cache["state"] = get_user_alert_state(user)
+                return alert_inbox_cache["state"]
+
+            with st.expander("Saved Searches"):
+                saved_searches = st.session_state.market_saved_searches
+                saved_names = [s.get("name") for s in saved_searches if s.get("name")]
+                selected_saved = st.selectbox(
+                    "Select saved search",
+                    ["Select..."] + saved_names,
+                    key="market_saved_search_select"
+                )
+                save_name = st.text_input("Save current search as", key="market_save_search_name")
+                save_cols = st.columns(3)
+                with save_cols[0]:
+                    if st.button("Save Search", key="market_save_search_btn"):
+                        if not save_name.strip():
+                            st.error("Please enter a name for this search.")
+                        else:
+                            payload = {
+                                "name": save_name.strip(),
+                                "search_term": search_term,
+                                "type_filter": type_filter,
+                                "category_filter": category_filter,
+                                "status_filter": status_filter,
+                                "sort_option": sort_option,
+                                "quick_category": st.session_state.get("market_quick_category", "All"),
+                                "price_range": list(price_range) if price_range else None,
+                                "filter_watchlist": filter_watchlist,
+                                "filter_photos": filter_photos,
+                                "filter_buy_now": filter_buy_now,
+                                "filter_new": filter_new,
+                                "filter_ending": filter_ending,
+                                "filter_near_me": filter_near_me,
+                                "saved_at": datetime.now().isoformat()
+                            }
+                            saved_searches = [s for s in saved_searches if s.get("name") != payload["name"]]
+                            saved_searches.insert(0, payload)
+                            st.session_state.market_saved_searches = saved_searches
+                            persist_market_saved_searches(db, user, saved_searches)
+                            st.success("Search saved.")
+                with save_cols[1]:
+                    if st.button("Load Search", key="market_load_search_btn"):
+                        if selected_saved and selected_saved != "Select...":
+                            search = next((s for s in saved_searches if s.get("name") == selected_saved), None)
+                            if search:
+                                st.session_state.market_search_term = search.get("search_term", "")
+                                st.session_state.market_type_filter = search.get("type_filter", "All")
+                                st.session_state.market_category_filter = search.get("category_filter", "All")
+                                st.session_state.market_status_filter = search.get("status_filter", "All")
+                                st.session_state.market_sort_option = search.get("sort_option", "Newest")
+                                st.session_state.market_quick_category = search.get("quick_category", "All")
+                                st.session_state.market_filter_watchlist = bool(search.get("filter_watchlist", False))
+                                st.session_state.market_filter_photos = bool(search.get("filter_photos", False))
+                                st.session_state.market_filter_buy_now = bool(search.get("filter_buy_now", False))
+                                st.session_state.market_filter_new = bool(search.get("filter_new", False))
+                                st.session_state.market_filter_ending = bool(search.get("filter_ending", False))
+                                st.session_state.market_filter_near_me = bool(search.get("filter_near_me", False))
+                                if price_values and search.get("price_range"):
+                                    min_price = float(min(price_values))
+                                    max_price = float(max(price_values))
+                                    st.session_state.market_price_range_pending = clamp_price_range(
+                                        search.get("price_range"), min_price, max_price
                                     )
-                    with sort_cols[1]:
-                        sort_option = st.selectbox(
-                            "Sort by",
-                            ["Newest", "Ending Soon", "Price (Low to High)", "Price (High to Low)"],
-                            key="market_sort_option"
+                                st.rerun()
+                with save_cols[2]:
+                    if st.button("Delete Search", key="market_delete_search_btn"):
+                        if selected_saved and selected_saved != "Select...":
+                            saved_searches = [s for s in saved_searches if s.get("name") != selected_saved]
+                            st.session_state.market_saved_searches = saved_searches
+                            persist_market_saved_searches(db, user, saved_searches)
+                            st.success("Search deleted.")
+                            st.rerun()
+
+                if selected_saved and selected_saved != "Select...":
+                    search = next((s for s in saved_searches if s.get("name") == selected_saved), None)
+                    if search:
+                        alerts_enabled = st.checkbox(
+                            "Enable alerts for this search",
+                            value=bool(search.get("alerts_enabled", True)),
+                            key="market_saved_search_alerts_enabled"
                         )
+                        email_enabled = st.checkbox(
+                            "Email alerts for this search",
+                            value=bool(search.get("email_alerts", False)),
+                            key="market_saved_search_email_enabled"
+                        )
+                        if (
+                            alerts_enabled != bool(search.get("alerts_enabled", True))
+                            or email_enabled != bool(search.get("email_alerts", False))
+                        ):
+                            search["alerts_enabled"] = alerts_enabled
+                            search["email_alerts"] = email_enabled
+                            persist_market_saved_searches(db, user, saved_searches)
+                        worker_run = get_alert_worker_status().get("last_run")
+                        last_checked = datetime.fromtimestamp(worker_run).isoformat(timespec="seconds") if worker_run else "Never"
+                        last_alerted = ((get_alert_inbox_state().get("searches") or {}).get(search.get("name")) or {}).get("last_alerted", "Never")
+                        st.caption(f"Last checked: {last_checked} • Last alert: {last_alerted}")
+
+            search_scores_cache = {}
+            # Supabase filters and sorts on the server; the local JSON backend filters in Python.
+            server_filters = supabase_enabled(community_settings) and column_support.get("list_price", True)
+
+            def get_search_scores(term):
+                # One index/RPC lookup per distinct term per rerun, shared by Browse and alerts.
+                term = (term or "").strip()
+                if term not in search_scores_cache:
+                    scores, search_err = community_search_scores(community_settings, forum_posts, term)
+                    if search_err:
+                        st.caption(f"Search index unavailable, results may be partial: {search_err}")
+                    search_scores_cache[term] = scores
+                return search_scores_cache[term]
+
+            def search_candidates(posts, term):
+                if not (term or "").strip():
+                    return posts
+                scores = get_search_scores(term)
+                return [post for post in posts if post.get("id") in scores]
+
+            def sort_by_best_match(results, term):
+                scores = get_search_scores(term)
+                results.sort(key=lambda pair: scores.get(pair[1].get("id"), 0.0), reverse=True)
+
+            def build_browse_criteria(search_state):
+                criteria = {"today": datetime.now().date().isoformat()}
+                category = search_state.get("category_filter", "All")
+                quick = search_state.get("quick_category", "All")
+                if quick and quick != "All":
+                    category = quick
+                if search_state.get("type_filter", "All") != "All":
+                    criteria["listing_type"] = search_state.get("type_filter")
+                if category != "All":
+                    criteria["category"] = category
+                if search_state.get("status_filter", "All") != "All":
+                    criteria["status"] = search_state.get("status_filter")
+                if search_state.get("price_range"):
+                    low, high = search_state["price_range"][0], search_state["price_range"][1]
+                    # The slider only spans the loaded cards, so an end left at its limit stays open.
+                    criteria["priced"] = True
+                    if not price_values or low > min(price_values):
+                        criteria["price_min"] = low
+                    if not price_values or high < max(price_values):
+                        criteria["price_max"] = high
+                ids = None
+                if search_state.get("filter_watchlist"):
+                    ids = list(st.session_state.market_watchlist)
+                term = (search_state.get("search_term") or "").strip()
+                if term:
+                    scores = get_search_scores(term)
+                    ids = [post_id for post_id in scores if ids is None or post_id in ids]
+                if ids is not None:
+                    criteria["ids"] = ids
+                criteria["photos"] = bool(search_state.get("filter_photos"))
+                criteria["buy_now"] = bool(search_state.get("filter_buy_now"))
+                if search_state.get("filter_new"):
+                    # is_recent_listing: fewer than 8 whole days old.
+                    # Minute resolution keeps the criteria, and so the cached query, stable across reruns.
+                    criteria["created_after"] = (datetime.now(timezone.utc).replace(second=0, microsecond=0) - timedelta(days=8)).isoformat()
+                if search_state.get("filter_ending"):
+                    # Auctions end at 23:59:59 on their end date; keep those ending within 2 days.
+                    criteria["ending_by"] = (forum_now() + timedelta(days=2) - timedelta(hours=23, minutes=59, seconds=59)).date().isoformat()
+                if search_state.get("filter_near_me"):
+                    user_country = get_country_name(get_country_code(user_settings))
+                    if user_country:
+                        criteria["location"] = user_country
+                return criteria
+
+            if "market_browse_queries" not in st.session_state:
+                st.session_state.market_browse_queries = {}
+            # Cached server results are reused until the filters or the synced feed change.
+            feed_marker = (len(forum_posts), max((str(post.get("updated_at") or post.get("created_at") or "") for post in forum_posts), default=""))
+
+            def browse_rows(criteria, s_sort, limit):
+                signature = json.dumps([criteria, s_sort, limit, feed_marker], sort_keys=True, default=str)
+                cached = st.session_state.market_browse_queries
+                if signature in cached:
+                    return cached[signature], None
+                rows, query_err = community_query_posts(
+                    community_settings,
+                    criteria,
+                    sort=s_sort,
+                    limit=limit,
+                    column_support=column_support
+                )
+                if query_err:
+                    return rows, query_err
+                if len(cached) >= 8:
+                    cached.pop(next(iter(cached)))
+                cached[signature] = rows or []
+                return cached[signature], None
+
+            def apply_saved_search_filters(posts, search_state, limit=COMMUNITY_PAGE_SIZE):
+                s_sort = search_state.get("sort_option", "Newest")
+                criteria = build_browse_criteria(search_state) if server_filters else None
+                # The unfiltered newest-first view (slider at its limits) is served from the synced feed.
+                default_view = criteria is not None and s_sort in ("Newest", "Best Match") and not any(
+                    value for key, value in criteria.items() if key not in ("today", "priced")
+                )
+                if server_filters and not default_view:
+                    rows, query_err = browse_rows(criteria, s_sort, limit)
+                    if query_err:
+                        st.error(f"Unable to load listings: {query_err}")
+                    results = [(get_post_status(post), post) for post in rows or []]
+                    if s_sort == "Best Match" and (search_state.get("search_term") or "").strip():
+                        sort_by_best_match(results, search_state.get("search_term"))
+                    return results
+                s_term = (search_state.get("search_term") or "").strip()
+                now_dt = forum_now()
+                results = [
+                    (get_post_status(post), post)
+                    for post in search_candidates(posts, s_term)
+                    if saved_search_matches(post, search_state, user_settings, st.session_state.market_watchlist, now_dt)
+                ]
 
-                components.html(
-                    """
-                    <script>
-                      (function() {
-                        const marker = window.parent.document.getElementById("sticky-filter-marker");
-                        if (!marker) return;
-                        const block = marker.closest('div[data-testid="stVerticalBlock"]');
-                        if (block) {
-                          block.classList.add("sticky-filter-block");
-                        }
-                      })();
-                    </script>
-                    """,
-                    height=0
+                if s_sort == "Ending Soon":
+                    results.sort(key=lambda pair: get_auction_end_dt(pair[1]) or datetime.max)
+                elif s_sort == "Price (Low to High)":
+                    results.sort(key=lambda pair: get_listing_price_value(pair[1]) if get_listing_price_value(pair[1]) is not None else float("inf"))
+                elif s_sort == "Price (High to Low)":
+                    results.sort(key=lambda pair: get_listing_price_value(pair[1]) if get_listing_price_value(pair[1]) is not None else -1, reverse=True)
+                elif s_sort == "Best Match" and s_term:
+                    sort_by_best_match(results, s_term)
+                else:
+                    results.sort(key=lambda pair: parse_forum_date(pair[1].get("created_at", "")), reverse=True)
+                return results
+
+            browse_limit = st.session_state.community_feed_pages * COMMUNITY_PAGE_SIZE
+            filtered = apply_saved_search_filters(forum_posts, {
+                "search_term": search_term,
+                "type_filter": type_filter,
+                "category_filter": category_filter,
+                "status_filter": status_filter,
+                "sort_option": sort_option,
+                "quick_category": st.session_state.get("market_quick_category", "All"),
+                "price_range": list(price_range) if price_range else None,
+                "filter_watchlist": filter_watchlist,
+                "filter_photos": filter_photos,
+                "filter_buy_now": filter_buy_now,
+                "filter_new": filter_new,
+                "filter_ending": filter_ending,
+                "filter_near_me": filter_near_me
+            }, limit=browse_limit)
+
+            alerts_enabled = bool(user_settings.get("market_alerts_enabled", True))
+            if alerts_enabled and st.session_state.market_saved_searches:
+                # Evaluation and email happen in the alert worker; the page only reads its inbox.
+                get_alert_worker()
+                seen_at = user_settings.get("market_alerts_seen_at") or ""
+                alert_results = [alert for alert in get_alert_inbox_state().get("inbox") or [] if str(alert.get("at") or "") > seen_at]
+                if alert_results:
+                    record = ensure_user_record(db, user)
+                    record.setdefault("settings", {})["market_alerts_seen_at"] = max(str(alert.get("at")) for alert in alert_results)
+                    save_data(db)
+                    st.markdown("#### Saved Search Alerts")
+                    for alert in alert_results:
+                        st.info(f"{alert['name']}: {alert['count']} new listing(s) matched.")
+                    if user_settings.get("market_alerts_push_enabled"):
+                        signature = build_alert_signature(alert_results)
+                        if signature and signature != st.session_state.get("market_alerts_last_push_signature"):
+                            st.session_state.market_alerts_last_push_signature = signature
+                            trigger_browser_notifications(alert_results)
+
+            if not filtered:
+                st.info("No listings yet. Create the first post!")
+            else:
+                stats_cols = st.columns(4)
+                total_count = len(forum_posts)
+                active_count = sum(1 for status, _ in filtered if status == "Active")
+                auction_count = sum(1 for _, post in filtered if post.get("listing_type") == "Auction")
+                ending_soon_count = sum(
+                    1 for _, post in filtered
+                    if post.get("listing_type") == "Auction"
+                    and (get_auction_end_dt(post) and get_auction_end_dt(post) <= forum_now() + timedelta(days=2))
+                )
+                stats_cols[0].metric("Listings", f"{total_count}")
+                stats_cols[1].metric("Active", f"{active_count}")
+                stats_cols[2].metric("Auctions", f"{auction_count}")
+                stats_cols[3].metric("Ending Soon", f"{ending_soon_count}")
+
+                featured = sorted(
+                    filtered,
+                    key=lambda pair: get_listing_price_value(pair[1]) or 0.0,
+                    reverse=True
+                )[:3]
+                if featured:
+                    st.markdown("#### Featured Picks")
+                    feat_cols = st.columns(len(featured))
+                    for idx, (status, post) in enumerate(featured):
+                        with feat_cols[idx]:
+                            render_marketplace_card(post, status, "featured")
+
+                post_ids = [post.get("id") for _, post in filtered]
+                if st.session_state.market_selected_post_id not in post_ids:
+                    st.session_state.market_selected_post_id = post_ids[0]
+
+                card_cols = st.columns(3)
+                for idx, (status, post) in enumerate(filtered):
+                    with card_cols[idx % 3]:
+                        render_marketplace_card(post, status, "grid")
+
+                selected_post = None
+                selected_status = None
+                for status, post in filtered:
+                    if post.get("id") == st.session_state.market_selected_post_id:
+                        selected_post = post
+                        selected_status = status
+                        break
+                st.markdown("---")
+                if selected_post:
+                    render_listing_detail_panel(get_full_post(selected_post), selected_status or get_post_status(selected_post))
+                else:
+                    st.info("Select a listing to view details.")
+
+            if len(forum_posts) >= browse_limit or (server_filters and len(filtered) >= browse_limit):
+                if st.button("Load older listings", key="community_feed_load_more"):
+                    st.session_state.community_feed_pages += 1
+                    st.rerun()
+
+    with forum_tabs[1]:
+        st.markdown("### Watchlist")
+        watchlist_items = [post for post in forum_posts if post.get("id") in st.session_state.market_watchlist]
+        if not watchlist_items:
+            st.info("No watchlist items yet. Tap Watch on a listing to save it here.")
+        else:
+            watchlist_items.sort(key=lambda post: parse_forum_date(post.get("created_at", "")), reverse=True)
+            watchlist_pairs = [(get_post_status(post), post) for post in watchlist_items]
+            watchlist_cols = st.columns(3)
+            for idx, (status, post) in enumerate(watchlist_pairs):
+                with watchlist_cols[idx % 3]:
+                    render_marketplace_card(post, status, "watchlist")
+            watch_ids = [post.get("id") for _, post in watchlist_pairs]
+            selected_id = st.session_state.get("market_selected_post_id")
+            if selected_id not in watch_ids:
+                st.session_state.market_selected_post_id = watch_ids[0]
+            selected_post = None
+            selected_status = None
+            for status, post in watchlist_pairs:
+                if post.get("id") == st.session_state.market_selected_post_id:
+                    selected_post = post
+                    selected_status = status
+                    break
+            st.markdown("---")
+            if selected_post:
+                render_listing_detail_panel(get_full_post(selected_post), selected_status or get_post_status(selected_post))
+
+    with forum_tabs[2]:
+        if not is_elite:
+            render_plan_gate(user_settings, "Elite", "Create Listing", "Upgrade to post listings and host auctions in the Community Market.", key="gate_community_create")
+        else:
+            st.markdown("### Create Listing")
+            if not community_ready:
+                st.info("Community is not ready yet. Configure Supabase in the setup section at the bottom of this page.")
+            elif community_is_banned(community_settings, db, user):
+                st.error("Your account is suspended from posting.")
+            else:
+                st.markdown("**Community Rules**")
+                for rule in COMMUNITY_RULES:
+                    st.markdown(f"- {rule}")
+                st.markdown("**Marketplace Disclaimer**")
+                st.caption(
+                    "Transactions are arranged directly between users. Buyers and sellers must contact each other "
+                    "to settle payment and delivery outside of the app using their preferred method. "
+                    "We provide the community forum only and take no responsibility for sales, disputes, "
+                    "or fraudulent activity."
+                )
+                prefill = st.checkbox("Prefill from my portfolio", value=bool(portfolio))
+                prefill_asset = None
+                if prefill and portfolio:
+                    asset_options = [f"{i+1}. {asset['name']} ({asset['type']})" for i, asset in enumerate(portfolio)]
+                    selected_asset_label = st.selectbox("Choose asset", asset_options)
+                    selected_index = int(selected_asset_label.split(".")[0]) - 1
+                    if 0 <= selected_index < len(portfolio):
+                        prefill_asset = portfolio[selected_index]
+
+                default_title = prefill_asset.get("name", "") if prefill_asset else ""
+                default_category = prefill_asset.get("type", "Other") if prefill_asset else "Other"
+                default_body = ""
+                default_price = 0.0
+                if prefill_asset:
+                    default_body = f"{prefill_asset.get('type')} in {prefill_asset.get('condition')} condition. Qty {prefill_asset.get('qty', 1)}."
+                    default_price = to_display_currency(get_asset_valuation(portfolio_valuation, selected_index)[0], currency_rate)
+
+                category_search = st.text_input(
+                    "Filter categories (optional)",
+                    placeholder="Type to filter categories (e.g., bullion, coins, trading cards)",
+                    key="market_category_search"
                 )
 
-                quick_filter_cols = st.columns(6)
-                with quick_filter_cols[0]:
-                    filter_watchlist = st.checkbox("Watchlist", key="market_filter_watchlist")
-                with quick_filter_cols[1]:
-                    filter_photos = st.checkbox("Photos only", key="market_filter_photos")
-                with quick_filter_cols[2]:
-                    filter_buy_now = st.checkbox("Buy Now", key="market_filter_buy_now")
-                with quick_filter_cols[3]:
-                    filter_new = st.checkbox("New (7d)", key="market_filter_new")
-                with quick_filter_cols[4]:
-                    filter_ending = st.checkbox("Ending Soon", key="market_filter_ending")
-                with quick_filter_cols[5]:
-                    filter_near_me = st.checkbox("Near Me", key="market_filter_near_me")
-
-                with st.expander("Saved Searches"):
-                    saved_searches = st.session_state.market_saved_searches
-                    saved_names = [s.get("name") for s in saved_searches if s.get("name")]
-                    selected_saved = st.selectbox(
-                        "Select saved search",
-                        ["Select..."] + saved_names,
-                        key="market_saved_search_select"
+                with st.form("create_listing_form"):
+                    listing_type = st.selectbox("Listing Type", ["For Sale", "Auction", "Discussion"])
+                    category_list = list(COMMUNITY_CATEGORY_OPTIONS)
+                    extra_categories = [default_category] + [asset.get("type", "Other") for asset in portfolio]
+                    for extra in sorted({c for c in extra_categories if c} - set(category_list)):
+                        category_list.append(extra)
+                    category_list = filter_category_options(category_list, category_search)
+                    category = st.selectbox(
+                        "Category",
+                        category_list,
+                        index=category_list.index(default_category) if default_category in category_list else 0
                     )
-                    save_name = st.text_input("Save current search as", key="market_save_search_name")
-                    save_cols = st.columns(3)
-                    with save_cols[0]:
-                        if st.button("Save Search", key="market_save_search_btn"):
-                            if not save_name.strip():
-                                st.error("Please enter a name for this search.")
+                    title = st.text_input("Title", value=default_title)
+                    description = st.text_area("Description", value=default_body, height=120)
+                    grading_type = grading_type_for_category(category)
+                    grading_company = None
+                    grading_grade = None
+                    if grading_type:
+                        st.markdown("#### Grading (optional)")
+                        if supports_grading:
+                            if grading_type == "coin":
+                                company_options = COIN_GRADING_COMPANIES
+                                grade_options = COIN_GRADE_OPTIONS
                             else:
-                                payload = {
-                                    "name": save_name.strip(),
-                                    "search_term": search_term,
-                                    "type_filter": type_filter,
-                                    "category_filter": category_filter,
-                                    "status_filter": status_filter,
-                                    "sort_option": sort_option,
-                                    "quick_category": st.session_state.get("market_quick_category", "All"),
-                                    "price_range": list(price_range) if price_range else None,
-                                    "filter_watchlist": filter_watchlist,
-                                    "filter_photos": filter_photos,
-                                    "filter_buy_now": filter_buy_now,
-                                    "filter_new": filter_new,
-                                    "filter_ending": filter_ending,
-                                    "filter_near_me": filter_near_me,
-                                    "saved_at": datetime.now().isoformat()
-                                }
-                                saved_searches = [s for s in saved_searches if s.get("name") != payload["name"]]
-                                saved_searches.insert(0, payload)
-                                st.session_state.market_saved_searches = saved_searches
-                                persist_market_saved_searches(db, user, saved_searches)
-                                st.success("Search saved.")
-                    with save_cols[1]:
-                        if st.button("Load Search", key="market_load_search_btn"):
-                            if selected_saved and selected_saved != "Select...":
-                                search = next((s for s in saved_searches if s.get("name") == selected_saved), None)
-                                if search:
-                                    st.session_state.market_search_term = search.get("search_term", "")
-                                    st.session_state.market_type_filter = search.get("type_filter", "All")
-                                    st.session_state.market_category_filter = search.get("category_filter", "All")
-                                    st.session_state.market_status_filter = search.get("status_filter", "All")
-                                    st.session_state.market_sort_option = search.get("sort_option", "Newest")
-                                    st.session_state.market_quick_category = search.get("quick_category", "All")
-                                    st.session_state.market_filter_watchlist = bool(search.get("filter_watchlist", False))
-                                    st.session_state.market_filter_photos = bool(search.get("filter_photos", False))
-                                    st.session_state.market_filter_buy_now = bool(search.get("filter_buy_now", False))
-                                    st.session_state.market_filter_new = bool(search.get("filter_new", False))
-                                    st.session_state.market_filter_ending = bool(search.get("filter_ending", False))
-                                    st.session_state.market_filter_near_me = bool(search.get("filter_near_me", False))
-                                    if price_values and search.get("price_range"):
-                                        min_price = float(min(price_values))
-                                        max_price = float(max(price_values))
-                                        st.session_state.market_price_range_pending = clamp_price_range(
-                                            search.get("price_range"), min_price, max_price
-                                        )
-                                    st.rerun()
-                    with save_cols[2]:
-                        if st.button("Delete Search", key="market_delete_search_btn"):
-                            if selected_saved and selected_saved != "Select...":
-                                saved_searches = [s for s in saved_searches if s.get("name") != selected_saved]
-                                st.session_state.market_saved_searches = saved_searches
-                                persist_market_saved_searches(db, user, saved_searches)
-                                st.success("Search deleted.")
-                                st.rerun()
-
-                    if selected_saved and selected_saved != "Select...":
-                        search = next((s for s in saved_searches if s.get("name") == selected_saved), None)
-                        if search:
-                            alerts_enabled = st.checkbox(
-                                "Enable alerts for this search",
-                                value=bool(search.get("alerts_enabled", True)),
-                                key="market_saved_search_alerts_enabled"
+                                company_options = CARD_GRADING_COMPANIES
+                                grade_options = CARD_GRADE_OPTIONS
+                            grading_company = st.selectbox(
+                                "Grading Company",
+                                ["Ungraded / None"] + company_options,
+                                key="listing_grading_company"
                             )
-                            email_enabled = st.checkbox(
-                                "Email alerts for this search",
-                                value=bool(search.get("email_alerts", False)),
-                                key="market_saved_search_email_enabled"
+                            grading_grade = st.selectbox(
+                                "Grade",
+                                grade_options,
+                                key="listing_grading_grade"
                             )
-                            if (
-                                alerts_enabled != bool(search.get("alerts_enabled", True))
-                                or email_enabled != bool(search.get("email_alerts", False))
-                            ):
-                                search["alerts_enabled"] = alerts_enabled
-                                search["email_alerts"] = email_enabled
-                                persist_market_saved_searches(db, user, saved_searches)
-                            last_checked = search.get("last_checked", "Never")
-                            last_alerted = search.get("last_alerted", "Never")
-                            st.caption(f"Last checked: {last_checked} • Last alert: {last_alerted}")
-
-                def apply_saved_search_filters(posts, search_state):
-                    s_term = (search_state.get("search_term") or "").strip().lower()
-                    s_type = search_state.get("type_filter", "All")
-                    s_category = search_state.get("category_filter", "All")
-                    s_status = search_state.get("status_filter", "All")
-                    s_sort = search_state.get("sort_option", "Newest")
-                    s_quick = search_state.get("quick_category", "All")
-                    s_price = search_state.get("price_range")
-                    s_watch = bool(search_state.get("filter_watchlist"))
-                    s_photos = bool(search_state.get("filter_photos"))
-                    s_buy_now = bool(search_state.get("filter_buy_now"))
-                    s_new = bool(search_state.get("filter_new"))
-                    s_ending = bool(search_state.get("filter_ending"))
-                    s_near = bool(search_state.get("filter_near_me"))
-
-                    if s_quick and s_quick != "All":
-                        s_category = s_quick
-
-                    results = []
-                    for post in posts:
-                        status = get_post_status(post)
-                        if s_type != "All" and post.get("listing_type") != s_type:
-                            continue
-                        if s_category != "All" and post.get("category") != s_category:
-                            continue
-                        if s_status != "All" and status != s_status:
-                            continue
-                        if s_term:
-                            hay = f"{post.get('title','')} {post.get('body','')} {post.get('created_by','')}".lower()
-                            if s_term not in hay:
-                                continue
-                        if s_price:
-                            price_value = get_listing_price_value(post)
-                            if price_value is None:
-                                continue
-                            if price_value < s_price[0] or price_value > s_price[1]:
-                                continue
-                        if s_watch and post.get("id") not in st.session_state.market_watchlist:
-                            continue
-                        if s_photos and not get_post_images(post):
-                            continue
-                        if s_buy_now and not post.get("buy_now_price"):
-                            continue
-                        if s_new and not is_recent_listing(post, days=7):
-                            continue
-                        if s_ending:
-                            end_dt = get_auction_end_dt(post)
-                            if not end_dt:
-                                continue
-                            if end_dt > forum_now() + timedelta(days=2):
-                                continue
-                        if s_near:
-                            user_country = get_country_name(get_country_code(user_settings)).lower()
-                            post_country = str(post.get("location", "")).lower()
-                            if user_country and user_country not in post_country:
-                                continue
-                        results.append((status, post))
-
-                    if s_sort == "Ending Soon":
-                        results.sort(key=lambda pair: get_auction_end_dt(pair[1]) or datetime.max)
-                    elif s_sort == "Price (Low to High)":
-                        results.sort(key=lambda pair: get_listing_price_value(pair[1]) if get_listing_price_value(pair[1]) is not None else float("inf"))
-                    elif s_sort == "Price (High to Low)":
-                        results.sort(key=lambda pair: get_listing_price_value(pair[1]) if get_listing_price_value(pair[1]) is not None else -1, reverse=True)
-                    else:
-                        results.sort(key=lambda pair: parse_forum_date(pair[1].get("created_at", "")), reverse=True)
-                    return results
-
-                def run_saved_search_alerts():
-                    alerts = []
-                    updated = False
-                    saved_searches = st.session_state.market_saved_searches
-                    if not saved_searches:
-                        return alerts, updated
-                    now_iso = datetime.now().isoformat()
-                    for search in saved_searches:
-                        if not search.get("alerts_enabled", True):
-                            continue
-                        results = apply_saved_search_filters(forum_posts, search)
-                        result_ids = [post.get("id") for _, post in results if post.get("id")]
-                        last_ids = set(search.get("last_result_ids") or [])
-                        new_ids = [pid for pid in result_ids if pid not in last_ids]
-                        search["last_result_ids"] = result_ids[:200]
-                        search["last_checked"] = now_iso
-                        updated = True
-                        if new_ids:
-                            alerts.append({
-                                "name": search.get("name"),
-                                "count": len(new_ids),
-                                "sample": results[:3]
-                            })
-                            search["last_alerted"] = now_iso
-                            if user_settings.get("market_alerts_email_enabled") and search.get("email_alerts"):
-                                subject = f"WealthPulse Alert: {search.get('name')} ({len(new_ids)} new)"
-                                listing_lines = []
-                                for _, post in results[:5]:
-                                    listing_lines.append(f"- {post.get('title')} ({post.get('listing_type')})")
-                                body = "New listings matched your saved search:\n" + "\n".join(listing_lines)
-                                send_alert_email(user_settings, subject, body)
-                    if updated:
-                        st.session_state.market_saved_searches = saved_searches
-                        persist_market_saved_searches(db, user, saved_searches)
-                    return alerts, updated
-
-                quick_category = st.session_state.get("market_quick_category", "All")
-                if quick_category != "All":
-                    category_filter = quick_category
-
-                filtered = []
-                for post in forum_posts:
-                    status = get_post_status(post)
-                    if type_filter != "All" and post.get("listing_type") != type_filter:
-                        continue
-                    if category_filter != "All" and post.get("category") != category_filter:
-                        continue
-                    if status_filter != "All" and status != status_filter:
-                        continue
-                    if search_term:
-                        hay = f"{post.get('title','')} {post.get('body','')} {post.get('created_by','')}".lower()
-                        if search_term.lower() not in hay:
-                            continue
-                    if price_range:
-                        price_value = get_listing_price_value(post)
-                        if price_value is None:
-                            continue
-                        if price_value < price_range[0] or price_value > price_range[1]:
-                            continue
-                    if filter_watchlist and post.get("id") not in st.session_state.market_watchlist:
-                        continue
-                    if filter_photos and not get_post_images(post):
-                        continue
-                    if filter_buy_now and not post.get("buy_now_price"):
-                        continue
-                    if filter_new and not is_recent_listing(post, days=7):
-                        continue
-                    if filter_ending:
-                        end_dt = get_auction_end_dt(post)
-                        if not end_dt:
-                            continue
-                        if end_dt > forum_now() + timedelta(days=2):
-                            continue
-                    if filter_near_me:
-                        user_country = get_country_name(get_country_code(user_settings)).lower()
-                        post_country = str(post.get("location", "")).lower()
-                        if user_country and user_country not in post_country:
-                            continue
-                    filtered.append((status, post))
-
-                if sort_option == "Ending Soon":
-                    filtered.sort(
-                        key=lambda pair: get_auction_end_dt(pair[1]) or datetime.max
-                    )
-                elif sort_option == "Price (Low to High)":
-                    filtered.sort(
-                        key=lambda pair: get_listing_price_value(pair[1]) if get_listing_price_value(pair[1]) is not None else float("inf")
-                    )
-                elif sort_option == "Price (High to Low)":
-                    filtered.sort(
-                        key=lambda pair: get_listing_price_value(pair[1]) if get_listing_price_value(pair[1]) is not None else -1,
-                        reverse=True
-                    )
-                else:
-                    filtered.sort(key=lambda pair: parse_forum_date(pair[1].get("created_at", "")), reverse=True)
-
-                alerts_enabled = bool(user_settings.get("market_alerts_enabled", True))
-                alert_interval = int(user_settings.get("market_alerts_interval", 180))
-                if alerts_enabled:
-                    last_check = st.session_state.get("market_alerts_last_check", 0.0)
-                    if time.time() - last_check >= alert_interval:
-                        alert_results, _ = run_saved_search_alerts()
-                        st.session_state.market_alerts_last_check = time.time()
+                            if grading_company == "Ungraded / None":
+                                grading_company = None
+                            if grading_grade == "Ungraded":
+                                grading_grade = None
+                        else:
+                            st.caption("Grading fields require a schema update. Run the migration helper below.")
+                    listing_images = []
+                    if supports_images:
+                        listing_images = st.file_uploader(
+                            f"Listing Photos (max {MAX_LISTING_IMAGES})",
+                            type=["jpg", "jpeg", "png"],
+                            accept_multiple_files=True
+                        )
+                        if listing_images:
+                            image_error = validate_listing_images(listing_images)
+                            if image_error:
+                                st.warning(image_error)
+                                listing_images = listing_images[:MAX_LISTING_IMAGES]
+                        if listing_images:
+                            preview_cols = st.columns(min(len(listing_images), 5))
+                            for idx, img in enumerate(listing_images[:5]):
+                                with preview_cols[idx]:
+                                    st.image(img, width=140)
                     else:
-                        alert_results = []
-                    if alert_results:
-                        st.markdown("#### Saved Search Alerts")
-                        for alert in alert_results:
-                            st.info(f"{alert['name']}: {alert['count']} new listing(s) matched.")
-                        if user_settings.get("market_alerts_push_enabled"):
-                            signature = build_alert_signature(alert_results)
-                            if signature and signature != st.session_state.get("market_alerts_last_push_signature"):
-                                st.session_state.market_alerts_last_push_signature = signature
-                                trigger_browser_notifications(alert_results)
-
-                if not filtered:
-                    st.info("No listings yet. Create the first post!")
-                else:
-                    stats_cols = st.columns(4)
-                    total_count = len(forum_posts)
-                    active_count = sum(1 for status, _ in filtered if status == "Active")
-                    auction_count = sum(1 for _, post in filtered if post.get("listing_type") == "Auction")
-                    ending_soon_count = sum(
-                        1 for _, post in filtered
-                        if post.get("listing_type") == "Auction"
-                        and (get_auction_end_dt(post) and get_auction_end_dt(post) <= forum_now() + timedelta(days=2))
+                        st.caption("Photo uploads require a schema update. Run the migration helper below.")
+                    default_country = get_country_name(get_country_code(user_settings))
+                    location = st.text_input(
+                        "Country (required)",
+                        value=default_country,
+                        help="Enter the country where the item is located. Add city/region in the description if needed."
                     )
-                    stats_cols[0].metric("Listings", f"{total_count}")
-                    stats_cols[1].metric("Active", f"{active_count}")
-                    stats_cols[2].metric("Auctions", f"{auction_count}")
-                    stats_cols[3].metric("Ending Soon", f"{ending_soon_count}")
-
-                    featured = sorted(
-                        filtered,
-                        key=lambda pair: get_listing_price_value(pair[1]) or 0.0,
-                        reverse=True
-                    )[:3]
-                    if featured:
-                        st.markdown("#### Featured Picks")
-                        feat_cols = st.columns(len(featured))
-                        for idx, (status, post) in enumerate(featured):
-                            with feat_cols[idx]:
-                                render_marketplace_card(post, status, "featured")
-
-                    post_ids = [post.get("id") for _, post in filtered]
-                    if st.session_state.market_selected_post_id not in post_ids:
-                        st.session_state.market_selected_post_id = post_ids[0]
-
-                    card_cols = st.columns(3)
-                    for idx, (status, post) in enumerate(filtered):
-                        with card_cols[idx % 3]:
-                            render_marketplace_card(post, status, "grid")
-
-                    selected_post = None
-                    selected_status = None
-                    for status, post in filtered:
-                        if post.get("id") == st.session_state.market_selected_post_id:
-                            selected_post = post
-                            selected_status = status
-                            break
-                    st.markdown("---")
-                    if selected_post:
-                        render_listing_detail_panel(selected_post, selected_status or get_post_status(selected_post))
+                    price = None
+                    starting_bid = None
+                    min_increment = None
+                    reserve_amount = None
+                    buy_now_price = None
+                    end_date = None
+                    if listing_type == "For Sale":
+                        price = st.number_input(f"Price ({currency_code})", min_value=0.0, value=float(default_price), step=1.0)
+                    elif listing_type == "Auction":
+                        starting_bid = st.number_input(f"Starting Bid ({currency_code})", min_value=0.0, value=float(default_price), step=1.0)
+                        min_increment = st.number_input(f"Minimum Increment ({currency_code})", min_value=0.0, value=10.0, step=1.0)
+                        if supports_reserve:
+                            reserve_amount = st.number_input(f"Reserve Amount ({currency_code})", min_value=0.0, value=0.0, step=1.0)
+                        else:
+                            st.caption("Reserve amounts require a schema update. Run the migration helper.")
+                        if supports_buy_now:
+                            buy_now_price = st.number_input(f"Buy Now Price ({currency_code})", min_value=0.0, value=0.0, step=1.0)
+                        else:
+                            st.caption("Buy Now requires a schema update. Run the migration helper.")
+                        end_date = st.date_input("Auction End Date", value=datetime.now().date() + timedelta(days=7))
+
+                    agree_rules = st.checkbox("I agree to the Community Rules above.")
+                    agree_terms = st.checkbox("I agree to the Marketplace Disclaimer above.")
+                    submit_listing = st.form_submit_button("Post Listing")
+
+                if submit_listing:
+                    if not title.strip():
+                        st.error("Title is required.")
+                    elif not location.strip():
+                        st.error("Country is required.")
+                    elif not description.strip():
+                        st.error("Description is required.")
+                    elif validate_community_text(f"{title} {description} {location}"):
+                        st.error("Your listing contains content that violates the Community Rules.")
+                    elif listing_images and validate_listing_images(listing_images):
+                        st.error(validate_listing_images(listing_images))
+                    elif not agree_rules:
+                        st.error("You must agree to the Community Rules to post a listing.")
+                    elif not agree_terms:
+                        st.error("You must agree to the Marketplace Disclaimer to post a listing.")
+                    elif listing_type == "Auction" and supports_reserve and reserve_amount and starting_bid is not None and reserve_amount < starting_bid:
+                        st.error("Reserve amount should be equal to or higher than the starting bid.")
+                    elif listing_type == "Auction" and supports_buy_now and buy_now_price and reserve_amount and buy_now_price < reserve_amount:
+                        st.error("Buy Now price should be equal to or higher than the reserve.")
                     else:
-                        st.info("Select a listing to view details.")
-
-        with forum_tabs[1]:
-            st.markdown("### Watchlist")
-            watchlist_items = [post for post in forum_posts if post.get("id") in st.session_state.market_watchlist]
-            if not watchlist_items:
-                st.info("No watchlist items yet. Tap Watch on a listing to save it here.")
-            else:
-                watchlist_items.sort(key=lambda post: parse_forum_date(post.get("created_at", "")), reverse=True)
-                watchlist_pairs = [(get_post_status(post), post) for post in watchlist_items]
-                watchlist_cols = st.columns(3)
-                for idx, (status, post) in enumerate(watchlist_pairs):
-                    with watchlist_cols[idx % 3]:
-                        render_marketplace_card(post, status, "watchlist")
-                watch_ids = [post.get("id") for _, post in watchlist_pairs]
-                selected_id = st.session_state.get("market_selected_post_id")
-                if selected_id not in watch_ids:
-                    st.session_state.market_selected_post_id = watch_ids[0]
-                selected_post = None
-                selected_status = None
-                for status, post in watchlist_pairs:
-                    if post.get("id") == st.session_state.market_selected_post_id:
-                        selected_post = post
-                        selected_status = status
-                        break
-                st.markdown("---")
-                if selected_post:
-                    render_listing_detail_panel(selected_post, selected_status or get_post_status(selected_post))
+                        encoded_images = encode_uploaded_images(listing_images, community_image_settings(community_settings)) if (supports_images and listing_images) else []
+                        post_payload = {
+                            "id": secrets.token_hex(6),
+                            "title": title.strip(),
+                            "body": description.strip(),
+                            "category": category,
+                            "listing_type": listing_type,
+                            "price": float(price) if price is not None else None,
+                            "currency": currency_code,
+                            "location": location.strip(),
+                            "created_by": user,
+                            "created_at": datetime.now().isoformat(),
+                            "status": "Active",
+                            "auction_starting_bid": float(starting_bid) if starting_bid is not None else None,
+                            "auction_min_increment": float(min_increment) if min_increment is not None else None,
+                            "reserve_amount": float(reserve_amount) if supports_reserve and reserve_amount and reserve_amount > 0 else None,
+                            "buy_now_price": float(buy_now_price) if supports_buy_now and buy_now_price and buy_now_price > 0 else None,
+                            "auction_end_date": end_date.isoformat() if end_date else None,
+                            "images": encoded_images or None
+                        }
+                        if supabase_auth_required(community_settings) and supports_owner_id and auth_user_id:
+                            post_payload["owner_id"] = auth_user_id
+                        if supports_grading:
+                            if grading_company:
+                                post_payload["grading_company"] = grading_company
+                            if grading_grade:
+                                post_payload["grading_grade"] = grading_grade
+                        if not post_payload.get("reserve_amount"):
+                            post_payload.pop("reserve_amount", None)
+                        if not post_payload.get("buy_now_price"):
+                            post_payload.pop("buy_now_price", None)
+                        if not post_payload.get("images"):
+                            post_payload.pop("images", None)
+                        if supabase_enabled(community_settings):
+                            post_payload.pop("id", None)
+                        _, err = community_create_post(community_settings, db, post_payload)
+                        if err:
+                            st.error(err)
+                        else:
+                            save_data(db)
+                            st.success("Listing posted.")
+                            request_scroll_to_top()
+                            st.rerun()
 
-        with forum_tabs[2]:
-            if not is_elite:
-                render_plan_gate(user_settings, "Elite", "Create Listing", "Upgrade to post listings and host auctions in the Community Market.", key="gate_community_create")
+    with forum_tabs[3]:
+        if not is_elite:
+            render_plan_gate(user_settings, "Elite", "My Listings", "Upgrade to manage and edit your Community Market listings.", key="gate_community_manage")
+        else:
+            st.markdown("### My Listings")
+            if not community_ready:
+                st.info("Community is not ready yet. Configure Supabase in the setup section at the bottom of this page.")
             else:
-                st.markdown("### Create Listing")
-                if not community_ready:
-                    st.info("Community is not ready yet. Configure Supabase in the setup section at the bottom of this page.")
-                elif community_is_banned(community_settings, db, user):
-                    st.error("Your account is suspended from posting.")
+                my_posts = [post for post in forum_posts if post.get("created_by") == user]
+                if not my_posts:
+                    st.info("You haven't posted anything yet.")
                 else:
-                    st.markdown("**Community Rules**")
-                    for rule in COMMUNITY_RULES:
-                        st.markdown(f"- {rule}")
-                    st.markdown("**Marketplace Disclaimer**")
-                    st.caption(
-                        "Transactions are arranged directly between users. Buyers and sellers must contact each other "
-                        "to settle payment and delivery outside of the app using their preferred method. "
-                        "We provide the community forum only and take no responsibility for sales, disputes, "
-                        "or fraudulent activity."
-                    )
-                    prefill = st.checkbox("Prefill from my portfolio", value=bool(portfolio))
-                    prefill_asset = None
-                    if prefill and portfolio:
-                        asset_options = [f"{i+1}. {asset['name']} ({asset['type']})" for i, asset in enumerate(portfolio)]
-                        selected_asset_label = st.selectbox("Choose asset", asset_options)
-                        selected_index = int(selected_asset_label.split(".")[0]) - 1
-                        if 0 <= selected_index < len(portfolio):
-                            prefill_asset = portfolio[selected_index]
-
-                    default_title = prefill_asset.get("name", "") if prefill_asset else ""
-                    default_category = prefill_asset.get("type", "Other") if prefill_asset else "Other"
-                    default_body = ""
-                    default_price = 0.0
-                    if prefill_asset:
-                        default_body = f"{prefill_asset.get('type')} in {prefill_asset.get('condition')} condition. Qty {prefill_asset.get('qty', 1)}."
-                        default_price = to_display_currency(ai_valuation(prefill_asset)[0], currency_rate)
-
-                    category_search = st.text_input(
-                        "Filter categories (optional)",
-                        placeholder="Type to filter categories (e.g., bullion, coins, trading cards)",
-                        key="market_category_search"
+                    my_posts.sort(key=lambda post: parse_forum_date(post.get("created_at", "")), reverse=True)
+                    my_bid_stats, _ = community_get_bid_stats(
+                        community_settings,
+                        db,
+                        [post.get("id") for post in my_posts if post.get("listing_type") == "Auction"]
                     )
+                    for post in my_posts:
+                        status = get_post_status(post)
+                        header = f"{post.get('title', 'Listing')} • {post.get('listing_type')} • {status}"
+                        with st.expander(header):
+                            if "body" in post:
+                                st.write(post.get("body", ""))
+                            else:
+                                st.caption("Open the listing to see the full description.")
+                            st.caption(f"Posted {post.get('created_at','')}")
+                            post_images = get_post_images(post, size=160)
+                            if post_images:
+                                image_cols = st.columns(min(len(post_images), 5))
+                                for idx, img in enumerate(post_images):
+                                    with image_cols[idx]:
+                                        st.image(img, width=160)
+                            if post.get("listing_type") == "Auction":
+                                reserve_amount = get_reserve_amount(post) if supports_reserve else None
+                                buy_now_price = get_buy_now_price(post) if supports_buy_now else None
+                                _, _, end_date = get_auction_fields(post)
+                                time_left_label = format_time_left(end_date, user_settings)
+                                if time_left_label:
+                                    st.caption(time_left_label)
+                                if reserve_amount:
+                                    st.caption(f"Reserve: {post.get('currency', currency_code)} {float(reserve_amount):,.2f}")
+                                if buy_now_price:
+                                    st.caption(f"Buy Now: {post.get('currency', currency_code)} {float(buy_now_price):,.2f}")
+                            if st.button("Edit Listing", key=f"edit_listing_open_my_{post.get('id')}"):
+                                st.session_state.edit_listing_id = post.get("id")
+                                st.session_state.edit_listing_origin = "my"
+                                st.session_state.jump_to_community = True
+                                request_scroll_to_top()
+                                st.rerun()
+                            sale_cols = st.columns(3)
+                            with sale_cols[0]:
+                                if st.button("Close Listing", key=f"close_listing_{post.get('id')}"):
+                                    _, err = community_update_post(community_settings, db, post.get("id"), {"status": "Closed"})
+                                    if err:
+                                        st.error(err)
+                                    else:
+                                        st.success("Listing closed.")
+                                        st.rerun()
+                            with sale_cols[1]:
+                                default_sold_price = float(post.get("price") or 0.0)
+                                if post.get("listing_type") == "Auction":
+                                    max_bid = my_bid_stats.get(post.get("id"), {}).get("max_bid")
+                                    if max_bid is not None:
+                                        default_sold_price = max_bid
+                                sold_price = st.number_input(
+                                    f"Sold Price ({post.get('currency', currency_code)})",
+                                    min_value=0.0,
+                                    value=float(default_sold_price),
+                                    step=1.0,
+                                    key=f"sold_price_{post.get('id')}"
+                                )
+                                if st.button("Mark as Sold", key=f"mark_sold_{post.get('id')}"):
+                                    _, err = community_update_post(community_settings, db, post.get("id"), {
+                                        "status": "Sold",
+                                        "sold_price": float(sold_price),
+                                        "sold_at": datetime.now().isoformat()
+                                    })
+                                    if err:
+                                        st.error(err)
+                                    else:
+                                        st.success("Listing marked as sold.")
+                                        st.rerun()
+                            with sale_cols[2]:
+                                if st.button("Delete Listing", key=f"delete_listing_{post.get('id')}"):
+                                    _, err = community_delete_post(community_settings, db, post.get("id"))
+                                    if err:
+                                        st.error(err)
+                                    else:
+                                        st.success("Listing deleted.")
+                                        st.rerun()
 
-                    with st.form("create_listing_form"):
-                        listing_type = st.selectbox("Listing Type", ["For Sale", "Auction", "Discussion"])
-                        category_list = list(COMMUNITY_CATEGORY_OPTIONS)
-                        extra_categories = [default_category] + [asset.get("type", "Other") for asset in portfolio]
-                        for extra in sorted({c for c in extra_categories if c} - set(category_list)):
-                            category_list.append(extra)
-                        category_list = filter_category_options(category_list, category_search)
-                        category = st.selectbox(
-                            "Category",
-                            category_list,
-                            index=category_list.index(default_category) if default_category in category_list else 0
-                        )
-                        title = st.text_input("Title", value=default_title)
-                        description = st.text_area("Description", value=default_body, height=120)
-                        grading_type = grading_type_for_category(category)
-                        grading_company = None
-                        grading_grade = None
-                        if grading_type:
-                            st.markdown("#### Grading (optional)")
-                            if supports_grading:
-                                if grading_type == "coin":
-                                    company_options = COIN_GRADING_COMPANIES
-                                    grade_options = COIN_GRADE_OPTIONS
+    with forum_tabs[4]:
+        st.markdown("### Private Messages")
+        if not community_ready:
+            st.info("Community is not ready yet. Configure Supabase in the setup section at the bottom of this page.")
+        else:
+            msg_cols = st.columns(2)
+
+            def load_message_pages(box):
+                # Keyset pages of COMMUNITY_MESSAGES_PAGE_SIZE; "Load more" adds one page.
+                pages = st.session_state.setdefault(f"community_{box}_pages", 1)
+                loaded = []
+                before = None
+                for _ in range(pages):
+                    page, page_err = community_get_messages(community_settings, db, user, box=box, before=before)
+                    if page_err:
+                        return loaded, False, page_err
+                    page = page or []
+                    loaded.extend(page)
+                    if len(page) < COMMUNITY_MESSAGES_PAGE_SIZE:
+                        return loaded, False, None
+                    before = keyset_cursor(page[-1])
+                return loaded, True, None
+
+            with msg_cols[0]:
+                unread_count, unread_err = community_count_unread(community_settings, db, user)
+                st.markdown(f"**Inbox** ({unread_count} unread)" if unread_count else "**Inbox**")
+                inbox, inbox_more, inbox_err = load_message_pages("inbox")
+                if inbox_err or unread_err:
+                    st.error(inbox_err or unread_err)
+                if unread_count:
+                    if st.button("Mark All Read", key="mark_all_read"):
+                        _, err = community_mark_messages_read(community_settings, db, user)
+                        if err:
+                            st.error(err)
+                        else:
+                            save_data(db)
+                            st.success("Inbox marked as read.")
+                            st.rerun()
+                for msg in inbox:
+                    status = "Unread" if not msg.get("read_at") else "Read"
+                    with st.expander(f"From {msg.get('sender')} • {status}"):
+                        st.caption(msg.get("created_at", ""))
+                        st.write(msg.get("subject", ""))
+                        st.write(msg.get("body", ""))
+                        if not msg.get("read_at") and msg.get("id"):
+                            if st.button("Mark Read", key=f"mark_read_{msg.get('id')}"):
+                                _, err = community_mark_messages_read(community_settings, db, user, [msg.get("id")])
+                                if err:
+                                    st.error(err)
                                 else:
-                                    company_options = CARD_GRADING_COMPANIES
-                                    grade_options = CARD_GRADE_OPTIONS
-                                grading_company = st.selectbox(
-                                    "Grading Company",
-                                    ["Ungraded / None"] + company_options,
-                                    key="listing_grading_company"
-                                )
-                                grading_grade = st.selectbox(
-                                    "Grade",
-                                    grade_options,
-                                    key="listing_grading_grade"
-                                )
-                                if grading_company == "Ungraded / None":
-                                    grading_company = None
-                                if grading_grade == "Ungraded":
-                                    grading_grade = None
-                            else:
-                                st.caption("Grading fields require a schema update. Run the migration helper below.")
-                        listing_images = []
-                        if supports_images:
-                            listing_images = st.file_uploader(
-                                f"Listing Photos (max {MAX_LISTING_IMAGES})",
-                                type=["jpg", "jpeg", "png"],
-                                accept_multiple_files=True
-                            )
-                            if listing_images:
-                                image_error = validate_listing_images(listing_images)
-                                if image_error:
-                                    st.warning(image_error)
-                                    listing_images = listing_images[:MAX_LISTING_IMAGES]
-                            if listing_images:
-                                preview_cols = st.columns(min(len(listing_images), 5))
-                                for idx, img in enumerate(listing_images[:5]):
-                                    with preview_cols[idx]:
-                                        st.image(img, width=140)
+                                    save_data(db)
+                                    st.success("Marked as read.")
+                                    st.rerun()
+                if inbox_more and st.button("Load more messages", key="inbox_load_more"):
+                    st.session_state.community_inbox_pages += 1
+                    st.rerun()
+            with msg_cols[1]:
+                st.markdown("**Send Message**")
+                if is_banned:
+                    st.info("You cannot send messages while suspended.")
+                else:
+                    with st.form("send_message_form"):
+                        recipient = st.text_input("Recipient Username")
+                        subject = st.text_input("Subject")
+                        body = st.text_area("Message", height=120)
+                        send_msg = st.form_submit_button("Send")
+                    if send_msg:
+                        if not recipient or not body.strip():
+                            st.error("Recipient and message are required.")
+                        elif validate_community_text(f"{subject} {body}"):
+                            st.error("Your message violates the Community Rules.")
                         else:
-                            st.caption("Photo uploads require a schema update. Run the migration helper below.")
-                        default_country = get_country_name(get_country_code(user_settings))
-                        location = st.text_input(
-                            "Country (required)",
-                            value=default_country,
-                            help="Enter the country where the item is located. Add city/region in the description if needed."
-                        )
-                        price = None
-                        starting_bid = None
-                        min_increment = None
-                        reserve_amount = None
-                        buy_now_price = None
-                        end_date = None
-                        if listing_type == "For Sale":
-                            price = st.number_input(f"Price ({currency_code})", min_value=0.0, value=float(default_price), step=1.0)
-                        elif listing_type == "Auction":
-                            starting_bid = st.number_input(f"Starting Bid ({currency_code})", min_value=0.0, value=float(default_price), step=1.0)
-                            min_increment = st.number_input(f"Minimum Increment ({currency_code})", min_value=0.0, value=10.0, step=1.0)
-                            if supports_reserve:
-                                reserve_amount = st.number_input(f"Reserve Amount ({currency_code})", min_value=0.0, value=0.0, step=1.0)
-                            else:
-                                st.caption("Reserve amounts require a schema update. Run the migration helper.")
-                            if supports_buy_now:
-                                buy_now_price = st.number_input(f"Buy Now Price ({currency_code})", min_value=0.0, value=0.0, step=1.0)
+                            recipient_name = recipient.strip()
+                            recipient_id = community_lookup_user_auth_id(community_settings, recipient_name) if supabase_auth_required(community_settings) else None
+                            if supabase_auth_required(community_settings) and not recipient_id:
+                                st.error("Recipient has not linked a Community account yet.")
                             else:
-                                st.caption("Buy Now requires a schema update. Run the migration helper.")
-                            end_date = st.date_input("Auction End Date", value=datetime.now().date() + timedelta(days=7))
-
-                        agree_rules = st.checkbox("I agree to the Community Rules above.")
-                        agree_terms = st.checkbox("I agree to the Marketplace Disclaimer above.")
-                        submit_listing = st.form_submit_button("Post Listing")
-
-                    if submit_listing:
-                        if not title.strip():
-                            st.error("Title is required.")
-                        elif not location.strip():
-                            st.error("Country is required.")
-                        elif not description.strip():
-                            st.error("Description is required.")
-                        elif validate_community_text(f"{title} {description} {location}"):
-                            st.error("Your listing contains content that violates the Community Rules.")
-                        elif listing_images and validate_listing_images(listing_images):
-                            st.error(validate_listing_images(listing_images))
-                        elif not agree_rules:
-                            st.error("You must agree to the Community Rules to post a listing.")
-                        elif not agree_terms:
-                            st.error("You must agree to the Marketplace Disclaimer to post a listing.")
-                        elif listing_type == "Auction" and supports_reserve and reserve_amount and starting_bid is not None and reserve_amount < starting_bid:
-                            st.error("Reserve amount should be equal to or higher than the starting bid.")
-                        elif listing_type == "Auction" and supports_buy_now and buy_now_price and reserve_amount and buy_now_price < reserve_amount:
-                            st.error("Buy Now price should be equal to or higher than the reserve.")
-                        else:
-                            encoded_images = encode_uploaded_images(listing_images) if (supports_images and listing_images) else []
-                            post_payload = {
-                                "id": secrets.token_hex(6),
-                                "title": title.strip(),
-                                "body": description.strip(),
-                                "category": category,
-                                "listing_type": listing_type,
-                                "price": float(price) if price is not None else None,
-                                "currency": currency_code,
-                                "location": location.strip(),
-                                "created_by": user,
-                                "created_at": datetime.now().isoformat(),
-                                "status": "Active",
-                                "auction_starting_bid": float(starting_bid) if starting_bid is not None else None,
-                                "auction_min_increment": float(min_increment) if min_increment is not None else None,
-                                "reserve_amount": float(reserve_amount) if supports_reserve and reserve_amount and reserve_amount > 0 else None,
-                                "buy_now_price": float(buy_now_price) if supports_buy_now and buy_now_price and buy_now_price > 0 else None,
-                                "auction_end_date": end_date.isoformat() if end_date else None,
-                                "images": encoded_images or None
-                            }
-                            if supabase_auth_required(community_settings) and supports_owner_id and auth_user_id:
-                                post_payload["owner_id"] = auth_user_id
-                            if supports_grading:
-                                if grading_company:
-                                    post_payload["grading_company"] = grading_company
-                                if grading_grade:
-                                    post_payload["grading_grade"] = grading_grade
-                            if not post_payload.get("reserve_amount"):
-                                post_payload.pop("reserve_amount", None)
-                            if not post_payload.get("buy_now_price"):
-                                post_payload.pop("buy_now_price", None)
-                            if not post_payload.get("images"):
-                                post_payload.pop("images", None)
-                            if supabase_enabled(community_settings):
-                                post_payload.pop("id", None)
-                            _, err = community_create_post(community_settings, db, post_payload)
+                                _, err = community_send_message(community_settings, db, {
+                                    "sender": user,
+                                    "recipient": recipient_name,
+                                    "sender_id": auth_user_id if supabase_auth_required(community_settings) else None,
+                                    "recipient_id": recipient_id,
+                                    "subject": subject.strip(),
+                                    "body": body.strip(),
+                                    "created_at": datetime.now().isoformat(),
+                                    "read_at": None
+                                })
                             if err:
                                 st.error(err)
                             else:
                                 save_data(db)
-                                st.success("Listing posted.")
-                                request_scroll_to_top()
+                                st.success("Message sent.")
                                 st.rerun()
+                st.markdown("**Sent**")
+                sent_messages, sent_more, sent_err = load_message_pages("sent")
+                if sent_err:
+                    st.error(sent_err)
+                for msg in sent_messages:
+                    with st.expander(f"To {msg.get('recipient')}"):
+                        st.caption(msg.get("created_at", ""))
+                        st.write(msg.get("subject", ""))
+                        st.write(msg.get("body", ""))
+                if sent_more and st.button("Load more sent", key="sent_load_more"):
+                    st.session_state.community_sent_pages += 1
+                    st.rerun()
 
-        with forum_tabs[3]:
-            if not is_elite:
-                render_plan_gate(user_settings, "Elite", "My Listings", "Upgrade to manage and edit your Community Market listings.", key="gate_community_manage")
-            else:
-                st.markdown("### My Listings")
-                if not community_ready:
-                    st.info("Community is not ready yet. Configure Supabase in the setup section at the bottom of this page.")
-                else:
-                    my_posts = [post for post in forum_posts if post.get("created_by") == user]
-                    if not my_posts:
-                        st.info("You haven't posted anything yet.")
-                    else:
-                        my_posts.sort(key=lambda post: parse_forum_date(post.get("created_at", "")), reverse=True)
-                        for post in my_posts:
-                            status = get_post_status(post)
-                            header = f"{post.get('title', 'Listing')} • {post.get('listing_type')} • {status}"
-                            with st.expander(header):
-                                st.write(post.get("body", ""))
-                                st.caption(f"Posted {post.get('created_at','')}")
-                                post_images = get_post_images(post)
-                                if post_images:
-                                    image_cols = st.columns(min(len(post_images), 5))
-                                    for idx, img in enumerate(post_images):
-                                        with image_cols[idx]:
-                                            st.image(img, width=160)
-                                if post.get("listing_type") == "Auction":
-                                    reserve_amount = get_reserve_amount(post) if supports_reserve else None
-                                    buy_now_price = get_buy_now_price(post) if supports_buy_now else None
-                                    _, _, end_date = get_auction_fields(post)
-                                    time_left_label = format_time_left(end_date, user_settings)
-                                    if time_left_label:
-                                        st.caption(time_left_label)
-                                    if reserve_amount:
-                                        st.caption(f"Reserve: {post.get('currency', currency_code)} {float(reserve_amount):,.2f}")
-                                    if buy_now_price:
-                                        st.caption(f"Buy Now: {post.get('currency', currency_code)} {float(buy_now_price):,.2f}")
-                                if st.button("Edit Listing", key=f"edit_listing_open_my_{post.get('id')}"):
-                                    st.session_state.edit_listing_id = post.get("id")
-                                    st.session_state.edit_listing_origin = "my"
-                                    st.session_state.jump_to_community = True
-                                    request_scroll_to_top()
-                                    st.rerun()
-                                sale_cols = st.columns(3)
-                                with sale_cols[0]:
-                                    if st.button("Close Listing", key=f"close_listing_{post.get('id')}"):
-                                        _, err = community_update_post(community_settings, db, post.get("id"), {"status": "Closed"})
-                                        if err:
-                                            st.error(err)
-                                        else:
-                                            st.success("Listing closed.")
-                                            st.rerun()
-                                with sale_cols[1]:
-                                    default_sold_price = float(post.get("price") or 0.0)
-                                    if post.get("listing_type") == "Auction":
-                                        bids, _ = community_get_bids(community_settings, db, post.get("id"))
-                                        if bids:
-                                            default_sold_price = max([b.get("amount", 0.0) for b in bids])
-                                    sold_price = st.number_input(
-                                        f"Sold Price ({post.get('currency', currency_code)})",
-                                        min_value=0.0,
-                                        value=float(default_sold_price),
-                                        step=1.0,
-                                        key=f"sold_price_{post.get('id')}"
-                                    )
-                                    if st.button("Mark as Sold", key=f"mark_sold_{post.get('id')}"):
-                                        _, err = community_update_post(community_settings, db, post.get("id"), {
-                                            "status": "Sold",
-                                            "sold_price": float(sold_price),
-                                            "sold_at": datetime.now().isoformat()
-                                        })
-                                        if err:
-                                            st.error(err)
-                                        else:
-                                            st.success("Listing marked as sold.")
-                                            st.rerun()
-                                with sale_cols[2]:
-                                    if st.button("Delete Listing", key=f"delete_listing_{post.get('id')}"):
-                                        _, err = community_delete_post(community_settings, db, post.get("id"))
-                                        if err:
-                                            st.error(err)
-                                        else:
-                                            st.success("Listing deleted.")
-                                            st.rerun()
-
-        with forum_tabs[4]:
-            st.markdown("### Private Messages")
+    if is_mod:
+        with forum_tabs[5]:
             if not community_ready:
                 st.info("Community is not ready yet. Configure Supabase in the setup section at the bottom of this page.")
             else:
-                msg_cols = st.columns(2)
-                with msg_cols[0]:
-                    st.markdown("**Inbox**")
-                    inbox, inbox_err = community_get_messages(community_settings, db, user, box="inbox")
-                    if inbox_err:
-                        st.error(inbox_err)
-                    else:
-                        for msg in inbox[:10]:
-                            status = "Unread" if not msg.get("read_at") else "Read"
-                            with st.expander(f"From {msg.get('sender')} • {status}"):
-                                st.caption(msg.get("created_at", ""))
-                                st.write(msg.get("subject", ""))
-                                st.write(msg.get("body", ""))
-                                if not msg.get("read_at") and msg.get("id"):
-                                    if st.button("Mark Read", key=f"mark_read_{msg.get('id')}"):
-                                        _, err = community_mark_message_read(community_settings, db, msg.get("id"))
-                                        if err:
-                                            st.error(err)
-                                        else:
-                                            st.success("Marked as read.")
-                                            st.rerun()
-                with msg_cols[1]:
-                    st.markdown("**Send Message**")
-                    if is_banned:
-                        st.info("You cannot send messages while suspended.")
-                    else:
-                        with st.form("send_message_form"):
-                            recipient = st.text_input("Recipient Username")
-                            subject = st.text_input("Subject")
-                            body = st.text_area("Message", height=120)
-                            send_msg = st.form_submit_button("Send")
-                        if send_msg:
-                            if not recipient or not body.strip():
-                                st.error("Recipient and message are required.")
-                            elif validate_community_text(f"{subject} {body}"):
-                                st.error("Your message violates the Community Rules.")
-                            else:
-                                recipient_name = recipient.strip()
-                                recipient_id = community_lookup_user_auth_id(community_settings, recipient_name) if supabase_auth_required(community_settings) else None
-                                if supabase_auth_required(community_settings) and not recipient_id:
-                                    st.error("Recipient has not linked a Community account yet.")
-                                else:
-                                    _, err = community_send_message(community_settings, db, {
-                                        "sender": user,
-                                        "recipient": recipient_name,
-                                        "sender_id": auth_user_id if supabase_auth_required(community_settings) else None,
-                                        "recipient_id": recipient_id,
-                                        "subject": subject.strip(),
-                                        "body": body.strip(),
-                                        "created_at": datetime.now().isoformat(),
-                                        "read_at": None
-                                    })
-                                if err:
-                                    st.error(err)
-                                else:
-                                    st.success("Message sent.")
-                                    st.rerun()
-                    st.markdown("**Sent**")
-                    sent_messages, sent_err = community_get_messages(community_settings, db, user, box="sent")
-                    if sent_err:
-                        st.error(sent_err)
-                    else:
-                        for msg in sent_messages[:10]:
-                            with st.expander(f"To {msg.get('recipient')}"):
-                                st.caption(msg.get("created_at", ""))
-                                st.write(msg.get("subject", ""))
-                                st.write(msg.get("body", ""))
-
-        if is_mod:
-            with forum_tabs[5]:
-                if not community_ready:
-                    st.info("Community is not ready yet. Configure Supabase in the setup section at the bottom of this page.")
+                if supabase_enabled(community_settings) and not community_use_service_role(community_settings):
+                    st.warning("Moderation actions require the Supabase service role key. Add it in secrets to enable bans and report management.")
+                st.markdown("### Moderation")
+                reports, report_err = community_get_reports(community_settings, db)
+                if report_err:
+                    st.error(report_err)
+                if not reports:
+                    st.info("No reports yet.")
                 else:
-                    if supabase_enabled(community_settings) and not community_use_service_role(community_settings):
-                        st.warning("Moderation actions require the Supabase service role key. Add it in secrets to enable bans and report management.")
-                    st.markdown("### Moderation")
-                    reports, report_err = community_get_reports(community_settings, db)
-                    if report_err:
-                        st.error(report_err)
-                    if not reports:
-                        st.info("No reports yet.")
-                    else:
-                        for report in reports:
-                            report_id = report.get("id")
-                            post_id = report.get("post_id")
-                            with st.expander(f"Report on {post_id} by {report.get('reported_by', 'User')}"):
-                                st.caption(report.get("created_at", ""))
-                                st.write(report.get("reason", ""))
-                                mod_cols = st.columns(3)
-                                with mod_cols[0]:
-                                    if st.button("Remove Post", key=f"mod_remove_{report_id}"):
-                                        _, err = community_update_post(community_settings, db, post_id, {"status": "Removed"})
-                                        if err:
-                                            st.error(err)
-                                        else:
-                                            st.success("Post removed.")
-                                            st.rerun()
-                                with mod_cols[1]:
-                                    if st.button("Clear Report", key=f"mod_clear_{report_id}"):
-                                        _, err = community_clear_report(community_settings, db, report_id)
+                    for report in reports:
+                        report_id = report.get("id")
+                        post_id = report.get("post_id")
+                        with st.expander(f"Report on {post_id} by {report.get('reported_by', 'User')}"):
+                            st.caption(report.get("created_at", ""))
+                            st.write(report.get("reason", ""))
+                            mod_cols = st.columns(3)
+                            with mod_cols[0]:
+                                if st.button("Remove Post", key=f"mod_remove_{report_id}"):
+                                    _, err = community_update_post(community_settings, db, post_id, {"status": "Removed"})
+                                    if err:
+                                        st.error(err)
+                                    else:
+                                        st.success("Post removed.")
+                                        st.rerun()
+                            with mod_cols[1]:
+                                if st.button("Clear Report", key=f"mod_clear_{report_id}"):
+                                    _, err = community_clear_report(community_settings, db, report_id)
+                                    if err:
+                                        st.error(err)
+                                    else:
+                                        st.success("Report cleared.")
+                                        st.rerun()
+                            with mod_cols[2]:
+                                target_user = report.get("reported_user") or ""
+                                if st.button("Ban User", key=f"mod_ban_{report_id}"):
+                                    if not target_user:
+                                        st.error("No user attached to report.")
+                                    else:
+                                        _, err = community_set_ban(community_settings, db, target_user, "Reported in Community Market")
                                         if err:
                                             st.error(err)
                                         else:
-                                            st.success("Report cleared.")
+                                            st.success("User banned.")
                                             st.rerun()
-                                with mod_cols[2]:
-                                    target_user = report.get("reported_user") or ""
-                                    if st.button("Ban User", key=f"mod_ban_{report_id}"):
-                                        if not target_user:
-                                            st.error("No user attached to report.")
-                                        else:
-                                            _, err = community_set_ban(community_settings, db, target_user, "Reported in Community Market")
-                                            if err:
-                                                st.error(err)
-                                            else:
-                                                st.success("User banned.")
-                                                st.rerun()
-
-                    st.markdown("### Moderators")
-                    if role == "admin":
-                        existing_roles, _ = community_get_roles(community_settings, db)
-                        st.write("Current moderators:")
-                        for entry in existing_roles:
-                            st.write(f"{entry.get('username')} — {entry.get('role')}")
-                        with st.form("add_moderator_form"):
-                            mod_user = st.text_input("Username")
-                            mod_role = st.selectbox("Role", ["moderator", "admin"])
-                            submit_mod = st.form_submit_button("Save Role")
-                        if submit_mod and mod_user.strip():
-                            _, err = community_set_role(community_settings, db, mod_user.strip(), mod_role)
-                            if err:
-                                st.error(err)
-                            else:
-                                st.success("Role updated.")
-                                st.rerun()
-                        with st.form("remove_moderator_form"):
-                            remove_user = st.text_input("Remove Username")
-                            remove_submit = st.form_submit_button("Remove Role")
-                        if remove_submit and remove_user.strip():
-                            _, err = community_remove_role(community_settings, db, remove_user.strip())
-                            if err:
-                                st.error(err)
-                            else:
-                                st.success("Role removed.")
-                                st.rerun()
 
-        st.markdown("---")
-        st.subheader("Community Market")
-        policy_mode = (user_settings.get("community_policy_mode") or "unknown").lower()
-        app_access_open = not supabase_auth_required(community_settings)
-        app_access_label = "App: Open Access" if app_access_open else "App: Sign-in Required"
-        app_badge_class = "open" if app_access_open else "secure"
-        policy_label_map = {
-            "open": "Supabase: Open",
-            "auth": "Supabase: Auth Required",
-            "service": "Supabase: Service Role",
-            "unknown": "Supabase: Not Set"
-        }
-        policy_badge_class = policy_mode if policy_mode in {"open", "auth", "service"} else "unknown"
-        policy_badge_style = "secure" if policy_badge_class in {"auth", "service"} else "open" if policy_badge_class == "open" else "unknown"
-        st.markdown(
-            f"""
-            <div class="community-badges">
-                <div class="community-badge {app_badge_class}">{app_access_label}</div>
-                <div class="community-badge {policy_badge_style}">{policy_label_map.get(policy_badge_class, 'Supabase: Not Set')}</div>
-            </div>
-            """,
-            unsafe_allow_html=True
-        )
-        if supabase_connected:
-            st.caption("Connected to Supabase community backend (multi-device).")
-        else:
-            st.warning("Connect Supabase in Settings to enable the multi-device community. Using local mode until configured.")
-
-        if supabase_connected:
-            if not schema_ok:
-                if is_supabase_missing_table_error(schema_err):
-                    st.error("Community backend not set up yet (tables missing).")
-                    st.info("Run the SQL in `supabase_community_schema.sql` using the Supabase SQL editor, then refresh.")
-                    with st.expander("Show Supabase schema SQL"):
-                        schema_sql = load_community_schema_sql()
-                        if schema_sql:
-                            st.code(schema_sql, language="sql")
+                st.markdown("### Moderators")
+                if role == "admin":
+                    existing_roles, _ = community_get_roles(community_settings, db)
+                    st.write("Current moderators:")
+                    for entry in existing_roles:
+                        st.write(f"{entry.get('username')} — {entry.get('role')}")
+                    with st.form("add_moderator_form"):
+                        mod_user = st.text_input("Username")
+                        mod_role = st.selectbox("Role", ["moderator", "admin"])
+                        submit_mod = st.form_submit_button("Save Role")
+                    if submit_mod and mod_user.strip():
+                        _, err = community_set_role(community_settings, db, mod_user.strip(), mod_role)
+                        if err:
+                            st.error(err)
                         else:
-                            st.caption("Schema file not found in the app directory.")
-                else:
-                    st.error(f"Community backend error: {schema_err}")
-
-            st.markdown("### Setup Checklist")
-            st.caption("Run the SQL schema and use this checklist to confirm your community tables are live.")
-            if "community_checklist_results" not in st.session_state:
-                st.session_state.community_checklist_results = None
-            checklist_tables = [
-                "community_users",
-                "community_posts",
-                "community_comments",
-                "community_bids",
-                "community_offers",
-                "community_messages",
-                "community_roles",
-                "community_bans",
-                "community_reports",
-                "wealthpulse_users"
-            ]
-            if st.button("Run Setup Checklist", key="community_setup_checklist"):
-                checklist_results = supabase_check_tables(
-                    community_settings,
-                    checklist_tables,
-                    use_service_key=community_use_service_role(community_settings),
-                    auth_token=community_auth_token(community_settings)
-                )
-                st.session_state.community_checklist_results = {
-                    "results": checklist_results,
-                    "checked_at": datetime.now().isoformat()
-                }
-            if st.session_state.community_checklist_results:
-                render_checklist_results(
-                    st.session_state.community_checklist_results["results"],
-                    st.session_state.community_checklist_results.get("checked_at")
-                )
-            else:
-                st.info("Click 'Run Setup Checklist' after running the SQL to confirm tables are available.")
+                            st.success("Role updated.")
+                            st.rerun()
+                    with st.form("remove_moderator_form"):
+                        remove_user = st.text_input("Remove Username")
+                        remove_submit = st.form_submit_button("Remove Role")
+                    if remove_submit and remove_user.strip():
+                        _, err = community_remove_role(community_settings, db, remove_user.strip())
+                        if err:
+                            st.error(err)
+                        else:
+                            st.success("Role removed.")
+                            st.rerun()
 
-            test_cols = st.columns([1, 3])
-            with test_cols[0]:
-                if st.button("Test Supabase Connection", key="community_supabase_test"):
-                    ok, err = supabase_check_table(
-                        community_settings,
-                        "community_posts",
-                        use_service_key=community_use_service_role(community_settings),
-                        auth_token=community_auth_token(community_settings)
-                    )
-                    if ok:
-                        st.success("Supabase connection OK.")
+    st.markdown("---")
+    st.subheader("Community Market")
+    policy_mode = (user_settings.get("community_policy_mode") or "unknown").lower()
+    app_access_open = not supabase_auth_required(community_settings)
+    app_access_label = "App: Open Access" if app_access_open else "App: Sign-in Required"
+    app_badge_class = "open" if app_access_open else "secure"
+    policy_label_map = {
+        "open": "Supabase: Open",
+        "auth": "Supabase: Auth Required",
+        "service": "Supabase: Service Role",
+        "unknown": "Supabase: Not Set"
+    }
+    policy_badge_class = policy_mode if policy_mode in {"open", "auth", "service"} else "unknown"
+    policy_badge_style = "secure" if policy_badge_class in {"auth", "service"} else "open" if policy_badge_class == "open" else "unknown"
+    st.markdown(
+        f"""
+        <div class="community-badges">
+            <div class="community-badge {app_badge_class}">{app_access_label}</div>
+            <div class="community-badge {policy_badge_style}">{policy_label_map.get(policy_badge_class, 'Supabase: Not Set')}</div>
+        </div>
+        """,
+        unsafe_allow_html=True
+    )
+    if supabase_connected:
+        st.caption("Connected to Supabase community backend (multi-device).")
+    else:
+        st.warning("Connect Supabase in Settings to enable the multi-device community. Using local mode until configured.")
+
+    if supabase_connected:
+        if not schema_ok:
+            if is_supabase_missing_table_error(schema_err):
+                st.error("Community backend not set up yet (tables missing).")
+                st.info("Run the SQL in `supabase_community_schema.sql` using the Supabase SQL editor, then refresh.")
+                with st.expander("Show Supabase schema SQL"):
+                    schema_sql = load_community_schema_sql()
+                    if schema_sql:
+                        st.code(schema_sql, language="sql")
                     else:
-                        st.error(f"Supabase test failed: {err}")
-
-            st.markdown("### Migration Helper")
-            st.caption("Detect and generate SQL for new columns (reserve + buy now + images + grading + auth ownership fields).")
-            if "community_migration_results" not in st.session_state:
-                st.session_state.community_migration_results = None
-            if st.button("Check for missing columns", key="community_migration_check"):
-                migration_results = supabase_check_columns(
+                        st.caption("Schema file not found in the app directory.")
+            else:
+                st.error(f"Community backend error: {schema_err}")
+
+        st.markdown("### Setup Checklist")
+        st.caption("Run the SQL schema and use this checklist to confirm your community tables are live.")
+        if "community_checklist_results" not in st.session_state:
+            st.session_state.community_checklist_results = None
+        checklist_tables = [
+            "community_users",
+            "community_posts",
+            "community_comments",
+            "community_bids",
+            "community_offers",
+            "community_messages",
+            "community_roles",
+            "community_bans",
+            "community_reports",
+            "wealthpulse_users"
+        ]
+        if st.button("Run Setup Checklist", key="community_setup_checklist"):
+            checklist_results = supabase_check_tables(
+                community_settings,
+                checklist_tables,
+                use_service_key=community_use_service_role(community_settings),
+                auth_token=community_auth_token(community_settings)
+            )
+            st.session_state.community_checklist_results = {
+                "results": checklist_results,
+                "checked_at": datetime.now().isoformat()
+            }
+        if st.session_state.community_checklist_results:
+            render_checklist_results(
+                st.session_state.community_checklist_results["results"],
+                st.session_state.community_checklist_results.get("checked_at")
+            )
+        else:
+            st.info("Click 'Run Setup Checklist' after running the SQL to confirm tables are available.")
+
+        test_cols = st.columns([1, 3])
+        with test_cols[0]:
+            if st.button("Test Supabase Connection", key="community_supabase_test"):
+                ok, err = supabase_check_table(
                     community_settings,
                     "community_posts",
-                    list(COMMUNITY_POSTS_EXTRA_COLUMNS.keys()),
                     use_service_key=community_use_service_role(community_settings),
                     auth_token=community_auth_token(community_settings)
                 )
-                st.session_state.community_migration_results = {
-                    "results": migration_results,
-                    "checked_at": datetime.now().isoformat()
-                }
-            if st.session_state.community_migration_results:
-                render_checklist_results(
-                    st.session_state.community_migration_results["results"],
-                    st.session_state.community_migration_results.get("checked_at")
-                )
-                st.session_state.community_column_support = {
-                    col: ok for col, ok, _ in st.session_state.community_migration_results["results"]
-                }
-                missing = [
-                    col for col, ok, err in st.session_state.community_migration_results["results"]
-                    if not ok and is_supabase_missing_column_error(err)
-                ]
-                if missing:
-                    st.info("Run this SQL in Supabase SQL Editor to add missing columns:")
-                    migration_sql = build_community_migration_sql(missing)
-                    st.code(migration_sql, language="sql")
-                    st.download_button(
-                        "Download migration SQL",
-                        data=migration_sql,
-                        file_name="community_posts_migration.sql"
-                    )
-                    st.caption("After running the SQL, refresh this page and re-run the column check.")
+                if ok:
+                    st.success("Supabase connection OK.")
                 else:
-                    st.success("No missing columns detected.")
-    # ==============================
+                    st.error(f"Supabase test failed: {err}")
+
+        st.markdown("### Migration Helper")
+        st.caption("Detect and generate SQL for new columns (reserve + buy now + images + grading + auth ownership fields).")
+        if "community_migration_results" not in st.session_state:
+            st.session_state.community_migration_results = None
+        if st.button("Check for missing columns", key="community_migration_check"):
+            migration_results = supabase_check_columns(
+                community_settings,
+                "community_posts",
+                list(COMMUNITY_POSTS_EXTRA_COLUMNS.keys()),
+                use_service_key=community_use_service_role(community_settings),
+                auth_token=community_auth_token(community_settings)
+            )
+            st.session_state.community_migration_results = {
+                "results": migration_results,
+                "checked_at": datetime.now().isoformat()
+            }
+        if st.session_state.community_migration_results:
+            render_checklist_results(
+                st.session_state.community_migration_results["results"],
+                st.session_state.community_migration_results.get("checked_at")
+            )
+            st.session_state.community_column_support = {
+                col: ok for col, ok, _ in st.session_state.community_migration_results["results"]
+            }
+            missing = [
+                col for col, ok, err in st.session_state.community_migration_results["results"]
+                if not ok and is_supabase_missing_column_error(err)
+            ]
+            if missing:
+                st.info("Run this SQL in Supabase SQL Editor to add missing columns:")
+                migration_sql = build_community_migration_sql(missing)
+                st.code(migration_sql, language="sql")
+                st.download_button(
+                    "Download migration SQL",
+                    data=migration_sql,
+                    file_name="community_posts_migration.sql"
+                )
+                st.caption("After running the SQL, refresh this page and re-run the column check.")
+            else:
+                st.success("No missing columns detected.")
+
+# ==============================
 # TAB 11: ADMIN
 # ==============================
-if admin_tab is not None:
-    with admin_tab:
-        st.subheader("Admin Console")
-        st.caption("Admin metrics are local to this installation. No cross-device tracking is enabled.")
-
-        meta = get_meta(db)
-        users = list(iter_user_records(db))
-        total_users = sum(1 for _, record in users if record.get("auth"))
-
-        active_days = 7
-        active_users = 0
-        cutoff = datetime.now() - timedelta(days=active_days)
-        for _, record in users:
-            last_active = record.get("last_active")
-            if not last_active:
-                continue
-            try:
-                last_dt = datetime.fromisoformat(last_active)
-            except Exception:
-                continue
-            if last_dt >= cutoff:
-                active_users += 1
-
-        st.markdown("### Usage Stats")
-        stat_cols = st.columns(3)
-        stat_cols[0].metric("Estimated Downloads (local)", total_users)
-        stat_cols[1].metric(f"Active Users (last {active_days} days)", active_users)
-        stat_cols[2].metric("Total Logins", int(meta.get("total_logins", 0)))
-        st.caption("Downloads are estimated by local registrations; install counts are not tracked across devices.")
-        install_seen = meta.get("install_first_seen")
-        if install_seen:
-            try:
-                install_dt = datetime.fromisoformat(install_seen)
-                st.caption(f"Local install first seen: {format_date_for_settings(install_dt, user_settings)}")
-            except Exception:
-                st.caption(f"Local install first seen: {install_seen}")
-
-        st.markdown("### Revenue")
-        revenue_value = st.number_input(
-            "Total App Revenue (manual entry)",
-            min_value=0.0,
-            value=float(meta.get("revenue_total", 0.0)),
-            step=100.0
-        )
-        if st.button("Save Revenue", width="stretch"):
-            meta["revenue_total"] = float(revenue_value)
+if active_tab == "Admin":
+    st.subheader("Admin Console")
+    st.caption("Admin metrics are local to this installation. No cross-device tracking is enabled.")
+
+    load_all_user_records(db)
+    meta = get_meta(db)
+    users = list(iter_user_records(db))
+    total_users = sum(1 for _, record in users if record.get("auth"))
+
+    active_days = 7
+    active_users = 0
+    cutoff = datetime.now() - timedelta(days=active_days)
+    for _, record in users:
+        last_active = record.get("last_active")
+        if not last_active:
+            continue
+        try:
+            last_dt = datetime.fromisoformat(last_active)
+        except Exception:
+            continue
+        if last_dt >= cutoff:
+            active_users += 1
+
+    st.markdown("### Usage Stats")
+    stat_cols = st.columns(3)
+    stat_cols[0].metric("Estimated Downloads (local)", total_users)
+    stat_cols[1].metric(f"Active Users (last {active_days} days)", active_users)
+    stat_cols[2].metric("Total Logins", int(meta.get("total_logins", 0)))
+    st.caption("Downloads are estimated by local registrations; install counts are not tracked across devices.")
+    install_seen = meta.get("install_first_seen")
+    if install_seen:
+        try:
+            install_dt = datetime.fromisoformat(install_seen)
+            st.caption(f"Local install first seen: {format_date_for_settings(install_dt, user_settings)}")
+        except Exception:
+            st.caption(f"Local install first seen: {install_seen}")
+
+    st.markdown("### Storage Writes")
+    save_history = st.session_state.get("storage_save_history", [])
+    skipped_saves = int(st.session_state.get("storage_saves_skipped", 0))
+    storage_cols = st.columns(3)
+    storage_cols[0].metric("Saves (this session)", len(save_history))
+    storage_cols[1].metric("Skipped (no changes)", skipped_saves)
+    storage_cols[2].metric("Bytes written", f"{sum(int(item.get('bytes', 0)) for item in save_history):,}")
+    if save_history:
+        save_rows = []
+        for item in reversed(save_history):
+            save_rows.append({
+                "At": item.get("at"),
+                "Backend": item.get("backend"),
+                "Records": ", ".join(item.get("records") or []) or "-",
+                "Meta sections": ", ".join(item.get("meta_sections") or []) or "-",
+                "Bytes": int(item.get("bytes", 0)),
+                "Requests": int(item.get("requests", 0)),
+                "Rows": item.get("rows"),
+                "Conflicts": sum(len(paths) for paths in (item.get("conflicts") or {}).values())
+            })
+        st.dataframe(pd.DataFrame(save_rows), width="stretch", hide_index=True)
+    else:
+        st.caption("No data has been written during this session.")
+
+    st.markdown("### Image Storage")
+    st.caption(f"Photos are stored by content hash in the `{image_store_provider()}` blob store; records keep only references.")
+    if not PIL_AVAILABLE:
+        st.caption("Pillow is not installed, so cards show full-size photos instead of thumbnails.")
+    if st.button("Move inline images to blob store", key="admin_migrate_images"):
+        image_stats = migrate_inline_images(db)
+        if image_stats["changed"]:
             save_data(db)
-            st.success("Revenue updated.")
-        st.write(f"Current Revenue: {format_currency(revenue_value, currency_symbol, currency_rate)}")
-
-        st.markdown("### Feedback Forum")
-        feedback_items = meta.get("feedback", [])
-        feedback_filter = st.selectbox("Filter", ["All", "Open", "Resolved"], index=0)
-        filtered_items = []
-        for entry in feedback_items:
-            status = entry.get("status", "Open")
-            if feedback_filter == "All" or status == feedback_filter:
-                filtered_items.append(entry)
-
-        if not filtered_items:
-            st.info("No feedback found for this filter.")
-        else:
-            for entry in filtered_items:
-                if not entry.get("id"):
-                    entry["id"] = secrets.token_hex(6)
+        message = f"Moved {image_stats['images']} portfolio/local listing image(s), {image_stats['bytes']:,} bytes out of records."
+        if supabase_enabled(community_settings):
+            post_stats = migrate_community_post_images(community_settings)
+            image_stats["errors"].extend(post_stats["errors"])
+            message += f" Community: {post_stats['images']} image(s) across {post_stats['posts']} listing(s)."
+        st.success(message)
+        if image_stats["errors"]:
+            st.warning(f"{len(image_stats['errors'])} image(s) could not be moved: {image_stats['errors'][0]}")
+
+    st.markdown("### Shared Cache")
+    cache_stats = get_cache_stats()
+    if cache_stats:
+        cache_rows = []
+        for namespace, stats in sorted(cache_stats.items()):
+            lookups = stats["hits"] + stats["misses"] + stats["expired"]
+            cache_rows.append({
+                "Namespace": namespace,
+                "Entries": stats["entries"],
+                "Hits": stats["hits"],
+                "Misses": stats["misses"],
+                "Expired": stats["expired"],
+                "Hit rate": f"{(stats['hits'] / lookups * 100) if lookups else 0:.0f}%",
+                "Sets": stats["sets"],
+                "Evictions": stats["evictions"]
+            })
+        st.dataframe(pd.DataFrame(cache_rows), width="stretch", hide_index=True)
+    else:
+        st.caption("Shared cache is empty.")
+
+    st.markdown("### Background Refresh")
+    refresh_jobs = get_market_refresh_jobs()
+    if refresh_jobs:
+        job_rows = []
+        for job in sorted(refresh_jobs, key=lambda item: item["key"]):
+            last_run = job.get("last_run")
+            job_rows.append({
+                "Key": job["key"],
+                "Kind": job.get("kind"),
+                "Every (s)": int(job.get("interval", 0)),
+                "Last run": datetime.fromtimestamp(last_run).strftime("%H:%M:%S") if last_run else "pending",
+                "Duration ms": round(job["last_duration_ms"], 1) if job.get("last_duration_ms") is not None else None,
+                "Last error": job.get("last_error") or ""
+            })
+        st.dataframe(pd.DataFrame(job_rows), width="stretch", hide_index=True)
+        st.caption("Cadence per provider can be overridden with `[MARKET_REFRESH_SECONDS]` (fx, metals, quotes) in secrets.")
+    else:
+        st.caption("No background refresh jobs registered.")
+
+    st.markdown("### Community Realtime")
+    realtime_rows = [
+        {
+            "Project": item["url"],
+            "Connected": item["connected"],
+            "Events": item["events"],
+            "Last event": datetime.fromtimestamp(item["last_event"]).strftime("%H:%M:%S") if item.get("last_event") else "",
+            "Last error": item.get("last_error") or ""
+        }
+        for item in get_community_realtime_status()
+    ]
+    if realtime_rows:
+        st.dataframe(pd.DataFrame(realtime_rows), width="stretch", hide_index=True)
+    elif not REALTIME_AVAILABLE:
+        st.caption("Install `websocket-client` for realtime Community updates; Browse falls back to 20s polling.")
+    else:
+        st.caption("No realtime subscriber running (starts when a Supabase Community view opens with live updates on).")
+
+    st.markdown("### Alert Worker")
+    alert_status = get_alert_worker_status()
+    if not alert_worker_enabled():
+        st.caption("In-app worker disabled (`ALERT_WORKER_ENABLED = false`, the default with Supabase app storage); run `python wealth_tracker.py --run-alerts` on a schedule.")
+    elif alert_status.get("standby"):
+        st.caption("Standing by: another process on this host holds the alert lease and evaluates alerts.")
+    elif alert_status.get("last_run"):
+        alert_cols = st.columns(4)
+        alert_cols[0].metric("Last run", datetime.fromtimestamp(alert_status["last_run"]).strftime("%H:%M:%S"))
+        alert_cols[1].metric("Duration ms", f"{alert_status.get('last_duration_ms') or 0:.0f}")
+        last_stats = alert_status.get("last_stats") or {}
+        alert_cols[2].metric("Alerts", last_stats.get("alerts", 0))
+        alert_cols[3].metric("Emails", last_stats.get("emails", 0))
+        if alert_status.get("last_error"):
+            st.warning(f"Last error: {alert_status['last_error']}")
+    else:
+        st.caption("Alert worker has not run yet.")
+
+    st.markdown("### HTTP Endpoints")
+    http_metrics = get_http_metrics()
+    if http_metrics:
+        http_rows = []
+        for item in sorted(http_metrics, key=lambda entry: entry["total_ms"], reverse=True):
+            http_rows.append({
+                "Provider": item["provider"],
+                "Endpoint": f"{item['method']} {item['endpoint']}",
+                "Calls": item["count"],
+                "Errors": item["errors"],
+                "Avg ms": round(item["total_ms"] / max(1, item["count"]), 1),
+                "Max ms": round(item["max_ms"], 1),
+                "Statuses": ", ".join(f"{code}×{count}" for code, count in item["statuses"].items())
+            })
+        st.dataframe(pd.DataFrame(http_rows), width="stretch", hide_index=True)
+        st.caption("Process-wide since the server started. Per-provider timeouts can be overridden with `[HTTP_TIMEOUTS]` in secrets.")
+    else:
+        st.caption("No outbound requests recorded yet.")
+
+    st.markdown("### Revenue")
+    revenue_value = st.number_input(
+        "Total App Revenue (manual entry)",
+        min_value=0.0,
+        value=float(meta.get("revenue_total", 0.0)),
+        step=100.0
+    )
+    if st.button("Save Revenue", width="stretch"):
+        meta["revenue_total"] = float(revenue_value)
+        save_data(db)
+        st.success("Revenue updated.")
+    st.write(f"Current Revenue: {format_currency(revenue_value, currency_symbol, currency_rate)}")
+
+    st.markdown("### Feedback Forum")
+    feedback_items = meta.get("feedback", [])
+    feedback_filter = st.selectbox("Filter", ["All", "Open", "Resolved"], index=0)
+    filtered_items = []
+    for entry in feedback_items:
+        status = entry.get("status", "Open")
+        if feedback_filter == "All" or status == feedback_filter:
+            filtered_items.append(entry)
+
+    if not filtered_items:
+        st.info("No feedback found for this filter.")
+    else:
+        for entry in filtered_items:
+            if not entry.get("id"):
+                entry["id"] = secrets.token_hex(6)
+                save_data(db)
+            entry_id = entry["id"]
+            title = f"{entry.get('category', 'Feedback')} • {entry.get('subject', 'No subject')}"
+            user_label = entry.get("user", "Unknown")
+            with st.expander(f"{title} — {user_label}"):
+                st.write(entry.get("message", ""))
+                created_at = entry.get("created_at")
+                if created_at:
+                    try:
+                        created_dt = datetime.fromisoformat(created_at)
+                        st.caption(f"Submitted {format_date_for_settings(created_dt, user_settings)}")
+                    except Exception:
+                        st.caption(f"Submitted {created_at}")
+                status_value = entry.get("status", "Open")
+                status_index = 0 if status_value == "Open" else 1
+                new_status = st.selectbox(
+                    "Status",
+                    ["Open", "Resolved"],
+                    index=status_index,
+                    key=f"fb_status_{entry_id}"
+                )
+                response_text = st.text_area(
+                    "Admin Response",
+                    value=entry.get("admin_response", ""),
+                    key=f"fb_response_{entry_id}"
+                )
+                if st.button("Save Response", key=f"fb_save_{entry_id}"):
+                    entry["status"] = new_status
+                    entry["admin_response"] = response_text.strip()
                     save_data(db)
-                entry_id = entry["id"]
-                title = f"{entry.get('category', 'Feedback')} • {entry.get('subject', 'No subject')}"
-                user_label = entry.get("user", "Unknown")
-                with st.expander(f"{title} — {user_label}"):
-                    st.write(entry.get("message", ""))
-                    created_at = entry.get("created_at")
-                    if created_at:
-                        try:
-                            created_dt = datetime.fromisoformat(created_at)
-                            st.caption(f"Submitted {format_date_for_settings(created_dt, user_settings)}")
-                        except Exception:
-                            st.caption(f"Submitted {created_at}")
-                    status_value = entry.get("status", "Open")
-                    status_index = 0 if status_value == "Open" else 1
-                    new_status = st.selectbox(
-                        "Status",
-                        ["Open", "Resolved"],
-                        index=status_index,
-                        key=f"fb_status_{entry_id}"
-                    )
-                    response_text = st.text_area(
-                        "Admin Response",
-                        value=entry.get("admin_response", ""),
-                        key=f"fb_response_{entry_id}"
-                    )
-                    if st.button("Save Response", key=f"fb_save_{entry_id}"):
-                        entry["status"] = new_status
-                        entry["admin_response"] = response_text.strip()
-                        save_data(db)
-                        st.success("Feedback updated.")
-                        st.rerun()
+                    st.success("Feedback updated.")
+                    st.rerun()
 
-        st.markdown("### Password Reset Assistance")
-        with st.form("admin_password_reset"):
-            target_user = st.text_input("Target Username")
-            new_password = st.text_input("New Password", type="password")
-            confirm_password = st.text_input("Confirm New Password", type="password")
-            admin_submit = st.form_submit_button("Reset User Password", width="stretch")
-
-        if admin_submit:
-            pw_error = True
-            if not target_user:
-                st.error("Enter a target username.")
+    st.markdown("### Password Reset Assistance")
+    with st.form("admin_password_reset"):
+        target_user = st.text_input("Target Username")
+        new_password = st.text_input("New Password", type="password")
+        confirm_password = st.text_input("Confirm New Password", type="password")
+        admin_submit = st.form_submit_button("Reset User Password", width="stretch")
+
+    if admin_submit:
+        pw_error = True
+        if not target_user:
+            st.error("Enter a target username.")
+        else:
+            pw_error = validate_password_strength(new_password)
+            if pw_error:
+                st.error(pw_error)
             else:
-                pw_error = validate_password_strength(new_password)
-                if pw_error:
-                    st.error(pw_error)
-                else:
-                    pw_error = False
-            if not pw_error:
-                if new_password != confirm_password:
-                    st.error("Passwords do not match.")
-                else:
-                    record = ensure_user_record(db, target_user)
-                    record["auth"] = make_password_record(new_password)
-                    if "recovery" not in record:
-                        record["recovery"] = []
-                    save_data(db)
-                    st.success("Password reset for user.")
+                pw_error = False
+        if not pw_error:
+            if new_password != confirm_password:
+                st.error("Passwords do not match.")
+            else:
+                ensure_user_loaded(db, target_user)
+                record = ensure_user_record(db, target_user)
+                record["auth"] = make_password_record(new_password)
+                if "recovery" not in record:
+                    record["recovery"] = []
+                save_data(db)
+                st.success("Password reset for user.")
 
-        if st.button("Disable Admin Mode", width="stretch"):
-            st.session_state.is_admin = False
-            st.success("Admin mode disabled.")
-            st.rerun()
+    if st.button("Disable Admin Mode", width="stretch"):
+        st.session_state.is_admin = False
+        st.success("Admin mode disabled.")
+        st.rerun()
 
 # ==============================
 # BULK DELETE CONFIRMATION MODAL